@@ -0,0 +1,239 @@
+"""Local JSON-RPC dev chain for the on-chain benchmark flows.
+
+No EVM: the node accepts any signed legacy transaction and mines it in
+nonce order, each in its own block as it arrives (`block_time=0`, anvil's
+default automine) or on the next block (`anvil --block-time`). It answers the
+calls the repo's send-and-wait scripts make through `Web3.HTTPProvider`:
+
+    eth_chainId, eth_blockNumber, eth_gasPrice, eth_getTransactionCount (latest / pending),
+    eth_sendRawTransaction, eth_getTransactionReceipt, eth_getTransactionByHash, eth_estimateGas
+
+Each call takes `rpc_latency` (plus up to as much again in jitter). Mined
+transactions are counted per diamond function selector, so a benchmark can
+check that the flow actually sent `sendQuote`, `settleUpnl`, ... A `sendQuote`
+receipt carries the diamond's `SendQuote` event with the next quote id, which
+is what party_a/send_quote.py reads its quote id from.
+
+Usage
+    chain = DevChain(block_time=0.2).start()
+    w3 = Web3(Web3.HTTPProvider(chain.url))
+    ...
+    print(chain.stats, chain.calls)
+    chain.stop()
+"""
+
+import os
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import rlp
+from eth_abi import decode, encode
+from eth_account import Account
+from web3 import Web3
+
+ABI_PATH = os.path.join(os.path.dirname(__file__), "..", "abi", "symmio.json")
+SEND_QUOTE_EVENT = "event:SendQuote"
+
+
+def _functions(abi_path: str = ABI_PATH) -> Dict[str, Any]:
+    """(name, canonical input types) per function selector, plus the SendQuote event under its topic."""
+    with open(abi_path) as f:
+        abi = json.load(f)
+    functions = {}
+    for item in abi:
+        if item.get("type") in ("function", "event"):
+            types = [_canonical(i) for i in item["inputs"]]
+            signature = f"{item['name']}({','.join(types)})"
+            if item["type"] == "function":
+                functions[Web3.keccak(text=signature)[:4].hex().removeprefix("0x")] = (item["name"], types)
+            elif item["name"] == "SendQuote":
+                functions[SEND_QUOTE_EVENT] = (Web3.to_hex(Web3.keccak(text=signature)), types)
+    return functions
+
+
+def _canonical(param: Dict[str, Any]) -> str:
+    if param["type"].startswith("tuple"):
+        return "(" + ",".join(_canonical(c) for c in param["components"]) + ")" + param["type"][5:]
+    return param["type"]
+
+
+class DevChain:
+    """Block-time mining JSON-RPC node on a local port."""
+
+    def __init__(self, block_time: float = 0.2, rpc_latency: float = 0.002, chain_id: int = 42161, seed: int = 0):
+        self.block_time = block_time
+        self.rpc_latency = rpc_latency
+        self.chain_id = chain_id
+        self.gas_price = 10**8
+        self.rng = random.Random(seed)
+        self.genesis = time.monotonic()
+        self.height = 1  # automine
+        self.functions = _functions()
+        self.selectors = {selector: name for selector, (name, _) in self.functions.items() if selector != SEND_QUOTE_EVENT}
+        self.next_quote_id = 1
+        self._lock = threading.Lock()
+        self._txs: Dict[str, Dict[str, Any]] = {}
+        self._nonces: Dict[str, Dict[int, str]] = {}
+        self.calls: Dict[str, int] = {}
+        self.stats = {"requests": 0, "transactions": 0, "rejected": 0}
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> "DevChain":
+        chain = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if isinstance(request, list):
+                    payload = [chain.handle(r) for r in request]
+                else:
+                    payload = chain.handle(request)
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    # ----------------------------------------------------------------
+    # JSON-RPC
+    # ----------------------------------------------------------------
+    def block_number(self) -> int:
+        if not self.block_time:
+            return self.height
+        return int((time.monotonic() - self.genesis) / self.block_time) + 1
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        self.stats["requests"] += 1
+        if self.rpc_latency:
+            time.sleep(self.rpc_latency * (1 + self.rng.random()))
+        method, params = request.get("method"), request.get("params") or []
+        try:
+            result = getattr(self, "rpc_" + method)(*params)
+        except AttributeError:
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32601, "message": f"{method} not supported"}}
+        except ValueError as e:
+            self.stats["rejected"] += 1
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32000, "message": str(e)}}
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+
+    def rpc_eth_chainId(self) -> str:
+        return hex(self.chain_id)
+
+    def rpc_eth_blockNumber(self) -> str:
+        return hex(self.block_number())
+
+    def rpc_eth_gasPrice(self) -> str:
+        return hex(self.gas_price)
+
+    def rpc_eth_estimateGas(self, tx: Dict[str, Any], *_: Any) -> str:
+        return hex(500_000)
+
+    def rpc_eth_getTransactionCount(self, address: str, block: str = "latest") -> str:
+        with self._lock:
+            nonces = self._nonces.get(address.lower(), {})
+            if block == "pending":
+                return hex(max(nonces, default=-1) + 1)
+            now = self.block_number()
+            return hex(max((n for n, h in nonces.items() if self._txs[h]["block"] <= now), default=-1) + 1)
+
+    def rpc_eth_sendRawTransaction(self, raw_hex: str) -> str:
+        raw = Web3.to_bytes(hexstr=raw_hex)
+        sender = Account.recover_transaction(raw).lower()
+        fields = rlp.decode(raw)  # legacy transactions only, as built by the scripts (gasPrice set)
+        nonce = int.from_bytes(fields[0], "big")
+        tx_hash = Web3.to_hex(Web3.keccak(raw))
+        with self._lock:
+            nonces = self._nonces.setdefault(sender, {})
+            expected = max(nonces, default=-1) + 1
+            if nonce < expected:
+                raise ValueError("nonce too low")
+            if nonce > expected:
+                raise ValueError(f"nonce gap: expected {expected}, got {nonce}")
+            nonces[nonce] = tx_hash
+            if self.block_time:
+                block = self.block_number() + 1
+            else:
+                self.height += 1
+                block = self.height
+            name = self.selectors.get(fields[5][:4].hex(), fields[5][:4].hex() or "transfer")
+            self._txs[tx_hash] = {
+                "block": block, "from": sender, "to": Web3.to_hex(fields[3]), "nonce": nonce,
+                "input": Web3.to_hex(fields[5]),
+                "logs": [self._send_quote_log(sender, fields[5])] if name == "sendQuote" else [],
+            }
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.stats["transactions"] += 1
+        return tx_hash
+
+    def _send_quote_log(self, party_a: str, calldata: bytes) -> Dict[str, Any]:
+        """The diamond's SendQuote event for a sendQuote call; the caller holds `_lock`."""
+        (party_bs, symbol_id, position_type, order_type, price, quantity, cva, lf, party_a_mm, party_b_mm,
+         _, deadline, upnl_sig) = decode(self.functions[calldata[:4].hex()][1], calldata[4:])
+        topic, types = self.functions[SEND_QUOTE_EVENT]
+        quote_id, self.next_quote_id = self.next_quote_id, self.next_quote_id + 1
+        data = encode(types, [party_a, quote_id, party_bs, symbol_id, position_type, order_type, price, upnl_sig[3],
+                              quantity, cva, lf, party_a_mm, party_b_mm, 0, deadline])
+        return {"topics": [topic], "data": Web3.to_hex(data)}
+
+    def rpc_eth_getTransactionByHash(self, tx_hash: str) -> Optional[Dict[str, Any]]:
+        tx = self._txs.get(tx_hash)
+        if tx is None:
+            return None
+        mined = tx["block"] <= self.block_number()
+        return {
+            "hash": tx_hash, "nonce": hex(tx["nonce"]), "from": Web3.to_checksum_address(tx["from"]),
+            "to": Web3.to_checksum_address(tx["to"]), "input": tx["input"], "value": "0x0", "gas": hex(500_000),
+            "gasPrice": hex(self.gas_price), "blockNumber": hex(tx["block"]) if mined else None,
+            "blockHash": self._block_hash(tx["block"]) if mined else None, "transactionIndex": "0x0" if mined else None,
+        }
+
+    def rpc_eth_getTransactionReceipt(self, tx_hash: str) -> Optional[Dict[str, Any]]:
+        tx = self._txs.get(tx_hash)
+        if tx is None or tx["block"] > self.block_number():
+            return None
+        return {
+            "transactionHash": tx_hash, "transactionIndex": "0x0", "blockHash": self._block_hash(tx["block"]),
+            "blockNumber": hex(tx["block"]), "from": Web3.to_checksum_address(tx["from"]),
+            "to": Web3.to_checksum_address(tx["to"]), "cumulativeGasUsed": hex(21_000), "gasUsed": hex(21_000),
+            "effectiveGasPrice": hex(self.gas_price), "contractAddress": None,
+            "logs": [
+                {"address": Web3.to_checksum_address(tx["to"]), "topics": log["topics"], "data": log["data"],
+                 "logIndex": hex(i), "transactionIndex": "0x0", "transactionHash": tx_hash,
+                 "blockHash": self._block_hash(tx["block"]), "blockNumber": hex(tx["block"]), "removed": False}
+                for i, log in enumerate(tx["logs"])
+            ],
+            "logsBloom": "0x" + "00" * 256, "status": "0x1", "type": "0x0",
+        }
+
+    @staticmethod
+    def _block_hash(block: int) -> str:
+        return Web3.to_hex(Web3.keccak(block.to_bytes(8, "big")))
+
+    def mined(self) -> List[str]:
+        now = self.block_number()
+        return [h for h, tx in self._txs.items() if tx["block"] <= now]
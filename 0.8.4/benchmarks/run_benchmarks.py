@@ -0,0 +1,353 @@
+"""End-to-end trading-flow benchmarks against local stand-ins.
+
+Each flow runs the SDK code a bot runs, end to end, against in-process
+stand-ins: a `MockSolver` (solver/hedger, Muon and notification service), and
+for the on-chain flows a `DevChain` JSON-RPC node that mines every transaction
+as it arrives.
+A flow is swept over concurrency levels. At each level `--ops` operations are
+shared by that many workers, each with its own wallet.
+
+    instant_open     AsyncSolverClient.open_trade: prepare, POST /instant_open, confirmation on the hub
+    instant_close    close_trade of an opened quote, through to the close confirmation
+    bracket          BracketOrders.open: open, confirmation, SL/TP legs accepted
+    send_quote       party_a/send_quote.py: symbols, locked params, Muon sig, sendQuote tx, receipt
+    settle_upnl      settlement/settle_upnl.py: Muon settlement sig, settleUpnl tx, receipt
+
+Results are per flow and concurrency: ops, errors, latency p50/p90/p99/max (ms)
+and throughput (ops/s). They are written as JSON (`--output`). `--check`
+compares them with the stored baseline and exits 1 when a p50 is more than
+`--tolerance` slower, or a throughput more than `--tolerance` lower, than the
+baseline. The stand-ins add fixed delays (see `STAND_IN`), so the numbers
+mostly measure the SDK's own hot path on top of them. A baseline is only
+comparable on similar hardware; regenerate it with `--update-baseline` when
+the machine or the stand-ins change.
+
+The shipped baseline.json was recorded on a single CPU (its `meta`: cpus 1,
+CPython 3.11.7, Linux x86_64, 48 ops per level). Its x4 and x16 levels
+therefore measure how far the SDK overlaps I/O on one core, not parallel
+speedup. On a machine with more cores those levels have more headroom, so
+they can hide a regression that the 1-CPU numbers would show; `--check` warns
+when the CPU count differs from the baseline's.
+
+Run
+- python benchmarks/run_benchmarks.py                              # every flow at 1, 4 and 16 workers
+- python benchmarks/run_benchmarks.py --flows instant_open,bracket --concurrency 1,32 --ops 128
+- python benchmarks/run_benchmarks.py --check                      # exit 1 on a regression against baseline.json
+- python benchmarks/run_benchmarks.py --update-baseline            # store this run as the baseline
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+for folder in ("instant_actions", "party_a", "settlement"):
+    sys.path.insert(0, os.path.join(ROOT, folder))
+
+from eth_account import Account
+
+from async_client import AsyncSolverClient
+from bracket_orders import BracketOrders
+from conditional_orders import ConditionalOrderManager
+from mock_solver import MockSolver, Profile
+from notification_hub import NotificationHub
+from tracing import LatencyHistogram
+from send_quote import SendQuoteClient
+from settle_upnl import SettleUpnlClient
+from dev_chain import DevChain
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DIAMOND_ADDRESS = "0x976c214741b4657bd99dfd38a5c0e3ac5c99d903"
+CHAIN_ID = 42161
+
+# Fixed, jitter-free stand-in delays, so runs differ only by the code under test
+STAND_IN = {
+    "solver": Profile(latency=0.005, confirm_delay=0.05, close_delay=0.05),
+    "block_time": 0.0,  # automine: receipts don't snap to block boundaries
+    "rpc_latency": 0.002,
+}
+FLOWS = ("instant_open", "instant_close", "bracket", "send_quote", "settle_upnl")
+
+
+# --------------------------------------------------------------------
+# Measurement
+# --------------------------------------------------------------------
+def summarize(durations: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    histogram = LatencyHistogram()
+    for seconds in durations:
+        histogram.record(seconds * 1_000_000)
+    return {
+        "ops": len(durations),
+        "errors": errors,
+        "p50_ms": round(histogram.percentile(0.50) / 1000, 2),
+        "p90_ms": round(histogram.percentile(0.90) / 1000, 2),
+        "p99_ms": round(histogram.percentile(0.99) / 1000, 2),
+        "max_ms": round(histogram.max_us / 1000, 2),
+        "throughput": round(len(durations) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+async def sweep_async(op: Callable[[int], Any], workers: int, ops: int) -> Dict[str, Any]:
+    """`ops` calls of `op(worker)`, `workers` at a time on the running loop."""
+    durations: List[float] = []
+    errors = 0
+    remaining = iter(range(ops))
+
+    async def worker(index: int) -> None:
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                await op(index)
+            except Exception:
+                errors += 1
+            else:
+                durations.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(workers)))
+    return summarize(durations, errors, time.perf_counter() - started)
+
+
+def sweep_threads(op: Callable[[int], Any], workers: int, ops: int) -> Dict[str, Any]:
+    """`ops` calls of the blocking `op(worker)` on `workers` threads."""
+    durations: List[float] = []
+    errors = [0]
+    remaining = iter(range(ops))
+    lock = threading.Lock()
+
+    def worker(index: int) -> None:
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            started = time.perf_counter()
+            try:
+                op(index)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+            else:
+                with lock:
+                    durations.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    # The scripts print every step; keep the report readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(worker, i) for i in range(workers)]:
+                future.result()
+    return summarize(durations, errors[0], time.perf_counter() - started)
+
+
+# --------------------------------------------------------------------
+# Flows
+# --------------------------------------------------------------------
+async def run_solver_flows(flows: List[str], levels: List[int], ops: int, base_url: str, solver: MockSolver) -> Dict[str, Dict[str, Any]]:
+    wallets = [Account.create() for _ in range(max(levels))]
+    hub = NotificationHub(solver.ws_url, reconnect_delay=0.05, verbose=False)
+    results: Dict[str, Dict[str, Any]] = {}
+    async with AsyncSolverClient(base_url, CHAIN_ID, f"{base_url}/muon", DIAMOND_ADDRESS,
+                                 cache_dir=tempfile.mkdtemp(prefix="symmio-bench-"), hub=hub,
+                                 notification_app_name=solver.app_name) as client:
+        for wallet in wallets:
+            client.add_account(wallet.key.hex(), wallet.address)
+        # Logins, symbols and websocket subscriptions happen once, as in a running bot
+        await asyncio.gather(*(client.token(w.address) for w in wallets))
+        await asyncio.sleep(0.2)
+
+        async def instant_open(worker: int) -> None:
+            await client.open_trade(wallets[worker].address, symbol_id=340, symbol_name="XRPUSDT", quantity="6")
+
+        opened: Dict[int, List[int]] = {}
+
+        async def instant_close(worker: int) -> None:
+            quote_id = opened[worker].pop()
+            sent_at = time.monotonic()
+            await client.close_trade(wallets[worker].address, 340, quote_id, "6")
+            await hub.close_confirmation(solver.app_name, quote_id, 10, since=sent_at)
+
+        orders = {w.address: ConditionalOrderManager(f"{base_url}/conditional-orders", None, w.address, w.address,
+                                                     [w.address]) for w in wallets}
+
+        async def bracket(worker: int) -> None:
+            address = wallets[worker].address
+            await BracketOrders(client, orders[address], confirm_timeout=10).open(
+                address, symbol_id=340, symbol_name="XRPUSDT", quantity="6", stop_loss_pct="0.2")
+
+        operations = {"instant_open": instant_open, "instant_close": instant_close, "bracket": bracket}
+        for flow in flows:
+            results[flow] = {}
+            for workers in levels:
+                if flow == "instant_close":
+                    # Positions to close, opened outside the measurement
+                    per_worker = -(-ops // workers) + 1
+                    opened = {i: [] for i in range(workers)}
+                    for i in range(workers):
+                        for _ in range(per_worker):
+                            result = await client.open_trade(wallets[i].address, symbol_id=340,
+                                                             symbol_name="XRPUSDT", quantity="6")
+                            opened[i].append(result["quote_id"])
+                results[flow][str(workers)] = await sweep_async(operations[flow], workers, ops)
+                report_level(flow, workers, results[flow][str(workers)])
+    await asyncio.to_thread(hub.stop)
+    return results
+
+
+def run_chain_flows(flows: List[str], levels: List[int], ops: int, base_url: str) -> Dict[str, Dict[str, Any]]:
+    chain = DevChain(block_time=STAND_IN["block_time"], rpc_latency=STAND_IN["rpc_latency"], chain_id=CHAIN_ID).start()
+    wallets = [Account.create() for _ in range(max(levels))]
+
+    def config(wallet) -> Dict[str, Any]:
+        return {
+            "rpc_url": chain.url,
+            "private_key": wallet.key.hex(),
+            "diamond_address": DIAMOND_ADDRESS,
+            "chain_id": str(CHAIN_ID),
+            "muon_base_url": f"{base_url}/muon",
+            "hedger_url": f"{base_url}/",
+            "symbol_id": 340,
+            "party_b_whitelist": [wallet.address],
+            "quantity": "6",
+            "leverage": 1,
+            "position_type": 0,
+            "order_type": 1,
+            "slippage": "2",
+        }
+
+    # One client per worker, built up front: ABI load and provider set-up are start-up costs
+    send_quote_clients = [SendQuoteClient(config(w)) for w in wallets]
+    settle_clients = [SettleUpnlClient(config(w)) for w in wallets]
+
+    def send_quote(worker: int) -> None:
+        send_quote_clients[worker].send_quote()
+
+    def settle_upnl(worker: int) -> None:
+        settle_clients[worker].settle_upnl(wallets[worker].address, [1000 + worker])
+
+    operations = {"send_quote": send_quote, "settle_upnl": settle_upnl}
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        for flow in flows:
+            results[flow] = {}
+            for workers in levels:
+                results[flow][str(workers)] = sweep_threads(operations[flow], workers, ops)
+                report_level(flow, workers, results[flow][str(workers)])
+    finally:
+        print(f"[BENCH] Dev chain: {chain.stats}, calls {chain.calls}")
+        chain.stop()
+    return results
+
+
+def report_level(flow: str, workers: int, result: Dict[str, Any]) -> None:
+    print(f"[BENCH] {flow:<14} x{workers:<3} {result['ops']:>4} ops {result['errors']:>3} errors  "
+          f"p50 {result['p50_ms']:8.1f}ms  p90 {result['p90_ms']:8.1f}ms  p99 {result['p99_ms']:8.1f}ms  "
+          f"{result['throughput']:8.1f}/s")
+
+
+def run(flows: List[str], levels: List[int], ops: int) -> Dict[str, Any]:
+    solver = MockSolver(STAND_IN["solver"], seed=1)
+    base_url = solver.start_in_thread()
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        solver_flows = [f for f in flows if f in ("instant_open", "instant_close", "bracket")]
+        if solver_flows:
+            results.update(asyncio.run(run_solver_flows(solver_flows, levels, ops, base_url, solver)))
+        chain_flows = [f for f in flows if f in ("send_quote", "settle_upnl")]
+        if chain_flows:
+            results.update(run_chain_flows(chain_flows, levels, ops, base_url))
+    finally:
+        solver.stop_thread()
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "ops_per_level": ops,
+            "stand_in": {"solver": repr(STAND_IN["solver"]), "block_time": STAND_IN["block_time"],
+                         "rpc_latency": STAND_IN["rpc_latency"]},
+        },
+        "results": {flow: results[flow] for flow in flows},
+    }
+
+
+# --------------------------------------------------------------------
+# Baseline
+# --------------------------------------------------------------------
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of `report` against `baseline`; levels missing from either side are skipped."""
+    regressions = []
+    for flow, levels in report["results"].items():
+        for workers, result in levels.items():
+            base = baseline.get("results", {}).get(flow, {}).get(workers)
+            if base is None:
+                continue
+            if result["errors"] > base["errors"]:
+                regressions.append(f"{flow} x{workers}: {result['errors']} errors (baseline {base['errors']})")
+            if base["p50_ms"] and result["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+                regressions.append(f"{flow} x{workers}: p50 {result['p50_ms']:.1f}ms (baseline {base['p50_ms']:.1f}ms)")
+            if result["throughput"] < base["throughput"] * (1 - tolerance):
+                regressions.append(f"{flow} x{workers}: {result['throughput']:.1f}/s (baseline {base['throughput']:.1f}/s)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end trading-flow benchmarks against local stand-ins")
+    parser.add_argument("--flows", default=",".join(FLOWS), help="comma-separated subset of " + ", ".join(FLOWS))
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated worker counts")
+    parser.add_argument("--ops", type=int, default=48, help="operations per flow and concurrency level")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--check", action="store_true", help="exit 1 on a regression against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+    args = parser.parse_args()
+
+    flows = [f.strip() for f in args.flows.split(",") if f.strip()]
+    unknown = set(flows) - set(FLOWS)
+    if unknown:
+        parser.error(f"unknown flows: {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    report = run(flows, levels, args.ops)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[BENCH] Results written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"[BENCH] Baseline updated: {args.baseline}")
+    elif args.check:
+        if not os.path.exists(args.baseline):
+            sys.exit(f"[BENCH] No baseline at {args.baseline}; run with --update-baseline first")
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        base_cpus = baseline.get("meta", {}).get("cpus")
+        if base_cpus != report["meta"]["cpus"]:
+            print(f"[BENCH] Warning: baseline recorded on {base_cpus} CPU(s), this run has {report['meta']['cpus']}; "
+                  "the x4/x16 levels are not directly comparable")
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"[BENCH] REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"[BENCH] No regressions against the baseline (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,594 @@
+"""Asyncio instant-trading client for the solver API.
+
+`instant_open.py` runs its calls strictly in sequence on blocking `requests`:
+Muon price, locked params, `POST /instant_open`, then status polling. This
+client covers the same endpoints on one pooled `aiohttp` session so a single
+event loop can drive hundreds of instant trades across sub-accounts:
+
+    /nonce/{address}         GET   SIWE nonce
+    /login                   POST  SIWE login (signing and token cache shared with session_manager.py)
+    /get_locked_params/{s}   GET   locked params for a symbol and leverage
+    /contract-symbols        GET   symbol metadata (cached; price/quantity precision)
+    /instant_open            POST  open
+    /instant_close           POST  close
+    /instant_open/{address}  GET   open status (temp quote id -> quote id)
+
+The independent pre-trade fetches (Muon price, locked params, symbol
+precision) run concurrently with `asyncio.gather`, so the pre-trade latency is
+the slowest of the three rather than their sum.
+
+With a `RequestScheduler` (rate_scheduler.py) every request waits for its
+endpoint's adaptive rate limit, queued by priority (closes before opens before
+status polls) and fairly across sub-accounts, and 429s are retried after
+`Retry-After`.
+
+Usage
+    async with AsyncSolverClient(HEDGER_URL, CHAIN_ID, MUON_BASE_URL, DIAMOND_ADDRESS) as client:
+        client.add_account(PRIVATE_KEY, SUB_ACCOUNT_ADDRESS)
+        result = await client.open_trade(SUB_ACCOUNT_ADDRESS, symbol_id=340, symbol_name="XRPUSDT", quantity="6.1")
+
+Run
+- python instant_actions/async_client.py          # latency comparison against a local stub solver
+- python instant_actions/async_client.py --live   # one instant open against HEDGER_URL
+
+Required .env (only for --live)
+- PRIVATE_KEY
+- SUB_ACCOUNT_ADDRESS
+- HEDGER_URL
+- MUON_BASE_URL
+- DIAMOND_ADDRESS
+
+Optional .env
+- CHAIN_ID (default: 42161)
+- NOTIFICATION_APP_NAME  # wait for confirmations on the notification hub instead of polling
+"""
+
+import os
+import sys
+import time
+import asyncio
+import statistics
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import aiohttp
+import requests
+from aiohttp import web
+from dotenv import load_dotenv
+
+from locked_params_cache import LockedParamsCache, parse_locked_params
+from margin_engine import MarginEngine
+from notification_hub import NotificationHub
+from rate_scheduler import PRIORITY_CLOSE, PRIORITY_OPEN, PRIORITY_POLL, RequestScheduler, request_priority
+from session_manager import SiweSessionManager
+from symbol_catalog import SymbolFormatter, parse_symbols, symbol_id_of
+from tracing import TRACER, traced, configure as configure_tracing
+
+
+class AsyncSolverClient:
+    """Pooled asyncio client for the solver's instant-trading endpoints."""
+
+    def __init__(
+        self,
+        solver_url: str,
+        chain_id: int,
+        muon_base_url: Optional[str] = None,
+        diamond_address: Optional[str] = None,
+        max_connections: int = 256,
+        timeout: float = 30.0,
+        cache_dir: Optional[str] = None,
+        hub: Optional[NotificationHub] = None,
+        notification_app_name: Optional[str] = None,
+        locked_params: Optional[LockedParamsCache] = None,
+        muon_ttl: float = 0.0,
+        scheduler: Optional[RequestScheduler] = None,
+    ):
+        self.solver_url = solver_url.rstrip("/")
+        self.chain_id = int(chain_id)
+        self.muon_base_url = muon_base_url
+        self.diamond_address = diamond_address
+        self.max_connections = max_connections
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.cache_dir = cache_dir
+        self.hub = hub
+        self.notification_app_name = notification_app_name
+        self.locked_params = locked_params
+        self.muon_ttl = muon_ttl
+        self.scheduler = scheduler
+
+        self.http: Optional[aiohttp.ClientSession] = None
+        self.accounts: Dict[str, SiweSessionManager] = {}
+        self._login_locks: Dict[str, asyncio.Lock] = {}
+        self._symbols: Optional[Dict[int, Dict]] = None
+        self._symbols_lock = asyncio.Lock()
+        self._formatters: Dict[int, SymbolFormatter] = {}
+        self._muon_prices: Dict[Tuple[str, int], Tuple[Decimal, float]] = {}
+        self._muon_inflight: Dict[Tuple[str, int], asyncio.Future] = {}
+
+    async def __aenter__(self) -> "AsyncSolverClient":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        if self.http is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300)
+            self.http = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self) -> None:
+        if self.http is not None:
+            await self.http.close()
+            self.http = None
+
+    # ----------------------------------------------------------------
+    # Authentication
+    # ----------------------------------------------------------------
+    def add_account(self, private_key: str, account_address: str) -> SiweSessionManager:
+        """Register a sub-account; its token is shared with the on-disk session cache."""
+        key = account_address.lower()
+        if key not in self.accounts:
+            self.accounts[key] = SiweSessionManager(
+                self.solver_url, private_key, account_address, self.chain_id, cache_dir=self.cache_dir,
+            )
+            self._login_locks[key] = asyncio.Lock()
+            if self.hub is not None:
+                self.hub.subscribe(self.notification_app_name, account_address)
+        return self.accounts[key]
+
+    def _session(self, account: str) -> SiweSessionManager:
+        try:
+            return self.accounts[account.lower()]
+        except KeyError:
+            raise KeyError(f"Unknown account {account}; call add_account() first") from None
+
+    async def get_nonce(self, account: str) -> str:
+        data = await self._get_json(f"{self.solver_url}/nonce/{account}", account=account)
+        return data["nonce"]
+
+    @traced("login")
+    async def login(self, account: str, stale_token: Optional[str] = None) -> str:
+        """SIWE login. Concurrent callers for the same account share one login."""
+        session = self._session(account)
+        async with self._login_locks[account.lower()]:
+            cached = session.cached_token()
+            if cached is not None and cached != stale_token:
+                return cached
+            nonce = await self.get_nonce(session.account_address)
+            body, issued = session.build_login_body(nonce)
+            async with self._request("POST", session.login_uri, account, json=body, headers=session.login_headers()) as response:
+                if response.status != 200:
+                    print(f"[ASYNC] Login failed for {account}: {response.status} {await response.text()}")
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+            return session.accept_token(data.get("access_token"), issued)
+
+    async def token(self, account: str) -> str:
+        return self._session(account).cached_token() or await self.login(account)
+
+    # ----------------------------------------------------------------
+    # HTTP helpers
+    # ----------------------------------------------------------------
+    def _request(self, method: str, url: str, account: str = "", priority: Optional[int] = None, **kwargs: Any):
+        """`http.request`, or through the scheduler when one is set (rate-limited, queued by priority)."""
+        if self.scheduler is None:
+            return self.http.request(method, url, **kwargs)
+        return self.scheduler.request(self.http, method, url, account=account, priority=priority, **kwargs)
+
+    async def _get_json(self, url: str, account: str = "", **kwargs: Any) -> Any:
+        async with self._request("GET", url, account, **kwargs) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def authed_request(self, method: str, account: str, path: str, priority: Optional[int] = None, **kwargs: Any) -> Any:
+        """Authenticated call that re-logs in once on 401.
+
+        `path` is relative to the solver, or an absolute URL for services that
+        accept the solver's token (e.g. conditional orders).
+        """
+        url = path if path.startswith(("http://", "https://")) else f"{self.solver_url}{path}"
+        extra_headers = kwargs.pop("headers", {})
+        token = await self.token(account)
+        for attempt in range(2):
+            headers = {"Content-Type": "application/json", **extra_headers, "Authorization": f"Bearer {token}"}
+            async with self._request(method, url, account, priority, headers=headers, **kwargs) as response:
+                if response.status == 401 and attempt == 0:
+                    token = await self.login(account, stale_token=token)
+                    continue
+                if response.status >= 400:
+                    text = await response.text()
+                    raise aiohttp.ClientResponseError(
+                        response.request_info, response.history, status=response.status, message=text,
+                    )
+                return await response.json(content_type=None)
+
+    # ----------------------------------------------------------------
+    # Endpoints
+    # ----------------------------------------------------------------
+    @traced("fetch_locked_params")
+    async def get_locked_params(self, symbol: Union[str, int], leverage: str) -> Dict:
+        """Locked params; served from `locked_params` without a round trip while cached."""
+        if self.locked_params is not None:
+            cached = self.locked_params.peek(symbol, leverage)
+            if cached is not None:
+                return cached
+        data = await self._get_json(f"{self.solver_url}/get_locked_params/{symbol}", params={"leverage": str(leverage)})
+        data = parse_locked_params(data, symbol, leverage)
+        if self.locked_params is not None:
+            self.locked_params.put(symbol, leverage, data)
+        return data
+
+    async def get_contract_symbols(self, refresh: bool = False) -> Dict[int, Dict]:
+        """Symbol metadata by symbol id, fetched once and shared by every trade."""
+        async with self._symbols_lock:
+            if self._symbols is None or refresh:
+                payload = await self._get_json(f"{self.solver_url}/contract-symbols")
+                symbols = {}
+                for sym in parse_symbols(payload):
+                    sym_id = symbol_id_of(sym)
+                    if sym_id is not None:
+                        symbols[sym_id] = sym
+                self._symbols = symbols
+                self._formatters = {}
+            return self._symbols
+
+    async def get_symbol(self, symbol_id: int) -> Dict:
+        symbols = await self.get_contract_symbols()
+        if symbol_id not in symbols:
+            raise ValueError(f"Symbol ID {symbol_id} not found in contract-symbols")
+        return symbols[symbol_id]
+
+    async def get_formatter(self, symbol_id: int) -> SymbolFormatter:
+        """Price/quantity formatter for `symbol_id`, compiled once from its precision."""
+        fmt = self._formatters.get(symbol_id)
+        if fmt is None:
+            fmt = self._formatters[symbol_id] = SymbolFormatter.for_symbol(await self.get_symbol(symbol_id))
+        return fmt
+
+    @traced("fetch_muon_price")
+    async def fetch_muon_price(self, account: str, symbol_id: int) -> Decimal:
+        """Muon uPnl_A_withSymbolPrice price for `symbol_id`, in human units.
+
+        With `muon_ttl` set, a signed price is reused for that many seconds and
+        concurrent requests for the same (account, symbol) share one Muon call.
+        """
+        if self.muon_ttl <= 0:
+            return await self._fetch_muon_price(account, symbol_id)
+        key = (account.lower(), int(symbol_id))
+        cached = self._muon_prices.get(key)
+        if cached is not None and time.monotonic() - cached[1] < self.muon_ttl:
+            return cached[0]
+        inflight = self._muon_inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        task = asyncio.ensure_future(self._fetch_muon_price(account, symbol_id))
+        self._muon_inflight[key] = task
+        try:
+            price = await asyncio.shield(task)
+        finally:
+            self._muon_inflight.pop(key, None)
+        self._muon_prices[key] = (price, time.monotonic())
+        return price
+
+    async def _fetch_muon_price(self, account: str, symbol_id: int) -> Decimal:
+        params = {
+            "app": "symmio",
+            "method": "uPnl_A_withSymbolPrice",
+            "params[partyA]": account,
+            "params[chainId]": str(self.chain_id),
+            "params[symmio]": self.diamond_address,
+            "params[symbolId]": str(symbol_id),
+        }
+        data = await self._get_json(self.muon_base_url, account, params=params)
+        price_wei = data["result"]["data"]["result"]["price"]
+        if not price_wei:
+            raise ValueError("Muon price not found in response.")
+        return Decimal(price_wei) / Decimal("1e18")
+
+    @traced("instant_open")
+    async def instant_open(self, account: str, payload: Dict) -> Dict:
+        return await self.authed_request("POST", account, "/instant_open", PRIORITY_OPEN, json=payload)
+
+    @traced("instant_close")
+    async def instant_close(self, account: str, quote_id: int, quantity_to_close: str, close_price: str) -> Dict:
+        payload = {"quote_id": quote_id, "quantity_to_close": quantity_to_close, "close_price": close_price}
+        return await self.authed_request("POST", account, "/instant_close", PRIORITY_CLOSE, json=payload)
+
+    async def get_open_status(self, account: str) -> List[Dict]:
+        data = await self.authed_request("GET", account, f"/instant_open/{account}", PRIORITY_POLL)
+        if isinstance(data, dict):
+            return data.get("quotes", [])
+        return data or []
+
+    async def poll_quote_status(
+        self, account: str, temp_quote_id: int, interval: float = 0.5, timeout: float = 60.0,
+    ) -> Optional[int]:
+        """Poll `/instant_open/{address}` until the temp quote id has a permanent quote id.
+
+        Only used without a notification hub; with one, `open_trade` waits on the hub instead.
+        """
+        temp_quote_id = int(temp_quote_id)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            for quote in await self.get_open_status(account):
+                # Entries without a temp quote id can't be attributed to this open (another trade's quote)
+                temp_id = quote.get("temp_quote_id")
+                if temp_id is None or int(temp_id) != temp_quote_id:
+                    continue
+                quote_id = quote.get("quote_id")
+                if quote_id is not None and int(quote_id) > 0:
+                    return int(quote_id)
+            await asyncio.sleep(interval)
+        return None
+
+    # ----------------------------------------------------------------
+    # Flows
+    # ----------------------------------------------------------------
+    async def prepare_open(
+        self,
+        account: str,
+        symbol_id: int,
+        symbol_name: str,
+        quantity: str,
+        position_type: int = 0,
+        leverage: str = "1",
+        slippage: Decimal = Decimal("0.01"),
+        max_funding_rate: str = "200",
+        deadline_offset: int = 3600,
+    ) -> Dict:
+        """Build an `/instant_open` payload; price, locked params and symbol precision are fetched concurrently."""
+        price, locked_params, fmt = await asyncio.gather(
+            self.fetch_muon_price(account, symbol_id),
+            self.get_locked_params(symbol_name, leverage),
+            self.get_formatter(symbol_id),
+        )
+        # Longs accept a higher price, shorts a lower one
+        direction = Decimal(1) if position_type == 0 else Decimal(-1)
+        adjusted_price = fmt.price(price * (1 + direction * slippage))
+        quantity = fmt.quantity(quantity)
+
+        locked = MarginEngine(locked_params).locked_values(Decimal(adjusted_price) * Decimal(quantity))
+        return {
+            "symbolId": symbol_id,
+            "positionType": position_type,
+            "orderType": 1,
+            "price": adjusted_price,
+            "quantity": quantity,
+            "cva": locked["cva"],
+            "lf": locked["lf"],
+            "partyAmm": locked["partyAmm"],
+            "partyBmm": "0",
+            "maxFundingRate": max_funding_rate,
+            "deadline": int(time.time()) + deadline_offset,
+        }
+
+    async def open_trade(self, account: str, wait_confirmed: bool = True, **order: Any) -> Dict:
+        """Prepare, send and (optionally) confirm one instant open. Returns a result dict."""
+        started = time.perf_counter()
+        with TRACER.trade():
+            # The login (if any) overlaps with the pre-trade fetches
+            payload, _ = await asyncio.gather(self.prepare_open(account, **order), self.token(account))
+            prepared = time.perf_counter()
+            response = await self.instant_open(account, payload)
+            temp_quote_id = response.get("temp_quote_id") or response.get("quote_id")
+            sent = time.perf_counter()
+            TRACER.link(temp_quote_id=temp_quote_id)
+
+            quote_id = None
+            if wait_confirmed and temp_quote_id is not None:
+                with TRACER.span("confirmation_wait"):
+                    if self.hub is not None:
+                        quote_id = await self.hub.confirmation(self.notification_app_name, temp_quote_id)
+                    else:
+                        quote_id = await self.poll_quote_status(account, temp_quote_id)
+                TRACER.link(quote_id=quote_id)
+        return {
+            "account": account,
+            "payload": payload,
+            "temp_quote_id": temp_quote_id,
+            "quote_id": quote_id,
+            "prepare_ms": (prepared - started) * 1000,
+            "open_ms": (sent - started) * 1000,
+            "total_ms": (time.perf_counter() - started) * 1000,
+        }
+
+    async def close_trade(
+        self,
+        account: str,
+        symbol_id: int,
+        quote_id: int,
+        quantity: str,
+        position_type: int = 0,
+        slippage: Decimal = Decimal("0.01"),
+    ) -> Dict:
+        """Instant-close `quantity` of `quote_id` at the Muon price less (long) or plus (short) `slippage`."""
+        with TRACER.trade(quote_id=quote_id), TRACER.span("close_instant_position"), request_priority(PRIORITY_CLOSE):
+            price, fmt = await asyncio.gather(self.fetch_muon_price(account, symbol_id), self.get_formatter(symbol_id))
+            direction = Decimal(-1) if position_type == 0 else Decimal(1)
+            close_price = fmt.price(price * (1 + direction * slippage))
+            quantity = fmt.quantity(quantity)
+            return await self.instant_close(account, quote_id, quantity, close_price)
+
+    async def run_trades(self, orders: List[Dict], concurrency: int = 100) -> List[Any]:
+        """Run many `open_trade(**order)` calls at once; failures are returned as exceptions."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(order):
+            async with semaphore:
+                return await self.open_trade(**order)
+
+        return await asyncio.gather(*(run(order) for order in orders), return_exceptions=True)
+
+
+# --------------------------------------------------------------------
+# Demo / latency comparison
+# --------------------------------------------------------------------
+async def start_stub_solver(latency: float = 0.05, port: int = 0, on_open: Optional[Callable[[str, int], None]] = None):
+    """Minimal local solver + Muon stub where every endpoint takes `latency` seconds.
+
+    `on_open(account, temp_quote_id)` is called for every accepted open, e.g. to push
+    its confirmation through a `NotificationHub`.
+    """
+    temp_ids: Dict[str, List[int]] = {}
+    counter = {"next": 1}
+
+    async def delay():
+        await asyncio.sleep(latency)
+
+    async def nonce(request):
+        await delay()
+        return web.json_response({"nonce": "stubnonce"})
+
+    async def login(request):
+        await delay()
+        return web.json_response({"access_token": f"stub-{(await request.json())['account_address']}"})
+
+    async def locked_params(request):
+        await delay()
+        return web.json_response({
+            "message": "Success", "leverage": request.query.get("leverage", "1"),
+            "cva": "2", "lf": "1", "partyAmm": "20", "partyBmm": "0",
+        })
+
+    async def contract_symbols(request):
+        await delay()
+        return web.json_response({"symbols": [{"symbol_id": 340, "name": "XRPUSDT", "price_precision": 4, "quantity_precision": 1}]})
+
+    async def muon(request):
+        await delay()
+        return web.json_response({"result": {"data": {"result": {"price": str(3 * 10**18)}}}})
+
+    async def instant_open(request):
+        await delay()
+        account = request.headers["Authorization"].split("stub-")[-1]
+        temp_id = -counter["next"]
+        counter["next"] += 1
+        temp_ids.setdefault(account, []).append(temp_id)
+        if on_open is not None:
+            on_open(account, temp_id)
+        return web.json_response({"temp_quote_id": temp_id})
+
+    async def instant_close(request):
+        await delay()
+        return web.json_response({"message": "Close request received", "quote_id": (await request.json())["quote_id"]})
+
+    async def conditional_orders(request):
+        await delay()
+        body = await request.json()
+        return web.json_response({"message": "ok", "quote_id": body["quote_id"], "count": len(body["conditional_orders"])})
+
+    async def open_status(request):
+        await delay()
+        ids = temp_ids.get(request.match_info["address"], [])
+        return web.json_response([{"temp_quote_id": t, "quote_id": -t + 1000} for t in ids])
+
+    app = web.Application()
+    app.router.add_get("/nonce/{address}", nonce)
+    app.router.add_post("/login", login)
+    app.router.add_get("/get_locked_params/{symbol}", locked_params)
+    app.router.add_get("/contract-symbols", contract_symbols)
+    app.router.add_post("/instant_close", instant_close)
+    app.router.add_get("/muon", muon)
+    app.router.add_post("/instant_open", instant_open)
+    app.router.add_get("/instant_open/{address}", open_status)
+    app.router.add_post("/conditional-orders/", conditional_orders)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    return runner, f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+
+def sequential_prepare(base_url: str, account: str, symbol_id: int, symbol_name: str, http: requests.Session) -> None:
+    """The pre-trade fetches as instant_open.py does them: one blocking call after another."""
+    http.get(f"{base_url}/muon", params={"params[partyA]": account, "params[symbolId]": symbol_id}).raise_for_status()
+    http.get(f"{base_url}/get_locked_params/{symbol_name}", params={"leverage": "1"}).raise_for_status()
+    http.get(f"{base_url}/contract-symbols").raise_for_status()
+
+
+async def benchmark(latency: float = 0.05, rounds: int = 10, accounts: int = 50, trades: int = 200) -> Dict[str, float]:
+    import tempfile
+    from eth_account import Account
+
+    runner, base_url = await start_stub_solver(latency)
+    cache_dir = tempfile.mkdtemp(prefix="symmio-sessions-")
+    try:
+        # 1. Pre-trade latency: sequential blocking vs gathered
+        http = requests.Session()
+        sequential = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await asyncio.to_thread(sequential_prepare, base_url, "0x0", 340, "XRPUSDT", http)
+            sequential.append((time.perf_counter() - start) * 1000)
+
+        wallet = Account.create()
+        async with AsyncSolverClient(base_url, 42161, f"{base_url}/muon", "0x0", cache_dir=cache_dir) as client:
+            addresses = [Account.create().address for _ in range(accounts)]
+            for address in addresses:
+                client.add_account(wallet.key.hex(), address)
+
+            await client.get_contract_symbols()  # symbol metadata is cached after the first fetch
+            gathered = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                await client.prepare_open(addresses[0], symbol_id=340, symbol_name="XRPUSDT", quantity="6.1")
+                gathered.append((time.perf_counter() - start) * 1000)
+
+            # 2. Many concurrent instant opens across sub-accounts on one loop
+            orders = [
+                {"account": addresses[i % accounts], "symbol_id": 340, "symbol_name": "XRPUSDT", "quantity": "6.1"}
+                for i in range(trades)
+            ]
+            start = time.perf_counter()
+            results = await client.run_trades(orders, concurrency=trades)
+            elapsed = time.perf_counter() - start
+        failures = [r for r in results if isinstance(r, Exception)]
+        confirmed = [r for r in results if not isinstance(r, Exception) and r["quote_id"] is not None]
+    finally:
+        await runner.cleanup()
+
+    result = {
+        "sequential_prepare_ms": statistics.median(sequential),
+        "gathered_prepare_ms": statistics.median(gathered),
+        "trades": trades,
+        "confirmed": len(confirmed),
+        "failures": len(failures),
+        "trades_elapsed_s": elapsed,
+        "trades_per_s": trades / elapsed,
+    }
+    print(f"[ASYNC] Stub endpoint latency: {latency * 1000:.0f}ms")
+    print(f"[ASYNC] Pre-trade fetches, sequential (instant_open.py): {result['sequential_prepare_ms']:.1f}ms median")
+    print(f"[ASYNC] Pre-trade fetches, asyncio.gather:               {result['gathered_prepare_ms']:.1f}ms median")
+    print(f"[ASYNC] {trades} instant opens over {accounts} sub-accounts: {len(confirmed)} confirmed, "
+          f"{len(failures)} failed in {elapsed:.2f}s ({result['trades_per_s']:.0f} trades/s)")
+    return result
+
+
+async def live_open() -> None:
+    load_dotenv()
+    account = os.getenv("SUB_ACCOUNT_ADDRESS")
+    app_name = os.getenv("NOTIFICATION_APP_NAME")
+    async with AsyncSolverClient(
+        os.getenv("HEDGER_URL"),
+        int(os.getenv("CHAIN_ID", 42161)),
+        os.getenv("MUON_BASE_URL"),
+        os.getenv("DIAMOND_ADDRESS"),
+        hub=NotificationHub() if app_name else None,
+        notification_app_name=app_name,
+    ) as client:
+        client.add_account(os.getenv("PRIVATE_KEY"), account)
+        result = await client.open_trade(account, symbol_id=340, symbol_name="XRPUSDT", quantity="6.1")
+        print(f"[ASYNC] Instant open result: {result}")
+
+
+def main():
+    if "--live" in sys.argv:
+        configure_tracing()
+        asyncio.run(live_open())
+    else:
+        asyncio.run(benchmark())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""Bracket orders: instant open with SL/TP attached the moment the quote id arrives.
+
+`vibecaps_open_set_sl_demo.py` runs a bracket as four blocking steps: login,
+`open_instant_trade`, wait for the confirmation, then `set_stop_loss`. The
+stop-loss legs are only built after the confirmation, and the post goes out on
+a fresh connection. The position is unprotected from the open request until
+the conditional-orders service accepts the stop loss, and every step in
+between adds to that window.
+
+`BracketOrders` runs the whole bracket on one event loop, on the
+`AsyncSolverClient`'s pooled session and token:
+- the open payload is prepared (price, locked params and precision gathered
+  concurrently), then `POST /instant_open` is sent as a task
+- while that request is in flight the SL/TP legs are built from the
+  request's price with the `ConditionalOrderManager`, so they are ready
+  before the temp quote id comes back
+- the confirmation is awaited on the client's shared `NotificationHub` (or
+  by polling the status endpoint when there is no hub), and the legs are
+  posted as soon as the permanent quote id arrives
+
+Legs are priced from the request's price, which is the worst fill the open
+accepts. A long fills at or below it, so its stop loss is at most `slippage`
+tighter than one computed from the fill (the manager does not move legs
+once posted, see conditional_orders.py). Every result carries the unprotected
+window (`protected_ms`: open request sent -> stop loss accepted) and its parts.
+With a `StateJournal`, each step (intent, temp id, confirmation, attached
+legs) is journaled so a restarted bot knows which brackets are open.
+
+Usage
+    async with AsyncSolverClient(SOLVER_URL, CHAIN_ID, MUON_BASE_URL, DIAMOND_ADDRESS,
+                                 hub=HUB, notification_app_name=APP_NAME) as client:
+        client.add_account(PRIVATE_KEY, ACCOUNT)
+        brackets = BracketOrders(client, ConditionalOrderManager(CONDITIONAL_ORDERS_BASE_URL, None, ACCOUNT,
+                                                                 MULTI_ACCOUNT_ADDRESS, HEDGER_WHITELIST))
+        result = await brackets.open(ACCOUNT, symbol_id=340, symbol_name="XRPUSDT", quantity="6.1",
+                                     stop_loss_pct="0.2", take_profit_pct="0.3")
+        result["quote_id"], result["protected_ms"]
+
+Run
+- python instant_actions/bracket_orders.py          # unprotected window against a local stub solver
+- python instant_actions/bracket_orders.py --live   # one bracket against VIBE_SOLVER_URL
+
+Required .env (only for --live)
+- PRIVATE_KEY
+- VIBE_SUBACCOUNT (or SUB_ACCOUNT_ADDRESS)
+- VIBE_SOLVER_URL
+- CONDITIONAL_ORDERS_BASE_URL
+- VIBE_MULTIACCOUNT_ADDRESS (or MULTIACCOUNT_ADDRESS)
+- VIBE_HEDGER_WHITELIST (or HEDGER_WHITELIST)
+
+Optional .env
+- VIBE_CHAIN_ID (default: 8453)
+- VIBE_DIAMOND_ADDRESS
+- MUON_BASE_URL
+- NOTIFICATION_APP_NAME (default: Base_Superflow_Production)
+- CONDITIONAL_ORDERS_APP_NAME (default: VIBE)
+"""
+
+import os
+import sys
+import time
+import asyncio
+import statistics
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Union
+
+import aiohttp
+import requests
+from dotenv import load_dotenv
+
+from async_client import AsyncSolverClient, start_stub_solver
+from conditional_orders import ConditionalOrderManager
+from notification_hub import NotificationHub
+from state_journal import StateJournal
+from tracing import TRACER, configure as configure_tracing
+
+Number = Union[str, int, Decimal]
+
+
+class BracketError(Exception):
+    """The open went through but its protective orders were not accepted."""
+
+    def __init__(self, message: str, result: Dict[str, Any]):
+        super().__init__(message)
+        self.result = result
+
+
+class BracketOrders:
+    """Instant opens with SL/TP legs attached on the same event loop."""
+
+    def __init__(
+        self,
+        client: AsyncSolverClient,
+        orders: ConditionalOrderManager,
+        poll_interval: float = 0.5,
+        confirm_timeout: float = 120.0,
+        journal: Optional[StateJournal] = None,
+    ):
+        self.client = client
+        self.orders = orders
+        self.journal = journal
+        self.poll_interval = poll_interval
+        self.confirm_timeout = confirm_timeout
+        self.stats = {"opened": 0, "protected": 0, "unconfirmed": 0, "rejected": 0}
+
+    async def _confirmation(self, account: str, temp_quote_id: int) -> Optional[int]:
+        client = self.client
+        if client.hub is not None:
+            try:
+                return await client.hub.confirmation(client.notification_app_name, temp_quote_id, self.confirm_timeout)
+            except TimeoutError:
+                return None
+        return await client.poll_quote_status(account, temp_quote_id, self.poll_interval, self.confirm_timeout)
+
+    async def open(
+        self,
+        account: str,
+        symbol_id: int,
+        symbol_name: str,
+        quantity: Number,
+        position_type: int = 0,
+        leverage: str = "1",
+        slippage: Decimal = Decimal("0.01"),
+        stop_loss_pct: Optional[Number] = None,
+        take_profit_pct: Optional[Number] = None,
+        order_type: int = 1,
+    ) -> Dict[str, Any]:
+        """Open, confirm and protect one position.
+
+        Raises `BracketError` (with the partial result) when the open is not
+        confirmed in time or its legs are rejected.
+        """
+        if stop_loss_pct is None and take_profit_pct is None:
+            raise ValueError("A bracket needs a stop_loss_pct and/or a take_profit_pct")
+        client = self.client
+        started = time.perf_counter()
+        with TRACER.trade():
+            payload, fmt, _ = await asyncio.gather(
+                client.prepare_open(account, symbol_id, symbol_name, str(quantity), position_type, leverage, slippage),
+                client.get_formatter(symbol_id),
+                client.token(account),
+            )
+            journal, intent = self.journal, None
+            if journal is not None:
+                intent = journal.intent({"account": account, "symbol_id": symbol_id, "quantity": payload["quantity"],
+                                "position_type": position_type, "price": payload["price"]})
+            sent = time.perf_counter()
+            opening = asyncio.ensure_future(client.instant_open(account, payload))
+
+            # Built while the open is in flight; the quote id is filled in on confirmation
+            spec = self.orders.build(
+                quote_id=0,
+                symbol_id=symbol_id,
+                position_type=position_type,
+                quantity=payload["quantity"],
+                fill_price=Decimal(payload["price"]),
+                fmt=fmt,
+                stop_loss_pct=stop_loss_pct,
+                take_profit_pct=take_profit_pct,
+                leverage=leverage,
+                order_type=order_type,
+            )
+            try:
+                response = await opening
+            except aiohttp.ClientResponseError as e:
+                # Only a 4xx certainly created no quote; otherwise the intent is left for reconcile()
+                if journal is not None and 400 <= e.status < 500:
+                    journal.abandoned(intent=intent)
+                raise
+            temp_quote_id = response.get("temp_quote_id") or response.get("quote_id")
+            if journal is not None and temp_quote_id is not None:
+                journal.sent(temp_quote_id, intent)
+            accepted = time.perf_counter()
+            TRACER.link(temp_quote_id=temp_quote_id)
+            self.stats["opened"] += 1
+
+            result = {
+                "account": account,
+                "payload": payload,
+                "temp_quote_id": temp_quote_id,
+                "quote_id": None,
+                "legs": spec["legs"],
+                "prepare_ms": (sent - started) * 1000,
+                "open_ms": (accepted - sent) * 1000,
+            }
+            with TRACER.span("confirmation_wait"):
+                quote_id = await self._confirmation(account, int(temp_quote_id)) if temp_quote_id is not None else None
+            confirmed = time.perf_counter()
+            result["confirm_ms"] = (confirmed - sent) * 1000
+            if quote_id is None:
+                self.stats["unconfirmed"] += 1
+                raise BracketError(f"Open {temp_quote_id} was not confirmed; no protective orders placed", result)
+            TRACER.link(quote_id=quote_id)
+            result["quote_id"] = spec["quote_id"] = int(quote_id)
+            if journal is not None:
+                journal.confirmed(temp_quote_id, quote_id)
+
+            with TRACER.span("attach_conditional_orders"):
+                posted = await self.orders.submit_async(spec, client, account)
+            protected = time.perf_counter()
+        result["attach_ms"] = (protected - confirmed) * 1000
+        result["protected_ms"] = (protected - sent) * 1000
+        if not posted["ok"]:
+            self.stats["rejected"] += 1
+            raise BracketError(f"Quote {quote_id} is open but unprotected: {posted['error']}", result)
+        if self.journal is not None:
+            self.journal.orders_attached(quote_id, spec["legs"])
+        self.stats["protected"] += 1
+        return result
+
+    async def open_many(self, brackets: List[Dict[str, Any]], concurrency: int = 100) -> List[Any]:
+        """Run many `open(**bracket)` calls at once; failures are returned as exceptions."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(bracket):
+            async with semaphore:
+                return await self.open(**bracket)
+
+        return await asyncio.gather(*(run(bracket) for bracket in brackets), return_exceptions=True)
+
+
+# --------------------------------------------------------------------
+# Benchmark / live demo
+# --------------------------------------------------------------------
+def sequential_bracket(base_url: str, account: str, payload: Dict, hub: NotificationHub, app_name: str,
+                       orders: ConditionalOrderManager, fmt: Any) -> float:
+    """The demo's order of steps, blocking: open, wait, re-fetch price and symbols, build and post the stop loss.
+
+    Returns the unprotected window in ms.
+    """
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer stub-{account}"}
+    sent = time.perf_counter()
+    response = requests.post(f"{base_url}/instant_open", json=payload, headers=headers, timeout=30)
+    response.raise_for_status()
+    quote_id = hub.wait_for_confirmation(app_name, response.json()["temp_quote_id"], timeout=30)
+    requests.get(f"{base_url}/muon", params={"params[partyA]": account, "params[symbolId]": 340}, timeout=30).raise_for_status()
+    requests.get(f"{base_url}/contract-symbols", timeout=30).raise_for_status()
+    spec = orders.build(quote_id, 340, 0, payload["quantity"], Decimal(payload["price"]), fmt, stop_loss_pct="0.2")
+    requests.post(orders.endpoint, json=orders.payload(spec), headers={**headers, "App-Name": orders.app_name},
+                  timeout=30).raise_for_status()
+    return (time.perf_counter() - sent) * 1000
+
+
+async def benchmark(latency: float = 0.05, confirm_delay: float = 0.1, rounds: int = 10,
+                    accounts: int = 50, brackets: int = 200) -> Dict[str, float]:
+    import tempfile
+    from eth_account import Account
+
+    app_name = "stub"
+    # Nothing listens on the hub's URL; confirmations are fed through resolve() instead
+    hub = NotificationHub("ws://127.0.0.1:9", verbose=False)
+    loop = asyncio.get_running_loop()
+
+    def confirm_later(account: str, temp_quote_id: int) -> None:
+        # The stub's permanent id for a temp id; pushed as the hub would receive it
+        loop.call_later(confirm_delay, hub.resolve, app_name, temp_quote_id, -temp_quote_id + 1000)
+
+    runner, base_url = await start_stub_solver(latency, on_open=confirm_later)
+    cache_dir = tempfile.mkdtemp(prefix="symmio-sessions-")
+    wallet = Account.create()
+    addresses = [Account.create().address for _ in range(accounts)]
+    orders = ConditionalOrderManager(f"{base_url}/conditional-orders", None, addresses[0], addresses[0], [addresses[0]])
+    try:
+        async with AsyncSolverClient(base_url, 42161, f"{base_url}/muon", "0x0", cache_dir=cache_dir,
+                                     hub=hub, notification_app_name=app_name) as client:
+            for address in addresses:
+                client.add_account(wallet.key.hex(), address)
+            bracket_orders = BracketOrders(client, orders)
+            order = {"symbol_id": 340, "symbol_name": "XRPUSDT", "quantity": "6.1", "stop_loss_pct": "0.2"}
+
+            # 1. One bracket at a time: the demo's sequence vs the pipeline
+            payload = await client.prepare_open(addresses[0], 340, "XRPUSDT", "6.1")
+            fmt = await client.get_formatter(340)
+            sequential = []
+            for _ in range(rounds):
+                sequential.append(await asyncio.to_thread(
+                    sequential_bracket, base_url, addresses[0], payload, hub, app_name, orders, fmt))
+            pipelined = []
+            for _ in range(rounds):
+                pipelined.append((await bracket_orders.open(addresses[0], **order))["protected_ms"])
+
+            # 2. Many brackets across sub-accounts on one loop
+            start = time.perf_counter()
+            results = await bracket_orders.open_many(
+                [{"account": addresses[i % accounts], **order} for i in range(brackets)], concurrency=brackets)
+            elapsed = time.perf_counter() - start
+    finally:
+        await runner.cleanup()
+        hub.stop()
+
+    failures = [r for r in results if isinstance(r, Exception)]
+    windows = sorted(r["protected_ms"] for r in results if not isinstance(r, Exception))
+    result = {
+        "sequential_protected_ms": statistics.median(sequential),
+        "pipelined_protected_ms": statistics.median(pipelined),
+        "brackets": brackets,
+        "failures": len(failures),
+        "concurrent_p50_ms": statistics.median(windows),
+        "concurrent_p95_ms": windows[int(len(windows) * 0.95) - 1],
+        "elapsed_s": elapsed,
+    }
+    print(f"[BRACKET] Stub endpoint latency {latency * 1000:.0f}ms, confirmation pushed {confirm_delay * 1000:.0f}ms after the open")
+    print(f"[BRACKET] Unprotected window (open request -> SL accepted), median of {rounds}:")
+    print(f"[BRACKET]   sequential (demo order, re-fetch before SL): {result['sequential_protected_ms']:.1f}ms")
+    print(f"[BRACKET]   BracketOrders pipeline:                      {result['pipelined_protected_ms']:.1f}ms")
+    print(f"[BRACKET] {brackets} concurrent brackets over {accounts} sub-accounts: {len(failures)} failed in {elapsed:.2f}s, "
+          f"window p50 {result['concurrent_p50_ms']:.1f}ms / p95 {result['concurrent_p95_ms']:.1f}ms")
+    return result
+
+
+async def live_bracket() -> None:
+    load_dotenv()
+    account = os.getenv("VIBE_SUBACCOUNT") or os.getenv("SUB_ACCOUNT_ADDRESS")
+    app_name = os.getenv("NOTIFICATION_APP_NAME", "Base_Superflow_Production")
+    hub = NotificationHub()
+    orders = ConditionalOrderManager(
+        os.getenv("CONDITIONAL_ORDERS_BASE_URL"),
+        None,
+        account,
+        os.getenv("VIBE_MULTIACCOUNT_ADDRESS") or os.getenv("MULTIACCOUNT_ADDRESS"),
+        os.getenv("VIBE_HEDGER_WHITELIST") or os.getenv("HEDGER_WHITELIST"),
+        app_name=os.getenv("CONDITIONAL_ORDERS_APP_NAME", "VIBE"),
+    )
+    async with AsyncSolverClient(
+        os.getenv("VIBE_SOLVER_URL"),
+        int(os.getenv("VIBE_CHAIN_ID", "8453")),
+        os.getenv("MUON_BASE_URL", "https://muon-oracle1.rasa.capital/v1/"),
+        os.getenv("VIBE_DIAMOND_ADDRESS", "0xC6a7cc26fd84aE573b705423b7d1831139793025"),
+        hub=hub,
+        notification_app_name=app_name,
+    ) as client:
+        client.add_account(os.getenv("PRIVATE_KEY"), account)
+        result = await BracketOrders(client, orders).open(
+            account, symbol_id=1, symbol_name="SYMMUSDT", quantity="2500", position_type=1,
+            leverage="3", slippage=Decimal("0.05"), stop_loss_pct="0.2",
+        )
+        print(f"[BRACKET] Quote {result['quote_id']} protected {result['protected_ms']:.0f}ms after the open request: "
+              f"{result['legs']}")
+    hub.stop()
+
+
+def main():
+    if "--live" in sys.argv:
+        configure_tracing()
+        asyncio.run(live_bracket())
+    else:
+        asyncio.run(benchmark())
+
+
+if __name__ == "__main__":
+    main()
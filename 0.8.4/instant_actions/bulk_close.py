@@ -0,0 +1,355 @@
+"""Concurrent bulk instant-close for every open position of a sub-account.
+
+`vibecaps_close_position_demo.py` and `majors_perpshub_close_position_demo.py`
+close one quote per run, after interactive prompts, fetching a Muon price for
+that quote. Flattening hundreds of positions that way takes minutes.
+
+`BulkCloser` takes the sub-account's open positions (read on-chain with
+`getPartyAOpenPositions`, or passed in from the solver), then:
+- fetches one fresh Muon price per symbol, concurrently, rather than one per quote;
+  a symbol whose price or formatter fails only errors that symbol's positions
+- computes each position's close price from its symbol's price and direction
+  (longs close below the price, shorts above it, by `slippage`), formatted with
+  the symbol's cached formatter
+- fires every `/instant_close` concurrently, started at most `rate` per second
+  and with at most `concurrency` requests in flight
+- with a notification hub, waits for each close to be confirmed on the shared
+  websocket (closes missed while it reconnects are re-checked on-chain in --live)
+
+The report gives the time to flat (the last confirmation, or the last accepted
+request without a hub) and one outcome per quote.
+
+Usage
+    async with AsyncSolverClient(HEDGER_URL, CHAIN_ID, MUON_BASE_URL, DIAMOND_ADDRESS, hub=hub,
+                                 notification_app_name=APP_NAME) as client:
+        client.add_account(PRIVATE_KEY, SUB_ACCOUNT_ADDRESS)
+        positions = await asyncio.to_thread(fetch_open_positions, diamond, SUB_ACCOUNT_ADDRESS)
+        report = await BulkCloser(client, SUB_ACCOUNT_ADDRESS, slippage=Decimal("0.01"), rate=20).close_all(positions)
+
+Run
+- python instant_actions/bulk_close.py          # 300 positions against a local stub solver
+- python instant_actions/bulk_close.py --live   # flatten SUB_ACCOUNT_ADDRESS (asks before sending)
+
+Required .env (only for --live)
+- PRIVATE_KEY
+- SUB_ACCOUNT_ADDRESS
+- HEDGER_URL
+- MUON_BASE_URL
+- DIAMOND_ADDRESS
+- RPC_URL
+
+Optional .env
+- CHAIN_ID (default: 42161)
+- NOTIFICATION_APP_NAME  # confirm closes on the notification hub
+- BULK_CLOSE_SLIPPAGE (default: 0.01)
+- BULK_CLOSE_RATE (requests per second, default: 20)
+- RATE_LIMITS / RATE_LIMIT_DEFAULT  # adaptive per-host limits (rate_scheduler.py); closes go first
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+from async_client import AsyncSolverClient, start_stub_solver
+from rate_scheduler import PRIORITY_FORCE_CLOSE, RequestScheduler, request_priority
+from notification_hub import NotificationHub, QuoteFailed
+from tracing import TRACER, configure as configure_tracing
+
+# QuoteStatus values in the Symmio diamond
+QUOTE_STATUS_OPENED = 4
+QUOTE_STATUS_CLOSE_PENDING = 5
+QUOTE_STATUS_CANCEL_CLOSE_PENDING = 6
+
+
+class Position:
+    """The part of an open quote needed to close it."""
+
+    __slots__ = ("quote_id", "symbol_id", "position_type", "quantity", "status")
+
+    def __init__(self, quote_id: int, symbol_id: int, position_type: int, quantity: Decimal, status: int = QUOTE_STATUS_OPENED):
+        self.quote_id = int(quote_id)
+        self.symbol_id = int(symbol_id)
+        self.position_type = int(position_type)
+        self.quantity = quantity
+        self.status = int(status)
+
+    @classmethod
+    def from_quote(cls, quote: Any) -> "Position":
+        """From a `getQuote` / `getPartyAOpenPositions` struct (id, .., symbolId, positionType, .., quantity, closedAmount, ..)."""
+        open_wei = int(quote[9]) - int(quote[10])
+        return cls(quote[0], quote[2], quote[3], Decimal(open_wei) / Decimal("1e18"), quote[16])
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Position":
+        """From a solver quote dict; quantities are in human units."""
+        quantity = Decimal(str(data.get("quantity", 0))) - Decimal(str(data.get("closed_amount", data.get("closedAmount", 0)) or 0))
+        return cls(
+            data.get("quote_id", data.get("id")),
+            data.get("symbol_id", data.get("symbolId")),
+            data.get("position_type", data.get("positionType", 0)),
+            quantity,
+            data.get("quote_status", data.get("quoteStatus", QUOTE_STATUS_OPENED)),
+        )
+
+    def __repr__(self) -> str:
+        side = "LONG" if self.position_type == 0 else "SHORT"
+        return f"Position(quote_id={self.quote_id}, symbol_id={self.symbol_id}, {side}, quantity={self.quantity})"
+
+
+def fetch_open_positions(diamond, party_a: str, page_size: int = 100) -> List[Position]:
+    """Every open position of `party_a`, paging through `getPartyAOpenPositions`."""
+    positions: List[Position] = []
+    start = 0
+    while True:
+        page = diamond.functions.getPartyAOpenPositions(party_a, start, page_size).call()
+        positions.extend(Position.from_quote(q) for q in page)
+        if len(page) < page_size:
+            return positions
+        start += page_size
+
+
+class BulkCloser:
+    """Closes many positions of one sub-account at once under a request-rate limit."""
+
+    def __init__(
+        self,
+        client: AsyncSolverClient,
+        account: str,
+        slippage: Decimal = Decimal("0.01"),
+        rate: float = 20.0,
+        concurrency: int = 64,
+        confirm_timeout: float = 60.0,
+    ):
+        self.client = client
+        self.account = account
+        self.slippage = Decimal(str(slippage))
+        self.rate = rate
+        self.concurrency = concurrency
+        self.confirm_timeout = confirm_timeout
+
+    def close_price(self, price: Decimal, position_type: int) -> Decimal:
+        # Closing a long sells, so accept a lower price; closing a short buys
+        if position_type == 0:
+            return price * (1 - self.slippage)
+        return price * (1 + self.slippage)
+
+    async def close_all(self, positions: Iterable[Position]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        closable, skipped = [], []
+        for position in positions:
+            if position.status in (QUOTE_STATUS_CLOSE_PENDING, QUOTE_STATUS_CANCEL_CLOSE_PENDING) or position.quantity <= 0:
+                skipped.append({"quote_id": position.quote_id, "status": "skipped", "reason": f"quote status {position.status}"})
+            else:
+                closable.append(position)
+
+        # One price and one formatter per symbol, all fetched at once; a failure only affects its symbol
+        symbol_ids = sorted({p.symbol_id for p in closable})
+        with request_priority(PRIORITY_FORCE_CLOSE):
+            fetched = await asyncio.gather(
+                *(self.client.fetch_muon_price(self.account, s) for s in symbol_ids),
+                *(self.client.get_formatter(s) for s in symbol_ids),
+                return_exceptions=True,
+            )
+        prices = dict(zip(symbol_ids, fetched[:len(symbol_ids)]))
+        formatters = dict(zip(symbol_ids, fetched[len(symbol_ids):]))
+        priced_ms = (time.perf_counter() - started) * 1000
+
+        errored = []
+        for symbol_id in symbol_ids:
+            failure = next((r for r in (prices[symbol_id], formatters[symbol_id]) if isinstance(r, BaseException)), None)
+            if failure is not None:
+                errored += [{"quote_id": p.quote_id, "symbol_id": symbol_id, "status": "error",
+                             "error": f"price/formatter for symbol {symbol_id}: {failure}"}
+                            for p in closable if p.symbol_id == symbol_id]
+        if errored:
+            failed_symbols = {o["symbol_id"] for o in errored}
+            closable = [p for p in closable if p.symbol_id not in failed_symbols]
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        send_from = time.perf_counter()
+
+        async def close_one(i: int, position: Position) -> Dict[str, Any]:
+            fmt = formatters[position.symbol_id]
+            outcome = {
+                "quote_id": position.quote_id,
+                "symbol_id": position.symbol_id,
+                "quantity": fmt.quantity(position.quantity),
+                "close_price": fmt.price(self.close_price(prices[position.symbol_id], position.position_type)),
+            }
+            # Spread request starts at `rate` per second
+            delay = send_from + i / self.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            with TRACER.trade(quote_id=position.quote_id):
+                sent_at = time.monotonic()
+                try:
+                    async with semaphore:
+                        await self.client.instant_close(self.account, position.quote_id, outcome["quantity"], outcome["close_price"])
+                    outcome["sent_ms"] = (time.perf_counter() - started) * 1000
+                except Exception as e:
+                    outcome.update(status="error", error=str(e))
+                    return outcome
+
+                hub, app_name = self.client.hub, self.client.notification_app_name
+                if hub is None:
+                    outcome["status"] = "accepted"
+                    return outcome
+                try:
+                    with TRACER.span("confirmation_wait"):
+                        await hub.close_confirmation(app_name, position.quote_id, self.confirm_timeout, since=sent_at)
+                    outcome.update(status="confirmed", confirmed_ms=(time.perf_counter() - started) * 1000)
+                    TRACER.forget(quote_id=position.quote_id)
+                except QuoteFailed as e:
+                    outcome.update(status="failed", error=str(e.data))
+                except TimeoutError as e:
+                    outcome.update(status="timeout", error=str(e))
+            return outcome
+
+        # Under a rate scheduler, flattening outranks every other request of the process
+        with request_priority(PRIORITY_FORCE_CLOSE):
+            outcomes = await asyncio.gather(*(close_one(i, p) for i, p in enumerate(closable)))
+        return self._report(outcomes + errored + skipped, priced_ms, len(symbol_ids), started)
+
+    def _report(self, outcomes: List[Dict[str, Any]], priced_ms: float, symbols: int, started: float) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for outcome in outcomes:
+            counts[outcome["status"]] = counts.get(outcome["status"], 0) + 1
+        done_key = "confirmed_ms" if self.client.hub is not None else "sent_ms"
+        done = [o[done_key] for o in outcomes if done_key in o]
+        attempted = len(outcomes) - counts.get("skipped", 0)
+        report = {
+            "positions": len(outcomes),
+            "symbols": symbols,
+            "counts": counts,
+            "price_fetch_ms": priced_ms,
+            # Only flat once every attempted close has gone through
+            "time_to_flat_ms": max(done) if done and len(done) == attempted else None,
+            "elapsed_ms": (time.perf_counter() - started) * 1000,
+            "outcomes": outcomes,
+        }
+        flat = f"{report['time_to_flat_ms']:.0f}ms" if report["time_to_flat_ms"] is not None else "not flat"
+        print(f"[BULK] {len(outcomes)} positions over {symbols} symbol(s): {counts}; "
+              f"prices in {priced_ms:.0f}ms, time to flat: {flat}")
+        for outcome in outcomes:
+            if outcome["status"] in ("error", "failed", "timeout"):
+                print(f"[BULK]   quote {outcome['quote_id']}: {outcome['status']} {outcome.get('error', '')}")
+        return report
+
+
+async def wait_until_flat(diamond, account: str, timeout: float = 120.0, interval: float = 1.0) -> Optional[float]:
+    """Re-read open positions on-chain until none remain. Returns the seconds waited, or None on timeout."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        remaining = await asyncio.to_thread(fetch_open_positions, diamond, account)
+        if not remaining:
+            return time.perf_counter() - started
+        await asyncio.sleep(interval)
+    return None
+
+
+# --------------------------------------------------------------------
+# Demo / benchmark
+# --------------------------------------------------------------------
+async def benchmark(latency: float = 0.02, positions: int = 300, baseline: int = 20) -> Dict[str, float]:
+    import tempfile
+    from eth_account import Account
+
+    runner, base_url = await start_stub_solver(latency)
+    try:
+        wallet = Account.create()
+        account = Account.create().address
+        async with AsyncSolverClient(base_url, 42161, f"{base_url}/muon", "0x0", cache_dir=tempfile.mkdtemp()) as client:
+            client.add_account(wallet.key.hex(), account)
+            await client.token(account)
+            book = [Position(i + 1, 340, i % 2, Decimal("6.15")) for i in range(positions)]
+
+            # One quote at a time, fetching a price per quote, as the close demos do
+            start = time.perf_counter()
+            for p in book[:baseline]:
+                await client.close_trade(account, p.symbol_id, p.quote_id, str(p.quantity), p.position_type)
+            per_quote = (time.perf_counter() - start) / baseline
+
+            report = await BulkCloser(client, account, rate=1000, concurrency=100).close_all(book)
+    finally:
+        await runner.cleanup()
+
+    sequential_s = per_quote * positions
+    bulk_s = report["time_to_flat_ms"] / 1000
+    print(f"[BULK] Stub endpoint latency: {latency * 1000:.0f}ms")
+    print(f"[BULK] One-by-one closes: {per_quote * 1000:.0f}ms per quote -> ~{sequential_s:.1f}s for {positions}")
+    print(f"[BULK] Bulk close: {positions} positions accepted in {bulk_s:.2f}s ({sequential_s / bulk_s:.0f}x)")
+    return {"sequential_s": sequential_s, "bulk_s": bulk_s}
+
+
+async def live_close() -> None:
+    from web3 import Web3
+
+    load_dotenv()
+    account = Web3.to_checksum_address(os.getenv("SUB_ACCOUNT_ADDRESS"))
+    app_name = os.getenv("NOTIFICATION_APP_NAME")
+    abi_path = os.path.join(os.path.dirname(__file__), "..", "abi", "symmio.json")
+    with open(abi_path) as f:
+        abi = json.load(f)
+    w3 = Web3(Web3.HTTPProvider(os.getenv("RPC_URL")))
+    diamond = w3.eth.contract(address=Web3.to_checksum_address(os.getenv("DIAMOND_ADDRESS")), abi=abi)
+
+    positions = await asyncio.to_thread(fetch_open_positions, diamond, account)
+    print(f"[BULK] {len(positions)} open position(s) for {account}")
+    for position in positions:
+        print(f"[BULK]   {position}")
+    if not positions or input("Type FLATTEN to close all of them: ").strip() != "FLATTEN":
+        return
+
+    def resync_closes(app_name, addresses, pending):
+        # Notification gap: a pending close whose quote is no longer open on-chain went through
+        still_open = {p.quote_id for p in fetch_open_positions(diamond, account)}
+        for quote_id in pending:
+            if quote_id not in still_open:
+                hub.resolve_close(app_name, quote_id)
+
+    hub = NotificationHub(on_close_gap=resync_closes) if app_name else None
+    if hub is not None:
+        hub.subscribe(app_name, account)
+    async with AsyncSolverClient(
+        os.getenv("HEDGER_URL"),
+        int(os.getenv("CHAIN_ID", 42161)),
+        os.getenv("MUON_BASE_URL"),
+        os.getenv("DIAMOND_ADDRESS"),
+        hub=hub,
+        notification_app_name=app_name,
+        scheduler=RequestScheduler.from_env(),
+    ) as client:
+        client.add_account(os.getenv("PRIVATE_KEY"), account)
+        closer = BulkCloser(
+            client,
+            account,
+            slippage=Decimal(os.getenv("BULK_CLOSE_SLIPPAGE", "0.01")),
+            rate=float(os.getenv("BULK_CLOSE_RATE", 20)),
+        )
+        report = await closer.close_all(positions)
+    if hub is None:
+        waited = await wait_until_flat(diamond, account)
+        if waited is None:
+            print("[BULK] Positions still open on-chain after 120s")
+        else:
+            print(f"[BULK] Flat on-chain {report['elapsed_ms'] / 1000 + waited:.1f}s after start")
+    else:
+        hub.stop()
+
+
+def main():
+    if "--live" in sys.argv:
+        configure_tracing()
+        asyncio.run(live_close())
+    else:
+        asyncio.run(benchmark())
+
+
+if __name__ == "__main__":
+    main()
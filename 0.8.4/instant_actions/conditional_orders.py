@@ -0,0 +1,336 @@
+"""Batch stop-loss / take-profit submission to the conditional-orders service.
+
+`set_stop_loss` in `vibecaps_open_set_sl_demo.py` posts one stop loss per quote.
+Each post re-fetches symbol info and a Muon price, and re-parses
+`HEDGER_WHITELIST` from the environment. `ConditionalOrderManager` parses the
+whitelist once. It builds stop-loss and take-profit legs for many quotes from
+their already-known fill prices, with each symbol's cached formatter.
+
+The service's payload is per quote, and `conditional_orders` already takes a
+list. So each quote's SL and TP legs go out together in one payload, which
+is as few payloads as the service accepts. Those payloads are posted
+concurrently. A post creates orders, so it is only retried when the service
+provably never processed it (429, or no connection was made); after a 5xx or
+a dropped connection the result is marked `unknown` instead of re-posting.
+
+The manager keeps a local registry of each quote's accepted legs. It does not
+cancel or amend legs: the service's documented API only creates them, and
+nothing says a post replaces the legs a quote already has, so re-posting a
+moved stop loss could leave both triggers live. Moving or removing legs stays
+with the frontend until the service documents a cancel route.
+
+Usage
+    orders = ConditionalOrderManager(CONDITIONAL_ORDERS_BASE_URL, SESSION, ACTIVE_ACCOUNT,
+                                     MULTI_ACCOUNT_ADDRESS, HEDGER_WHITELIST, app_name="VIBE")
+    results = orders.submit_many([
+        orders.build(quote_id=101, symbol_id=340, position_type=0, quantity="6.1",
+                     fill_price=Decimal("3.06"), fmt=SYMBOLS.formatter(340),
+                     stop_loss_pct="0.2", take_profit_pct="0.3"),
+        ...
+    ])
+    orders.active(101)                          # {"stop_loss": {...}, "take_profit": {...}}
+
+Run
+- python instant_actions/conditional_orders.py    # 200 quotes against a local stub service
+
+Optional .env
+- CONDITIONAL_ORDERS_APP_NAME (default: VIBE)
+"""
+
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import aiohttp
+import requests
+from urllib3.exceptions import NewConnectionError
+from web3 import Web3
+
+from party_b_router import parse_whitelist
+from rate_scheduler import PRIORITY_CLOSE
+from symbol_catalog import SymbolFormatter
+
+Number = Union[str, int, Decimal]
+STOP_LOSS = "stop_loss"
+TAKE_PROFIT = "take_profit"
+# Answered before the request was processed, so re-sending cannot create a second set of legs
+RETRY_STATUSES = (429,)
+
+
+def _never_sent(error: requests.RequestException) -> bool:
+    """The connection was never established, so the service cannot have seen the request."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+def trigger_price(fill_price: Decimal, position_type: int, kind: str, pct: Decimal) -> Decimal:
+    """A long stops out below its fill and takes profit above it; a short the reverse."""
+    adverse = (kind == STOP_LOSS) == (position_type == 0)
+    return fill_price * (1 - pct) if adverse else fill_price * (1 + pct)
+
+
+class ConditionalOrderManager:
+    """Builds, submits and tracks SL/TP legs for many quotes of one sub-account."""
+
+    def __init__(
+        self,
+        base_url: str,
+        session: Any,
+        account_address: str,
+        multi_account_address: str,
+        hedger_whitelist: Union[str, Iterable[str]],
+        app_name: str = "VIBE",
+        max_workers: int = 16,
+        retries: int = 3,
+        backoff: float = 0.25,
+    ):
+        """`session` is a `SiweSessionManager` (anything with `request(method, url, **kwargs)`)."""
+        # Frontend uses a trailing slash; some backends treat /api/v4 and /api/v4/ differently.
+        self.endpoint = base_url.rstrip("/") + "/"
+        self.session = session
+        self.account_address = Web3.to_checksum_address(account_address)
+        self.multi_account_address = Web3.to_checksum_address(multi_account_address)
+        self.hedger_whitelist = parse_whitelist(hedger_whitelist)
+        self.app_name = app_name
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+
+        self.registry: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()  # registry and stats; submit_many updates both from pool threads
+        self.stats = {"posts": 0, "retries": 0, "failures": 0, "unknown": 0}
+
+    # ----------------------------------------------------------------
+    # Building
+    # ----------------------------------------------------------------
+    def build(
+        self,
+        quote_id: int,
+        symbol_id: int,
+        position_type: int,
+        quantity: Number,
+        fill_price: Number,
+        fmt: SymbolFormatter,
+        stop_loss_pct: Optional[Number] = None,
+        take_profit_pct: Optional[Number] = None,
+        leverage: Number = 1,
+        order_type: int = 1,
+        conditional_price_type: str = "last_close",
+    ) -> Dict[str, Any]:
+        """An order spec (payload fields plus the fill and formatter its legs were priced from); no request is made."""
+        spec = {
+            "quote_id": int(quote_id),
+            "symbol_id": int(symbol_id),
+            "position_type": int(position_type),
+            "quantity": fmt.quantity(quantity),
+            "fill_price": Decimal(str(fill_price)),
+            "fmt": fmt,
+            "leverage": int(Decimal(str(leverage))),
+            "order_type": int(order_type),
+            "conditional_price_type": conditional_price_type,
+            "legs": {},
+        }
+        for kind, pct in ((STOP_LOSS, stop_loss_pct), (TAKE_PROFIT, take_profit_pct)):
+            if pct is not None:
+                spec["legs"][kind] = self._leg(spec, kind, Decimal(str(pct)))
+        return spec
+
+    def _leg(self, spec: Dict[str, Any], kind: str, pct: Decimal) -> Dict[str, Any]:
+        fmt = spec["fmt"]
+        return {
+            "quantity": spec["quantity"],
+            "price": fmt.price(spec["fill_price"]),
+            "conditional_price": fmt.price(trigger_price(spec["fill_price"], spec["position_type"], kind, pct)),
+            "conditional_price_type": spec["conditional_price_type"],
+            "order_type": spec["order_type"],
+            "position_type": spec["position_type"],
+            "conditional_order_type": kind,
+            "leverage": spec["leverage"],
+        }
+
+    def payload(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "account_address": self.account_address,
+            "quote_id": spec["quote_id"],
+            "conditional_orders": list(spec["legs"].values()),
+            "symbol_id": spec["symbol_id"],
+            "multi_account_address": self.multi_account_address,
+            "hedger_whitelist": self.hedger_whitelist,
+        }
+
+    # ----------------------------------------------------------------
+    # Submitting
+    # ----------------------------------------------------------------
+    def _headers(self) -> Dict[str, str]:
+        return {"Content-Type": "application/json", "Accept": "application/json", "App-Name": self.app_name}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def _accepted(self, spec: Dict[str, Any], status: int) -> Dict[str, Any]:
+        with self._lock:
+            entry = self.registry.get(spec["quote_id"])
+            legs = {**(entry["legs"] if entry else {}), **spec["legs"]}
+            self.registry[spec["quote_id"]] = {**spec, "legs": legs, "updated_at": time.time()}
+        return {"quote_id": spec["quote_id"], "ok": True, "legs": list(spec["legs"]), "status": status}
+
+    def _failed(self, quote_id: int, error: Optional[str], unknown: bool) -> Dict[str, Any]:
+        """`unknown`: the service may have processed the request (5xx, dropped connection) and must be checked."""
+        self._count("unknown" if unknown else "failures")
+        return {"quote_id": quote_id, "ok": False, "error": error, "unknown": unknown}
+
+    def _backoff(self, attempt: int) -> float:
+        self._count("retries")
+        return self.backoff * 2 ** (attempt - 1) * (0.5 + random.random())
+
+    def _send(self, method: str, url: str, body: Dict[str, Any]) -> Tuple[Optional[int], Optional[str], bool]:
+        """(status, error, unknown) of one request, re-sent only while the service provably has not processed it."""
+        headers = self._headers()
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self._backoff(attempt))
+            self._count("posts")
+            try:
+                response = self.session.request(method, url, json=body, headers=headers, allow_redirects=True)
+            except requests.RequestException as e:
+                error = str(e)
+                if _never_sent(e):
+                    continue
+                return None, error, True
+            if response.status_code in RETRY_STATUSES:
+                error = f"{response.status_code} {response.text[:200]}"
+                continue
+            if response.status_code >= 400:
+                return response.status_code, f"{response.status_code} {response.text[:200]}", response.status_code >= 500
+            return response.status_code, None, False
+        return None, error, False
+
+    def _post(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        """Post one quote's legs; records them in the registry once accepted."""
+        status, error, unknown = self._send("POST", self.endpoint, self.payload(spec))
+        if error is None:
+            return self._accepted(spec, status)
+        return self._failed(spec["quote_id"], error, unknown)
+
+    async def submit_async(self, spec: Dict[str, Any], client: Any, account: Optional[str] = None) -> Dict[str, Any]:
+        """`submit` on an AsyncSolverClient's pooled session and token, for callers on an event loop."""
+        body = self.payload(spec)
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self._backoff(attempt))
+            self._count("posts")
+            try:
+                # Protective legs queue with closes under a shared rate scheduler
+                await client.authed_request("POST", account or self.account_address, self.endpoint, PRIORITY_CLOSE,
+                                            json=body, headers=self._headers())
+            except aiohttp.ClientResponseError as e:
+                error = f"{e.status} {str(e.message)[:200]}"
+                if e.status in RETRY_STATUSES:
+                    continue
+                return self._failed(spec["quote_id"], error, e.status >= 500)
+            except aiohttp.ClientConnectorError as e:
+                # No connection was made, so nothing reached the service
+                error = str(e) or type(e).__name__
+                continue
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                return self._failed(spec["quote_id"], str(e) or type(e).__name__, True)
+            return self._accepted(spec, 200)
+        return self._failed(spec["quote_id"], error, False)
+
+    def submit_many(self, specs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Post every quote's legs concurrently. Returns one result per quote, in order."""
+        specs = list(specs)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(len(specs), 1))) as pool:
+            results = list(pool.map(self._post, specs))
+        ok = sum(1 for r in results if r["ok"])
+        print(f"[COND] Submitted {sum(len(s['legs']) for s in specs)} leg(s) for {len(specs)} quote(s): "
+              f"{ok} accepted, {len(specs) - ok} failed")
+        return results
+
+    def submit(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        return self._post(spec)
+
+    # ----------------------------------------------------------------
+    # Registry
+    # ----------------------------------------------------------------
+    def active(self, quote_id: int) -> Dict[str, Dict[str, Any]]:
+        """The legs last accepted for `quote_id`, by kind."""
+        entry = self.registry.get(int(quote_id))
+        return dict(entry["legs"]) if entry else {}
+
+    def forget(self, quote_id: int) -> None:
+        """Drop a quote from the registry (e.g. after the position is closed); no request is made."""
+        with self._lock:
+            self.registry.pop(int(quote_id), None)
+
+
+# --------------------------------------------------------------------
+# Demo
+# --------------------------------------------------------------------
+class _StubSession:
+    """Stands in for SiweSessionManager: `latency` per request, every 10th answered 429 once."""
+
+    def __init__(self, latency: float = 0.03):
+        self.latency = latency
+        self.posts = 0
+        self.received: Dict[int, List[Dict]] = {}
+        self._lock = threading.Lock()
+
+    def request(self, method: str, url: str, json: Dict, **kwargs: Any) -> requests.Response:
+        time.sleep(self.latency)
+        with self._lock:
+            self.posts += 1
+            n = self.posts
+        response = requests.Response()
+        if n % 10 == 0:
+            response.status_code = 429
+            response._content = b"slow down"
+            return response
+        self.received.setdefault(json["quote_id"], []).extend(json["conditional_orders"])
+        response.status_code = 200
+        response._content = b'{"message": "ok"}'
+        return response
+
+
+def main():
+    quotes = 200
+    latency = 0.03
+    fmt = SymbolFormatter(4, 1)
+    session = _StubSession(latency)
+    manager = ConditionalOrderManager(
+        "http://stub/api/v4", session, "0x" + "1" * 40, "0x" + "2" * 40, "0x" + "3" * 40 + "," + "0x" + "4" * 40,
+    )
+
+    start = time.perf_counter()
+    specs = [
+        manager.build(quote_id=1000 + i, symbol_id=340, position_type=i % 2, quantity="6.15",
+                      fill_price=Decimal("3.0612") + Decimal(i) / 10000, fmt=fmt,
+                      stop_loss_pct="0.2", take_profit_pct="0.3")
+        for i in range(quotes)
+    ]
+    built_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    results = manager.submit_many(specs)
+    elapsed = time.perf_counter() - start
+    accepted = sum(1 for r in results if r["ok"])
+
+    print(f"[COND] Built {quotes * 2} legs in {built_ms:.1f}ms (no price or symbol fetches)")
+    print(f"[COND] {accepted}/{quotes} quotes accepted in {elapsed:.2f}s, "
+          f"{manager.stats['retries']} retried; one stop loss per request in sequence would take "
+          f"~{quotes * 2 * latency:.1f}s plus a Muon and symbol fetch each")
+    long_legs = session.received[1000]
+    print(f"[COND] Quote 1000 (long, fill 3.0612): SL {long_legs[0]['conditional_price']}, TP {long_legs[1]['conditional_price']}")
+
+    print(f"[COND] Registry: {len(manager.registry)} quotes, quote 1001 legs {sorted(manager.active(1001))}")
+
+if __name__ == "__main__":
+    main()
@@ -13,14 +13,16 @@ With an access token, the bot/frontend calls the solver's HTTP endpoints (e.g.
 `/instant_close`). The solver uses delegated permissions to perform the fast
 price-lock and submit the closing transaction on-chain.
 
+With TRACE_ENABLED=1 the login, Muon price and close are recorded as latency
+spans (tracing.py) under the quote's trace id.
 """
 
 import os
 import requests
-from eth_account import Account
-from eth_account.messages import encode_defunct
 from dotenv import load_dotenv
-from datetime import datetime, timedelta, timezone
+from session_manager import SiweSessionManager
+from tracing import TRACER, traced, configure as configure_tracing
+from datetime import timedelta
 from decimal import Decimal
 
 load_dotenv()
@@ -30,105 +32,24 @@ ACTIVE_ACCOUNT = os.getenv("SUB_ACCOUNT_ADDRESS")
 HEDGER_URL = os.getenv("HEDGER_URL")
 MUON_BASE_URL = os.getenv("MUON_BASE_URL")
 CHAIN_ID = int(os.getenv("CHAIN_ID", 42161))  
-DOMAIN = "localhost"
-ORIGIN = "http://localhost:3000"
-LOGIN_URI = f"{HEDGER_URL}/login"
 DIAMOND_ADDRESS = os.getenv("DIAMOND_ADDRESS")
 
-ISSUED_AT = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
-EXPIRATION_DATE = (datetime.now(timezone.utc) + timedelta(hours=24)).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
-
-wallet = Account.from_key(PRIVATE_KEY)
+# Solver session: the access token is cached on disk and reused until shortly before expiry
+SESSION = SiweSessionManager(HEDGER_URL, PRIVATE_KEY, ACTIVE_ACCOUNT, CHAIN_ID, lifetime=timedelta(hours=24))
 
 SYMBOL_ID = 340  # XRP symbol ID
 MUON_URL = f"{MUON_BASE_URL}?app=symmio&method=uPnl_A_withSymbolPrice&params[partyA]={ACTIVE_ACCOUNT}&params[chainId]={CHAIN_ID}&params[symmio]={DIAMOND_ADDRESS}&params[symbolId]={SYMBOL_ID}"
 
-def get_nonce(address: str) -> str:
-    """Fetch the nonce for the active account from the server."""
-    url = f"{HEDGER_URL}/nonce/{address}"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()["nonce"]
-
-def build_siwe_message(domain, address, statement, uri, version, chain_id, nonce, issued_at, expiration_time):
-    """Build a SIWE message string following the EIP-4361 format."""
-    return f"""{domain} wants you to sign in with your Ethereum account:
-{address}
-
-{statement}
-
-URI: {uri}
-Version: {version}
-Chain ID: {chain_id}
-Nonce: {nonce}
-Issued At: {issued_at}
-Expiration Time: {expiration_time}"""
-
+@traced("login")
 def login():
-    """Perform SIWE login and return the access token."""
+    """Return a valid access token, logging in via SIWE only when the cached one is missing or expiring."""
     try:
-        print(f"\n[1/4] Wallet Address: {wallet.address}")
-        print(f"[1.5/4] Active Account (Checksum): {ACTIVE_ACCOUNT}")
-
-        nonce = get_nonce(ACTIVE_ACCOUNT)
-        print(f"[2/4] Got nonce: {nonce}")
-
-        message_string = build_siwe_message(
-            domain=DOMAIN,
-            address=wallet.address,
-            statement=f"msg: {ACTIVE_ACCOUNT}",
-            uri=LOGIN_URI,
-            version="1",
-            chain_id=CHAIN_ID,
-            nonce=nonce,
-            issued_at=ISSUED_AT,
-            expiration_time=EXPIRATION_DATE
-        )
-        
-        print("\n[3/4] SIWE message to sign:\n", message_string)
-
-        message = encode_defunct(text=message_string)
-        
-        signed_message = wallet.sign_message(message)
-        signature = "0x" + signed_message.signature.hex()
-        print("\nSignature:", signature)
-
-        body = {
-            "account_address": ACTIVE_ACCOUNT,
-            "expiration_time": EXPIRATION_DATE,
-            "issued_at": ISSUED_AT,
-            "signature": signature,
-            "nonce": nonce
-        }
-
-        print("body: ", body)
-
-        headers = {
-            "Content-Type": "application/json",
-            "Origin": ORIGIN,
-            "Referer": ORIGIN,
-        }
-
-        print("\n[4/4] Sending login request...")
-
-        response = requests.post(
-            LOGIN_URI,
-            json=body,
-            headers=headers
-        )
-        
-        if response.status_code != 200:
-            print(f"Server response: {response.status_code}")
-            print(f"Response text: {response.text}")
-            
-        response.raise_for_status()
-        print("Login response:", response.json())
-        
-        return response.json().get("access_token")
+        return SESSION.get_token()
     except Exception as e:
         print(f"Error in SIWE login flow: {e}")
         raise
 
+@traced("fetch_muon_price")
 def fetch_muon_price():
     """Fetch the current price from Muon oracle and convert to decimal."""
     try:
@@ -143,19 +64,17 @@ def fetch_muon_price():
         print(f"Error fetching Muon price: {e}")
         raise
 
-def close_instant_position(token, quote_id, quantity_to_close, close_price):
-    """Call the /instant_close endpoint to close a position."""
+@traced("close_instant_position")
+def close_instant_position(quote_id, quantity_to_close, close_price):
+    """Call the /instant_close endpoint to close a position (through SESSION, which re-logs in on a 401)."""
     try:
         payload = {
             "quote_id": quote_id,
             "quantity_to_close": quantity_to_close,
             "close_price": close_price
         }
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {token}"
-        }
-        response = requests.post(f"{HEDGER_URL}/instant_close", json=payload, headers=headers)
+        response = SESSION.request("POST", f"{HEDGER_URL}/instant_close", json=payload,
+                                   headers={"Content-Type": "application/json"})
         response.raise_for_status()
         print("Instant close response:", response.json())
         return response.json()
@@ -165,6 +84,7 @@ def close_instant_position(token, quote_id, quantity_to_close, close_price):
 
 def main():
     """Main execution flow."""
+    configure_tracing()
     try:
         access_token = login()
         if not access_token:
@@ -183,7 +103,9 @@ def main():
         print(f"Close Price: {close_price}")
         
         print("\nSending instant close request...")
-        close_response = close_instant_position(access_token, quote_id, quantity_to_close, close_price)
+        with TRACER.trade(quote_id=quote_id):
+            close_response = close_instant_position(quote_id, quantity_to_close, close_price)
+        TRACER.forget(quote_id=quote_id)
         print("Instant close response:", close_response)
     except Exception as e:
         print(f"Error in SIWE login flow or closing position: {e}")
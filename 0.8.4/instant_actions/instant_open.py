@@ -13,18 +13,23 @@ High-level flow :
     using its delegated permissions.
 
 This script is a practical example of an instant open:
-- logs in to the solver, fetches oracle price (Muon) and solver "locked params",
-    computes the normalized lock values, then calls the solver's `/instant_open`
-    endpoint.
+- logs in to the solver, fetches oracle price (Muon) and solver "locked params"
+    (all three at once, see warmup.py), computes the normalized lock values, then
+    calls the solver's `/instant_open` endpoint over the already-open session.
+- With TRACE_ENABLED=1 each stage is recorded as a latency span (tracing.py),
+    linked to the returned temp_quote_id.
 """
 
 import os
 import requests
 import json
-from eth_account import Account
-from eth_account.messages import encode_defunct
 from dotenv import load_dotenv
-from datetime import datetime, timedelta, timezone
+from session_manager import SiweSessionManager
+from locked_params_cache import LockedParamsCache
+from margin_engine import MarginEngine
+from warmup import Warmup, WarmupError
+from tracing import TRACER, traced, configure as configure_tracing
+from datetime import timedelta
 import time
 from decimal import Decimal
 import math
@@ -38,17 +43,12 @@ ACTIVE_ACCOUNT = os.getenv("SUB_ACCOUNT_ADDRESS")
 HEDGER_URL = os.getenv("HEDGER_URL")
 CHAIN_ID = int(os.getenv("CHAIN_ID", 42161))  
 MUON_BASE_URL = os.getenv("MUON_BASE_URL")  # Load MUON_BASE_URL from .env
-DOMAIN = "localhost"
-ORIGIN = "http://localhost:3000"
-LOGIN_URI = f"{HEDGER_URL}/login"
 DIAMOND_ADDRESS = os.getenv("DIAMOND_ADDRESS")
 
 
-ISSUED_AT = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
-EXPIRATION_DATE = (datetime.now(timezone.utc) + timedelta(hours=2, minutes=30)).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
 
-# Initialize wallet
-wallet = Account.from_key(PRIVATE_KEY)
+# Solver session: the access token is cached on disk and reused until shortly before expiry
+SESSION = SiweSessionManager(HEDGER_URL, PRIVATE_KEY, ACTIVE_ACCOUNT, CHAIN_ID, lifetime=timedelta(hours=2, minutes=30))
 
 # Trade Configuration - XRP
 SYMBOL_ID = 340
@@ -60,101 +60,27 @@ DEADLINE = int(time.time()) + 3600  # Current time + 1 hour
 LEVERAGE = "1"  # Leverage value
 
 # URLs
-LOCKED_PARAMS_URL = f"{HEDGER_URL}/get_locked_params/XRPUSDT?leverage={LEVERAGE}"
+SYMBOL_NAME = "XRPUSDT"
+LOCKED_PARAMS = LockedParamsCache(HEDGER_URL)
+MUON_HTTP = requests.Session()
 MUON_URL = f"{MUON_BASE_URL}?app=symmio&method=uPnl_A_withSymbolPrice&params[partyA]={ACTIVE_ACCOUNT}&params[chainId]={CHAIN_ID}&params[symmio]={DIAMOND_ADDRESS}&params[symbolId]={SYMBOL_ID}"
 
-def get_nonce(address: str) -> str:
-    """Fetch the nonce for the active account from the server."""
-    url = f"{HEDGER_URL}/nonce/{address}"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()["nonce"]
-
-def build_siwe_message(domain, address, statement, uri, version, chain_id, nonce, issued_at, expiration_time):
-    """Build a SIWE message string following the EIP-4361 format."""
-    return f"""{domain} wants you to sign in with your Ethereum account:
-{address}
-
-{statement}
-
-URI: {uri}
-Version: {version}
-Chain ID: {chain_id}
-Nonce: {nonce}
-Issued At: {issued_at}
-Expiration Time: {expiration_time}"""
-
+@traced("login")
 def login():
-    """Perform SIWE login and return the access token."""
+    """Return a valid access token, logging in via SIWE only when the cached one is missing or expiring."""
     try:
-        print(f"\n[1/4] Wallet Address: {wallet.address}")
-        print(f"[1.5/4] Active Account (Checksum): {ACTIVE_ACCOUNT}")
-
-        nonce = get_nonce(ACTIVE_ACCOUNT)
-        print(f"[2/4] Got nonce: {nonce}")
-
-        message_string = build_siwe_message(
-            domain=DOMAIN,
-            address=wallet.address,
-            statement=f"msg: {ACTIVE_ACCOUNT}",
-            uri=LOGIN_URI,
-            version="1",
-            chain_id=CHAIN_ID,
-            nonce=nonce,
-            issued_at=ISSUED_AT,
-            expiration_time=EXPIRATION_DATE
-        )
-        
-        print("\n[3/4] SIWE message to sign:\n", message_string)
-
-        message = encode_defunct(text=message_string)
-        
-        signed_message = wallet.sign_message(message)
-        signature = "0x" + signed_message.signature.hex()
-        print("\nSignature:", signature)
-
-        body = {
-            "account_address": ACTIVE_ACCOUNT,
-            "expiration_time": EXPIRATION_DATE,
-            "issued_at": ISSUED_AT,
-            "signature": signature,
-            "nonce": nonce
-        }
-
-        print("body: ", body)
-
-        headers = {
-            "Content-Type": "application/json",
-            "Origin": ORIGIN,
-            "Referer": ORIGIN,
-        }
-
-        print("\n[4/4] Sending login request...")
-
-        response = requests.post(
-            LOGIN_URI,
-            json=body,
-            headers=headers
-        )
-        
-        if response.status_code != 200:
-            print(f"Server response: {response.status_code}")
-            print(f"Response text: {response.text}")
-            
-        response.raise_for_status()
-        print("Login response:", response.json())
-        
-        return response.json().get("access_token")
+        return SESSION.get_token()
     except Exception as e:
         print(f"Error in SIWE login flow: {e}")
         import traceback
         traceback.print_exc()
         return None
 
+@traced("fetch_muon_price")
 def fetch_muon_price():
     """Fetch the current price from Muon oracle."""
     try:
-        response = requests.get(MUON_URL)
+        response = MUON_HTTP.get(MUON_URL, timeout=30)
         response.raise_for_status()
         data = response.json()
         fetched_price_wei = data["result"]["data"]["result"]["price"]
@@ -165,40 +91,23 @@ def fetch_muon_price():
         print(f"Error fetching Muon price: {e}")
         raise
 
+@traced("fetch_locked_params")
 def fetch_locked_params():
-    """Fetch locked parameters for the trade."""
+    """Locked parameters for the trade, from the cache unless expired."""
     try:
-        response = requests.get(LOCKED_PARAMS_URL)
-        response.raise_for_status()
-        data = response.json()
-        if data.get("message") == "Success":
-            return data
-        else:
-            raise ValueError("Failed to fetch locked parameters")
+        return LOCKED_PARAMS.get(SYMBOL_NAME, LEVERAGE)
     except Exception as e:
         print(f"Error fetching locked parameters: {e}")
         raise
 
-def calculate_normalized_locked_value(notional, locked_param, leverage, apply_leverage=True):
-    """
-    Compute normalized locked value for a given parameter.
-    
-    For CVA, LF, and PartyAmm: (notionalValue * lockedParam) / (100 * leverage)
-    For PartyBmm: (notionalValue * partyBmm) / 100
-    """
-    notional = Decimal(str(notional))
-    locked_param = Decimal(str(locked_param))
-    leverage = Decimal(str(leverage))
-    
-    if apply_leverage:
-        return str(notional * locked_param / (Decimal('100') * leverage))
-    else:
-        return str(notional * locked_param / Decimal('100'))
+@traced("open_instant_trade")
+def open_instant_trade(fetched_price_wei=None, locked_params=None):
+    """Execute an instant open trade; price and locked params are fetched unless given.
 
-def open_instant_trade(token):
-    """Execute an instant open trade using the access token."""
+    The request goes through SESSION, which sends its current token and re-logs in once on a 401.
+    """
     try:
-        fetched_price_wei = fetch_muon_price()
+        fetched_price_wei = fetched_price_wei or fetch_muon_price()
         print(f"Fetched price (wei): {fetched_price_wei}")
         
         # Because in this example we are going LONG, we are increasing the price by 1% before we send the order
@@ -206,18 +115,16 @@ def open_instant_trade(token):
         adjusted_price = fetched_price * Decimal('1.01')  # Add 1% slippage
         print(f"Adjusted price (+1%): {adjusted_price}")
         
-        locked_params = fetch_locked_params()
+        locked_params = locked_params or fetch_locked_params()
         print(f"Locked parameters: {locked_params}")
         
         notional = adjusted_price * Decimal(QUANTITY)
         print(f"Notional: {notional}")
         
-        # Compute normalized locked values
-        leverage = Decimal(locked_params["leverage"])
-        normalized_cva = calculate_normalized_locked_value(notional, locked_params["cva"], leverage, True)
-        normalized_lf = calculate_normalized_locked_value(notional, locked_params["lf"], leverage, True)
-        normalized_party_amm = calculate_normalized_locked_value(notional, locked_params["partyAmm"], leverage, True)
-        normalized_party_bmm = calculate_normalized_locked_value(notional, locked_params["partyBmm"], leverage, False)
+        # Compute normalized locked values: (notional * param) / (100 * leverage), partyBmm without leverage
+        locked = MarginEngine(locked_params).locked_values(notional)
+        normalized_cva, normalized_lf = locked["cva"], locked["lf"]
+        normalized_party_amm, normalized_party_bmm = locked["partyAmm"], locked["partyBmm"]
         
         print(f"Normalized CVA: {normalized_cva}")
         print(f"Normalized LF: {normalized_lf}")
@@ -240,15 +147,13 @@ def open_instant_trade(token):
         
         print(f"Trade Payload: {trade_params}")
         
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {token}"
-        }
-        
-        response = requests.post(f"{HEDGER_URL}/instant_open", json=trade_params, headers=headers)
+        # The login's keep-alive connection to the solver carries the order; a revoked token re-logs in
+        response = SESSION.request("POST", f"{HEDGER_URL}/instant_open", json=trade_params,
+                                   headers={"Content-Type": "application/json"})
         
         print(f"Response status: {response.status_code}")
         print(f"Instant open response: {response.text}")
+        LOCKED_PARAMS.check_response(SYMBOL_NAME, LEVERAGE, response)
         
         response.raise_for_status()
         print(f"Instant open successful: {response.json()}")
@@ -262,15 +167,26 @@ def open_instant_trade(token):
 
 def main():
     """Main execution flow."""
-    access_token = login()
-    if not access_token:
-        print("Login failed. Cannot proceed with trade.")
+    configure_tracing()
+    # Login, Muon price and locked params don't depend on each other: fetch them at once
+    try:
+        ready = (Warmup()
+                 .add("login", traced("login")(SESSION.get_token))
+                 .add("muon_price", fetch_muon_price)
+                 .add("locked_params", fetch_locked_params)
+                 .run())
+    except WarmupError as e:
+        print(f"{e}. Cannot proceed with trade.")
         return
+    access_token = ready["login"]
     
     print(f"\nAccess token obtained: {access_token}")
     
     print("\n----- Starting Instant Open Trade Process -----")
-    result = open_instant_trade(access_token)
+    with TRACER.trade():
+        result = open_instant_trade(ready["muon_price"], ready["locked_params"])
+        if result:
+            TRACER.link(temp_quote_id=result.get("temp_quote_id"))
     
     if result:
         print("\n----- Instant Open Trade Completed Successfully -----")
@@ -0,0 +1,269 @@
+"""Locked-params cache keyed by symbol and leverage.
+
+Every order path calls `GET /get_locked_params/{symbol}?leverage=N` right before
+sending (instant_open.py, party_a/send_quote.py, the vibecaps and majors
+demos), although cva / lf / partyAmm / partyBmm rarely change. `LockedParamsCache`
+keeps them per (symbol, leverage) with a TTL, can be warmed in bulk at startup
+for every pair a bot trades, refreshes entries in a background thread before
+they expire, and drops entries when the solver rejects an order built from them.
+
+Solvers key the endpoint differently: the hedger and PerpsHub take the symbol
+name (`XRPUSDT`), the vibecaps solver takes the numeric id (`340`). Callers may
+pass either; the cache translates to whatever the solver expects
+(`symbol_param="name"` or `"id"`) using `/contract-symbols`, and both forms hit
+the same entry.
+
+Usage
+    cache = LockedParamsCache(HEDGER_URL)
+    cache.warm([("XRPUSDT", "1"), ("BTCUSDT", "5")])
+    cache.start_background_refresh()
+    params = cache.get("XRPUSDT", "1")      # no round trip while fresh
+    ...
+    if order_response.status_code >= 400:
+        cache.invalidate("XRPUSDT", "1")
+
+Run
+- python instant_actions/locked_params_cache.py
+
+Required .env
+- HEDGER_URL
+
+Optional .env
+- LOCKED_PARAMS_TTL (seconds, default: 300)
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import requests
+from dotenv import load_dotenv
+
+from symbol_catalog import parse_symbols, symbol_id_of
+
+Symbol = Union[str, int]
+
+
+def parse_locked_params(data: Any, symbol: Symbol, leverage: Union[str, int, Decimal]) -> Dict[str, Any]:
+    """Validate a `/get_locked_params` body; the one success check for the sync and async clients.
+
+    The hedger answers `{"message": "Success", ...}`; the vibecaps solver omits the message.
+    """
+    if not isinstance(data, dict) or "cva" not in data or data.get("message", "Success") != "Success":
+        raise ValueError(f"Failed to fetch locked params for {symbol} x{leverage}: {data}")
+    return data
+
+
+class LockedParamsCache:
+    """TTL cache of `/get_locked_params` responses per (symbol, leverage)."""
+
+    def __init__(
+        self,
+        solver_url: str,
+        ttl: Optional[float] = None,
+        refresh_ahead: float = 0.2,
+        symbol_param: str = "name",
+        session: Optional[requests.Session] = None,
+        max_workers: int = 8,
+    ):
+        if symbol_param not in ("name", "id"):
+            raise ValueError("symbol_param must be 'name' or 'id'")
+        self.solver_url = solver_url.rstrip("/")
+        self.ttl = float(ttl if ttl is not None else os.getenv("LOCKED_PARAMS_TTL", 300))
+        self.refresh_ahead = refresh_ahead
+        self.symbol_param = symbol_param
+        self.http = session or requests.Session()
+        self.max_workers = max_workers
+
+        self._entries: Dict[Tuple[str, str], Tuple[Dict[str, Any], float]] = {}
+        self._key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._id_by_name: Dict[str, int] = {}
+        self._name_by_id: Dict[int, str] = {}
+        self._stop = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+        self.stats = {"hits": 0, "misses": 0, "refreshes": 0, "invalidations": 0, "errors": 0}
+
+    # ----------------------------------------------------------------
+    # Symbol keying
+    # ----------------------------------------------------------------
+    def load_symbols(self) -> None:
+        """Fetch `/contract-symbols` once so names and ids can be used interchangeably."""
+        response = self.http.get(f"{self.solver_url}/contract-symbols", timeout=30)
+        response.raise_for_status()
+        for sym in parse_symbols(response.json()):
+            sym_id = symbol_id_of(sym)
+            name = sym.get("name") or sym.get("symbol")
+            if sym_id is not None and name:
+                self._id_by_name[str(name).upper()] = int(sym_id)
+                self._name_by_id[int(sym_id)] = str(name)
+
+    def _request_symbol(self, symbol: Symbol) -> str:
+        """`symbol` in the form the solver's endpoint expects."""
+        text = str(symbol).strip()
+        is_id = text.isdigit()
+        if self.symbol_param == "id" and not is_id:
+            if not self._id_by_name:
+                self.load_symbols()
+            try:
+                return str(self._id_by_name[text.upper()])
+            except KeyError:
+                raise ValueError(f"Unknown symbol name {text}") from None
+        if self.symbol_param == "name" and is_id:
+            if not self._name_by_id:
+                self.load_symbols()
+            try:
+                return self._name_by_id[int(text)]
+            except KeyError:
+                raise ValueError(f"Unknown symbol id {text}") from None
+        return text.upper() if not is_id else text
+
+    @staticmethod
+    def _leverage(leverage: Union[str, int, Decimal]) -> str:
+        return format(Decimal(str(leverage)).normalize(), "f")
+
+    def _key(self, symbol: Symbol, leverage: Union[str, int, Decimal]) -> Tuple[str, str]:
+        return self._request_symbol(symbol), self._leverage(leverage)
+
+    # ----------------------------------------------------------------
+    # Lookups
+    # ----------------------------------------------------------------
+    def _fetch(self, key: Tuple[str, str]) -> Dict[str, Any]:
+        symbol, leverage = key
+        response = self.http.get(
+            f"{self.solver_url}/get_locked_params/{symbol}", params={"leverage": leverage}, timeout=30,
+        )
+        response.raise_for_status()
+        data = parse_locked_params(response.json(), symbol, leverage)
+        with self._lock:
+            self._entries[key] = (data, time.monotonic())
+        return data
+
+    def _key_lock(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def peek(self, symbol: Symbol, leverage: Union[str, int, Decimal]) -> Optional[Dict[str, Any]]:
+        """The cached params if still within TTL, else None. Never makes a request."""
+        entry = self._entries.get(self._key(symbol, leverage))
+        if entry is not None and time.monotonic() - entry[1] < self.ttl:
+            return entry[0]
+        return None
+
+    def get(self, symbol: Symbol, leverage: Union[str, int, Decimal]) -> Dict[str, Any]:
+        """Locked params for (symbol, leverage); fetched only on a miss or after expiry."""
+        key = self._key(symbol, leverage)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl:
+            self.stats["hits"] += 1
+            return entry[0]
+
+        with self._key_lock(key):
+            # Another thread may have fetched it while we waited
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                self.stats["hits"] += 1
+                return entry[0]
+            self.stats["misses"] += 1
+            return self._fetch(key)
+
+    def put(self, symbol: Symbol, leverage: Union[str, int, Decimal], data: Dict[str, Any]) -> None:
+        """Store params fetched by another client (e.g. the async client)."""
+        key = self._key(symbol, leverage)
+        with self._lock:
+            self._entries[key] = (data, time.monotonic())
+
+    def warm(self, pairs: Iterable[Tuple[Symbol, Union[str, int, Decimal]]]) -> Dict[Tuple[str, str], Any]:
+        """Fetch every (symbol, leverage) pair concurrently. Returns {key: params or exception}."""
+        keys = list(dict.fromkeys(self._key(symbol, leverage) for symbol, leverage in pairs))
+        results: Dict[Tuple[str, str], Any] = {}
+
+        def fetch(key):
+            try:
+                return key, self._fetch(key)
+            except Exception as e:
+                self.stats["errors"] += 1
+                return key, e
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for key, result in pool.map(fetch, keys):
+                results[key] = result
+        loaded = sum(1 for r in results.values() if not isinstance(r, Exception))
+        print(f"[LOCKED] Warmed {loaded}/{len(keys)} (symbol, leverage) pairs")
+        return results
+
+    def invalidate(self, symbol: Optional[Symbol] = None, leverage: Optional[Union[str, int, Decimal]] = None) -> None:
+        """Drop one entry, every leverage of a symbol, or (no arguments) everything."""
+        request_symbol = self._request_symbol(symbol) if symbol is not None else None
+        with self._lock:
+            if symbol is None:
+                dropped = list(self._entries)
+            elif leverage is None:
+                dropped = [k for k in self._entries if k[0] == request_symbol]
+            else:
+                dropped = [(request_symbol, self._leverage(leverage))]
+            for key in dropped:
+                if self._entries.pop(key, None) is not None:
+                    self.stats["invalidations"] += 1
+
+    def check_response(self, symbol: Symbol, leverage: Union[str, int, Decimal], response: requests.Response) -> None:
+        """Invalidate (symbol, leverage) if the solver rejected an order built from cached params."""
+        if response.status_code >= 400 and response.status_code not in (401, 429):
+            print(f"[LOCKED] Solver rejected order ({response.status_code}), dropping cached params for {symbol} x{leverage}")
+            self.invalidate(symbol, leverage)
+
+    # ----------------------------------------------------------------
+    # Background refresh
+    # ----------------------------------------------------------------
+    def _due(self) -> List[Tuple[str, str]]:
+        horizon = self.ttl * (1 - self.refresh_ahead)
+        now = time.monotonic()
+        with self._lock:
+            return [key for key, (_, fetched_at) in self._entries.items() if now - fetched_at >= horizon]
+
+    def start_background_refresh(self, interval: Optional[float] = None) -> None:
+        """Re-fetch entries in the last `refresh_ahead` fraction of their TTL so `get` never blocks on them."""
+        if self._refresh_thread is not None:
+            return
+        interval = interval if interval is not None else max(self.ttl * self.refresh_ahead / 2, 0.05)
+
+        def loop():
+            while not self._stop.wait(interval):
+                for key in self._due():
+                    try:
+                        self._fetch(key)
+                        self.stats["refreshes"] += 1
+                    except Exception as e:
+                        self.stats["errors"] += 1
+                        print(f"[LOCKED] Refresh failed for {key}: {e}")
+
+        self._refresh_thread = threading.Thread(target=loop, daemon=True)
+        self._refresh_thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def main():
+    load_dotenv()
+    cache = LockedParamsCache(os.getenv("HEDGER_URL"))
+    pairs = [("XRPUSDT", "1"), ("BTCUSDT", "1"), ("ETHUSDT", "1")]
+
+    start = time.perf_counter()
+    cache.warm(pairs)
+    print(f"[LOCKED] Bulk warm-up: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        cache.get("XRPUSDT", 1)
+    print(f"[LOCKED] 1000 cached lookups: {(time.perf_counter() - start) * 1000:.2f}ms")
+    print(f"[LOCKED] XRPUSDT x1: {cache.get('XRPUSDT', '1')}")
+    print(f"[LOCKED] stats={cache.stats}")
+
+
+if __name__ == "__main__":
+    main()
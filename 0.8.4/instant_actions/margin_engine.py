@@ -0,0 +1,241 @@
+"""Margin and price engine for bulk order preparation.
+
+Every open path derives the same numbers for each order:
+- the slippage-adjusted price, rounded down to the symbol's price precision
+- the quantity, rounded down to the quantity precision
+- the normalized locked values cva / lf / partyAmm (notional * param / (100 * leverage))
+  and partyBmm (notional * param / 100)
+
+The scripts used to do this per order with `Decimal(str(x))` round trips (each
+had its own `calculate_normalized_locked_value`), and
+`SendQuoteClient.calculate_adjusted_price` went through `float`, which is lossy.
+They all take these numbers from here now.
+
+`MarginEngine` computes whole batches from one set of locked params. The
+per-batch constants (locked params, 100 * leverage, slippage factors,
+quantizers) are converted once, and each order needs only its own multiplies
+and divides. All arithmetic runs in an explicit 28-digit ROUND_HALF_EVEN
+context, which is the default context the scripts use. The strings and wei
+amounts are therefore identical to the existing Decimal code's, and do not
+depend on whatever context the calling thread has set.
+
+Usage
+    engine = MarginEngine(locked_params)                  # one /get_locked_params response
+    orders = engine.instant_orders(prices_wei, quantities, position_types,
+                                   slippage="0.01", price_precision=4, quantity_precision=1)
+    orders[0]  # {"price": "3.0603", "quantity": "6.1", "cva": "...", "lf": ..., "partyAmm": ..., "partyBmm": ...}
+    engine.locked_values(notional)  # the same four strings for a price * quantity computed by the caller
+
+    prices_wei = MarginEngine.adjusted_prices_wei(prices_wei, position_types, slippage_percent="1")
+    margins = engine.onchain_margins(quantities_wei, prices_wei)   # sendQuote cva/lf/partyAmm/partyBmm in wei
+
+Run
+- python instant_actions/margin_engine.py     # 100k-order benchmark against the per-order Decimal path
+"""
+
+import time
+import random
+from decimal import Context, Decimal, ROUND_DOWN, ROUND_HALF_EVEN
+from typing import Dict, List, Optional, Sequence, Union
+
+Number = Union[str, int, Decimal]
+
+# decimal.DefaultContext's precision and rounding, which all the existing Decimal code runs under
+CONTEXT = Context(prec=28, rounding=ROUND_HALF_EVEN)
+WEI = Decimal("1e18")
+HUNDRED = Decimal(100)
+
+
+def _format_plain(value: Decimal) -> str:
+    """`"{:f}"` without trailing zeros (or a bare point), as the majors/vibecaps demos send."""
+    text = "{:f}".format(value)
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return text
+
+
+class MarginEngine:
+    """Batch price/margin computation for one set of locked params."""
+
+    PARAMS = ("cva", "lf", "partyAmm", "partyBmm")
+
+    def __init__(self, locked_params: Dict, leverage: Optional[Number] = None, plain: bool = False):
+        """`plain=True` formats like the majors/vibecaps demos ("{:f}" without trailing zeros), else like `str(Decimal)`."""
+        self.leverage = Decimal(str(leverage if leverage is not None else locked_params["leverage"]))
+        self.params = {name: Decimal(str(locked_params[name])) for name in self.PARAMS}
+        hundred_leverage = CONTEXT.multiply(HUNDRED, self.leverage)
+        # partyBmm is not divided by leverage
+        self.divisors = {name: HUNDRED if name == "partyBmm" else hundred_leverage for name in self.PARAMS}
+        self.fmt = _format_plain if plain else str
+
+    @staticmethod
+    def _factors(slippage: Decimal):
+        """{position_type: price factor}: longs accept a higher price, shorts a lower one."""
+        return {0: CONTEXT.add(1, slippage), 1: CONTEXT.subtract(1, slippage)}
+
+    # ----------------------------------------------------------------
+    # Instant (solver API) orders
+    # ----------------------------------------------------------------
+    def instant_orders(
+        self,
+        prices_wei: Sequence[int],
+        quantities: Sequence[Number],
+        position_types: Sequence[int],
+        slippage: Number = "0.01",
+        price_precision: Optional[int] = None,
+        quantity_precision: Optional[int] = None,
+    ) -> List[Dict[str, str]]:
+        """`/instant_open` price, quantity, cva, lf, partyAmm and partyBmm strings for each order.
+
+        `prices_wei` are Muon prices (18 decimals); quantities are in human units.
+        """
+        factors = self._factors(Decimal(str(slippage)))
+        price_quantum = Decimal(1).scaleb(-int(price_precision)) if price_precision is not None else None
+        quantity_quantum = Decimal(1).scaleb(-int(quantity_precision)) if quantity_precision is not None else None
+        plan = [(name, self.params[name], self.divisors[name]) for name in self.PARAMS]
+        multiply, divide, quantize, fmt = CONTEXT.multiply, CONTEXT.divide, Decimal.quantize, self.fmt
+
+        out = []
+        for price_wei, quantity, position_type in zip(prices_wei, quantities, position_types):
+            price = multiply(divide(Decimal(price_wei), WEI), factors[position_type])
+            if price_quantum is not None:
+                price = quantize(price, price_quantum, rounding=ROUND_DOWN, context=CONTEXT)
+            quantity = Decimal(str(quantity))
+            if quantity_quantum is not None:
+                quantity = quantize(quantity, quantity_quantum, rounding=ROUND_DOWN, context=CONTEXT)
+            notional = multiply(price, quantity)
+            order = {name: fmt(divide(multiply(notional, param), divisor)) for name, param, divisor in plan}
+            order["price"] = str(price)
+            order["quantity"] = str(quantity)
+            out.append(order)
+        return out
+
+    def instant_order(self, price_wei: int, quantity: Number, position_type: int = 0, **kwargs) -> Dict[str, str]:
+        return self.instant_orders([price_wei], [quantity], [position_type], **kwargs)[0]
+
+    def locked_values(self, notional: Number) -> Dict[str, str]:
+        """cva / lf / partyAmm / partyBmm strings for one order whose notional (price * quantity) is already known."""
+        notional = Decimal(str(notional))
+        multiply, divide, fmt = CONTEXT.multiply, CONTEXT.divide, self.fmt
+        return {name: fmt(divide(multiply(notional, self.params[name]), self.divisors[name])) for name in self.PARAMS}
+
+    # ----------------------------------------------------------------
+    # On-chain sendQuote amounts
+    # ----------------------------------------------------------------
+    @classmethod
+    def adjusted_prices_wei(cls, prices_wei: Sequence[int], position_types: Sequence[int], slippage_percent: Number) -> List[int]:
+        """Wei prices with `slippage_percent`% added (long) or removed (short), without going through float."""
+        factors = cls._factors(CONTEXT.divide(Decimal(str(slippage_percent)), HUNDRED))
+        multiply = CONTEXT.multiply
+        return [int(multiply(Decimal(price), factors[t])) for price, t in zip(prices_wei, position_types)]
+
+    def onchain_margins(self, quantities_wei: Sequence[int], prices_wei: Sequence[int]) -> List[Dict[str, int]]:
+        """sendQuote cva / lf / partyAmm / partyBmm in wei for each (quantity, price) pair."""
+        # The contract path divides by (100 * leverage * 1e18) in one step
+        plan = [
+            (name, self.params[name], CONTEXT.multiply(self.divisors[name], Decimal(10**18)))
+            for name in self.PARAMS
+        ]
+        multiply, divide = CONTEXT.multiply, CONTEXT.divide
+        out = []
+        for quantity_wei, price_wei in zip(quantities_wei, prices_wei):
+            notional = multiply(Decimal(quantity_wei), Decimal(price_wei))
+            out.append({name: int(divide(multiply(notional, param), divisor)) for name, param, divisor in plan})
+        return out
+
+
+# --------------------------------------------------------------------
+# Reference per-order Decimal path (as the scripts compute it) and benchmark
+# --------------------------------------------------------------------
+def _decimal_locked_value(notional, locked_param, leverage, apply_leverage=True):
+    notional = Decimal(str(notional))
+    locked_param = Decimal(str(locked_param))
+    leverage = Decimal(str(leverage))
+    if apply_leverage:
+        return str(notional * locked_param / (Decimal("100") * leverage))
+    return str(notional * locked_param / Decimal("100"))
+
+
+def _decimal_order(price_wei, quantity, position_type, locked_params, slippage, price_precision, quantity_precision):
+    price = Decimal(price_wei) / Decimal("1e18")
+    direction = Decimal(1) if position_type == 0 else Decimal(-1)
+    price = (price * (1 + direction * Decimal(slippage))).quantize(Decimal(1).scaleb(-price_precision), rounding=ROUND_DOWN)
+    quantity = Decimal(quantity).quantize(Decimal(1).scaleb(-quantity_precision), rounding=ROUND_DOWN)
+    notional = price * quantity
+    leverage = Decimal(locked_params["leverage"])
+    return {
+        "cva": _decimal_locked_value(notional, locked_params["cva"], leverage, True),
+        "lf": _decimal_locked_value(notional, locked_params["lf"], leverage, True),
+        "partyAmm": _decimal_locked_value(notional, locked_params["partyAmm"], leverage, True),
+        "partyBmm": _decimal_locked_value(notional, locked_params["partyBmm"], leverage, False),
+        "price": str(price),
+        "quantity": str(quantity),
+    }
+
+
+def _decimal_margins(quantity_wei, price_wei, locked_params):
+    """`SendQuoteClient.calculate_margins` before this engine."""
+    notional_value = Decimal(quantity_wei) * Decimal(price_wei)
+    leverage = Decimal(locked_params["leverage"])
+    return {
+        "cva": int(notional_value * Decimal(locked_params["cva"]) / (Decimal(100) * leverage * Decimal(10**18))),
+        "lf": int(notional_value * Decimal(locked_params["lf"]) / (Decimal(100) * leverage * Decimal(10**18))),
+        "partyAmm": int(notional_value * Decimal(locked_params["partyAmm"]) / (Decimal(100) * leverage * Decimal(10**18))),
+        "partyBmm": int(notional_value * Decimal(locked_params["partyBmm"]) / (Decimal(100) * Decimal(10**18))),
+    }
+
+
+def benchmark(n: int = 100_000, leverage: str = "3", seed: int = 3) -> Dict[str, float]:
+    rng = random.Random(seed)
+    locked_params = {"leverage": leverage, "cva": "2.5", "lf": "1.25", "partyAmm": "17.3", "partyBmm": "0.7"}
+    prices_wei = [rng.randint(10**14, 10**23) for _ in range(n)]
+    quantities = [f"{rng.randint(1, 10**6) / 10**rng.randint(0, 4)}" for _ in range(n)]
+    position_types = [rng.randint(0, 1) for _ in range(n)]
+    engine = MarginEngine(locked_params)
+
+    start = time.perf_counter()
+    expected = [_decimal_order(p, q, t, locked_params, "0.01", 6, 3) for p, q, t in zip(prices_wei, quantities, position_types)]
+    decimal_s = time.perf_counter() - start
+    start = time.perf_counter()
+    got = engine.instant_orders(prices_wei, quantities, position_types, "0.01", 6, 3)
+    engine_s = time.perf_counter() - start
+    mismatches = sum(1 for a, b in zip(expected, got) if a != b)
+
+    quantities_wei = [rng.randint(10**15, 10**24) for _ in range(n)]
+    adjusted_wei = MarginEngine.adjusted_prices_wei(prices_wei, position_types, "1")
+    start = time.perf_counter()
+    expected_wei = [_decimal_margins(q, p, locked_params) for q, p in zip(quantities_wei, adjusted_wei)]
+    decimal_wei_s = time.perf_counter() - start
+    start = time.perf_counter()
+    got_wei = engine.onchain_margins(quantities_wei, adjusted_wei)
+    engine_wei_s = time.perf_counter() - start
+    mismatches_wei = sum(1 for a, b in zip(expected_wei, got_wei) if a != b)
+
+    float_diffs = sum(
+        1 for p, t, exact in zip(prices_wei, position_types, adjusted_wei)
+        if int(p * (1 - 1 / 100) if t == 1 else p * (1 + 1 / 100)) != exact
+    )
+
+    print(f"[MARGIN] leverage {leverage}, {n} instant orders: per-order Decimal {decimal_s:.2f}s, "
+          f"engine {engine_s:.2f}s ({decimal_s / engine_s:.1f}x), {mismatches} mismatches")
+    print(f"[MARGIN] leverage {leverage}, {n} sendQuote margins: per-order Decimal {decimal_wei_s:.2f}s, "
+          f"engine {engine_wei_s:.2f}s ({decimal_wei_s / engine_wei_s:.1f}x), {mismatches_wei} mismatches")
+    print(f"[MARGIN] float-based calculate_adjusted_price differed from the exact price on {float_diffs}/{n} orders")
+    return {
+        "orders": n,
+        "decimal_s": decimal_s,
+        "engine_s": engine_s,
+        "mismatches": mismatches,
+        "decimal_wei_s": decimal_wei_s,
+        "engine_wei_s": engine_wei_s,
+        "mismatches_wei": mismatches_wei,
+    }
+
+
+def main():
+    for leverage in ("3", "10"):
+        benchmark(leverage=leverage)
+
+
+if __name__ == "__main__":
+    main()
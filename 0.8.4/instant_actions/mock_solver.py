@@ -0,0 +1,622 @@
+"""Local solver/hedger stand-in for offline end-to-end and load tests.
+
+`start_stub_solver` in async_client.py answers every endpoint after a fixed
+delay, but it keeps no state: no auth, no quote lifecycle, no notifications.
+`MockSolver` serves the whole surface the trading flows use, from one
+aiohttp server:
+
+    GET  /nonce/{address}          single-use SIWE nonce
+    POST /login                    checks the nonce, issues a bearer token (`token_ttl`)
+    GET  /get_locked_params/{s}    by symbol name or id, 400 for unknown symbols
+    GET  /contract-symbols         the configured symbols with their precision
+    GET  /muon                     uPnl_A_withSymbolPrice / settle_upnl responses with dummy signatures
+    POST /instant_open             validates the payload, returns a negative temp quote id
+    POST /instant_close            only for OPENED quotes of the caller, up to the open quantity
+    GET  /instant_open/{address}   [{temp_quote_id, quote_id, quote_status, action_status}]
+    POST /conditional-orders/      SL/TP legs added to the quote
+    WS   /ws/v1/subscribe          notification-service stand-in (channel_patterns subscription)
+
+Quotes follow the on-chain lifecycle: PENDING with a temp id, then after
+`confirm_delay` either OPENED with a permanent id, or failed (`fail_rate`).
+Closes move an OPENED quote to CLOSE_PENDING, then after `close_delay` to
+CLOSED, or back to OPENED if only part of it was closed. Each transition is
+pushed to the subscribed websockets. The message shape is
+`{"sequence", "data": {"temp_quote_id", "quote_id", "action_status"}}` (closes:
+`{"quote_id", "action", "action_status", "closed_amount"}`), which is what
+`NotificationHub` (and the old per-trade `wait_for_quote_confirmation` loops) parse.
+
+A `Profile` sets latency and jitter, the 5xx rate, a server-side request-rate
+limit (429 + Retry-After), the quote failure rate, and forced websocket
+drops. `PROFILES` has presets.
+
+Usage
+    solver = MockSolver(PROFILES["realistic"])
+    base_url = await solver.start()                 # or solver.start_in_thread() from blocking code
+    client = AsyncSolverClient(base_url, 42161, f"{base_url}/muon", "0x0",
+                               hub=NotificationHub(solver.ws_url), notification_app_name=solver.app_name)
+    ...
+    print(solver.stats)
+    await solver.stop()
+
+Run
+- python instant_actions/mock_solver.py                  # open -> confirm -> close throughput, every profile
+- python instant_actions/mock_solver.py --serve 8100     # keep serving on a port for manual runs
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import secrets
+import tempfile
+import threading
+import statistics
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import aiohttp
+from aiohttp import web
+
+QUOTE_STATUS_PENDING = 0
+QUOTE_STATUS_CANCELED = 3
+QUOTE_STATUS_OPENED = 4
+QUOTE_STATUS_CLOSE_PENDING = 5
+QUOTE_STATUS_CLOSED = 7
+
+OPEN_FIELDS = ("symbolId", "positionType", "orderType", "price", "quantity", "cva", "lf", "partyAmm",
+               "partyBmm", "maxFundingRate", "deadline")
+
+DEFAULT_SYMBOLS = [
+    {"symbol_id": 340, "name": "XRPUSDT", "price": "3", "price_precision": 4, "quantity_precision": 1},
+    {"symbol_id": 1, "name": "BTCUSDT", "price": "100000", "price_precision": 1, "quantity_precision": 3},
+    {"symbol_id": 2, "name": "ETHUSDT", "price": "3500", "price_precision": 2, "quantity_precision": 3},
+]
+# Remaining /contract-symbols fields (party_a/send_quote.py reads all of them)
+SYMBOL_DEFAULTS = {
+    "asset": "USDT", "is_valid": True, "min_acceptable_quote_value": "10", "min_acceptable_portion_lf": "0.001",
+    "trading_fee": "0.0006", "max_leverage": 50, "max_notional_value": "1000000", "max_funding_rate": "200",
+    "rfq_allowed": True, "hedger_fee_open": "0.0005", "hedger_fee_close": "0.0005",
+}
+
+
+class Profile:
+    """Latency and failure behaviour of a `MockSolver`."""
+
+    __slots__ = ("latency", "jitter", "error_rate", "rate_limit", "confirm_delay", "close_delay", "fail_rate",
+                 "ws_drop_every")
+
+    def __init__(
+        self,
+        latency: float = 0.02,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit: float = 0.0,
+        confirm_delay: float = 0.1,
+        close_delay: float = 0.1,
+        fail_rate: float = 0.0,
+        ws_drop_every: int = 0,
+    ):
+        self.latency = latency              # seconds added to every HTTP response
+        self.jitter = jitter                # plus uniform(0, jitter)
+        self.error_rate = error_rate        # share of requests answered 503
+        self.rate_limit = rate_limit        # requests per second before 429 (0 = unlimited)
+        self.confirm_delay = confirm_delay  # PENDING -> OPENED / failed
+        self.close_delay = close_delay      # CLOSE_PENDING -> CLOSED
+        self.fail_rate = fail_rate          # share of opens that fail instead of confirming
+        self.ws_drop_every = ws_drop_every  # drop each websocket after this many messages (0 = never)
+
+    def __repr__(self) -> str:
+        return "Profile(" + ", ".join(f"{name}={getattr(self, name)}" for name in self.__slots__) + ")"
+
+
+PROFILES = {
+    "fast": Profile(latency=0.0, confirm_delay=0.0, close_delay=0.0),
+    "realistic": Profile(latency=0.04, jitter=0.04, confirm_delay=0.8, close_delay=0.8),
+    "flaky": Profile(latency=0.04, jitter=0.1, error_rate=0.02, confirm_delay=1.0, close_delay=1.0, fail_rate=0.05,
+                     ws_drop_every=200),
+    "throttled": Profile(latency=0.02, jitter=0.02, rate_limit=100.0, confirm_delay=0.5, close_delay=0.5),
+}
+
+
+class _Quote:
+    __slots__ = ("temp_quote_id", "quote_id", "account", "symbol_id", "position_type", "price", "quantity",
+                 "closed_amount", "status", "action_status", "conditional_orders")
+
+    def __init__(self, temp_quote_id: int, account: str, payload: Dict[str, Any]):
+        self.temp_quote_id = temp_quote_id
+        self.quote_id: Optional[int] = None
+        self.account = account
+        self.symbol_id = int(payload["symbolId"])
+        self.position_type = int(payload["positionType"])
+        self.price = Decimal(str(payload["price"]))
+        self.quantity = Decimal(str(payload["quantity"]))
+        self.closed_amount = Decimal(0)
+        self.status = QUOTE_STATUS_PENDING
+        self.action_status = "pending"
+        self.conditional_orders: List[Dict[str, Any]] = []
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "temp_quote_id": self.temp_quote_id,
+            "quote_id": self.quote_id,
+            "symbol_id": self.symbol_id,
+            "position_type": self.position_type,
+            "quantity": str(self.quantity - self.closed_amount),
+            "quote_status": self.status,
+            "action_status": self.action_status,
+        }
+
+
+class MockSolver:
+    """Stateful in-process solver, Muon and notification service."""
+
+    def __init__(
+        self,
+        profile: Optional[Profile] = None,
+        symbols: Optional[List[Dict[str, Any]]] = None,
+        app_name: str = "Mock_App",
+        token_ttl: float = 3600.0,
+        seed: Optional[int] = None,
+    ):
+        self.profile = profile or Profile()
+        self.symbols = {int(s["symbol_id"]): {"symbol": s["name"], **SYMBOL_DEFAULTS, **s}
+                        for s in (symbols or DEFAULT_SYMBOLS)}
+        self._by_name = {s["name"]: symbol_id for symbol_id, s in self.symbols.items()}
+        self._prices = {symbol_id: float(s["price"]) for symbol_id, s in self.symbols.items()}
+        self.app_name = app_name
+        self.token_ttl = token_ttl
+        self.rng = random.Random(seed)
+
+        self.nonces: Dict[str, str] = {}
+        self.tokens: Dict[str, Tuple[str, float]] = {}
+        self.quotes: Dict[int, _Quote] = {}  # by temp quote id
+        self.by_quote_id: Dict[int, _Quote] = {}
+        self.by_account: Dict[str, List[_Quote]] = {}
+        self._next_temp_id = 1
+        self._next_quote_id = 1000
+        self._subscribers: Dict[web.WebSocketResponse, Dict[str, Any]] = {}
+        self._timers: Set[asyncio.Task] = set()
+        self._tokens_left = 1.0
+        self._refilled = time.monotonic()
+
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0, "logins": 0, "opens": 0, "confirmed": 0,
+                      "failed": 0, "closes": 0, "closed": 0, "rejected": 0, "notifications": 0, "ws_drops": 0}
+        self.runner: Optional[web.AppRunner] = None
+        self.base_url: Optional[str] = None
+        self._thread_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def ws_url(self) -> str:
+        return self.base_url.replace("http://", "ws://", 1) + "/ws/v1/subscribe"
+
+    # ----------------------------------------------------------------
+    # Lifecycle
+    # ----------------------------------------------------------------
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._profile_middleware])
+        app.router.add_get("/nonce/{address}", self._nonce)
+        app.router.add_post("/login", self._login)
+        app.router.add_get("/get_locked_params/{symbol}", self._locked_params)
+        app.router.add_get("/contract-symbols", self._contract_symbols)
+        app.router.add_get("/muon", self._muon)
+        app.router.add_post("/instant_open", self._instant_open)
+        app.router.add_post("/instant_close", self._instant_close)
+        app.router.add_get("/instant_open/{address}", self._open_status)
+        app.router.add_post("/conditional-orders/", self._conditional_orders)
+        app.router.add_get("/ws/v1/subscribe", self._websocket)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self.runner = web.AppRunner(self.app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        self.base_url = f"http://{host}:{site._server.sockets[0].getsockname()[1]}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        for task in list(self._timers):
+            task.cancel()
+        for ws in list(self._subscribers):
+            await ws.close()
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    def start_in_thread(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """`start` on a private event loop thread, for blocking callers (requests, web3)."""
+        self._thread_loop = asyncio.new_event_loop()
+        threading.Thread(target=self._thread_loop.run_forever, daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(self.start(host, port), self._thread_loop).result()
+
+    def stop_thread(self) -> None:
+        if self._thread_loop is not None:
+            asyncio.run_coroutine_threadsafe(self.stop(), self._thread_loop).result()
+            self._thread_loop.call_soon_threadsafe(self._thread_loop.stop)
+            self._thread_loop = None
+
+    # ----------------------------------------------------------------
+    # Profile: latency, 429 and 5xx on every HTTP route
+    # ----------------------------------------------------------------
+    @web.middleware
+    async def _profile_middleware(self, request: web.Request, handler):
+        if request.path == "/ws/v1/subscribe":
+            return await handler(request)
+        self.stats["requests"] += 1
+        profile = self.profile
+        if profile.rate_limit > 0:
+            now = time.monotonic()
+            burst = max(1.0, profile.rate_limit / 10)
+            self._tokens_left = min(burst, self._tokens_left + (now - self._refilled) * profile.rate_limit)
+            self._refilled = now
+            if self._tokens_left < 1:
+                self.stats["throttled"] += 1
+                return web.json_response({"detail": "Too Many Requests"}, status=429, headers={"Retry-After": "1"})
+            self._tokens_left -= 1
+        delay = profile.latency + (self.rng.uniform(0, profile.jitter) if profile.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if profile.error_rate and self.rng.random() < profile.error_rate:
+            self.stats["errors"] += 1
+            return web.json_response({"detail": "Service Unavailable"}, status=503)
+        return await handler(request)
+
+    # ----------------------------------------------------------------
+    # Auth
+    # ----------------------------------------------------------------
+    async def _nonce(self, request: web.Request) -> web.Response:
+        nonce = secrets.token_hex(8)
+        self.nonces[request.match_info["address"].lower()] = nonce
+        return web.json_response({"nonce": nonce})
+
+    async def _login(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        account = str(body.get("account_address", "")).lower()
+        nonce = self.nonces.pop(account, None)
+        signature = str(body.get("signature", ""))
+        if nonce is None or body.get("nonce") != nonce:
+            return web.json_response({"detail": "Invalid or reused nonce"}, status=401)
+        if not signature.startswith("0x") or len(signature) != 132:
+            return web.json_response({"detail": "Invalid signature"}, status=401)
+        token = f"mock-{secrets.token_hex(16)}"
+        self.tokens[token] = (account, time.time() + self.token_ttl)
+        self.stats["logins"] += 1
+        return web.json_response({"access_token": token, "token_type": "bearer"})
+
+    def _account(self, request: web.Request) -> Optional[str]:
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        entry = self.tokens.get(token)
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    @staticmethod
+    def _unauthorized() -> web.Response:
+        return web.json_response({"detail": "Could not validate credentials"}, status=401)
+
+    def _reject(self, detail: str, status: int = 400) -> web.Response:
+        self.stats["rejected"] += 1
+        return web.json_response({"detail": detail}, status=status)
+
+    # ----------------------------------------------------------------
+    # Market data
+    # ----------------------------------------------------------------
+    def _symbol_id(self, symbol: str) -> Optional[int]:
+        if symbol in self._by_name:
+            return self._by_name[symbol]
+        try:
+            return int(symbol) if int(symbol) in self.symbols else None
+        except ValueError:
+            return None
+
+    async def _locked_params(self, request: web.Request) -> web.Response:
+        if self._symbol_id(request.match_info["symbol"]) is None:
+            return self._reject(f"Unknown symbol {request.match_info['symbol']}")
+        return web.json_response({
+            "message": "Success", "leverage": request.query.get("leverage", "1"),
+            "cva": "2", "lf": "1", "partyAmm": "20", "partyBmm": "0",
+        })
+
+    async def _contract_symbols(self, request: web.Request) -> web.Response:
+        symbols = [{key: value for key, value in s.items() if key != "price"} for s in self.symbols.values()]
+        return web.json_response({"symbols": symbols})
+
+    def price(self, symbol_id: int) -> float:
+        """Current mock price; each read moves it by a small random step."""
+        self._prices[symbol_id] *= math.exp(self.rng.gauss(0, 0.0002))
+        return self._prices[symbol_id]
+
+    def _signed(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """A Muon response around `result`, with well-formed but meaningless signatures."""
+        return {"success": True, "result": {
+            "reqId": "0x" + secrets.token_hex(32),
+            "data": {"timestamp": str(int(time.time())), "result": result,
+                     "init": {"nonceAddress": "0x" + secrets.token_hex(20)}},
+            "nodeSignature": "0x" + secrets.token_hex(65),
+            "signatures": [{"signature": "0x" + secrets.token_hex(32), "owner": "0x" + secrets.token_hex(20)}],
+        }}
+
+    async def _muon(self, request: web.Request) -> web.Response:
+        if request.query.get("method") == "settle_upnl":
+            try:
+                quote_ids = json.loads(request.query.get("params[quoteIds]", "[]"))
+            except ValueError:
+                return self._reject("Malformed params[quoteIds]")
+            settlements = []
+            for quote_id in quote_ids:
+                quote = self.by_quote_id.get(int(quote_id))
+                symbol_id = quote.symbol_id if quote is not None else next(iter(self.symbols))
+                settlements.append([int(quote_id), int(Decimal(repr(self.price(symbol_id))) * 10**18), 0])
+            return web.json_response(self._signed({
+                "quoteSettlementData": settlements, "upnlPartyBs": ["0"] * len(settlements), "uPnlA": "0",
+            }))
+        try:
+            symbol_id = int(request.query.get("params[symbolId]", next(iter(self.symbols))))
+        except ValueError:
+            symbol_id = -1
+        if symbol_id not in self.symbols:
+            return self._reject(f"Unknown symbolId {request.query.get('params[symbolId]')}")
+        price_wei = int(Decimal(repr(self.price(symbol_id))) * 10**18)
+        return web.json_response(self._signed({"uPnl": "0", "price": str(price_wei)}))
+
+    # ----------------------------------------------------------------
+    # Quotes
+    # ----------------------------------------------------------------
+    async def _instant_open(self, request: web.Request) -> web.Response:
+        account = self._account(request)
+        if account is None:
+            return self._unauthorized()
+        payload = await request.json()
+        missing = [field for field in OPEN_FIELDS if field not in payload]
+        if missing:
+            return self._reject(f"Missing field(s): {', '.join(missing)}", status=422)
+        try:
+            if int(payload["symbolId"]) not in self.symbols:
+                return self._reject(f"Unknown symbolId {payload['symbolId']}")
+            if Decimal(str(payload["quantity"])) <= 0 or Decimal(str(payload["price"])) <= 0:
+                return self._reject("Quantity and price must be positive")
+        except (ValueError, InvalidOperation):
+            return self._reject("Malformed number in payload", status=422)
+        if int(payload["deadline"]) < time.time():
+            return self._reject("Deadline has passed")
+
+        temp_quote_id = -self._next_temp_id
+        self._next_temp_id += 1
+        quote = _Quote(temp_quote_id, account, payload)
+        self.quotes[temp_quote_id] = quote
+        self.by_account.setdefault(account, []).append(quote)
+        self.stats["opens"] += 1
+        self._later(self.profile.confirm_delay, self._settle_open, quote)
+        return web.json_response({"temp_quote_id": temp_quote_id, "message": "Instant open request received"})
+
+    def _settle_open(self, quote: _Quote) -> None:
+        if self.profile.fail_rate and self.rng.random() < self.profile.fail_rate:
+            quote.status, quote.action_status = QUOTE_STATUS_CANCELED, "failed"
+            self.stats["failed"] += 1
+            self._notify(quote.account, {"temp_quote_id": quote.temp_quote_id, "action_status": "failed",
+                                         "error_message": "Hedger rejected the quote"})
+            return
+        quote.quote_id = self._next_quote_id
+        self._next_quote_id += 1
+        quote.status, quote.action_status = QUOTE_STATUS_OPENED, "success"
+        self.by_quote_id[quote.quote_id] = quote
+        self.stats["confirmed"] += 1
+        self._notify(quote.account, {"temp_quote_id": quote.temp_quote_id, "quote_id": quote.quote_id,
+                                     "action_status": "success"})
+
+    async def _instant_close(self, request: web.Request) -> web.Response:
+        account = self._account(request)
+        if account is None:
+            return self._unauthorized()
+        payload = await request.json()
+        try:
+            quote = self.by_quote_id.get(int(payload["quote_id"]))
+            quantity = Decimal(str(payload["quantity_to_close"]))
+            Decimal(str(payload["close_price"]))
+        except (KeyError, ValueError, InvalidOperation):
+            return self._reject("quote_id, quantity_to_close and close_price are required", status=422)
+        if quote is None or quote.account != account:
+            return self._reject(f"Quote {payload['quote_id']} not found for this account", status=404)
+        if quote.status != QUOTE_STATUS_OPENED:
+            return self._reject(f"Quote {quote.quote_id} is not open (status {quote.status})")
+        if quantity <= 0 or quantity > quote.quantity - quote.closed_amount:
+            return self._reject(f"Invalid quantity_to_close {quantity}")
+        quote.status = QUOTE_STATUS_CLOSE_PENDING
+        self.stats["closes"] += 1
+        self._later(self.profile.close_delay, self._settle_close, quote, quantity)
+        return web.json_response({"message": "Close request received", "quote_id": quote.quote_id})
+
+    def _settle_close(self, quote: _Quote, quantity: Decimal) -> None:
+        quote.closed_amount += quantity
+        quote.status = QUOTE_STATUS_CLOSED if quote.closed_amount >= quote.quantity else QUOTE_STATUS_OPENED
+        self.stats["closed"] += 1
+        self._notify(quote.account, {"quote_id": quote.quote_id, "action": "instant_close", "action_status": "success",
+                                     "closed_amount": str(quote.closed_amount)})
+
+    async def _open_status(self, request: web.Request) -> web.Response:
+        account = self._account(request)
+        if account is None:
+            return self._unauthorized()
+        quotes = self.by_account.get(request.match_info["address"].lower(), [])
+        return web.json_response({"quotes": [quote.as_dict() for quote in quotes]})
+
+    async def _conditional_orders(self, request: web.Request) -> web.Response:
+        if self._account(request) is None:
+            return self._unauthorized()
+        body = await request.json()
+        quote = self.by_quote_id.get(int(body.get("quote_id", 0)))
+        if quote is None:
+            return self._reject(f"Quote {body.get('quote_id')} not found", status=404)
+        if not body.get("conditional_orders"):
+            return self._reject("No conditional orders", status=422)
+        quote.conditional_orders.extend(body["conditional_orders"])
+        return web.json_response({"message": "ok", "quote_id": quote.quote_id, "count": len(quote.conditional_orders)})
+
+    def open_positions(self, account: str) -> List[Dict[str, Any]]:
+        """Open quotes of `account` as dicts `bulk_close.Position.from_dict` accepts."""
+        return [
+            {"quote_id": q.quote_id, "symbol_id": q.symbol_id, "position_type": q.position_type,
+             "quantity": str(q.quantity - q.closed_amount), "quote_status": q.status}
+            for q in self.by_account.get(account.lower(), []) if q.status in (QUOTE_STATUS_OPENED, QUOTE_STATUS_CLOSE_PENDING)
+        ]
+
+    def _later(self, delay: float, fn, *args: Any) -> None:
+        async def run():
+            await asyncio.sleep(delay)
+            fn(*args)
+
+        task = asyncio.ensure_future(run())
+        self._timers.add(task)
+        task.add_done_callback(self._timers.discard)
+
+    # ----------------------------------------------------------------
+    # Notifications
+    # ----------------------------------------------------------------
+    async def _websocket(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self._subscribers[ws] = {"patterns": set(), "sequence": 0}
+        try:
+            async for message in ws:
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                try:
+                    patterns = json.loads(message.data).get("channel_patterns", [])
+                except (ValueError, AttributeError):
+                    continue
+                self._subscribers[ws]["patterns"].update(
+                    (p.get("app_name"), str(p.get("address", "")).lower()) for p in patterns
+                )
+        finally:
+            self._subscribers.pop(ws, None)
+        return ws
+
+    def _notify(self, account: str, data: Dict[str, Any]) -> None:
+        for ws, sub in list(self._subscribers.items()):
+            if (self.app_name, account) not in sub["patterns"] and (self.app_name, "*") not in sub["patterns"]:
+                continue
+            sub["sequence"] += 1
+            drop_every = self.profile.ws_drop_every
+            if drop_every and sub["sequence"] % drop_every == 0:
+                # This message is lost with the connection, as with a real disconnect
+                self.stats["ws_drops"] += 1
+                self._subscribers.pop(ws, None)
+                asyncio.ensure_future(ws.close())
+                continue
+            message = {"sequence": sub["sequence"], "app_name": self.app_name, "address": account, "data": data}
+            asyncio.ensure_future(ws.send_str(json.dumps(message)))
+            self.stats["notifications"] += 1
+
+
+# --------------------------------------------------------------------
+# Demo: open -> confirm -> close throughput per profile
+# --------------------------------------------------------------------
+async def run_flow(profile_name: str, accounts: int = 20, trades_per_account: int = 10) -> Dict[str, Any]:
+    from eth_account import Account
+    from async_client import AsyncSolverClient
+    from notification_hub import NotificationHub, QuoteFailed
+    from rate_scheduler import RequestScheduler
+
+    solver = MockSolver(PROFILES[profile_name], seed=1)
+    base_url = await solver.start()
+    wallets = [Account.create() for _ in range(accounts)]
+    hub = NotificationHub(solver.ws_url, reconnect_delay=0.05, verbose=False)
+
+    async def resync(app_name, addresses, pending):
+        for address in addresses:
+            for quote in await client.get_open_status(address):
+                if quote.get("quote_id") and quote["temp_quote_id"] in pending:
+                    hub.resolve(app_name, quote["temp_quote_id"], quote["quote_id"])
+
+    async def resync_closes(app_name, addresses, pending):
+        for address in addresses:
+            for quote in await client.get_open_status(address):
+                if quote.get("quote_id") in pending and quote.get("quote_status") == QUOTE_STATUS_CLOSED:
+                    hub.resolve_close(app_name, quote["quote_id"])
+
+    loop = asyncio.get_running_loop()
+    hub.on_gap = lambda *args: asyncio.run_coroutine_threadsafe(resync(*args), loop).result()
+    hub.on_close_gap = lambda *args: asyncio.run_coroutine_threadsafe(resync_closes(*args), loop).result()
+    scheduler = RequestScheduler(default_rate=150.0) if PROFILES[profile_name].rate_limit else None
+    started = time.perf_counter()
+    async with AsyncSolverClient(base_url, 42161, f"{base_url}/muon", "0x0", cache_dir=tempfile.mkdtemp(),
+                                 hub=hub, notification_app_name=solver.app_name, scheduler=scheduler) as client:
+        for wallet in wallets:
+            client.add_account(wallet.key.hex(), wallet.address)
+        await asyncio.sleep(0.2)  # websocket subscriptions
+
+        async def retried(step) -> Any:
+            """Run one lifecycle step, retrying only that step; a failed quote is not retried here."""
+            for attempt in range(3):
+                try:
+                    return await step()
+                except QuoteFailed:
+                    raise
+                except Exception:
+                    if attempt == 2:
+                        raise
+
+        async def lifecycle(wallet) -> Optional[float]:
+            trade_started = time.perf_counter()
+            try:
+                # A quote the solver fails needs a new open; a lost response or notification only repeats its own step
+                for _ in range(3):
+                    opened = await retried(lambda: client.open_trade(
+                        wallet.address, wait_confirmed=False, symbol_id=340, symbol_name="XRPUSDT", quantity="6"))
+                    try:
+                        quote_id = await retried(lambda: hub.confirmation(solver.app_name, opened["temp_quote_id"], 10))
+                        break
+                    except QuoteFailed:
+                        continue
+                else:
+                    return None
+                sent_at = time.monotonic()
+                await retried(lambda: client.close_trade(wallet.address, 340, quote_id, "6"))
+                await retried(lambda: hub.close_confirmation(solver.app_name, quote_id, 10, since=sent_at))
+                return time.perf_counter() - trade_started
+            except Exception:
+                return None
+
+        durations = await asyncio.gather(*(lifecycle(w) for w in wallets for _ in range(trades_per_account)))
+    elapsed = time.perf_counter() - started
+    await asyncio.to_thread(hub.stop)  # its websocket close needs this loop, which serves the mock
+    await solver.stop()
+
+    completed = sorted(d for d in durations if d is not None)
+    report = {
+        "profile": profile_name,
+        "trades": len(durations),
+        "completed": len(completed),
+        "trades_per_s": len(completed) / elapsed,
+        "p50_ms": statistics.median(completed) * 1000 if completed else None,
+        "p99_ms": completed[int(0.99 * (len(completed) - 1))] * 1000 if completed else None,
+        "solver": dict(solver.stats),
+    }
+    print(f"[MOCK] {profile_name:<10} {report['completed']}/{report['trades']} open->confirm->close lifecycles in "
+          f"{elapsed:.2f}s ({report['trades_per_s']:.0f}/s), p50 {report['p50_ms']:.0f}ms p99 {report['p99_ms']:.0f}ms")
+    print(f"[MOCK]            solver stats: {report['solver']}")
+    return report
+
+
+async def serve(port: int) -> None:
+    solver = MockSolver(PROFILES["realistic"])
+    base_url = await solver.start(port=port)
+    print(f"[MOCK] Serving on {base_url} (websocket {solver.ws_url}, app name {solver.app_name}); Ctrl+C to stop")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await solver.stop()
+
+
+def main():
+    if "--serve" in sys.argv:
+        asyncio.run(serve(int(sys.argv[sys.argv.index("--serve") + 1])))
+        return
+    for name in PROFILES:
+        asyncio.run(run_flow(name))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,448 @@
+"""Shared, multiplexed notification-hub connection for quote confirmations.
+
+`vibecaps_open_set_sl_demo.py` used to open a new websocket to the
+notification service for every trade, re-subscribe, and inspect every message
+in turn; the other bots polled `GET /instant_open/{address}` every 0.5s.
+
+`NotificationHub` keeps one long-lived websocket per app name on a background
+event loop, subscribed to the channel patterns of every account registered
+with it. Incoming messages are dispatched through a
+(app name, temp_quote_id) -> Future map, so matching a confirmation is a
+dict lookup regardless of how many trades are in flight. Confirmations that
+arrive before anyone waits on them are kept in a small LRU, so registering
+after `POST /instant_open` returns cannot miss a fast confirmation.
+
+When a connection drops the hub reconnects with exponential backoff and
+re-subscribes every pattern. Messages broadcast while it was disconnected are
+lost, so on reconnect (and when a message sequence number skips) the
+`on_gap(app_name, addresses, pending_temp_quote_ids)` callback is run in a
+worker thread; bots use it to re-check the REST status endpoint once and feed
+any confirmations found back through `resolve()`. Pending closes get the same
+treatment through `on_close_gap(app_name, addresses, pending_quote_ids)` and
+`resolve_close()`.
+
+Closes carry no temp id, so a message counts as a close only when its `action`
+names one, or (without an `action`) it reports a `closed_amount`. A close
+waiter given `since` ignores outcomes recorded before that moment, so an
+earlier partial close of the same quote cannot settle it.
+
+Usage
+    hub = NotificationHub()
+    hub.subscribe(APP_NAME, ACTIVE_ACCOUNT)
+    ... POST /instant_open -> temp_quote_id ...
+    quote_id = hub.wait_for_confirmation(APP_NAME, temp_quote_id, timeout=120)
+
+Run
+- python instant_actions/notification_hub.py   # local websocket stub with a forced disconnect
+
+Optional .env
+- NOTIFICATION_WS_URL (default: wss://notification.rasa.capital/ws/v1/subscribe)
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+import concurrent.futures
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import websockets
+
+DEFAULT_WS_URL = "wss://notification.rasa.capital/ws/v1/subscribe"
+SEQUENCE_FIELDS = ("sequence", "seq", "sequence_number")
+# Closes have no temp id; their outcomes are keyed by quote id under this suffix
+CLOSE_SUFFIX = "#close"
+CLOSE_ACTIONS = frozenset({"close", "instant_close", "close_position", "force_close"})
+CLOSED_AMOUNT_FIELDS = ("closed_amount", "closedAmount")
+
+
+def _is_close(data: Dict[str, Any]) -> bool:
+    """Whether a quote-id-only message reports a close (rather than e.g. a stop-loss or cancel update)."""
+    action = data.get("action", data.get("action_type"))
+    if action is not None:
+        return str(action).lower() in CLOSE_ACTIONS
+    return any(data.get(field) is not None for field in CLOSED_AMOUNT_FIELDS)
+
+
+class QuoteFailed(Exception):
+    """The notification service reported the quote's action as failed."""
+
+    def __init__(self, temp_quote_id: int, data: Dict[str, Any]):
+        super().__init__(f"Quote failed: temp_quote_id={temp_quote_id} {data}")
+        self.temp_quote_id = temp_quote_id
+        self.data = data
+
+
+class _AppConnection:
+    """One websocket and the set of account addresses subscribed on it."""
+
+    __slots__ = ("app_name", "addresses", "ws", "task", "last_seq", "dropped_at", "connects")
+
+    def __init__(self, app_name: str):
+        self.app_name = app_name
+        self.addresses: Set[str] = set()
+        self.ws = None
+        self.task: Optional[asyncio.Task] = None
+        self.last_seq: Optional[int] = None
+        self.dropped_at: Optional[float] = None
+        self.connects = 0
+
+
+class NotificationHub:
+    """One websocket per app name, shared by every trade and account waiting on confirmations."""
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 30.0,
+        recent_size: int = 4096,
+        on_gap: Optional[Callable[[str, Set[str], List[int]], None]] = None,
+        on_close_gap: Optional[Callable[[str, Set[str], List[int]], None]] = None,
+        verbose: bool = True,
+    ):
+        self.url = url or os.getenv("NOTIFICATION_WS_URL") or DEFAULT_WS_URL
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.recent_size = recent_size
+        self.on_gap = on_gap
+        self.on_close_gap = on_close_gap
+        self.verbose = verbose
+
+        self._apps: Dict[str, _AppConnection] = {}
+        self._waiters: Dict[Tuple[str, int], List[concurrent.futures.Future]] = {}
+        self._recent: "OrderedDict[Tuple[str, int], Tuple[Any, float]]" = OrderedDict()  # (outcome, monotonic time)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._closing = False
+
+        self.stats = {"messages": 0, "dispatched": 0, "reconnects": 0, "gaps": 0}
+
+    # ----------------------------------------------------------------
+    # Lifecycle
+    # ----------------------------------------------------------------
+    def start(self) -> "NotificationHub":
+        """Start the background event loop (idempotent)."""
+        if self._thread is None:
+            ready = threading.Event()
+
+            def run():
+                self._loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(self._loop)
+                ready.set()
+                self._loop.run_forever()
+
+            self._thread = threading.Thread(target=run, name="notification-hub", daemon=True)
+            self._thread.start()
+            ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        self._closing = True
+
+        async def shutdown():
+            for conn in self._apps.values():
+                if conn.task is not None:
+                    conn.task.cancel()
+                if conn.ws is not None:
+                    await conn.ws.close()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = None
+        self._thread = None
+
+    # ----------------------------------------------------------------
+    # Subscriptions and waiting
+    # ----------------------------------------------------------------
+    def subscribe(self, app_name: str, address: str) -> None:
+        """Receive `app_name` notifications for `address` on the shared connection."""
+        self.start()
+        self._loop.call_soon_threadsafe(self._subscribe, app_name, address)
+
+    def _subscribe(self, app_name: str, address: str) -> None:
+        conn = self._apps.get(app_name)
+        if conn is None:
+            conn = self._apps[app_name] = _AppConnection(app_name)
+        if address in conn.addresses:
+            return
+        conn.addresses.add(address)
+        if conn.task is None:
+            conn.task = self._loop.create_task(self._run(conn))
+        elif conn.ws is not None:
+            self._loop.create_task(self._send_subscription(conn))
+
+    def expect(self, app_name: str, temp_quote_id: int, since: Optional[float] = None) -> concurrent.futures.Future:
+        """Future resolved with the permanent quote id (or `QuoteFailed`) for `temp_quote_id`.
+
+        An outcome that already arrived is used unless it was recorded before `since` (`time.monotonic()`).
+        """
+        key = (app_name, int(temp_quote_id))
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._lock:
+            recent = self._recent.get(key)
+            if recent is not None and (since is None or recent[1] >= since):
+                self._settle(future, key[1], recent[0])
+                return future
+            self._waiters.setdefault(key, []).append(future)
+        return future
+
+    def wait_for_confirmation(self, app_name: str, temp_quote_id: int, timeout: float = 120.0) -> int:
+        """Block until `temp_quote_id` is confirmed; raises `TimeoutError` or `QuoteFailed`."""
+        future = self.expect(app_name, temp_quote_id)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            self._discard(app_name, int(temp_quote_id), future)
+            raise TimeoutError(f"Timed out after {timeout}s waiting for quote confirmation") from None
+
+    async def confirmation(self, app_name: str, temp_quote_id: int, timeout: float = 120.0, since: Optional[float] = None) -> int:
+        """`wait_for_confirmation` for callers running their own event loop."""
+        future = self.expect(app_name, temp_quote_id, since)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self._discard(app_name, int(temp_quote_id), future)
+            raise TimeoutError(f"Timed out after {timeout}s waiting for quote confirmation") from None
+
+    def expect_close(self, app_name: str, quote_id: int, since: Optional[float] = None) -> concurrent.futures.Future:
+        """Future resolved with `quote_id` (or `QuoteFailed`) when a close of `quote_id` is reported.
+
+        Pass `since=time.monotonic()` taken before sending the close, so an earlier close of the quote is ignored.
+        """
+        return self.expect(app_name + CLOSE_SUFFIX, quote_id, since)
+
+    async def close_confirmation(self, app_name: str, quote_id: int, timeout: float = 120.0, since: Optional[float] = None) -> int:
+        return await self.confirmation(app_name + CLOSE_SUFFIX, quote_id, timeout, since)
+
+    def resolve(self, app_name: str, temp_quote_id: int, quote_id: int) -> None:
+        """Feed a confirmation learned elsewhere (e.g. a REST re-check after a gap)."""
+        self._deliver((app_name, int(temp_quote_id)), int(quote_id))
+
+    def resolve_close(self, app_name: str, quote_id: int) -> None:
+        """Feed a close learned elsewhere (e.g. the quote no longer open on-chain after a gap)."""
+        self._deliver((app_name + CLOSE_SUFFIX, int(quote_id)), int(quote_id))
+
+    def pending(self, app_name: str) -> List[int]:
+        with self._lock:
+            return [temp_id for (app, temp_id), futures in self._waiters.items() if app == app_name and futures]
+
+    def pending_closes(self, app_name: str) -> List[int]:
+        return self.pending(app_name + CLOSE_SUFFIX)
+
+    def _discard(self, app_name: str, temp_quote_id: int, future: concurrent.futures.Future) -> None:
+        with self._lock:
+            futures = self._waiters.get((app_name, temp_quote_id), [])
+            if future in futures:
+                futures.remove(future)
+            if not futures:
+                self._waiters.pop((app_name, temp_quote_id), None)
+
+    # ----------------------------------------------------------------
+    # Dispatch
+    # ----------------------------------------------------------------
+    @staticmethod
+    def _settle(future: concurrent.futures.Future, temp_quote_id: int, outcome: Any) -> None:
+        if future.done():
+            return
+        if isinstance(outcome, dict):
+            future.set_exception(QuoteFailed(temp_quote_id, outcome))
+        else:
+            future.set_result(outcome)
+
+    def _deliver(self, key: Tuple[str, int], outcome: Any) -> None:
+        """`outcome` is the permanent quote id, or the message data of a failed action."""
+        with self._lock:
+            self._recent[key] = (outcome, time.monotonic())
+            self._recent.move_to_end(key)
+            if len(self._recent) > self.recent_size:
+                self._recent.popitem(last=False)
+            futures = self._waiters.pop(key, [])
+        for future in futures:
+            self._settle(future, key[1], outcome)
+        if futures:
+            self.stats["dispatched"] += len(futures)
+
+    def _dispatch(self, conn: _AppConnection, raw: Any) -> None:
+        self.stats["messages"] += 1
+        try:
+            msg = json.loads(raw)
+        except (TypeError, ValueError):
+            return
+        if not isinstance(msg, dict):
+            return
+
+        for field in SEQUENCE_FIELDS:
+            seq = msg.get(field)
+            if isinstance(seq, int):
+                if conn.last_seq is not None and seq > conn.last_seq + 1:
+                    self._gap(conn, f"sequence jumped {conn.last_seq} -> {seq}")
+                conn.last_seq = seq
+                break
+
+        data = msg.get("data")
+        if not isinstance(data, dict):
+            return
+        status = data.get("action_status")
+        temp_id = data.get("temp_quote_id")
+        if temp_id is None:
+            # Close (and other position) actions refer to the quote id only
+            if status in ("success", "failed") and data.get("quote_id") is not None and _is_close(data):
+                try:
+                    quote_id = int(data["quote_id"])
+                except (TypeError, ValueError):
+                    return
+                self._deliver((conn.app_name + CLOSE_SUFFIX, quote_id), quote_id if status == "success" else data)
+            return
+        try:
+            key = (conn.app_name, int(temp_id))
+        except (TypeError, ValueError):
+            return
+
+        if status == "success" and data.get("quote_id") is not None:
+            self._deliver(key, int(data["quote_id"]))
+        elif status == "failed":
+            self._deliver(key, data)
+
+    def _gap(self, conn: _AppConnection, reason: str) -> None:
+        self.stats["gaps"] += 1
+        pending, closes = self.pending(conn.app_name), self.pending_closes(conn.app_name)
+        if self.verbose:
+            print(f"[HUB] {conn.app_name}: possible missed messages ({reason}), "
+                  f"{len(pending)} pending confirmation(s), {len(closes)} pending close(s)")
+        for callback, waiting in ((self.on_gap, pending), (self.on_close_gap, closes)):
+            if callback is not None and waiting:
+                future = self._loop.run_in_executor(None, callback, conn.app_name, set(conn.addresses), waiting)
+                future.add_done_callback(lambda f: f.exception() and print(f"[HUB] gap resync failed: {f.exception()}"))
+
+    # ----------------------------------------------------------------
+    # Connection loop
+    # ----------------------------------------------------------------
+    async def _send_subscription(self, conn: _AppConnection) -> None:
+        message = {
+            "channel_patterns": [
+                {
+                    "app_name": conn.app_name,
+                    "address": address,
+                    "primary_identifier": "*",
+                    "secondary_identifier": "*",
+                }
+                for address in sorted(conn.addresses)
+            ]
+        }
+        await conn.ws.send(json.dumps(message))
+
+    async def _run(self, conn: _AppConnection) -> None:
+        delay = self.reconnect_delay
+        while not self._closing:
+            try:
+                async with websockets.connect(self.url, ping_interval=20, ping_timeout=20) as ws:
+                    conn.ws = ws
+                    conn.last_seq = None
+                    conn.connects += 1
+                    await self._send_subscription(conn)
+                    if self.verbose:
+                        print(f"[HUB] {conn.app_name}: connected, {len(conn.addresses)} account(s) subscribed")
+                    if conn.dropped_at is not None:
+                        self._gap(conn, f"reconnected after {time.time() - conn.dropped_at:.1f}s")
+                        conn.dropped_at = None
+                    delay = self.reconnect_delay
+                    async for raw in ws:
+                        self._dispatch(conn, raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.verbose and not self._closing:
+                    print(f"[HUB] {conn.app_name}: connection error: {e}")
+            conn.ws = None
+            if self._closing:
+                return
+            if conn.dropped_at is None:
+                conn.dropped_at = time.time()
+            self.stats["reconnects"] += 1
+            await asyncio.sleep(delay * (0.5 + random.random()))
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+
+# --------------------------------------------------------------------
+# Demo
+# --------------------------------------------------------------------
+async def _stub_server(state: Dict[str, Any]):
+    """Websocket stub: confirms temp ids pushed into `state["queue"]`; drops every connection once."""
+    async def handler(ws):
+        await ws.recv()  # subscription
+        state["connections"].append(ws)
+        seq = state["seq"]
+        while True:
+            temp_id = await state["queue"].get()
+            seq += 1
+            state["seq"] = seq
+            message = {"sequence": seq, "data": {"temp_quote_id": temp_id, "quote_id": 1000 - temp_id, "action_status": "success"}}
+            if state.get("drop_next"):
+                # Simulate a message broadcast while we are disconnected
+                state["drop_next"] = False
+                state["missed"].append(temp_id)
+                await ws.close()
+                return
+            await ws.send(json.dumps(message))
+
+    return await websockets.serve(handler, "127.0.0.1", 0)
+
+
+def main():
+    state: Dict[str, Any] = {"seq": 0, "connections": [], "missed": []}
+    server_loop = asyncio.new_event_loop()
+    threading.Thread(target=server_loop.run_forever, daemon=True).start()
+
+    async def setup():
+        state["queue"] = asyncio.Queue()
+        return await _stub_server(state)
+
+    server = asyncio.run_coroutine_threadsafe(setup(), server_loop).result()
+    port = server.sockets[0].getsockname()[1]
+
+    def push(temp_id: int) -> None:
+        server_loop.call_soon_threadsafe(state["queue"].put_nowait, temp_id)
+
+    def resync(app_name, addresses, pending):
+        # Stands in for one GET /instant_open/{address} per account after a gap
+        for temp_id in pending:
+            if temp_id in state["missed"]:
+                hub.resolve(app_name, temp_id, 1000 - temp_id)
+
+    hub = NotificationHub(f"ws://127.0.0.1:{port}", reconnect_delay=0.1, on_gap=resync)
+    app_name = "Demo_App"
+    for i in range(50):
+        hub.subscribe(app_name, f"0x{i:040x}")
+    time.sleep(0.3)
+
+    # 1000 in-flight trades, confirmed in random order through one connection
+    temp_ids = list(range(-1, -1001, -1))
+    futures = {temp_id: hub.expect(app_name, temp_id) for temp_id in temp_ids}
+    random.shuffle(temp_ids)
+    start = time.perf_counter()
+    for temp_id in temp_ids:
+        push(temp_id)
+    results = {temp_id: f.result(timeout=10) for temp_id, f in futures.items()}
+    elapsed = time.perf_counter() - start
+    assert all(results[t] == 1000 - t for t in results)
+    print(f"[HUB] 1000 confirmations dispatched in {elapsed * 1000:.1f}ms over one websocket")
+
+    # A confirmation sent while the connection is down is recovered through on_gap
+    state["drop_next"] = True
+    push(-5000)
+    quote_id = hub.wait_for_confirmation(app_name, -5000, timeout=10)
+    print(f"[HUB] Confirmation missed during reconnect recovered via resync: quote_id={quote_id}")
+    print(f"[HUB] stats={hub.stats} websocket connections opened={len(state['connections'])}")
+    hub.stop()
+
+
+if __name__ == "__main__":
+    main()
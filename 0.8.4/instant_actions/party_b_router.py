@@ -0,0 +1,474 @@
+"""PartyB router: picks the sendQuote whitelist from live partyB state.
+
+`party_a/send_quote.py` hardcodes `party_b_whitelist` to one address, and the
+vibecaps demo passes `HEDGER_WHITELIST` through as is. Neither checks whether a
+partyB can actually lock the quote. A partyB in emergency mode, liquidated
+against this partyA, at the pending-quotes cap, or without the balance to
+cover its side of the quote, never locks it. If every partyB in the whitelist
+is like that, the quote sits until it expires.
+
+`PartyBRouter` keeps each whitelisted partyB's state in memory:
+- `allocatedBalanceOfPartyB(partyB, partyA)`
+- `balanceOf(partyB)` (its free balance, which it allocates to a partyA on demand)
+- `getPartyBPendingQuotes(partyB, partyA)` (its length)
+- `getPartyBEmergencyStatus(partyB)`
+- `isPartyBLiquidated(partyB, partyA)`
+- plus `pendingQuotesValidLength()` once
+It refreshes all of them with one JSON-RPC batch (`w3.batch_requests()`): one
+round trip for the whole whitelist, on a background thread. The calldata is
+encoded once up front; going through `diamond.functions.f(...)` re-validates
+the whole ABI on every call (~20ms each for this diamond). `choose` runs on
+that snapshot only, so routing an order makes no RPC call.
+
+`choose(required_balance)` drops partyBs that can't lock (emergency,
+liquidated, at the pending cap, allocated plus free balance below the partyB
+side of the quote: cva + lf + partyBmm). A partyB usually funds a new partyA
+with `allocateForPartyB` just before locking, so an allocated balance short of
+the quote only ranks it lower (`ALLOCATE_PENALTY`), for the extra transaction.
+It ranks the rest by expected fill rate x free pending capacity / expected
+time-to-lock. Fill rate and time-to-lock start from a neutral prior and are
+learned from `track_quote`, which polls a sent quote until a partyB locks it
+(`observe_lock`) or it ends unlocked (`observe_expired`). Every eligible
+partyB stays in the whitelist, because any of
+them may lock and the first one wins; `max_party_bs` trims it to the best
+ranked. Routed orders are reserved against the snapshot until the next
+refresh, split across the whitelist since only one partyB will lock each
+(pending count and balance), so a burst of orders between refreshes doesn't
+all pile onto the same partyB. An empty whitelist would open the quote
+to every partyB, so when no partyB qualifies `choose` raises `RoutingError`
+instead.
+
+Usage
+    router = PartyBRouter(diamond, PARTY_A, parse_whitelist(PARTY_B_WHITELIST))
+    router.refresh()
+    router.start_background_refresh()
+    whitelist = router.choose(required_balance=cva + lf + party_b_mm)   # no RPC
+    ...
+    sent_at = time.monotonic()
+    ...                                                # sendQuote(whitelist, ...), wait for the receipt
+    router.track_quote(quote_id, whitelist, sent_at)   # observe_lock / observe_expired from getQuote
+
+Run
+- python instant_actions/party_b_router.py     # batched vs one-call-per-read refresh against a local stub RPC
+
+Optional .env
+- PARTY_B_WHITELIST (JSON list or comma-separated addresses; party_a/send_quote.py)
+- PARTY_B_REFRESH_INTERVAL (seconds, default: 5)
+- TRACK_LOCK_TIMEOUT (seconds party_a/send_quote.py waits in `track_quote`, default: 0, don't wait)
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from eth_abi import decode
+from web3 import Web3
+
+# (function, output type) per partyB, in batch order
+PARTY_B_READS = (
+    ("allocatedBalanceOfPartyB", "uint256"),
+    ("balanceOf", "uint256"),
+    ("getPartyBPendingQuotes", "uint256[]"),
+    ("getPartyBEmergencyStatus", "bool"),
+    ("isPartyBLiquidated", "bool"),
+)
+# Reads that take only the partyB, not (partyB, partyA)
+PARTY_B_ONLY_READS = ("balanceOf", "getPartyBEmergencyStatus")
+# Score factor for a partyB that has to allocate more to this partyA before it can lock
+ALLOCATE_PENALTY = 0.5
+# QuoteStatus values in the Symmio diamond
+QUOTE_STATUS_PENDING = 0  # not locked by any partyB yet
+QUOTE_STATUSES_UNLOCKED = (3, 9)  # CANCELED, EXPIRED
+
+
+class RoutingError(ValueError):
+    """No whitelisted partyB can take the order."""
+
+
+def parse_whitelist(raw: Union[str, Iterable[str], None]) -> List[str]:
+    """A whitelist setting (`PARTY_B_WHITELIST`, `HEDGER_WHITELIST`) as a JSON array or comma-separated addresses, checksummed."""
+    if raw is None:
+        return []
+    if isinstance(raw, str):
+        raw = raw.strip()
+        addresses = json.loads(raw) if raw.startswith("[") else [w.strip() for w in raw.split(",") if w.strip()]
+    else:
+        addresses = list(raw)
+    return [Web3.to_checksum_address(a) for a in addresses]
+
+
+class _PartyBState:
+    __slots__ = ("address", "allocated_balance", "free_balance", "pending_quotes", "emergency", "liquidated", "reserved_balance",
+                 "reserved_quotes", "lock_s", "locks", "expiries", "updated_at")
+
+    def __init__(self, address: str, lock_prior: float):
+        self.address = address
+        self.allocated_balance = 0
+        self.free_balance = 0
+        self.pending_quotes = 0
+        self.emergency = False
+        self.liquidated = False
+        self.reserved_balance = 0
+        self.reserved_quotes = 0
+        self.lock_s = lock_prior  # EWMA of observed time-to-lock
+        self.locks = 0
+        self.expiries = 0
+        self.updated_at: Optional[float] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class PartyBRouter:
+    """In-memory partyB state, refreshed in one batch, and per-order whitelist selection."""
+
+    def __init__(
+        self,
+        diamond: Any,
+        party_a: str,
+        party_bs: Iterable[str],
+        refresh_interval: Optional[float] = None,
+        lock_prior: float = 2.0,
+        lock_alpha: float = 0.2,
+    ):
+        """`diamond` is a web3 contract for the Symmio diamond (its `w3` is used for the batch)."""
+        self.diamond = diamond
+        self.w3 = diamond.w3
+        self.party_a = Web3.to_checksum_address(party_a)
+        self.refresh_interval = float(refresh_interval if refresh_interval is not None
+                                      else os.getenv("PARTY_B_REFRESH_INTERVAL", 5))
+        self.lock_alpha = lock_alpha
+        self.party_bs: Dict[str, _PartyBState] = {}
+        for address in party_bs:
+            address = Web3.to_checksum_address(address)
+            self.party_bs[address] = _PartyBState(address, lock_prior)
+        if not self.party_bs:
+            raise ValueError("PartyBRouter needs at least one partyB")
+        self._calls = self._encode_calls()
+        self.pending_quotes_cap: Optional[int] = None
+        self.refreshed_at: Optional[float] = None
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self.stats = {"refreshes": 0, "refresh_errors": 0, "routed": 0, "rejected": 0, "last_refresh_ms": 0.0}
+
+    # ----------------------------------------------------------------
+    # State
+    # ----------------------------------------------------------------
+    def _encode_calls(self) -> List[Dict[str, str]]:
+        """The `eth_call` params of one refresh: the pending cap, then PARTY_B_READS per partyB."""
+        to = self.diamond.address
+        calls = [{"to": to, "data": self.diamond.encode_abi("pendingQuotesValidLength")}]
+        for party_b in self.party_bs:
+            for name, _ in PARTY_B_READS:
+                args = [party_b] if name in PARTY_B_ONLY_READS else [party_b, self.party_a]
+                calls.append({"to": to, "data": self.diamond.encode_abi(name, args=args)})
+        return calls
+
+    def refresh(self) -> None:
+        """Re-read every partyB's state in one JSON-RPC batch and clear the reservations."""
+        started = time.perf_counter()
+        with self.w3.batch_requests() as batch:
+            for call in self._calls:
+                batch.add(self.w3.eth.call(call))
+            results = batch.execute()
+        reads = len(PARTY_B_READS)
+        now = time.monotonic()
+        with self._lock:
+            self.pending_quotes_cap = decode(["uint256"], results[0])[0]
+            for i, state in enumerate(self.party_bs.values()):
+                balance, free, pending, emergency, liquidated = (
+                    decode([kind], result)[0]
+                    for (_, kind), result in zip(PARTY_B_READS, results[1 + reads * i:1 + reads * (i + 1)])
+                )
+                state.allocated_balance = balance
+                state.free_balance = free
+                state.pending_quotes = len(pending)
+                state.emergency = emergency
+                state.liquidated = liquidated
+                state.reserved_balance = state.reserved_quotes = 0
+                state.updated_at = now
+            self.refreshed_at = now
+        self.stats["refreshes"] += 1
+        self.stats["last_refresh_ms"] = (time.perf_counter() - started) * 1000
+
+    def start_background_refresh(self, interval: Optional[float] = None) -> None:
+        """Call `refresh` every `interval` seconds; a failed refresh keeps the previous snapshot."""
+        if self._refresh_thread is not None:
+            return
+        interval = interval if interval is not None else self.refresh_interval
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    self.stats["refresh_errors"] += 1
+                    print(f"[ROUTER] Refresh failed: {e}")
+
+        self._refresh_thread = threading.Thread(target=loop, name="party-b-router", daemon=True)
+        self._refresh_thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def staleness(self) -> Optional[float]:
+        """Seconds since the last successful refresh (None before the first)."""
+        return None if self.refreshed_at is None else time.monotonic() - self.refreshed_at
+
+    # ----------------------------------------------------------------
+    # Routing
+    # ----------------------------------------------------------------
+    def _blocker(self, state: _PartyBState, required_balance: int) -> Optional[str]:
+        if state.updated_at is None:
+            return "no state yet"
+        if state.emergency:
+            return "emergency status"
+        if state.liquidated:
+            return "liquidated"
+        if self.pending_quotes_cap and state.pending_quotes + state.reserved_quotes >= self.pending_quotes_cap:
+            return f"{state.pending_quotes + state.reserved_quotes}/{self.pending_quotes_cap} pending quotes"
+        available = state.allocated_balance + state.free_balance - state.reserved_balance
+        if available < required_balance:
+            return f"allocated + free balance {available} < {required_balance}"
+        return None
+
+    def _score(self, state: _PartyBState, required_balance: int) -> float:
+        fill_rate = (state.locks + 1) / (state.locks + state.expiries + 2)
+        if self.pending_quotes_cap:
+            free = 1 - (state.pending_quotes + state.reserved_quotes) / self.pending_quotes_cap
+        else:
+            free = 1 / (1 + state.pending_quotes + state.reserved_quotes)
+        score = fill_rate * free / max(state.lock_s, 1e-3)
+        if state.allocated_balance - state.reserved_balance < required_balance:
+            score *= ALLOCATE_PENALTY
+        return score
+
+    def rank(self, required_balance: int = 0) -> List[Dict[str, Any]]:
+        """Every partyB with its score, or why it can't take an order needing `required_balance`."""
+        with self._lock:
+            ranked = []
+            for state in self.party_bs.values():
+                blocker = self._blocker(state, required_balance)
+                ranked.append({"party_b": state.address, "eligible": blocker is None, "reason": blocker,
+                               "score": self._score(state, required_balance) if blocker is None else 0.0})
+        return sorted(ranked, key=lambda r: -r["score"])
+
+    def choose(self, required_balance: int = 0, max_party_bs: Optional[int] = None, reserve: bool = True) -> List[str]:
+        """The whitelist for one order, best first, from the in-memory snapshot (no RPC).
+
+        `required_balance` is the partyB side of the quote in wei (cva + lf +
+        partyBmm). With `reserve`, the order counts against the chosen partyBs
+        until the next refresh, split evenly between them.
+        """
+        with self._lock:
+            eligible = []
+            blockers = {}
+            for state in self.party_bs.values():
+                blocker = self._blocker(state, required_balance)
+                if blocker is None:
+                    eligible.append(state)
+                else:
+                    blockers[state.address] = blocker
+            if not eligible:
+                self.stats["rejected"] += 1
+                raise RoutingError("No partyB can take this order: "
+                                   + ", ".join(f"{address} ({reason})" for address, reason in blockers.items()))
+            eligible.sort(key=lambda state: self._score(state, required_balance), reverse=True)
+            chosen = eligible[:max_party_bs] if max_party_bs else eligible
+            if reserve:
+                for state in chosen:
+                    state.reserved_quotes += 1 / len(chosen)
+                    state.reserved_balance += -(-required_balance // len(chosen))  # wei, rounded up
+            self.stats["routed"] += 1
+        return [state.address for state in chosen]
+
+    # ----------------------------------------------------------------
+    # Feedback
+    # ----------------------------------------------------------------
+    def observe_lock(self, party_b: str, seconds: float) -> None:
+        """`party_b` locked a routed quote `seconds` after it was sent."""
+        state = self.party_bs.get(Web3.to_checksum_address(party_b))
+        if state is not None:
+            with self._lock:
+                state.locks += 1
+                state.lock_s += self.lock_alpha * (seconds - state.lock_s)
+
+    def observe_expired(self, party_bs: Iterable[str]) -> None:
+        """A quote routed to `party_bs` expired or was cancelled unlocked."""
+        with self._lock:
+            for party_b in party_bs:
+                state = self.party_bs.get(Web3.to_checksum_address(party_b))
+                if state is not None:
+                    state.expiries += 1
+
+    def track_quote(self, quote_id: int, party_bs: Iterable[str], sent_at: Optional[float] = None,
+                    timeout: float = 60.0, interval: float = 1.0) -> Optional[str]:
+        """Poll `getQuote` until a partyB locks the quote or it ends unlocked, and feed that back.
+
+        `sent_at` is the `time.monotonic()` the quote was sent at. Returns the
+        partyB that locked it, or None when it was cancelled or expired (an
+        expiry for every partyB in `party_bs`), or is still pending after
+        `timeout` (not recorded: it may still be locked).
+        """
+        sent_at = time.monotonic() if sent_at is None else sent_at
+        give_up = time.monotonic() + timeout
+        while True:
+            quote = self.diamond.functions.getQuote(quote_id).call()
+            party_b, status, deadline = quote[15], quote[16], quote[24]
+            # A pending quote past its deadline stays PENDING until someone calls expireQuote
+            if status in QUOTE_STATUSES_UNLOCKED or (status == QUOTE_STATUS_PENDING and deadline < time.time()):
+                self.observe_expired(party_bs)
+                return None
+            if status != QUOTE_STATUS_PENDING:
+                self.observe_lock(party_b, time.monotonic() - sent_at)
+                return party_b
+            if time.monotonic() >= give_up:
+                return None
+            time.sleep(interval)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {address: state.as_dict() for address, state in self.party_bs.items()}
+
+    def report(self) -> None:
+        print(f"[ROUTER] {len(self.party_bs)} partyBs for {self.party_a}, pending cap {self.pending_quotes_cap}, "
+              f"refreshed {self.staleness() or 0:.1f}s ago in {self.stats['last_refresh_ms']:.1f}ms")
+        for row in self.rank():
+            state = self.party_bs[row["party_b"]]
+            status = f"score {row['score']:.3f}" if row["eligible"] else f"skipped: {row['reason']}"
+            print(f"[ROUTER]   {row['party_b']} balance {state.allocated_balance / 1e18:>12.2f} "
+                  f"free {state.free_balance / 1e18:>12.2f} "
+                  f"pending {state.pending_quotes:>3}  lock {state.lock_s:.2f}s  {status}")
+
+
+# --------------------------------------------------------------------
+# Demo: batched refresh and routing against a local stub RPC
+# --------------------------------------------------------------------
+def start_stub_rpc(abi: List[Dict[str, Any]], state: Dict[str, Dict[str, Any]], pending_cap: int, latency: float = 0.02):
+    """JSON-RPC server answering the router's `eth_call`s from `state`, `latency` per HTTP request."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from eth_abi import decode, encode
+
+    names = ("pendingQuotesValidLength", "allocatedBalanceOfPartyB", "balanceOf", "getPartyBPendingQuotes",
+             "getPartyBEmergencyStatus", "isPartyBLiquidated")
+    functions = {}
+    for item in abi:
+        if item.get("type") == "function" and item["name"] in names:
+            types = [i["type"] for i in item["inputs"]]
+            functions[Web3.keccak(text=f"{item['name']}({','.join(types)})")[:4]] = (item["name"], types)
+    counts = {"http_requests": 0, "calls": 0}
+
+    def answer(request: Dict[str, Any]) -> Dict[str, Any]:
+        if request["method"] == "eth_chainId":
+            return {"jsonrpc": "2.0", "id": request["id"], "result": "0xa4b1"}
+        counts["calls"] += 1
+        data = Web3.to_bytes(hexstr=request["params"][0]["data"])
+        name, types = functions[data[:4]]
+        if name == "pendingQuotesValidLength":
+            types, value = ["uint256"], [pending_cap]
+        else:
+            party_b = state[Web3.to_checksum_address(decode(types, data[4:])[0])]
+            types, value = {
+                "allocatedBalanceOfPartyB": (["uint256"], [party_b["balance"]]),
+                "balanceOf": (["uint256"], [party_b["free"]]),
+                "getPartyBPendingQuotes": (["uint256[]"], [list(range(party_b["pending"]))]),
+                "getPartyBEmergencyStatus": (["bool"], [party_b["emergency"]]),
+                "isPartyBLiquidated": (["bool"], [party_b["liquidated"]]),
+            }[name]
+        return {"jsonrpc": "2.0", "id": request["id"], "result": Web3.to_hex(encode(types, value))}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            counts["http_requests"] += 1
+            time.sleep(latency)
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            payload = [answer(r) for r in request] if isinstance(request, list) else answer(request)
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", counts
+
+
+def main():
+    from eth_account import Account
+
+    abi_path = os.path.join(os.path.dirname(__file__), "..", "abi", "symmio.json")
+    with open(abi_path) as f:
+        abi = json.load(f)
+    diamond_address = "0x976c214741b4657bd99dfd38a5c0e3ac5c99d903"
+    party_a = Account.create().address
+    party_bs = [Account.create().address for _ in range(8)]
+    state = {
+        address: {"balance": balance * 10**18, "free": free * 10**18, "pending": pending, "emergency": emergency,
+                  "liquidated": liquidated}
+        for address, (balance, free, pending, emergency, liquidated) in zip(party_bs, [
+            (50_000, 0, 2, False, False), (20_000, 10_000, 10, False, False), (80_000, 0, 0, True, False),
+            (5_000, 0, 0, False, False), (60_000, 0, 5, False, True), (100, 0, 1, False, False),
+            (0, 500_000, 0, False, False), (45_000, 0, 8, False, False),
+        ])
+    }
+    latency = 0.02
+    server, url, counts = start_stub_rpc(abi, state, pending_cap=20, latency=latency)
+    try:
+        w3 = Web3(Web3.HTTPProvider(url))
+        diamond = w3.eth.contract(address=Web3.to_checksum_address(diamond_address), abi=abi)
+        router = PartyBRouter(diamond, party_a, party_bs)
+        print(f"[ROUTER] Stub RPC at {latency * 1000:.0f}ms per HTTP request, {len(party_bs)} whitelisted partyBs")
+
+        # 1. One call per read, as the view/ scripts do
+        counts["http_requests"] = 0
+        started = time.perf_counter()
+        diamond.functions.pendingQuotesValidLength().call()
+        for party_b in party_bs:
+            diamond.functions.allocatedBalanceOfPartyB(party_b, party_a).call()
+            diamond.functions.getPartyBPendingQuotes(party_b, party_a).call()
+            diamond.functions.getPartyBEmergencyStatus(party_b).call()
+            diamond.functions.isPartyBLiquidated(party_b, party_a).call()
+        sequential_ms = (time.perf_counter() - started) * 1000
+        print(f"[ROUTER] One call per read: {counts['http_requests']} HTTP requests, {sequential_ms:.0f}ms")
+
+        # 2. The router's batched refresh
+        counts["http_requests"] = 0
+        router.refresh()
+        print(f"[ROUTER] Batched refresh:   {counts['http_requests']} HTTP request, "
+              f"{router.stats['last_refresh_ms']:.0f}ms")
+        router.report()
+
+        # 3. A burst of orders routed from the snapshot: no RPC per order
+        counts["http_requests"] = 0
+        router.observe_lock(party_bs[7], 0.6)
+        first_choice: Dict[str, int] = {}
+        orders, rejected = 30, 0
+        started = time.perf_counter()
+        for _ in range(orders):
+            try:
+                whitelist = router.choose(required_balance=2_000 * 10**18, max_party_bs=3)
+            except RoutingError:
+                rejected += 1
+            else:
+                first_choice[whitelist[0]] = first_choice.get(whitelist[0], 0) + 1
+        elapsed_us = (time.perf_counter() - started) * 1e6 / orders
+        print(f"[ROUTER] {orders} orders needing 2000 of partyB balance routed in {elapsed_us:.1f}us each, "
+              f"{counts['http_requests']} HTTP requests, {rejected} rejected")
+        for address, count in sorted(first_choice.items(), key=lambda item: -item[1]):
+            print(f"[ROUTER]   first choice {address}: {count} orders")
+        print(f"[ROUTER] stats={router.stats}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+"""Adaptive per-endpoint rate limiting and request scheduling.
+
+The hedger, Muon and the conditional-orders service all answer 429 once a
+client goes too fast, and the scripts only had fixed sleeps (or a fixed
+`BULK_CLOSE_RATE`) to stay under those limits. `RequestScheduler` gives every
+endpoint (URL host) a token bucket whose rate is learned from the responses:
+
+- the rate creeps up additively while requests are queueing (the bucket is the
+  bottleneck), and on a 429 it drops multiplicatively. The rate that drew the
+  429 becomes the learned limit, and the ceiling is set just under it
+  (`headroom`), so sustained throughput settles right below the provider's limit;
+  the ceiling is re-probed upwards after `reprobe_after` seconds without a 429,
+- `Retry-After` (seconds or an HTTP date) pauses the whole endpoint,
+- waiting requests are served by priority class (force-close, close, open,
+  poll) and, within a class, round-robin across sub-accounts, so one busy
+  sub-account cannot starve the others,
+- per endpoint: current and learned rate, queue depth per class, 429 count, and
+  wait-time percentiles per class (`snapshot()`, `report()`).
+
+The priority of a request is the one it asks for, raised to the priority of the
+flow it runs in (`request_priority`). For example, the Muon fetch of a close
+queues as a close.
+
+Usage
+    scheduler = RequestScheduler.from_env()
+    async with AsyncSolverClient(HEDGER_URL, CHAIN_ID, MUON_BASE_URL, DIAMOND_ADDRESS, scheduler=scheduler) as client:
+        ...
+    with request_priority(PRIORITY_FORCE_CLOSE):
+        await closer.close_all(positions)
+
+    # any other aiohttp call
+    async with scheduler.request(http, "GET", url, account=account, priority=PRIORITY_POLL) as response:
+        data = await response.json()
+
+Run
+- python instant_actions/rate_scheduler.py     # unscheduled vs scheduled load against a local 429-ing stub
+
+Optional .env
+- RATE_LIMITS         # initial per-host rates, e.g. "hedger.example.com=10,muon-oracle1.rasa.capital=5"
+- RATE_LIMIT_DEFAULT  # initial rate for other hosts (requests per second, default: 20)
+"""
+
+import os
+import time
+import asyncio
+import contextvars
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp import web
+from dotenv import load_dotenv
+
+from tracing import TRACER, LatencyHistogram
+
+PRIORITY_FORCE_CLOSE = 0
+PRIORITY_CLOSE = 1
+PRIORITY_OPEN = 2
+PRIORITY_POLL = 3
+PRIORITY_NAMES = ("force_close", "close", "open", "poll")
+
+_flow_priority: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("request_priority", default=None)
+
+
+@contextmanager
+def request_priority(priority: int):
+    """Requests made in this block (and in tasks started from it) queue at least at `priority`."""
+    current = _flow_priority.get()
+    token = _flow_priority.set(priority if current is None else min(current, priority))
+    try:
+        yield
+    finally:
+        _flow_priority.reset(token)
+
+
+def effective_priority(priority: Optional[int] = None) -> int:
+    flow = _flow_priority.get()
+    priority = PRIORITY_OPEN if priority is None else priority
+    return priority if flow is None else min(priority, flow)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a `Retry-After` header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class EndpointLimiter:
+    """Adaptive token bucket and priority/fair queue of one endpoint."""
+
+    __slots__ = (
+        "name", "rate", "min_rate", "max_rate", "ceiling", "learned_limit", "burst", "increase", "decrease",
+        "headroom", "reprobe_after", "tokens", "updated", "paused_until", "queues", "depth", "waits",
+        "stats", "_decreased_at", "_probe_at", "_dispatcher",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        min_rate: float = 0.5,
+        max_rate: float = 1000.0,
+        burst: float = 1.0,
+        increase: float = 1.0,
+        decrease: float = 0.7,
+        headroom: float = 0.95,
+        reprobe_after: float = 60.0,
+    ):
+        self.name = name
+        self.rate = float(rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.ceiling = max_rate
+        self.learned_limit: Optional[float] = None
+        self.burst = max(1.0, burst)
+        self.increase = increase
+        self.decrease = decrease
+        self.headroom = headroom
+        self.reprobe_after = reprobe_after
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        # One dict per priority class: account -> waiters; dict order is the round-robin order
+        self.queues: List[Dict[str, Deque[Tuple[asyncio.Future, float]]]] = [{} for _ in PRIORITY_NAMES]
+        self.depth = 0
+        self.waits = [LatencyHistogram() for _ in PRIORITY_NAMES]
+        self.stats = {"granted": 0, "ok": 0, "throttled": 0, "max_depth": 0}
+        self._decreased_at = 0.0
+        self._probe_at = self.updated
+        self._dispatcher: Optional[asyncio.Future] = None
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def _grant(self, now: float, waited: float, priority: int) -> float:
+        self.tokens -= 1
+        self.stats["granted"] += 1
+        self.waits[priority].record(int(waited * 1_000_000))
+        if waited > 0:
+            TRACER.record("rate_wait", waited, {"endpoint": self.name, "priority": PRIORITY_NAMES[priority]})
+        return now
+
+    async def acquire(self, account: str = "", priority: int = PRIORITY_OPEN) -> float:
+        """Wait for a send slot; returns the grant time to pass back to `throttled`."""
+        now = time.monotonic()
+        if not self.depth and now >= self.paused_until:
+            self._refill(now)
+            if self.tokens >= 1:
+                return self._grant(now, 0.0, priority)
+        future = asyncio.get_running_loop().create_future()
+        self.queues[priority].setdefault(account.lower(), deque()).append((future, now))
+        self.depth += 1
+        self.stats["max_depth"] = max(self.stats["max_depth"], self.depth)
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        return await future
+
+    def _pop(self) -> Tuple[asyncio.Future, int, float]:
+        for priority, queue in enumerate(self.queues):
+            if queue:
+                account = next(iter(queue))
+                waiters = queue.pop(account)
+                future, enqueued = waiters.popleft()
+                if waiters:
+                    queue[account] = waiters  # back of the round-robin
+                self.depth -= 1
+                return future, priority, enqueued
+        raise IndexError("empty queue")
+
+    async def _dispatch(self) -> None:
+        try:
+            while self.depth:
+                now = time.monotonic()
+                self._refill(now)
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                future, priority, enqueued = self._pop()
+                if not future.done():
+                    future.set_result(self._grant(now, now - enqueued, priority))
+        finally:
+            self._dispatcher = None
+
+    def succeeded(self) -> None:
+        """A non-429 response: probe upwards while requests are queueing behind the bucket."""
+        self.stats["ok"] += 1
+        now = time.monotonic()
+        if self.ceiling < self.max_rate and now - self._probe_at > self.reprobe_after:
+            self.ceiling = min(self.max_rate, self.ceiling * 1.05)
+            self._probe_at = now
+        if self.depth and self.rate < self.ceiling:
+            self.rate = min(self.ceiling, self.rate + self.increase / self.rate)
+
+    def throttled(self, granted: float, retry_after: Optional[float] = None) -> None:
+        """A 429 for a request granted at `granted`: back off once per episode and honour Retry-After."""
+        self.stats["throttled"] += 1
+        now = time.monotonic()
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+            self.tokens, self.updated = 1.0, self.paused_until
+        if granted <= self._decreased_at:
+            return  # sent before the last back-off; already accounted for
+        # The rate only grows while requests queue behind the bucket, so it is the rate actually sent
+        self.learned_limit = self.rate
+        self.ceiling = max(self.min_rate, self.rate * self.headroom)
+        self.rate = max(self.min_rate, min(self.rate * self.decrease, self.ceiling))
+        self._decreased_at = self._probe_at = now
+
+    def snapshot(self) -> Dict[str, Any]:
+        waits = {}
+        for name, histogram in zip(PRIORITY_NAMES, self.waits):
+            if histogram.count:
+                waits[name] = {
+                    "count": histogram.count,
+                    "p50_ms": histogram.percentile(0.5) / 1000,
+                    "p99_ms": histogram.percentile(0.99) / 1000,
+                    "max_ms": histogram.max_us / 1000,
+                }
+        return {
+            "rate": round(self.rate, 2),
+            "ceiling": round(self.ceiling, 2),
+            "learned_limit": None if self.learned_limit is None else round(self.learned_limit, 2),
+            "depth": self.depth,
+            "depth_by_priority": {name: sum(map(len, q.values())) for name, q in zip(PRIORITY_NAMES, self.queues)},
+            "wait": waits,
+            **self.stats,
+        }
+
+
+class RequestScheduler:
+    """Shared per-endpoint limiters for every request a process sends."""
+
+    def __init__(
+        self,
+        limits: Optional[Mapping[str, float]] = None,
+        default_rate: float = 20.0,
+        max_retries: int = 3,
+        **limiter_options: Any,
+    ):
+        self.limits = {host.lower(): float(rate) for host, rate in (limits or {}).items()}
+        self.default_rate = default_rate
+        self.max_retries = max_retries
+        self.limiter_options = limiter_options
+        self.endpoints: Dict[str, EndpointLimiter] = {}
+
+    @classmethod
+    def from_env(cls, **options: Any) -> "RequestScheduler":
+        limits = {}
+        for item in filter(None, (part.strip() for part in os.getenv("RATE_LIMITS", "").split(","))):
+            host, _, rate = item.partition("=")
+            limits[host.strip()] = float(rate)
+        return cls(limits, default_rate=float(os.getenv("RATE_LIMIT_DEFAULT", 20)), **options)
+
+    def endpoint(self, url: str) -> EndpointLimiter:
+        host = urlsplit(url).netloc.lower() or url
+        limiter = self.endpoints.get(host)
+        if limiter is None:
+            rate = self.limits.get(host, self.default_rate)
+            limiter = self.endpoints[host] = EndpointLimiter(host, rate, **self.limiter_options)
+        return limiter
+
+    async def acquire(self, url: str, account: str = "", priority: Optional[int] = None) -> float:
+        return await self.endpoint(url).acquire(account, effective_priority(priority))
+
+    def observe(self, url: str, granted: float, status: int, headers: Optional[Mapping[str, str]] = None) -> None:
+        """Feed a response status back to the endpoint's limiter."""
+        limiter = self.endpoint(url)
+        if status == 429:
+            limiter.throttled(granted, parse_retry_after((headers or {}).get("Retry-After")))
+        else:
+            limiter.succeeded()
+
+    @asynccontextmanager
+    async def request(
+        self, http: aiohttp.ClientSession, method: str, url: str, account: str = "", priority: Optional[int] = None,
+        **kwargs: Any,
+    ):
+        """`http.request` once a slot is granted; 429s are retried up to `max_retries` times."""
+        limiter = self.endpoint(url)
+        priority = effective_priority(priority)
+        for attempt in range(self.max_retries + 1):
+            granted = await limiter.acquire(account, priority)
+            response = await http.request(method, url, **kwargs)
+            self.observe(url, granted, response.status, response.headers)
+            if response.status == 429 and attempt < self.max_retries:
+                response.release()
+                continue
+            try:
+                yield response
+            finally:
+                response.release()
+            return
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: limiter.snapshot() for name, limiter in self.endpoints.items()}
+
+    def report(self) -> None:
+        for name, snap in self.snapshot().items():
+            learned = "-" if snap["learned_limit"] is None else f"{snap['learned_limit']}/s"
+            print(f"[RATE] {name}: rate {snap['rate']}/s (ceiling {snap['ceiling']}/s, learned limit {learned}), "
+                  f"{snap['granted']} sent, {snap['throttled']} throttled, queue {snap['depth']} (max {snap['max_depth']})")
+            for priority, wait in snap["wait"].items():
+                print(f"[RATE]   {priority:<12} {wait['count']:6d} waits  p50 {wait['p50_ms']:8.1f}ms  "
+                      f"p99 {wait['p99_ms']:8.1f}ms  max {wait['max_ms']:8.1f}ms")
+
+
+# --------------------------------------------------------------------
+# Demo: a stub that answers 429 above its limit
+# --------------------------------------------------------------------
+async def start_limited_stub(limit: float, latency: float = 0.01):
+    """Local endpoint allowing `limit` requests per second (bursts of limit/10); 429 + Retry-After: 1 beyond it."""
+    burst = max(1.0, limit / 10)
+    state = {"tokens": burst, "updated": time.monotonic(), "ok": 0, "rejected": 0}
+
+    async def handle(request):
+        now = time.monotonic()
+        state["tokens"] = min(burst, state["tokens"] + (now - state["updated"]) * limit)
+        state["updated"] = now
+        if state["tokens"] < 1:
+            state["rejected"] += 1
+            return web.json_response({"error": "rate limited"}, status=429, headers={"Retry-After": "1"})
+        state["tokens"] -= 1
+        state["ok"] += 1
+        await asyncio.sleep(latency)
+        return web.json_response({"ok": True})
+
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", state
+
+
+async def benchmark(limit: float = 50.0, duration: float = 8.0, accounts: int = 4) -> Dict[str, float]:
+    runner, base_url, state = await start_limited_stub(limit)
+    results: Dict[str, float] = {}
+    try:
+        async with aiohttp.ClientSession() as http:
+            # 1. Unscheduled: workers send as fast as the stub answers, retrying 429s after a fixed sleep
+            deadline = time.monotonic() + duration
+
+            async def naive_worker():
+                while time.monotonic() < deadline:
+                    async with http.post(f"{base_url}/instant_open") as response:
+                        if response.status == 429:
+                            await asyncio.sleep(0.05)
+
+            state.update(ok=0, rejected=0)
+            await asyncio.gather(*(naive_worker() for _ in range(32)))
+            results["naive_ok_per_s"] = state["ok"] / duration
+            results["naive_429_share"] = state["rejected"] / max(1, state["ok"] + state["rejected"])
+            print(f"[RATE] Unscheduled: {results['naive_ok_per_s']:.1f} ok/s against a {limit:.0f}/s limit, "
+                  f"{results['naive_429_share']:.0%} of requests rejected")
+            await asyncio.sleep(1.0)
+
+            # 2. Scheduled: the limiter starts at 4x the limit and has to learn it
+            scheduler = RequestScheduler(default_rate=limit * 4)
+            deadline = time.monotonic() + duration
+            settled_from = time.monotonic() + duration / 2
+            settled = {"ok": 0}
+
+            async def scheduled_worker(account: str):
+                while time.monotonic() < deadline:
+                    async with scheduler.request(http, "POST", f"{base_url}/instant_open", account=account) as response:
+                        if response.status < 400 and time.monotonic() >= settled_from:
+                            settled["ok"] += 1
+
+            state.update(ok=0, rejected=0)
+            await asyncio.gather(*(scheduled_worker(f"0x{i:040x}") for i in range(32)))
+            results["scheduled_ok_per_s"] = settled["ok"] / (duration / 2)
+            results["scheduled_429_share"] = state["rejected"] / max(1, state["ok"] + state["rejected"])
+            print(f"[RATE] Scheduled:   {results['scheduled_ok_per_s']:.1f} ok/s over the second half "
+                  f"(limit {limit:.0f}/s), {results['scheduled_429_share']:.1%} of requests rejected")
+
+            # 3. Priorities and fairness on a saturated endpoint: polls and one heavy account's opens are
+            #    queued first, then a light account's opens and a few closes arrive
+            limiter = scheduler.endpoint(base_url)
+            limiter.waits = [LatencyHistogram() for _ in PRIORITY_NAMES]
+            waits: Dict[str, List[float]] = {"heavy open": [], "light open": [], "close": [], "poll": []}
+
+            async def send(kind: str, account: str, priority: int):
+                queued = time.monotonic()
+                async with scheduler.request(http, "POST", f"{base_url}/x", account=account, priority=priority):
+                    waits[kind].append(time.monotonic() - queued)
+
+            tasks = [asyncio.ensure_future(send("poll", "0xheavy", PRIORITY_POLL)) for _ in range(40)]
+            tasks += [asyncio.ensure_future(send("heavy open", "0xheavy", PRIORITY_OPEN)) for _ in range(120)]
+            await asyncio.sleep(0.2)
+            tasks += [asyncio.ensure_future(send("light open", f"0xlight{i}", PRIORITY_OPEN)) for i in range(accounts)]
+            with request_priority(PRIORITY_CLOSE):
+                tasks += [asyncio.ensure_future(send("close", "0xheavy", PRIORITY_OPEN)) for _ in range(5)]
+            await asyncio.gather(*tasks)
+            for kind, values in waits.items():
+                results[f"{kind} wait ms"] = sum(values) / len(values) * 1000
+                print(f"[RATE] {kind:<11} mean wait {results[f'{kind} wait ms']:7.0f}ms ({len(values)} requests)")
+            scheduler.report()
+    finally:
+        await runner.cleanup()
+    return results
+
+
+def main():
+    load_dotenv()
+    asyncio.run(benchmark())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""Persistent SIWE session manager for the solver APIs.
+
+Every instant-action script and trading-bot demo performs a full SIWE login on
+each run (`/nonce`, build the EIP-4361 message, sign, `POST /login`), and the
+`ISSUED_AT` / `EXPIRATION_DATE` they sign are computed once at import time, so
+a long-running bot keeps re-using a stale window.
+
+`SiweSessionManager` caches the access token per (solver URL, sub-account) on
+disk (directory 0700, files 0600) and reuses it until shortly before expiry.
+It can refresh in a background thread ahead of expiry, and a 401 from the
+solver triggers a single re-login shared by every concurrent caller that saw
+the same stale token.
+
+Usage
+    session = SiweSessionManager(HEDGER_URL, PRIVATE_KEY, ACTIVE_ACCOUNT, CHAIN_ID)
+    token = session.get_token()
+    response = session.request("POST", f"{HEDGER_URL}/instant_open", json=payload)
+
+Run
+- python instant_actions/session_manager.py
+
+Required .env
+- PRIVATE_KEY
+- SUB_ACCOUNT_ADDRESS
+- HEDGER_URL
+
+Optional .env
+- CHAIN_ID (default: 42161)
+- SESSION_CACHE_DIR (default: ~/.symmio/sessions)
+"""
+
+import os
+import json
+import time
+import base64
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from dotenv import load_dotenv
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".symmio", "sessions")
+DEFAULT_LIFETIME = timedelta(hours=2, minutes=30)
+
+
+def _iso_utc_ms(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def build_siwe_message(domain, address, statement, uri, version, chain_id, nonce, issued_at, expiration_time):
+    """Build a SIWE message string following the EIP-4361 format."""
+    return f"""{domain} wants you to sign in with your Ethereum account:
+{address}
+
+{statement}
+
+URI: {uri}
+Version: {version}
+Chain ID: {chain_id}
+Nonce: {nonce}
+Issued At: {issued_at}
+Expiration Time: {expiration_time}"""
+
+
+def _jwt_expiry(token: str) -> Optional[float]:
+    """`exp` claim of a JWT access token, if the token is a JWT."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp else None
+    except Exception:
+        return None
+
+
+class SiweSessionManager:
+    """Caches and refreshes a solver access token for one (solver URL, sub-account)."""
+
+    def __init__(
+        self,
+        solver_url: str,
+        private_key: str,
+        account_address: str,
+        chain_id: int,
+        domain: str = "localhost",
+        origin: str = "http://localhost:3000",
+        lifetime: timedelta = DEFAULT_LIFETIME,
+        refresh_margin: float = 300.0,
+        cache_dir: Optional[str] = None,
+        session: Optional[requests.Session] = None,
+    ):
+        self.solver_url = solver_url.rstrip("/")
+        self.login_uri = f"{self.solver_url}/login"
+        self.wallet = Account.from_key(private_key)
+        self.account_address = account_address
+        self.chain_id = int(chain_id)
+        self.domain = domain
+        self.origin = origin
+        self.lifetime = lifetime
+        self.refresh_margin = refresh_margin
+        self.http = session or requests.Session()
+
+        cache_dir = cache_dir or os.getenv("SESSION_CACHE_DIR") or DEFAULT_CACHE_DIR
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        key = hashlib.sha256(f"{self.solver_url}|{account_address.lower()}".encode()).hexdigest()[:24]
+        self.cache_path = os.path.join(cache_dir, f"{key}.json")
+
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self.logins = 0
+        self._load()
+
+    # ----------------------------------------------------------------
+    # Disk cache
+    # ----------------------------------------------------------------
+    def _load(self) -> None:
+        try:
+            with open(self.cache_path, "r") as cache_file:
+                cached = json.load(cache_file)
+        except (OSError, ValueError):
+            return
+        if cached.get("solver_url") == self.solver_url and cached.get("access_token"):
+            self._token = cached["access_token"]
+            self._expires_at = float(cached.get("expires_at", 0))
+
+    def _save(self) -> None:
+        data = {
+            "solver_url": self.solver_url,
+            "account_address": self.account_address,
+            "access_token": self._token,
+            "expires_at": self._expires_at,
+        }
+        tmp_path = f"{self.cache_path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as cache_file:
+            json.dump(data, cache_file)
+        os.replace(tmp_path, self.cache_path)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+            try:
+                os.remove(self.cache_path)
+            except OSError:
+                pass
+
+    # ----------------------------------------------------------------
+    # Login
+    # ----------------------------------------------------------------
+    def build_login_body(self, nonce: str) -> Tuple[Dict[str, Any], datetime]:
+        """Signed `/login` body for `nonce`, and the issue time it was built with."""
+        now = datetime.now(timezone.utc)
+        issued_at = _iso_utc_ms(now)
+        expiration_time = _iso_utc_ms(now + self.lifetime)
+        message_string = build_siwe_message(
+            domain=self.domain,
+            address=self.wallet.address,
+            statement=f"msg: {self.account_address}",
+            uri=self.login_uri,
+            version="1",
+            chain_id=self.chain_id,
+            nonce=nonce,
+            issued_at=issued_at,
+            expiration_time=expiration_time,
+        )
+        signed_message = self.wallet.sign_message(encode_defunct(text=message_string))
+        body = {
+            "account_address": self.account_address,
+            "expiration_time": expiration_time,
+            "issued_at": issued_at,
+            "signature": "0x" + signed_message.signature.hex(),
+            "nonce": nonce,
+        }
+        return body, now
+
+    def login_headers(self) -> Dict[str, str]:
+        return {
+            "Content-Type": "application/json",
+            "Origin": self.origin,
+            "Referer": self.origin,
+        }
+
+    def accept_token(self, token: Optional[str], issued: datetime) -> str:
+        """Store a token returned by `/login` for a body built at `issued`, and persist it."""
+        if not token:
+            raise ValueError("No access_token in login response")
+        expires_at = (issued + self.lifetime).timestamp()
+        jwt_exp = _jwt_expiry(token)
+        if jwt_exp:
+            expires_at = min(expires_at, jwt_exp)
+
+        self._token = token
+        self._expires_at = expires_at
+        self.logins += 1
+        self._save()
+        print(f"[SESSION] Logged in {self.account_address}, token valid for {int(expires_at - time.time())}s")
+        return token
+
+    def cached_token(self) -> Optional[str]:
+        """The cached token if it is not about to expire, else None. Never logs in."""
+        return self._token if self._fresh() else None
+
+    def _login(self) -> None:
+        """Full SIWE login. Caller holds `_lock`."""
+        response = self.http.get(f"{self.solver_url}/nonce/{self.account_address}", timeout=30)
+        response.raise_for_status()
+        body, issued = self.build_login_body(response.json()["nonce"])
+
+        response = self.http.post(self.login_uri, json=body, headers=self.login_headers(), timeout=30)
+        if response.status_code != 200:
+            print(f"[SESSION] Login failed: {response.status_code} {response.text}")
+        response.raise_for_status()
+        self.accept_token(response.json().get("access_token"), issued)
+
+    def _fresh(self) -> bool:
+        return self._token is not None and time.time() < self._expires_at - self.refresh_margin
+
+    def get_token(self) -> str:
+        """Cached token, logging in first if it is missing or about to expire."""
+        if self._fresh():
+            return self._token
+        with self._lock:
+            if not self._fresh():
+                self._login()
+            return self._token
+
+    def handle_unauthorized(self, stale_token: Optional[str]) -> str:
+        """Re-login after a 401. Concurrent callers holding the same stale token share one login."""
+        with self._lock:
+            if self._token is not None and self._token != stale_token and self._fresh():
+                return self._token
+            self._login()
+            return self._token
+
+    def headers(self) -> Dict[str, str]:
+        return {"Content-Type": "application/json", "Authorization": f"Bearer {self.get_token()}"}
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """Authenticated request that re-logs in once on 401."""
+        token = self.get_token()
+        headers = {**kwargs.pop("headers", {}), "Authorization": f"Bearer {token}"}
+        kwargs.setdefault("timeout", 30)
+        response = self.http.request(method, url, headers=headers, **kwargs)
+        if response.status_code == 401:
+            token = self.handle_unauthorized(token)
+            headers["Authorization"] = f"Bearer {token}"
+            response = self.http.request(method, url, headers=headers, **kwargs)
+        return response
+
+    # ----------------------------------------------------------------
+    # Background refresh
+    # ----------------------------------------------------------------
+    def start_background_refresh(self) -> None:
+        """Re-login in a daemon thread `refresh_margin` seconds before the token expires."""
+        if self._refresh_thread is not None:
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                wait = self._expires_at - self.refresh_margin - time.time()
+                if wait > 0 and self._stop.wait(min(wait, 60)):
+                    return
+                if not self._fresh():
+                    try:
+                        with self._lock:
+                            if not self._fresh():
+                                self._login()
+                    except Exception as e:
+                        print(f"[SESSION] Background refresh failed: {e}")
+                        self._stop.wait(10)
+
+        self._refresh_thread = threading.Thread(target=loop, daemon=True)
+        self._refresh_thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def main():
+    load_dotenv()
+    session = SiweSessionManager(
+        os.getenv("HEDGER_URL"),
+        os.getenv("PRIVATE_KEY"),
+        os.getenv("SUB_ACCOUNT_ADDRESS"),
+        int(os.getenv("CHAIN_ID", 42161)),
+    )
+    print(f"[SESSION] Cache file: {session.cache_path}")
+
+    start = time.perf_counter()
+    session.get_token()
+    print(f"[SESSION] First get_token: {(time.perf_counter() - start) * 1000:.1f}ms (logins so far: {session.logins})")
+
+    start = time.perf_counter()
+    session.get_token()
+    print(f"[SESSION] Second get_token: {(time.perf_counter() - start) * 1000:.3f}ms (logins so far: {session.logins})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+"""Crash-safe journal of a bot's positions, pending quotes and conditional orders.
+
+`instant_actions_trading_bot.py` keeps `in_position` and the quote ids in local
+variables. After a crash, a restart either enters again on top of an open
+position or forgets a pending open, and the only way back is to rescan the
+account on-chain.
+
+`StateJournal` keeps that state in memory, in four sections:
+- `pending`   temp quote id -> the open that was sent (plus "intent:<n>"
+              entries written just before a send whose temp id is not known yet)
+- `positions` quote id -> the confirmed position
+- `orders`    quote id -> its attached conditional-order legs
+- `bot`       free-form bot state
+- `seen`      temp quote ids already accounted for (sent, adopted, or listed
+              by the solver before the open was sent)
+Every change is also appended to `journal.log` as one checksummed JSON line.
+Writes are buffered, and fsyncs are batched: the file is fsynced every
+`fsync_every` records or `fsync_interval` seconds (a timer flushes a journal
+that went idle), and immediately for `sync=True` writes. Only the records that cannot be recovered by asking the
+solver are synced on the spot: the intent before an open is sent, the temp id
+once it is known, and a close (without a `quote_status` source, `reconcile()`
+would otherwise resume a position that is gone). A lost confirm or orders
+record is recovered by `reconcile()`.
+
+Every `compact_every` records, the state is written to `snapshot.json`
+(via a temp file, fsynced and renamed) and the log is truncated. On start the
+snapshot is loaded and the log's newer records are replayed; a torn last line
+from a crash mid-write fails its checksum and is cut off.
+
+`reconcile()` then checks only the delta: one solver status call for the
+pending temp ids, and one `getQuote` status per journaled position. It does
+not rescan the account: an outstanding intent adopts only a listed temp id
+the journal has not seen, one per intent.
+
+Usage
+    journal = StateJournal("xrp-bot")                 # ~/.symmio/journals/xrp-bot
+    journal.reconcile(fetch_confirmed_quote_ids(), quote_status=diamond_quote_status(diamond))
+    intent = journal.intent({"symbol_id": 340, "quantity": "6"})
+    ... POST /instant_open -> temp_quote_id ...
+    journal.sent(temp_quote_id, intent)
+    journal.confirmed(temp_quote_id, quote_id)
+    journal.orders_attached(quote_id, legs)
+    journal.closed(quote_id)
+
+Run
+- python instant_actions/state_journal.py     # write/replay timings and a simulated crash
+
+Optional .env
+- JOURNAL_DIR (default: ~/.symmio/journals)
+"""
+
+import os
+import json
+import time
+import zlib
+import shutil
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+DEFAULT_JOURNAL_DIR = os.path.join(os.path.expanduser("~"), ".symmio", "journals")
+SECTIONS = ("pending", "positions", "orders", "bot", "seen")
+INTENT = "intent:"
+# QuoteStatus values in the Symmio diamond that still hold a position
+LIVE_QUOTE_STATUSES = (4, 5, 6)  # OPENED, CLOSE_PENDING, CANCEL_CLOSE_PENDING
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    body = json.dumps(record, separators=(",", ":"), default=str).encode()
+    return b"%08x %s\n" % (zlib.crc32(body), body)
+
+
+def _decode(line: bytes) -> Optional[Dict[str, Any]]:
+    """The record on `line`, or None if it is torn or corrupt."""
+    if len(line) < 10 or not line.endswith(b"\n"):
+        return None
+    body = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(body):
+            return None
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+class StateJournal:
+    """Write-ahead journal plus snapshot for one bot's trading state."""
+
+    def __init__(
+        self,
+        name: str,
+        directory: Optional[str] = None,
+        fsync_every: int = 64,
+        fsync_interval: float = 0.05,
+        compact_every: int = 10_000,
+    ):
+        self.directory = os.path.join(directory or os.getenv("JOURNAL_DIR") or DEFAULT_JOURNAL_DIR, name)
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self.log_path = os.path.join(self.directory, "journal.log")
+        self.snapshot_path = os.path.join(self.directory, "snapshot.json")
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+
+        self.state: Dict[str, Dict[str, Any]] = {section: {} for section in SECTIONS}
+        self.seq = 0
+        self._since_snapshot = 0
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+        self._flush_timer: Optional[threading.Timer] = None
+        self._lock = threading.RLock()
+        self.stats = {"records": 0, "fsyncs": 0, "compactions": 0, "replayed": 0, "torn": 0, "replay_ms": 0.0}
+
+        self._replay()
+        self._file = open(self.log_path, "ab")
+
+    # ----------------------------------------------------------------
+    # Replay and compaction
+    # ----------------------------------------------------------------
+    def _replay(self) -> None:
+        started = time.perf_counter()
+        try:
+            with open(self.snapshot_path, "r") as f:
+                snapshot = json.load(f)
+            self.seq = int(snapshot["seq"])
+            for section in SECTIONS:
+                self.state[section] = snapshot["state"].get(section, {})
+        except (OSError, ValueError, KeyError):
+            pass
+
+        good_bytes = 0
+        try:
+            with open(self.log_path, "rb") as f:
+                for line in f:
+                    record = _decode(line)
+                    if record is None:
+                        self.stats["torn"] += 1
+                        break
+                    good_bytes += len(line)
+                    if record["seq"] <= self.seq:
+                        continue  # already in the snapshot (crash between snapshot and truncate)
+                    self._apply(record["ops"])
+                    self.seq = record["seq"]
+                    self._since_snapshot += 1
+                    self.stats["replayed"] += 1
+        except FileNotFoundError:
+            pass
+        if self.stats["torn"]:
+            with open(self.log_path, "r+b") as f:
+                f.truncate(good_bytes)
+                os.fsync(f.fileno())
+        self.stats["replay_ms"] = (time.perf_counter() - started) * 1000
+
+    def _apply(self, ops: List[List[Any]]) -> None:
+        for op in ops:
+            if op[0] == "put":
+                self.state[op[1]][op[2]] = op[3]
+            else:
+                self.state[op[1]].pop(op[2], None)
+
+    def compact(self) -> None:
+        """Write the state as a snapshot and start an empty log."""
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            tmp_path = f"{self.snapshot_path}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump({"seq": self.seq, "state": self.state}, f, separators=(",", ":"), default=str)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            self._file.close()
+            self._file = open(self.log_path, "wb")
+            dir_fd = os.open(self.directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+            self._since_snapshot = 0
+            self._unsynced = 0
+            self._synced_at = time.monotonic()
+            self.stats["compactions"] += 1
+
+    # ----------------------------------------------------------------
+    # Writing
+    # ----------------------------------------------------------------
+    def _write(self, ops: List[List[Any]], sync: bool = False) -> None:
+        with self._lock:
+            self.seq += 1
+            self._apply(ops)
+            self._file.write(_encode({"seq": self.seq, "ts": time.time(), "ops": ops}))
+            self._unsynced += 1
+            self._since_snapshot += 1
+            self.stats["records"] += 1
+            if sync or self._unsynced >= self.fsync_every or time.monotonic() - self._synced_at >= self.fsync_interval:
+                self.sync()
+            elif self._flush_timer is None:
+                # No further write may come to sync this one
+                self._flush_timer = threading.Timer(self.fsync_interval, self._timed_sync)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+            if self._since_snapshot >= self.compact_every:
+                self.compact()
+
+    def _timed_sync(self) -> None:
+        with self._lock:
+            self._flush_timer = None
+            if not self._file.closed:
+                self.sync()
+
+    def sync(self) -> None:
+        with self._lock:
+            if self._unsynced:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self.stats["fsyncs"] += 1
+                self._unsynced = 0
+            self._synced_at = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            self.sync()
+            self._file.close()
+
+    def put(self, section: str, key: Any, value: Any, sync: bool = False) -> None:
+        self._write([["put", section, str(key), value]], sync)
+
+    def delete(self, section: str, key: Any, sync: bool = False) -> None:
+        if str(key) in self.state[section]:
+            self._write([["del", section, str(key)]], sync)
+
+    def get(self, section: str, key: Any, default: Any = None) -> Any:
+        return self.state[section].get(str(key), default)
+
+    # ----------------------------------------------------------------
+    # Trade lifecycle
+    # ----------------------------------------------------------------
+    @property
+    def positions(self) -> Dict[str, Any]:
+        return self.state["positions"]
+
+    @property
+    def pending(self) -> Dict[str, Any]:
+        return self.state["pending"]
+
+    def intent(self, order: Dict[str, Any]) -> str:
+        """Durably note an open about to be sent, before its temp id exists. Returns the intent's key."""
+        with self._lock:
+            key = f"{INTENT}{self.seq + 1}"
+            self.put("pending", key, {**order, "sent_at": time.time()}, sync=True)
+        return key
+
+    def sent(self, temp_quote_id: int, intent: Optional[str] = None, order: Optional[Dict[str, Any]] = None) -> None:
+        """The open was accepted with `temp_quote_id`; replaces its intent."""
+        ops = []
+        entry = {**(order or {}), "sent_at": time.time()}
+        if intent is not None:
+            entry = {**self.get("pending", intent, {}), **entry}
+            ops.append(["del", "pending", intent])
+        ops.append(["put", "pending", str(int(temp_quote_id)), entry])
+        ops.append(["put", "seen", str(int(temp_quote_id)), 1])
+        self._write(ops, sync=True)
+
+    def abandoned(self, temp_quote_id: Optional[int] = None, intent: Optional[str] = None) -> None:
+        """The open was rejected or never sent."""
+        self.delete("pending", intent if temp_quote_id is None else int(temp_quote_id), sync=True)
+
+    def confirmed(self, temp_quote_id: int, quote_id: int, data: Optional[Dict[str, Any]] = None) -> None:
+        entry = {**(self.get("pending", temp_quote_id) or {}), **(data or {}), "temp_quote_id": int(temp_quote_id),
+                 "confirmed_at": time.time()}
+        self._write([["del", "pending", str(int(temp_quote_id))], ["put", "positions", str(int(quote_id)), entry]])
+
+    def orders_attached(self, quote_id: int, legs: Dict[str, Any]) -> None:
+        self.put("orders", int(quote_id), legs)
+
+    def closed(self, quote_id: int, sync: bool = True) -> None:
+        self._write([["del", "positions", str(int(quote_id))], ["del", "orders", str(int(quote_id))]], sync)
+
+    # ----------------------------------------------------------------
+    # Reconciliation
+    # ----------------------------------------------------------------
+    def reconcile(
+        self,
+        confirmed_quote_ids: Dict[int, int],
+        quote_status: Optional[Callable[[int], Optional[int]]] = None,
+        pending_ttl: float = 3600.0,
+        failed_temp_ids: Iterable[int] = (),
+        listed_temp_ids: Optional[Iterable[int]] = None,
+    ) -> Dict[str, int]:
+        """Bring the replayed state up to date with the solver and the chain.
+
+        `confirmed_quote_ids` is one `/instant_open/{address}` read
+        ({temp_quote_id: quote_id}); `failed_temp_ids` are the temp ids the
+        same read reports failed, and `listed_temp_ids` every temp id it lists
+        (default: the confirmed ones). `quote_status(quote_id)` returns the
+        QuoteStatus, or None when unknown; it is called once per journaled
+        position. Pending opens that failed, or have no quote after
+        `pending_ttl` seconds (the order deadline), are dropped.
+
+        Outstanding intents (a crash between sending an open and journaling its
+        temp id) adopt confirmed temp ids the journal has not seen, oldest
+        intent first, each with its own intent's order; `quote_status` then
+        drops the adopted quotes that are no longer open. Every listed temp id
+        is marked seen afterwards, so the account's history is never adopted.
+        """
+        summary = {"promoted": 0, "adopted": 0, "dropped": 0, "closed": 0, "checked": 0}
+        now = time.time()
+        failed = {int(temp_id) for temp_id in failed_temp_ids}
+        for key, entry in list(self.pending.items()):
+            if key.startswith(INTENT):
+                continue
+            quote_id = confirmed_quote_ids.get(int(key))
+            if quote_id is not None:
+                self.confirmed(int(key), quote_id)
+                summary["promoted"] += 1
+            elif int(key) in failed or now - float(entry.get("sent_at", 0)) > pending_ttl:
+                self.abandoned(int(key))
+                summary["dropped"] += 1
+        intents = sorted((key for key in self.pending if key.startswith(INTENT)), key=lambda k: int(k[len(INTENT):]))
+        unseen = [(int(temp_id), int(quote_id)) for temp_id, quote_id in confirmed_quote_ids.items()
+                  if str(int(temp_id)) not in self.state["seen"] and str(int(quote_id)) not in self.positions]
+        if intents and unseen and quote_status is None:
+            print(f"[JOURNAL] Warning: {len(intents)} open(s) were sent without a journaled temp id; "
+                  "without a quote status source they cannot be matched, check the account")
+        elif intents:
+            for key, (temp_id, quote_id) in zip(intents, unseen):
+                self._write([["put", "positions", str(quote_id),
+                              {**self.pending[key], "temp_quote_id": temp_id, "adopted": True}]])
+                summary["adopted"] += 1
+            if len(unseen) > len(intents):
+                print(f"[JOURNAL] Warning: {len(unseen) - len(intents)} unknown confirmed quote(s) left alone")
+        for key in intents:
+            self.abandoned(intent=key)
+
+        # The listing is what the next reconcile compares against: seen = listed, plus what is still journaled
+        listed = {str(int(temp_id)) for temp_id in (confirmed_quote_ids if listed_temp_ids is None else listed_temp_ids)}
+        keep = listed | set(self.pending) | {str(int(p.get("temp_quote_id", 0))) for p in self.positions.values()}
+        ops = [["put", "seen", temp_id, 1] for temp_id in listed if temp_id not in self.state["seen"]]
+        ops += [["del", "seen", temp_id] for temp_id in self.state["seen"] if temp_id not in keep]
+        if ops:
+            self._write(ops)
+
+        if quote_status is not None:
+            for key in list(self.positions):
+                status = quote_status(int(key))
+                summary["checked"] += 1
+                if status is not None and int(status) not in LIVE_QUOTE_STATUSES:
+                    self.closed(int(key), sync=False)  # synced once at the end
+                    summary["closed"] += 1
+        self.sync()
+        return summary
+
+
+def diamond_quote_status(diamond) -> Callable[[int], Optional[int]]:
+    """`quote_status` for `reconcile()` from the diamond's `getQuote` (status is field 16)."""
+    def status(quote_id: int) -> Optional[int]:
+        try:
+            return int(diamond.functions.getQuote(quote_id).call()[16])
+        except Exception as e:
+            print(f"[JOURNAL] getQuote({quote_id}) failed: {e}")
+            return None
+    return status
+
+
+def main():
+    directory = tempfile.mkdtemp(prefix="symmio-journal-")
+    try:
+        journal = StateJournal("bench", directory, compact_every=50_000)
+        n = 20_000
+        start = time.perf_counter()
+        for i in range(n):
+            intent = journal.intent({"symbol_id": 340, "quantity": "6"})
+            journal.sent(-i - 1, intent)
+            journal.confirmed(-i - 1, 1000 + i, {"open_price": "3.05"})
+            journal.orders_attached(1000 + i, {"stop_loss": {"conditional_price": "2.44"}})
+            if i % 4:
+                journal.closed(1000 + i)
+        elapsed = time.perf_counter() - start
+        records = journal.stats["records"]
+        print(f"[JOURNAL] {n} trades, {records} records in {elapsed:.2f}s ({records / elapsed:,.0f} records/s), "
+              f"{journal.stats['fsyncs']} fsyncs, {journal.stats['compactions']} compaction(s)")
+
+        # Crash mid-write: a half-written record is left at the end of the log
+        journal._file.flush()
+        with open(journal.log_path, "ab") as f:
+            f.write(_encode({"seq": journal.seq + 1, "ops": []})[:20])
+        journal._file.close()
+
+        restarted = StateJournal("bench", directory)
+        print(f"[JOURNAL] Replayed {restarted.stats['replayed']} records in {restarted.stats['replay_ms']:.1f}ms "
+              f"({restarted.stats['torn']} torn line cut): {len(restarted.positions)} open positions, "
+              f"{len(restarted.pending)} pending")
+        state_matches = restarted.state == journal.state
+        print(f"[JOURNAL] Replayed state matches the pre-crash state: {state_matches}")
+
+        # A crash right after a send: the temp id is durable, its confirmation is not
+        restarted.sent(-999_999, restarted.intent({"symbol_id": 340, "quantity": "6"}))
+        # ... and one right after sending, before its temp id came back
+        restarted.intent({"symbol_id": 340, "quantity": "6"})
+        restarted.close()
+        again = StateJournal("bench", directory)
+        closed_quotes = {1000 + i for i in range(n) if i % 4}
+        summary = again.reconcile(
+            {-999_999: 999_999, -1_000_000: 1_000_000},
+            quote_status=lambda quote_id: 7 if quote_id in closed_quotes or quote_id % 3 == 0 else 4,
+        )
+        print(f"[JOURNAL] Reconciled the delta: {summary}")
+        again.compact()
+        print(f"[JOURNAL] After compaction: snapshot {os.path.getsize(again.snapshot_path):,} bytes, "
+              f"log {os.path.getsize(again.log_path)} bytes, {len(again.positions)} open positions")
+        again.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
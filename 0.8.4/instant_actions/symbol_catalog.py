@@ -0,0 +1,260 @@
+"""Symbol catalog with per-symbol price/quantity formatters.
+
+The demos learn a symbol's precision by re-fetching `/contract-symbols` before
+every order (the vibecaps open demo does it twice per trade: once for the open
+and again for the stop loss). They then format each value with
+`format_decimal`, which builds `Decimal(10) ** -precision` and quantizes on
+every call.
+
+`SymbolCatalog` fetches `/contract-symbols` once and looks symbols up by id or
+name. `catalog.formatter(symbol)` returns a `SymbolFormatter` that is compiled
+once from the symbol's price_precision and quantity_precision: the quantizers,
+wei multipliers and a ROUND_DOWN context are built up front, so formatting a
+price is one C-level quantize and wei amounts are an integer scale. Its output
+is identical to `format_decimal`'s (ROUND_DOWN, `str(Decimal)`), which `main()`
+checks.
+
+Usage
+    SYMBOLS = SymbolCatalog(SOLVER_BASE_URL)
+    fmt = SYMBOLS.formatter(340)                 # or SYMBOLS.formatter("XRPUSDT")
+    fmt.price(muon_price * (1 + slippage))       # "3.0603"
+    fmt.quantity("6.15")                         # "6.1"
+    fmt.quantity_wei("6.15")                     # 6100000000000000000
+
+Run
+- python instant_actions/symbol_catalog.py     # check against format_decimal and time both
+"""
+
+import time
+import random
+import threading
+from decimal import Context, Decimal, InvalidOperation, ROUND_DOWN
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import requests
+
+Symbol = Union[str, int]
+Number = Union[str, int, Decimal]
+
+# format_decimal's arithmetic (default 28-digit context, ROUND_DOWN), bound once
+_CONTEXT = Context(prec=28, rounding=ROUND_DOWN)
+_quantize = _CONTEXT.quantize
+_scaleb = _CONTEXT.scaleb
+DEFAULT_PRECISION = 6
+
+
+def parse_symbols(payload: Any) -> List[Dict]:
+    """`/contract-symbols` is a list, a dict wrapping one (possibly nested), or a {id: symbol} mapping."""
+    if isinstance(payload, list):
+        return [s for s in payload if isinstance(s, dict)]
+    if isinstance(payload, dict):
+        for key in ("symbols", "data", "result", "items", "contract_symbols"):
+            value = payload.get(key)
+            if isinstance(value, dict):
+                value = value.get("symbols") or value.get("data") or value.get("result")
+            if isinstance(value, list):
+                return [s for s in value if isinstance(s, dict)]
+        values = list(payload.values())
+        if values and all(isinstance(v, dict) for v in values):
+            return values
+    raise ValueError(f"Unexpected /contract-symbols payload type: {type(payload)}")
+
+
+def symbol_id_of(symbol: Dict) -> Optional[int]:
+    for key in ("symbol_id", "symbolId", "id"):
+        try:
+            return int(symbol[key])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+class SymbolFormatter:
+    """Price/quantity wire formatting for one (price_precision, quantity_precision) pair."""
+
+    __slots__ = ("price_precision", "quantity_precision", "_price_quantum", "_quantity_quantum", "_price_wei", "_quantity_wei")
+
+    def __init__(self, price_precision: int, quantity_precision: int):
+        self.price_precision = int(price_precision)
+        self.quantity_precision = int(quantity_precision)
+        if not (0 <= self.price_precision <= 18 and 0 <= self.quantity_precision <= 18):
+            raise ValueError(f"Precision must be within 0..18, got {price_precision}/{quantity_precision}")
+        self._price_quantum = Decimal(1).scaleb(-self.price_precision)
+        self._quantity_quantum = Decimal(1).scaleb(-self.quantity_precision)
+        self._price_wei = 10 ** (18 - self.price_precision)
+        self._quantity_wei = 10 ** (18 - self.quantity_precision)
+
+    @classmethod
+    def for_symbol(cls, symbol: Dict) -> "SymbolFormatter":
+        return _formatter(
+            int(symbol.get("price_precision", DEFAULT_PRECISION)),
+            int(symbol.get("quantity_precision", DEFAULT_PRECISION)),
+        )
+
+    def price(self, value: Number) -> str:
+        if value.__class__ is not Decimal:
+            value = Decimal(str(value))
+        return str(_quantize(value, self._price_quantum))
+
+    def quantity(self, value: Number) -> str:
+        if value.__class__ is not Decimal:
+            value = Decimal(str(value))
+        return str(_quantize(value, self._quantity_quantum))
+
+    def price_wei(self, value: Number) -> int:
+        """`price(value)` as an 18-decimal integer."""
+        if value.__class__ is not Decimal:
+            value = Decimal(str(value))
+        return int(_scaleb(value, self.price_precision)) * self._price_wei
+
+    def quantity_wei(self, value: Number) -> int:
+        """`quantity(value)` as an 18-decimal integer."""
+        if value.__class__ is not Decimal:
+            value = Decimal(str(value))
+        return int(_scaleb(value, self.quantity_precision)) * self._quantity_wei
+
+    def price_from_wei(self, price_wei: int) -> str:
+        """A wei (18-decimal) price such as Muon's, rounded down to the price precision."""
+        return str(_quantize(_scaleb(Decimal(price_wei // self._price_wei), -self.price_precision), self._price_quantum))
+
+    def __repr__(self) -> str:
+        return f"SymbolFormatter(price_precision={self.price_precision}, quantity_precision={self.quantity_precision})"
+
+
+@lru_cache(maxsize=None)
+def _formatter(price_precision: int, quantity_precision: int) -> SymbolFormatter:
+    """Symbols with the same precisions share one formatter."""
+    return SymbolFormatter(price_precision, quantity_precision)
+
+
+class SymbolCatalog:
+    """`/contract-symbols`, fetched once, with a cached formatter per symbol.
+
+    With `default_precision=(price, quantity)`, a failed fetch or unknown symbol
+    falls back to those precisions instead of raising (the majors demos' behaviour).
+    """
+
+    def __init__(
+        self,
+        solver_url: str,
+        session: Optional[requests.Session] = None,
+        default_precision: Optional[Tuple[int, int]] = None,
+    ):
+        self.solver_url = solver_url.rstrip("/")
+        self.http = session or requests.Session()
+        self.default_precision = default_precision
+        self._by_id: Optional[Dict[int, Dict]] = None
+        self._id_by_name: Dict[str, int] = {}
+        self._formatters: Dict[int, SymbolFormatter] = {}
+        self._lock = threading.Lock()
+
+    def add(self, symbols: List[Dict]) -> None:
+        """Register already-fetched symbol dicts (e.g. from the async client)."""
+        by_id = dict(self._by_id or {})
+        for sym in symbols:
+            sym_id = symbol_id_of(sym)
+            if sym_id is None:
+                continue
+            by_id[sym_id] = sym
+            name = sym.get("name") or sym.get("symbol")
+            if name:
+                self._id_by_name[str(name).upper()] = sym_id
+        self._by_id = by_id
+        self._formatters.clear()
+
+    def load(self, refresh: bool = False) -> Dict[int, Dict]:
+        """Symbols by id; fetched on first use or when `refresh` is set."""
+        with self._lock:
+            if self._by_id is None or refresh:
+                url = f"{self.solver_url}/contract-symbols"
+                print(f"[SYMBOLS] {url}")
+                response = self.http.get(url, timeout=30)
+                response.raise_for_status()
+                self.add(parse_symbols(response.json()))
+                print(f"[SYMBOLS] Loaded {len(self._by_id)} symbols")
+            return self._by_id
+
+    def _lookup(self, symbol: Symbol) -> Optional[Dict]:
+        by_id = self.load()
+        text = str(symbol).strip()
+        sym_id = int(text) if text.isdigit() else self._id_by_name.get(text.upper())
+        return by_id.get(sym_id) if sym_id is not None else None
+
+    def get(self, symbol: Symbol) -> Dict:
+        """Symbol metadata by id (340) or name ("XRPUSDT")."""
+        try:
+            found = self._lookup(symbol)
+            if found is not None:
+                return found
+            if self.default_precision is None:
+                raise ValueError(f"Symbol {symbol} not found in contract-symbols")
+            print(f"[SYMBOLS] Warning: symbol {symbol} not found; using defaults")
+        except Exception as e:
+            if self.default_precision is None:
+                raise
+            print(f"[SYMBOLS] Warning: failed to fetch symbol info ({e}); using defaults")
+        price_precision, quantity_precision = self.default_precision
+        return {"symbol_id": symbol, "price_precision": price_precision, "quantity_precision": quantity_precision}
+
+    def formatter(self, symbol: Symbol) -> SymbolFormatter:
+        """The symbol's formatter, compiled on first use. Defaults are not cached, so a later load can replace them."""
+        key = str(symbol).strip().upper()
+        fmt = self._formatters.get(key)
+        if fmt is None:
+            info = self.get(symbol)
+            fmt = SymbolFormatter.for_symbol(info)
+            if symbol_id_of(info) in (self._by_id or {}):
+                self._formatters[key] = fmt
+        return fmt
+
+
+def format_decimal(value: Decimal, precision: int) -> str:
+    """The demos' per-call formatter, kept as the reference `SymbolFormatter` is checked against."""
+    quantizer = Decimal(10) ** -precision
+    return str(value.quantize(quantizer, rounding=ROUND_DOWN))
+
+
+def main():
+    rng = random.Random(11)
+    values = [
+        Decimal(rng.randint(0, 10**rng.randint(1, 24))).scaleb(-rng.randint(0, 20))
+        for _ in range(100_000)
+    ]
+    values += [Decimal(0), Decimal("0.00000001"), Decimal("1E+3"), Decimal("123.4500")]
+
+    checked = mismatches = 0
+    for precision in range(0, 19):
+        fmt = _formatter(precision, precision)
+        for value in values[:5000]:
+            try:
+                expected = format_decimal(value, precision)
+            except InvalidOperation:
+                continue  # more than 28 digits once quantized; quantize cannot represent it
+            checked += 1
+            if fmt.price(value) != expected:
+                mismatches += 1
+            if fmt.quantity_wei(value) != int(Decimal(expected) * 10**18):
+                mismatches += 1
+            wei = int(value * 10**18)
+            if fmt.price_from_wei(wei) != format_decimal(Decimal(wei) / Decimal("1e18"), precision):
+                mismatches += 1
+    print(f"[SYMBOLS] Checked {checked} values at precisions 0..18 against format_decimal: {mismatches} mismatches")
+
+    fmt = _formatter(4, 1)
+    start = time.perf_counter()
+    for value in values:
+        format_decimal(value, 4)
+        format_decimal(value, 1)
+    reference_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for value in values:
+        fmt.price(value)
+        fmt.quantity(value)
+    formatter_s = time.perf_counter() - start
+    print(f"[SYMBOLS] {len(values)} price+quantity pairs: format_decimal {reference_s * 1000:.0f}ms, "
+          f"SymbolFormatter {formatter_s * 1000:.0f}ms ({reference_s / formatter_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+"""Per-stage latency tracing for the instant open/close path.
+
+The instant-action scripts only `print`, so a slow fill cannot be attributed to
+Muon, `get_locked_params`, the solver's `/instant_open`, the confirmation wait
+or the close. `Tracer` records a monotonic-clock span for each stage, tagged
+with a per-trade trace id that is linked to the trade's temp_quote_id and then
+its quote_id. That lets a close be correlated with the open that created the
+position. Durations go into HdrHistogram-style log-linear histograms (about 3%
+relative error, O(1) record, bounded memory). Spans are written to a JSONL file
+and exposed as Prometheus summaries.
+
+When disabled (the default), `span()` returns a shared no-op context manager and
+`traced()` wrappers add one attribute check per call. Importing the module
+configures nothing: an entry point turns tracing on with `configure()`, which
+reads the .env below; library modules and benchmarks only import `TRACER`.
+
+Usage
+    from tracing import TRACER, traced, configure
+
+    configure()                                  # once, in the script's main()
+
+    @traced("fetch_muon_price")
+    def fetch_muon_price(): ...
+
+    with TRACER.trade():                         # new trace id for this trade
+        temp_id = open_instant_trade()
+        TRACER.link(temp_quote_id=temp_id)
+        quote_id = poll_quote_status(temp_id)
+        TRACER.link(quote_id=quote_id)
+    ...
+    with TRACER.trade(quote_id=quote_id):        # same trace id as the open
+        close_instant_position(quote_id, price)
+    TRACER.forget(quote_id=quote_id)             # position gone, drop its ids
+
+Linked ids are kept in an LRU map capped at `max_aliases` entries, so ids of
+trades that are never forgotten (e.g. closed by another process) cannot grow it
+without bound.
+
+Run
+- python instant_actions/tracing.py     # overhead benchmark + sample output
+
+Optional .env
+- TRACE_ENABLED (default: 0)
+- TRACE_JSONL (default: no file; path spans are appended to)
+- TRACE_PROMETHEUS_PORT (default: no server; port serving /metrics on 127.0.0.1)
+- TRACE_PROMETHEUS_HOST (default: 127.0.0.1; 0.0.0.0 exposes /metrics to the network)
+"""
+
+import os
+import json
+import time
+import uuid
+import queue
+import asyncio
+import threading
+import functools
+import contextvars
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("symmio_trace", default=None)
+
+
+class LatencyHistogram:
+    """Log-linear histogram of microsecond values in the style of HdrHistogram.
+
+    Values below 2**sub_bits are recorded exactly; above that each power of two is
+    split into 2**(sub_bits - 1) buckets, bounding the relative error at 2**-(sub_bits - 1).
+    """
+
+    __slots__ = ("sub_bits", "counts", "count", "total_us", "min_us", "max_us")
+
+    def __init__(self, sub_bits: int = 6):
+        self.sub_bits = sub_bits
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+
+    def _index(self, value: int) -> int:
+        if value < (1 << self.sub_bits):
+            return value
+        shift = value.bit_length() - self.sub_bits
+        return shift * (1 << (self.sub_bits - 1)) + (value >> shift)
+
+    def _value(self, index: int) -> int:
+        """Midpoint of the bucket at `index`."""
+        if index < (1 << self.sub_bits):
+            return index
+        half = 1 << (self.sub_bits - 1)
+        shift = index // half - 1
+        mantissa = index - shift * half
+        return (mantissa << shift) + ((1 << shift) >> 1)
+
+    def record(self, value_us: int) -> None:
+        value_us = max(int(value_us), 0)
+        index = self._index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total_us += value_us
+        if self.min_us is None or value_us < self.min_us:
+            self.min_us = value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
+
+    def percentile(self, q: float) -> int:
+        if not self.count:
+            return 0
+        target = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._value(index), self.max_us)
+        return self.max_us
+
+
+class _Trace:
+    __slots__ = ("trace_id", "temp_quote_id", "quote_id")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.temp_quote_id = None
+        self.quote_id = None
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "stage", "attrs", "start")
+
+    def __init__(self, tracer: "Tracer", stage: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.stage = stage
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.record(self.stage, time.monotonic() - self.start, self.attrs, error=exc_type is not None)
+        return False
+
+    def set(self, **attrs: Any) -> None:
+        """Attach attributes (e.g. the HTTP status) to the span before it ends."""
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """Stage spans with trade correlation ids, latency histograms, JSONL and Prometheus output."""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        jsonl_path: Optional[str] = None,
+        service: str = "symmio",
+        max_aliases: int = 10_000,
+    ):
+        self.enabled = False
+        self.service = service
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.errors: Dict[str, int] = {}
+        self.max_aliases = max_aliases
+        self._aliases: "OrderedDict[Any, _Trace]" = OrderedDict()  # ("temp" | "quote", id) -> trace, LRU order
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+        self.jsonl_path: Optional[str] = None
+        self._events: Optional[queue.SimpleQueue] = None
+        self.enable(enabled, jsonl_path)
+
+    def enable(self, enabled: bool = True, jsonl_path: Optional[str] = None) -> None:
+        """Turn span recording on or off; with a `jsonl_path`, spans are also appended to that file."""
+        if enabled and jsonl_path and self._events is None:
+            self.jsonl_path = jsonl_path
+            self._events = queue.SimpleQueue()
+            threading.Thread(target=self._write_events, daemon=True).start()
+        self.enabled = enabled
+
+    # ----------------------------------------------------------------
+    # Spans
+    # ----------------------------------------------------------------
+    def span(self, stage: str, **attrs: Any):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, stage, attrs)
+
+    def traced(self, stage: str) -> Callable:
+        """Decorator recording a span around every call of a function or coroutine function."""
+        def decorator(fn):
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await fn(*args, **kwargs)
+                    with _Span(self, stage, {}):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Span(self, stage, {}):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, stage: str, seconds: float, attrs: Optional[Dict[str, Any]] = None, error: bool = False) -> None:
+        trace = _current_trace.get()
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = LatencyHistogram()
+            histogram.record(int(seconds * 1_000_000))
+            if error:
+                self.errors[stage] = self.errors.get(stage, 0) + 1
+        if self._events is not None:
+            event = {
+                "ts": time.time(),
+                "service": self.service,
+                "stage": stage,
+                "duration_ms": round(seconds * 1000, 3),
+                "error": error,
+            }
+            if trace is not None:
+                event.update(trace_id=trace.trace_id, temp_quote_id=trace.temp_quote_id, quote_id=trace.quote_id)
+            if attrs:
+                event.update(attrs)
+            self._events.put(event)
+
+    # ----------------------------------------------------------------
+    # Trade correlation
+    # ----------------------------------------------------------------
+    def trade(self, temp_quote_id: Any = None, quote_id: Any = None):
+        """Context in which spans belong to one trade.
+
+        With a temp_quote_id or quote_id already linked to a trace, that trace is
+        resumed (e.g. the close of a position opened earlier); otherwise a new one starts.
+        """
+        return _TradeContext(self, temp_quote_id, quote_id)
+
+    def _resolve(self, temp_quote_id: Any, quote_id: Any) -> _Trace:
+        with self._lock:
+            for key in (("quote", quote_id), ("temp", temp_quote_id)):
+                if key[1] is not None and key in self._aliases:
+                    self._aliases.move_to_end(key)
+                    return self._aliases[key]
+        trace = _Trace(uuid.uuid4().hex[:16])
+        if temp_quote_id is not None or quote_id is not None:
+            self._link(trace, temp_quote_id, quote_id)
+        return trace
+
+    def link(self, temp_quote_id: Any = None, quote_id: Any = None) -> None:
+        """Attach the solver's ids to the current trade as they become known."""
+        if not self.enabled:
+            return
+        trace = _current_trace.get()
+        if trace is not None:
+            self._link(trace, temp_quote_id, quote_id)
+
+    def _link(self, trace: _Trace, temp_quote_id: Any, quote_id: Any) -> None:
+        with self._lock:
+            if temp_quote_id is not None:
+                trace.temp_quote_id = int(temp_quote_id)
+                self._remember(("temp", trace.temp_quote_id), trace)
+            if quote_id is not None:
+                trace.quote_id = int(quote_id)
+                self._remember(("quote", trace.quote_id), trace)
+        if self._events is not None:
+            self._events.put({
+                "ts": time.time(), "service": self.service, "event": "link", "trace_id": trace.trace_id,
+                "temp_quote_id": trace.temp_quote_id, "quote_id": trace.quote_id,
+            })
+
+    def _remember(self, key: Any, trace: _Trace) -> None:
+        self._aliases[key] = trace
+        self._aliases.move_to_end(key)
+        while len(self._aliases) > self.max_aliases:
+            self._aliases.popitem(last=False)
+
+    def forget(self, temp_quote_id: Any = None, quote_id: Any = None) -> None:
+        """Drop a finished trade's id links (call once its position is fully closed)."""
+        with self._lock:
+            for key in (("quote", quote_id), ("temp", temp_quote_id)):
+                if key[1] is None:
+                    continue
+                trace = self._aliases.pop((key[0], int(key[1])), None)
+                if trace is not None:
+                    self._aliases.pop(("temp", trace.temp_quote_id), None)
+                    self._aliases.pop(("quote", trace.quote_id), None)
+
+    # ----------------------------------------------------------------
+    # Output
+    # ----------------------------------------------------------------
+    def _write_events(self) -> None:
+        with open(self.jsonl_path, "a", buffering=1 << 16) as f:
+            while True:
+                f.write(json.dumps(self._events.get()) + "\n")
+                while not self._events.empty():
+                    f.write(json.dumps(self._events.get()) + "\n")
+                f.flush()
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage count, error count and latency quantiles in milliseconds."""
+        with self._lock:
+            result = {}
+            for stage, h in sorted(self.histograms.items()):
+                result[stage] = {
+                    "count": h.count,
+                    "errors": self.errors.get(stage, 0),
+                    "mean_ms": h.total_us / h.count / 1000 if h.count else 0.0,
+                    "max_ms": h.max_us / 1000,
+                    **{f"p{q * 100:g}_ms": h.percentile(q) / 1000 for q in QUANTILES},
+                }
+            return result
+
+    def render_prometheus(self) -> str:
+        name = f"{self.service}_stage_latency_seconds"
+        lines = [
+            f"# HELP {name} Latency of instant open/close stages.",
+            f"# TYPE {name} summary",
+        ]
+        errors = [
+            f"# HELP {self.service}_stage_errors_total Stage calls that raised.",
+            f"# TYPE {self.service}_stage_errors_total counter",
+        ]
+        with self._lock:
+            for stage, h in sorted(self.histograms.items()):
+                for q in QUANTILES:
+                    lines.append(f'{name}{{stage="{stage}",quantile="{q}"}} {h.percentile(q) / 1e6}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {h.total_us / 1e6}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+                errors.append(f'{self.service}_stage_errors_total{{stage="{stage}"}} {self.errors.get(stage, 0)}')
+        return "\n".join(lines + errors) + "\n"
+
+    def start_prometheus_server(self, port: Optional[int] = None, host: str = "127.0.0.1") -> int:
+        """Serve `/metrics` from a daemon thread, on loopback unless `host` says otherwise. Returns the bound port."""
+        if self._server is not None:
+            return self._server.server_address[1]
+        port = int(port if port is not None else os.getenv("TRACE_PROMETHEUS_PORT", 9464))
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = tracer.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"[TRACE] Prometheus metrics on http://{host}:{self._server.server_address[1]}/metrics")
+        return self._server.server_address[1]
+
+
+class _TradeContext:
+    __slots__ = ("tracer", "temp_quote_id", "quote_id", "trace", "_token")
+
+    def __init__(self, tracer: Tracer, temp_quote_id: Any, quote_id: Any):
+        self.tracer = tracer
+        self.temp_quote_id = temp_quote_id
+        self.quote_id = quote_id
+        self.trace = None
+        self._token = None
+
+    def __enter__(self) -> Optional[_Trace]:
+        if self.tracer.enabled:
+            self.trace = self.tracer._resolve(self.temp_quote_id, self.quote_id)
+            self._token = _current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, *exc):
+        if self._token is not None:
+            _current_trace.reset(self._token)
+        return False
+
+
+# Process-wide tracer; disabled until an entry point calls configure()
+TRACER = Tracer()
+traced = TRACER.traced
+span = TRACER.span
+
+
+def configure(
+    enabled: Optional[bool] = None,
+    jsonl_path: Optional[str] = None,
+    prometheus_port: Optional[int] = None,
+    prometheus_host: Optional[str] = None,
+) -> Tracer:
+    """Configure `TRACER` for this process; arguments left as None come from the .env.
+
+    Functions already wrapped with `traced` pick the change up on their next call.
+    """
+    load_dotenv()
+    if enabled is None:
+        enabled = os.getenv("TRACE_ENABLED", "0").lower() in ("1", "true", "yes")
+    TRACER.enable(enabled, jsonl_path or os.getenv("TRACE_JSONL"))
+    port = prometheus_port if prometheus_port is not None else os.getenv("TRACE_PROMETHEUS_PORT")
+    if enabled and port:
+        TRACER.start_prometheus_server(int(port), prometheus_host or os.getenv("TRACE_PROMETHEUS_HOST", "127.0.0.1"))
+    return TRACER
+
+
+def main():
+    import random
+    import tempfile
+
+    def work():
+        return None
+
+    calls = 200_000
+    start = time.perf_counter()
+    for _ in range(calls):
+        work()
+    bare = time.perf_counter() - start
+
+    tracer = Tracer(enabled=False)
+    wrapped = tracer.traced("work")(work)
+    start = time.perf_counter()
+    for _ in range(calls):
+        wrapped()
+    disabled = time.perf_counter() - start
+
+    tracer.enabled = True
+    start = time.perf_counter()
+    for _ in range(calls):
+        wrapped()
+    enabled = time.perf_counter() - start
+    print(f"[TRACE] Per-call overhead: disabled {(disabled - bare) / calls * 1e9:.0f}ns, "
+          f"enabled {(enabled - bare) / calls * 1e9:.0f}ns")
+
+    # Sample trades with simulated stage latencies
+    path = os.path.join(tempfile.mkdtemp(prefix="symmio-trace-"), "spans.jsonl")
+    tracer = Tracer(enabled=True, jsonl_path=path)
+    rng = random.Random(1)
+    for i in range(200):
+        with tracer.trade():
+            for stage, mean in (("fetch_muon_price", 0.12), ("fetch_locked_params", 0.03), ("open_instant_trade", 0.2)):
+                tracer.record(stage, rng.expovariate(1 / mean))
+            tracer.link(temp_quote_id=-(i + 1))
+            tracer.record("confirmation_wait", rng.expovariate(1 / 1.5))
+            tracer.link(quote_id=1000 + i)
+        with tracer.trade(quote_id=1000 + i):
+            tracer.record("close_instant_position", rng.expovariate(1 / 0.25))
+
+    for stage, stats in tracer.snapshot().items():
+        print(f"[TRACE] {stage:<24} n={stats['count']:<4} p50={stats['p50_ms']:8.1f}ms "
+              f"p99={stats['p99_ms']:8.1f}ms max={stats['max_ms']:8.1f}ms")
+    time.sleep(0.2)
+    with open(path) as f:
+        lines = f.readlines()
+    print(f"[TRACE] {len(lines)} JSONL events in {path}; last: {lines[-1].strip()}")
+    print(tracer.render_prometheus().splitlines()[2])
+
+
+if __name__ == "__main__":
+    main()
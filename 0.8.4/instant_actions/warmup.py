@@ -0,0 +1,231 @@
+"""Concurrent start-up warm-up for bots and instant-action scripts.
+
+Before their first order the scripts run their start-up I/O one call after
+another: the SIWE login (nonce, then login), `/contract-symbols`, locked params,
+a Muon price, and in some scripts a Web3 contract built from the full ABI plus a
+chain-id call. Most of these calls don't depend on each other, yet the first
+order waits for their sum.
+
+`Warmup` collects those steps and runs them all at once (threads for blocking
+calls, the running loop for coroutines). It can also open keep-alive
+connections to each endpoint on the `requests.Session` that will later carry
+the orders, so the first order skips the TCP/TLS handshake. Each step's result
+lands in the caches it fills (session token, symbol catalog, locked params), or
+is returned by name. The readiness report shows each dependency's time and
+outcome, the wall time, and what running them one after another would have
+cost. The wall time is roughly the slowest single dependency.
+
+Usage
+    ready = (Warmup()
+             .add("login", SESSION.get_token)
+             .add("symbols", SYMBOLS.load)
+             .add("locked_params", LOCKED_PARAMS.warm, [("XRPUSDT", "1")])
+             .add("muon_price", fetch_muon_price)
+             .preconnect(MUON_HTTP, MUON_BASE_URL)
+             .run())
+    price = ready["muon_price"]
+
+Run
+- python instant_actions/warmup.py     # serial vs concurrent start-up against a local stub solver
+"""
+
+import os
+import json
+import time
+import asyncio
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from web3 import Web3
+
+DEFAULT_ABI_PATH = os.path.join(os.path.dirname(__file__), "..", "abi", "symmio.json")
+
+
+class WarmupError(RuntimeError):
+    """One or more required start-up dependencies failed."""
+
+    def __init__(self, failures: Dict[str, BaseException]):
+        super().__init__("Warm-up failed: " + ", ".join(f"{name} ({e})" for name, e in failures.items()))
+        self.failures = failures
+
+
+class Warmup:
+    """Runs independent start-up steps concurrently and reports per-dependency readiness."""
+
+    def __init__(self, max_workers: int = 16, verbose: bool = True):
+        self.max_workers = max_workers
+        self.verbose = verbose
+        self.steps: List[Tuple[str, Callable[..., Any], tuple, dict, bool]] = []
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"wall_ms": 0.0, "serial_ms": 0.0, "slowest": None}
+
+    def add(self, name: str, fn: Callable[..., Any], *args: Any, required: bool = True, **kwargs: Any) -> "Warmup":
+        """Add a step; `fn` may be blocking or a coroutine function. Optional steps never fail the warm-up."""
+        self.steps.append((name, fn, args, kwargs, required))
+        return self
+
+    def preconnect(self, session: requests.Session, url: Optional[str], connections: int = 1) -> "Warmup":
+        """Open `connections` keep-alive connections to `url`'s origin in `session`'s pool."""
+        if url:
+            origin = "{0.scheme}://{0.netloc}".format(urlsplit(url))
+            for i in range(connections):
+                name = f"connect {urlsplit(url).netloc}" + (f" #{i + 1}" if connections > 1 else "")
+                self.add(name, preconnect, session, origin, required=False)
+        return self
+
+    def _record(self, name: str, started: float, value: Any = None, error: Optional[BaseException] = None) -> None:
+        self.results[name] = {
+            "ok": error is None,
+            "ms": (time.perf_counter() - started) * 1000,
+            "value": value,
+            "error": error,
+        }
+
+    def _run_sync(self, name: str, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        started = time.perf_counter()
+        try:
+            value = fn(*args, **kwargs)
+            if inspect.isawaitable(value):
+                value = asyncio.run(value)
+        except Exception as e:
+            self._record(name, started, error=e)
+        else:
+            self._record(name, started, value)
+
+    async def _run_async(self, name: str, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        started = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(fn):
+                value = await fn(*args, **kwargs)
+            else:
+                value = await asyncio.to_thread(fn, *args, **kwargs)
+        except Exception as e:
+            self._record(name, started, error=e)
+        else:
+            self._record(name, started, value)
+
+    def run(self, raise_on_error: bool = True) -> Dict[str, Any]:
+        """Run every step at once in threads; returns {name: value} of the successful steps."""
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(self.steps)))) as pool:
+            for future in [pool.submit(self._run_sync, name, fn, args, kwargs) for name, fn, args, kwargs, _ in self.steps]:
+                future.result()
+        return self._finish(started, raise_on_error)
+
+    async def run_async(self, raise_on_error: bool = True) -> Dict[str, Any]:
+        """`run` on the caller's event loop: coroutines run on it, blocking steps in threads."""
+        started = time.perf_counter()
+        await asyncio.gather(*(self._run_async(name, fn, args, kwargs) for name, fn, args, kwargs, _ in self.steps))
+        return self._finish(started, raise_on_error)
+
+    def _finish(self, started: float, raise_on_error: bool) -> Dict[str, Any]:
+        self.stats["wall_ms"] = (time.perf_counter() - started) * 1000
+        self.stats["serial_ms"] = sum(r["ms"] for r in self.results.values())
+        if self.results:
+            self.stats["slowest"] = max(self.results, key=lambda name: self.results[name]["ms"])
+        if self.verbose:
+            self.report()
+        failures = {
+            name: self.results[name]["error"]
+            for name, _, _, _, required in self.steps
+            if required and not self.results[name]["ok"]
+        }
+        if failures and raise_on_error:
+            raise WarmupError(failures)
+        return {name: r["value"] for name, r in self.results.items() if r["ok"]}
+
+    def report(self) -> None:
+        for name, result in sorted(self.results.items(), key=lambda item: -item[1]["ms"]):
+            outcome = "ready" if result["ok"] else f"FAILED: {result['error']}"
+            print(f"[WARMUP] {name:<28} {result['ms']:8.1f}ms  {outcome}")
+        print(f"[WARMUP] Ready in {self.stats['wall_ms']:.0f}ms (slowest: {self.stats['slowest']}); "
+              f"one after another: {self.stats['serial_ms']:.0f}ms")
+
+
+def preconnect(session: requests.Session, origin: str) -> int:
+    """A HEAD request to `origin`, leaving a connection in `session`'s pool. Any HTTP status will do."""
+    response = session.head(origin, timeout=10, allow_redirects=False)
+    response.close()
+    return response.status_code
+
+
+@lru_cache(maxsize=None)
+def load_abi(path: str = DEFAULT_ABI_PATH) -> Tuple[Dict[str, Any], ...]:
+    """The parsed ABI file, read once per process."""
+    with open(path) as f:
+        return tuple(json.load(f))
+
+
+def load_diamond(rpc_url: str, diamond_address: str, abi_path: str = DEFAULT_ABI_PATH, expected_chain_id: Optional[int] = None):
+    """The diamond contract on a connected provider; one `eth_chainId` call opens and checks the connection."""
+    w3 = Web3(Web3.HTTPProvider(rpc_url))
+    chain_id = w3.eth.chain_id
+    if expected_chain_id is not None and int(chain_id) != int(expected_chain_id):
+        raise ValueError(f"RPC is on chain {chain_id}, expected {expected_chain_id}")
+    return w3.eth.contract(address=Web3.to_checksum_address(diamond_address), abi=list(load_abi(abi_path)))
+
+
+# --------------------------------------------------------------------
+# Demo: serial vs concurrent start-up against the local stub solver
+# --------------------------------------------------------------------
+def main():
+    import tempfile
+    from eth_account import Account
+    from async_client import start_stub_solver
+    from locked_params_cache import LockedParamsCache
+    from session_manager import SiweSessionManager
+    from symbol_catalog import SymbolCatalog
+
+    latency = 0.1
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    runner, base_url = asyncio.run_coroutine_threadsafe(start_stub_solver(latency), loop).result()
+    wallet = Account.create()
+
+    def start_up(concurrent: bool) -> Tuple[float, float]:
+        """(ms until ready, ms until the first order is accepted), with fresh caches and pools."""
+        load_abi.cache_clear()
+        session = SiweSessionManager(base_url, wallet.key.hex(), wallet.address, 42161, cache_dir=tempfile.mkdtemp())
+        symbols = SymbolCatalog(base_url, session=requests.Session())
+        locked_params = LockedParamsCache(base_url, session=requests.Session())
+        muon_http = requests.Session()
+
+        def muon_price():
+            response = muon_http.get(f"{base_url}/muon", timeout=30)
+            response.raise_for_status()
+            return response.json()["result"]["data"]["result"]["price"]
+
+        warmup = (Warmup(verbose=concurrent)
+                  .add("login", session.get_token)
+                  .add("symbols", symbols.load)
+                  .add("locked_params", locked_params.warm, [("XRPUSDT", "1")])
+                  .add("muon_price", muon_price)
+                  .add("abi", load_abi))
+        started = time.perf_counter()
+        if concurrent:
+            warmup.run()
+        else:
+            for name, fn, args, kwargs, _ in warmup.steps:
+                fn(*args, **kwargs)
+        ready = time.perf_counter()
+        session.request("POST", f"{base_url}/instant_open", json={"symbolId": 340}).raise_for_status()
+        return (ready - started) * 1000, (time.perf_counter() - started) * 1000
+
+    try:
+        print(f"[WARMUP] Stub solver and Muon at {latency * 1000:.0f}ms per request")
+        serial_ready, serial_order = start_up(concurrent=False)
+        ready, first_order = start_up(concurrent=True)
+        print(f"[WARMUP] One after another: ready in {serial_ready:.0f}ms, first order accepted at {serial_order:.0f}ms")
+        print(f"[WARMUP] Concurrent:        ready in {ready:.0f}ms, first order accepted at {first_order:.0f}ms")
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+
+if __name__ == "__main__":
+    main()
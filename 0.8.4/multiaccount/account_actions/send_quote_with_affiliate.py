@@ -6,6 +6,10 @@ import time
 from web3 import Web3
 from decimal import Decimal
 from typing import Dict, List, Tuple, Union, Optional, Any
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "instant_actions")))
+from margin_engine import MarginEngine
 
 # Load environment variables
 load_dotenv()
@@ -156,29 +160,6 @@ class MultiAccountTradeClient:
         else:  # LONG
             return int(price * (1 + slippage_percent / 100))
     
-    def calculate_margins(self, notional_value: Decimal, locked_params: Dict) -> Dict:
-        """Calculate all margin values"""
-        leverage = Decimal(locked_params["leverage"])
-        
-        cva_wei = int(notional_value * Decimal(locked_params["cva"]) / 
-                     (Decimal(100) * leverage * Decimal(10**18)))
-        
-        lf_wei = int(notional_value * Decimal(locked_params["lf"]) / 
-                    (Decimal(100) * leverage * Decimal(10**18)))
-        
-        party_a_mm_wei = int(notional_value * Decimal(locked_params["partyAmm"]) / 
-                           (Decimal(100) * leverage * Decimal(10**18)))
-        
-        party_b_mm_wei = int(notional_value * Decimal(locked_params["partyBmm"]) / 
-                           (Decimal(100) * Decimal(10**18)))
-        
-        return {
-            "cva": cva_wei,
-            "lf": lf_wei,
-            "partyAmm": party_a_mm_wei,
-            "partyBmm": party_b_mm_wei
-        }
-    
     def send_quote_with_affiliate_via_multiaccount(self) -> int:
         """Execute sendQuoteWithAffiliate function via multiaccount _call"""
         try:
@@ -208,7 +189,7 @@ class MultiAccountTradeClient:
             
             # 6. Calculate notional value and margins
             notional_value = Decimal(quantity_wei) * Decimal(adjusted_price)
-            margins = self.calculate_margins(notional_value, locked_params)
+            margins = MarginEngine(locked_params).onchain_margins([quantity_wei], [adjusted_price])[0]
             print(f"Notional: {notional_value}, CVA: {margins['cva']}")
             
             # 7. Set max funding rate and deadline
@@ -4,8 +4,15 @@ import json
 import requests
 import time
 from web3 import Web3
+from web3.logs import DISCARD
 from decimal import Decimal
 from typing import Dict, List, Tuple, Union, Optional, Any
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "instant_actions")))
+from locked_params_cache import LockedParamsCache
+from margin_engine import MarginEngine
+from party_b_router import PartyBRouter, parse_whitelist
 
 # Load environment variables
 load_dotenv()
@@ -21,17 +28,21 @@ CONFIG = {
     
     # Trade settings
     "symbol_id": 4,
-    "party_b_whitelist": ["0x5044238ea045585C704dC2C6387D66d29eD56648"],
+    "party_b_whitelist": parse_whitelist(os.getenv("PARTY_B_WHITELIST") or "0x5044238ea045585C704dC2C6387D66d29eD56648"),
     "quantity": "6",
     "leverage": 1,
     "position_type": 0,  # 0=LONG, 1=SHORT
     "order_type": 1,     # 0=LIMIT, 1=MARKET
-    "slippage": "2"      # Percentage
+    "slippage": "2",     # Percentage
+    # Seconds to wait for a partyB to lock the quote and feed that back to the router (0: don't wait)
+    "track_lock_timeout": float(os.getenv("TRACK_LOCK_TIMEOUT", "0")),
 }
 
 class SendQuoteClient:
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], router: Optional[PartyBRouter] = None):
         self.config = config
+        # Picks the whitelist per quote from partyB state; without it config["party_b_whitelist"] is sent as is
+        self.router = router
         
         # Load ABI
         abi_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "abi", "symmio.json"))
@@ -45,6 +56,7 @@ class SendQuoteClient:
             address=Web3.to_checksum_address(config["diamond_address"]), 
             abi=self.abi
         )
+        self.locked_params = LockedParamsCache(config["hedger_url"])
     
     def api_request(self, url: str, error_message: str = "API request failed") -> Dict:
         """Make API request with error handling"""
@@ -91,9 +103,8 @@ class SendQuoteClient:
         return filtered_markets[0]
     
     def fetch_locked_params(self, pair: str, leverage: int) -> Dict:
-        """Fetch locked parameters for a symbol and leverage"""
-        url = f"{self.config['hedger_url']}get_locked_params/{pair}?leverage={leverage}"
-        data = self.api_request(url, "Failed to fetch locked params")
+        """Locked parameters for a symbol and leverage, cached per (pair, leverage)"""
+        data = self.locked_params.get(pair, leverage)
         
         return {
             "cva": data["cva"],
@@ -137,35 +148,8 @@ class SendQuoteClient:
         return upnl_sig, price
     
     def calculate_adjusted_price(self, price: int, position_type: int, slippage: str) -> int:
-        """Calculate price with slippage"""
-        slippage_percent = float(slippage)
-        if position_type == 1:  # SHORT
-            return int(price * (1 - slippage_percent / 100))
-        else:  # LONG
-            return int(price * (1 + slippage_percent / 100))
-    
-    def calculate_margins(self, notional_value: Decimal, locked_params: Dict) -> Dict:
-        """Calculate all margin values"""
-        leverage = Decimal(locked_params["leverage"])
-        
-        cva_wei = int(notional_value * Decimal(locked_params["cva"]) / 
-                     (Decimal(100) * leverage * Decimal(10**18)))
-        
-        lf_wei = int(notional_value * Decimal(locked_params["lf"]) / 
-                    (Decimal(100) * leverage * Decimal(10**18)))
-        
-        party_a_mm_wei = int(notional_value * Decimal(locked_params["partyAmm"]) / 
-                           (Decimal(100) * leverage * Decimal(10**18)))
-        
-        party_b_mm_wei = int(notional_value * Decimal(locked_params["partyBmm"]) / 
-                           (Decimal(100) * Decimal(10**18)))
-        
-        return {
-            "cva": cva_wei,
-            "lf": lf_wei,
-            "partyAmm": party_a_mm_wei,
-            "partyBmm": party_b_mm_wei
-        }
+        """Calculate price with slippage (exact; the float version lost precision on wei prices)"""
+        return MarginEngine.adjusted_prices_wei([price], [position_type], slippage)[0]
     
     def send_quote(self) -> int:
         """Execute sendQuote function"""
@@ -191,14 +175,20 @@ class SendQuoteClient:
             print(f"Adjusted price: {adjusted_price}")
             
             # 5. Convert parameters
-            party_bs_white_list = [Web3.to_checksum_address(addr) for addr in self.config["party_b_whitelist"]]
             quantity_wei = self.w3.to_wei(self.config["quantity"], "ether")
             
             # 6. Calculate notional value and margins
             notional_value = Decimal(quantity_wei) * Decimal(adjusted_price)
-            margins = self.calculate_margins(notional_value, locked_params)
+            margins = MarginEngine(locked_params).onchain_margins([quantity_wei], [adjusted_price])[0]
             print(f"Notional: {notional_value}, CVA: {margins['cva']}")
             
+            # PartyBs that can lock it (cva + lf + partyBmm of allocated balance), from the router's snapshot
+            if self.router is not None:
+                party_bs_white_list = self.router.choose(margins["cva"] + margins["lf"] + margins["partyBmm"])
+                print(f"Routed to partyBs: {party_bs_white_list}")
+            else:
+                party_bs_white_list = [Web3.to_checksum_address(addr) for addr in self.config["party_b_whitelist"]]
+            
             # 7. Set max funding rate and deadline
             max_funding_rate = self.w3.to_wei("200", "ether")
             deadline = int(time.time()) + 86400  # 24 hours
@@ -226,12 +216,26 @@ class SendQuoteClient:
             })
             
             signed_txn = self.w3.eth.account.sign_transaction(txn, private_key=self.config["private_key"])
+            sent_at = time.monotonic()
             tx_hash = self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
             print(f"Transaction sent: {tx_hash.hex()}")
 
             receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            if receipt["status"] != 1:
+                raise Exception(f"sendQuote reverted: {tx_hash.hex()}")
             print("Transaction confirmed.")
-            return 0  # Return 0 or any placeholder value if needed
+            events = self.diamond.events.SendQuote().process_receipt(receipt, errors=DISCARD)
+            if not events:
+                raise Exception(f"No SendQuote event in the receipt of {tx_hash.hex()}")
+            quote_id = events[0]["args"]["quoteId"]
+            print(f"Quote ID: {quote_id}")
+            
+            # 9. Whether and how fast a partyB locks it feeds the router's ranking of the next quotes
+            timeout = self.config.get("track_lock_timeout", 0)
+            if self.router is not None and timeout:
+                party_b = self.router.track_quote(quote_id, party_bs_white_list, sent_at, timeout=timeout)
+                print(f"Locked by partyB: {party_b}" if party_b else "Not locked by a routed partyB (yet)")
+            return quote_id
                                                 
         except Exception as e:
             print(f"Error: {e}")
@@ -240,6 +244,10 @@ class SendQuoteClient:
 def main():
     """Main function to demonstrate SDK usage"""
     client = SendQuoteClient(CONFIG)
+    # One batched read of the whitelist's state; quotes go only to partyBs that can lock them
+    client.router = PartyBRouter(client.diamond, client.account.address, CONFIG["party_b_whitelist"])
+    client.router.refresh()
+    client.router.report()
     
     # Example: Modify configuration as needed
     # client.config["slippage"] = "1" 
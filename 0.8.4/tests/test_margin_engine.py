@@ -0,0 +1,52 @@
+"""MarginEngine: the batch and single-order paths agree with the per-order Decimal formulas they replaced."""
+
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "instant_actions")))
+from margin_engine import MarginEngine, _decimal_locked_value, _decimal_margins, _decimal_order
+
+LOCKED_PARAMS = {"leverage": "3", "cva": "2.5", "lf": "1.25", "partyAmm": "17.3", "partyBmm": "0.7"}
+
+
+def test_instant_orders_match_decimal_path():
+    rng = random.Random(1)
+    engine = MarginEngine(LOCKED_PARAMS)
+    prices_wei = [rng.randint(10**14, 10**23) for _ in range(2000)]
+    quantities = [f"{rng.randint(1, 10**6) / 10**rng.randint(0, 4)}" for _ in range(2000)]
+    position_types = [rng.randint(0, 1) for _ in range(2000)]
+    got = engine.instant_orders(prices_wei, quantities, position_types, "0.01", 6, 3)
+    expected = [_decimal_order(p, q, t, LOCKED_PARAMS, "0.01", 6, 3)
+                for p, q, t in zip(prices_wei, quantities, position_types)]
+    assert got == expected
+
+
+def test_locked_values_match_decimal_path():
+    engine = MarginEngine(LOCKED_PARAMS)
+    for notional in ("18.6543", "0.000001", "123456789.123456789"):
+        expected = {name: _decimal_locked_value(notional, LOCKED_PARAMS[name], "3", name != "partyBmm")
+                    for name in MarginEngine.PARAMS}
+        assert engine.locked_values(notional) == expected
+
+
+def test_plain_format_strips_trailing_zeros():
+    engine = MarginEngine(LOCKED_PARAMS, leverage="1", plain=True)
+    assert engine.locked_values("200") == {"cva": "5", "lf": "2.5", "partyAmm": "34.6", "partyBmm": "1.4"}
+
+
+def test_onchain_margins_match_decimal_path():
+    rng = random.Random(2)
+    engine = MarginEngine(LOCKED_PARAMS)
+    quantities_wei = [rng.randint(10**15, 10**24) for _ in range(500)]
+    prices_wei = [rng.randint(10**14, 10**23) for _ in range(500)]
+    expected = [_decimal_margins(q, p, LOCKED_PARAMS) for q, p in zip(quantities_wei, prices_wei)]
+    assert engine.onchain_margins(quantities_wei, prices_wei) == expected
+
+
+def test_adjusted_prices_are_exact():
+    price = 3_061_234_567_891_234_567
+    assert MarginEngine.adjusted_prices_wei([price, price], [0, 1], "1") == [
+        price * 101 // 100,
+        price * 99 // 100,
+    ]
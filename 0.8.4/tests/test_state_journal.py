@@ -0,0 +1,147 @@
+"""StateJournal: replay after a restart, torn-write recovery and reconcile() against the solver listing."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "instant_actions")))
+from state_journal import StateJournal
+
+OPENED, CLOSED = 4, 7
+
+
+def _journal(tmp_path, **kwargs):
+    return StateJournal("bot", directory=str(tmp_path), **kwargs)
+
+
+def test_replay_restores_every_section(tmp_path):
+    journal = _journal(tmp_path)
+    intent = journal.intent({"symbol_id": 340, "quantity": "6"})
+    journal.sent(-1, intent)
+    journal.confirmed(-1, 101, {"entry_price": "3.05"})
+    journal.orders_attached(101, {"stop_loss": {"conditional_price": "2.9"}})
+    journal.sent(-2, journal.intent({"symbol_id": 340, "quantity": "3"}))
+    journal.put("bot", "mode", "long")
+    journal.close()
+
+    replayed = _journal(tmp_path)
+    assert replayed.state == journal.state
+    assert replayed.positions["101"]["entry_price"] == "3.05"
+    assert replayed.positions["101"]["quantity"] == "6"
+    assert list(replayed.pending) == ["-2"]
+    assert replayed.get("orders", 101) == {"stop_loss": {"conditional_price": "2.9"}}
+    assert replayed.stats["replayed"] == journal.stats["records"]
+    replayed.close()
+
+
+def test_closed_position_stays_closed_after_replay(tmp_path):
+    journal = _journal(tmp_path)
+    journal.sent(-1, journal.intent({"quantity": "6"}))
+    journal.confirmed(-1, 101)
+    journal.orders_attached(101, {"stop_loss": {}})
+    journal.closed(101)
+    journal.close()
+
+    replayed = _journal(tmp_path)
+    assert replayed.positions == {} and replayed.state["orders"] == {} and replayed.pending == {}
+    replayed.close()
+
+
+def test_torn_last_record_is_cut_off(tmp_path):
+    journal = _journal(tmp_path)
+    journal.sent(-1, journal.intent({"quantity": "6"}))
+    journal.confirmed(-1, 101)
+    journal.close()
+    with open(journal.log_path, "ab") as f:
+        f.write(b'0badc0de {"seq":99,"ops":[["put","positions","202"')  # crash mid-write
+
+    replayed = _journal(tmp_path)
+    assert replayed.stats["torn"] == 1
+    assert list(replayed.positions) == ["101"]
+    replayed.sent(-3, replayed.intent({"quantity": "1"}))
+    replayed.close()
+    again = _journal(tmp_path)
+    assert again.stats["torn"] == 0 and list(again.pending) == ["-3"]
+    again.close()
+
+
+def test_snapshot_plus_log_replay(tmp_path):
+    journal = _journal(tmp_path, compact_every=5)
+    for i in range(1, 13):
+        journal.sent(-i, journal.intent({"quantity": str(i)}))
+        journal.confirmed(-i, 100 + i)
+        if i % 3 == 0:
+            journal.closed(100 + i)
+    journal.close()
+    assert journal.stats["compactions"] > 0
+
+    replayed = _journal(tmp_path)
+    assert replayed.state == journal.state
+    assert sorted(int(q) for q in replayed.positions) == [101, 102, 104, 105, 107, 108, 110, 111]
+    assert replayed.stats["replayed"] < journal.stats["records"]
+    replayed.close()
+
+
+def test_reconcile_promotes_confirmed_and_drops_failed_or_expired(tmp_path):
+    journal = _journal(tmp_path)
+    journal.sent(-1, journal.intent({"quantity": "6"}))
+    journal.sent(-2, journal.intent({"quantity": "6"}))
+    journal.sent(-3, journal.intent({"quantity": "6"}))
+    journal.put("pending", -4, {"quantity": "6", "sent_at": 0})  # sent long before its deadline passed
+
+    summary = journal.reconcile({-1: 101}, failed_temp_ids=[-2], listed_temp_ids=[-1, -2, -3])
+    assert summary["promoted"] == 1 and summary["dropped"] == 2
+    assert list(journal.positions) == ["101"] and journal.positions["101"]["temp_quote_id"] == -1
+    assert list(journal.pending) == ["-3"]  # not listed as confirmed or failed yet: still unknown
+    journal.close()
+
+
+def test_reconcile_adopts_only_unseen_quotes_each_with_its_own_intent(tmp_path):
+    journal = _journal(tmp_path)
+    # The account's history, listed before this bot sent anything
+    journal.reconcile({-1: 101, -2: 102}, quote_status=lambda quote_id: CLOSED)
+    assert journal.positions == {}
+
+    # Two opens sent, then a crash before either temp id was journaled
+    journal.intent({"quantity": "6"})
+    journal.intent({"quantity": "3"})
+    journal.close()
+    journal = _journal(tmp_path)
+
+    listing = {-1: 101, -2: 102, -3: 103, -4: 104}
+    summary = journal.reconcile(listing, quote_status=lambda quote_id: OPENED)
+    assert summary["adopted"] == 2
+    assert {key: (p["temp_quote_id"], p["quantity"]) for key, p in journal.positions.items()} == {
+        "103": (-3, "6"),
+        "104": (-4, "3"),
+    }
+    assert journal.pending == {}
+
+    # A second pass over the same listing adopts nothing new
+    journal.intent({"quantity": "9"})
+    assert journal.reconcile(listing, quote_status=lambda quote_id: OPENED)["adopted"] == 0
+    assert sorted(journal.positions) == ["103", "104"]
+    journal.close()
+
+
+def test_reconcile_without_status_source_leaves_intents_unmatched(tmp_path):
+    journal = _journal(tmp_path)
+    journal.intent({"quantity": "6"})
+    summary = journal.reconcile({-5: 105})
+    assert summary["adopted"] == 0 and journal.positions == {} and journal.pending == {}
+    journal.close()
+
+
+def test_reconcile_closes_positions_that_are_no_longer_open(tmp_path):
+    journal = _journal(tmp_path)
+    for temp_id, quote_id in ((-1, 101), (-2, 102)):
+        journal.sent(temp_id, journal.intent({"quantity": "6"}))
+        journal.confirmed(temp_id, quote_id)
+    statuses = {101: OPENED, 102: CLOSED}
+
+    summary = journal.reconcile({}, quote_status=statuses.get)
+    assert summary["checked"] == 2 and summary["closed"] == 1
+    assert list(journal.positions) == ["101"]
+    journal.close()
+    replayed = _journal(tmp_path)
+    assert list(replayed.positions) == ["101"]
+    replayed.close()
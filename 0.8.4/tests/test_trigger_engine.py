@@ -0,0 +1,173 @@
+"""TriggerEngine: crossed-trigger order, one-cancels-other, trailing stops and lazy cancellation."""
+
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "trading_bot_example")))
+import trigger_engine
+from trigger_engine import ABOVE, BELOW, TriggerEngine
+
+
+def test_below_triggers_fire_highest_level_first():
+    engine = TriggerEngine()
+    for level in ("2.95", "2.90", "3.00", "2.80"):
+        engine.add("XRPUSDT", level, BELOW)
+    fired = engine.crossed("XRPUSDT", 2.9)
+    assert [t.level for t in fired] == [3.0, 2.95, 2.9]
+    assert len(engine) == 1
+    assert engine.crossed("XRPUSDT", 2.85) == []
+
+
+def test_above_triggers_fire_lowest_level_first():
+    engine = TriggerEngine()
+    for level in ("3.2", "3.1", "3.4"):
+        engine.add("XRPUSDT", level, ABOVE)
+    assert [t.level for t in engine.crossed("XRPUSDT", 3.3)] == [3.1, 3.2]
+    assert [t.level for t in engine.crossed("XRPUSDT", 3.4)] == [3.4]
+    assert len(engine) == 0
+
+
+def test_stop_and_take_profit_sides_follow_position_type():
+    engine = TriggerEngine()
+    long_stop = engine.add_stop("XRPUSDT", quote_id=1, position_type=0, level="2.9")
+    short_stop = engine.add_stop("XRPUSDT", quote_id=2, position_type=1, level="3.1")
+    long_tp = engine.add_take_profit("XRPUSDT", quote_id=3, position_type=0, level="3.2")
+    short_tp = engine.add_take_profit("XRPUSDT", quote_id=4, position_type=1, level="2.8")
+    assert (long_stop.when, short_stop.when, long_tp.when, short_tp.when) == (BELOW, ABOVE, ABOVE, BELOW)
+    assert engine.crossed("XRPUSDT", 3.15) == [short_stop]
+
+
+def test_one_cancels_other_on_fire():
+    engine = TriggerEngine()
+    stop = engine.add_stop("XRPUSDT", quote_id=101, position_type=0, level="2.9")
+    take_profit = engine.add_take_profit("XRPUSDT", quote_id=101, position_type=0, level="3.3")
+    assert engine.on_price("XRPUSDT", 2.85, 1.0) == [stop]
+    assert stop.fired_at == 1.0
+    assert not take_profit.active
+    assert len(engine) == 0 and engine.by_quote == {}
+    assert engine.on_price("XRPUSDT", 3.5, 2.0) == []
+
+
+def test_siblings_crossed_on_the_same_tick_dispatch_once():
+    dispatched = []
+    engine = TriggerEngine(lambda trigger, price, ts: dispatched.append(trigger))
+    engine.add_stop("XRPUSDT", quote_id=7, position_type=0, level="2.9")
+    engine.add_trailing("XRPUSDT", quote_id=7, position_type=0, trail="0.01", reference="3.0")
+    engine.on_price("XRPUSDT", 2.5, 1.0)
+    assert len(dispatched) == 1
+    assert engine.stats["fired"] == 1
+
+
+def test_trailing_long_follows_the_peak():
+    engine = TriggerEngine()
+    trigger = engine.add_trailing("XRPUSDT", quote_id=None, position_type=0, trail="0.02", reference="100")
+    assert engine.crossed("XRPUSDT", 110) == []
+    assert engine.crossed("XRPUSDT", 108) == []  # 110 * 0.98 = 107.8
+    assert engine.crossed("XRPUSDT", 107.7) == [trigger]
+    assert abs(trigger.level - 107.8) < 1e-9
+
+
+def test_trailing_short_follows_the_low():
+    engine = TriggerEngine()
+    trigger = engine.add_trailing("XRPUSDT", quote_id=None, position_type=1, trail="0.05", reference="100")
+    assert engine.crossed("XRPUSDT", 80) == []
+    assert engine.crossed("XRPUSDT", 83.9) == []  # 80 * 1.05 = 84
+    assert engine.crossed("XRPUSDT", 84.1) == [trigger]
+    assert abs(trigger.level - 84.0) < 1e-9
+
+
+def test_tightest_trailing_stop_fires_first():
+    engine = TriggerEngine()
+    wide = engine.add_trailing("XRPUSDT", quote_id=None, position_type=0, trail="0.05", reference="100")
+    tight = engine.add_trailing("XRPUSDT", quote_id=None, position_type=0, trail="0.01", reference="100")
+    assert engine.crossed("XRPUSDT", 98) == [tight]
+    assert engine.crossed("XRPUSDT", 94) == [wide]
+
+
+def test_cancelled_triggers_never_fire_and_are_not_counted():
+    engine = TriggerEngine()
+    kept = engine.add_stop("XRPUSDT", quote_id=1, position_type=0, level="2.9")
+    cancelled = engine.add_stop("XRPUSDT", quote_id=2, position_type=0, level="2.95")
+    trailing = engine.add_trailing("XRPUSDT", quote_id=3, position_type=0, trail="0.01", reference="3.0")
+    engine.cancel(cancelled)
+    engine.cancel_quote(3)
+    assert len(engine) == 1
+    assert engine.crossed("XRPUSDT", 2.0) == [kept]
+    assert not trailing.active and trailing.fired_at is None
+    assert engine.stats["cancelled"] == 2
+
+
+def _brute_force(specs, cancelled, prices):
+    """Reference model: every live trigger checked on every tick."""
+    state = {}
+    for i, (kind, side, value, reference) in enumerate(specs):
+        state[i] = reference if kind == "trailing" else value
+    fired = []
+    for price in prices:
+        tick = set()
+        for i, (kind, side, value, reference) in enumerate(specs):
+            if i in cancelled or i not in state:
+                continue
+            if kind == "trailing":
+                if side == 0:
+                    state[i] = max(state[i], price)
+                    hit = price <= state[i] * (1 - value)
+                else:
+                    state[i] = min(state[i], price)
+                    hit = -price <= -state[i] * (1 + value)
+            else:
+                hit = price <= value if side == BELOW else price >= value
+            if hit:
+                tick.add(i)
+                del state[i]
+        fired.append(tick)
+    return fired
+
+
+def _check_against_brute_force(seed, cancels=60):
+    rng = random.Random(seed)
+    engine = TriggerEngine()
+    specs, triggers = [], []
+    for _ in range(300):
+        if rng.random() < 0.4:
+            side, trail, reference = rng.randint(0, 1), rng.choice((0.01, 0.02, 0.05)), rng.uniform(95, 105)
+            triggers.append(engine.add_trailing("SYM", None, side, trail, reference))
+            specs.append(("trailing", side, trail, reference))
+        else:
+            when, level = rng.choice((BELOW, ABOVE)), rng.uniform(80, 120)
+            triggers.append(engine.add("SYM", level, when))
+            specs.append(("fixed", when, level, None))
+    cancelled = set(rng.sample(range(len(specs)), cancels))
+    for i in cancelled:
+        engine.cancel(triggers[i])
+    prices, price = [], 100.0
+    for _ in range(2000):
+        price = min(max(price * (1 + rng.gauss(0, 0.004)), 70.0), 130.0)
+        prices.append(price)
+    ids = {trigger.id: i for i, trigger in enumerate(triggers)}
+    got = [{ids[t.id] for t in engine.crossed("SYM", p)} for p in prices]
+    assert got == _brute_force(specs, cancelled, prices)
+    assert len(engine) == len(specs) - len(cancelled) - sum(len(tick) for tick in got)
+
+
+def _counting(method, calls):
+    def wrapper(self):
+        calls.append(self)
+        return method(self)
+    return wrapper
+
+
+def test_matches_brute_force_scan():
+    for seed in range(5):
+        _check_against_brute_force(seed)
+
+
+def test_matches_brute_force_scan_with_compaction(monkeypatch):
+    # Cancelled entries outnumber live ones, so the books are rebuilt mid-run
+    monkeypatch.setattr(trigger_engine, "COMPACT_MIN", 1)
+    compactions = []
+    monkeypatch.setattr(trigger_engine._SymbolBook, "compact", _counting(trigger_engine._SymbolBook.compact, compactions))
+    for seed in range(5):
+        _check_against_brute_force(seed, cancels=200)
+    assert compactions
@@ -0,0 +1,472 @@
+"""Backtest: deterministic replay of the bots' strategies against a simulated solver
+
+What this script does
+- Replays recorded (CSV) or synthetic ticks through the strategy code the bots
+  trade with: `ThresholdStrategy.decide` on `StrategyInstance` state
+  (strategy_runner.py, the legacy bot's entry/exit rule), plus the demos' stop
+  loss placed at `stop_loss_pct` from the fill (conditional_orders.trigger_price).
+- The clock is the ticks' own timestamps, so a day of ticks replays in seconds
+  and the same input always gives the same trades.
+- `SimulatedSolver` stands in for the solver:
+  - latency: an order signalled at t is filled at the first tick at or after
+    t + latency (fixed, or with seeded log-normal jitter)
+  - slippage: the open/close carries the bots' limit price (signal price
+    +/- slippage, rounded down to the symbol's precision); if the market has
+    moved past it when the order lands, the solver rejects it
+  - funding: open positions pay (longs) or receive (shorts) `funding_rate_8h`
+    on their notional, accrued between ticks
+  - margin: each open's cva / lf / partyAmm come from MarginEngine with the
+    symbol's locked params, as in the live payload
+- `sweep()` evaluates a grid of (entry, exit, stop loss) combinations for one
+  symbol in NumPy: each tick updates every combination's state at once, and the
+  grid is split across processes, one per core. `main()` replays a sample of
+  the grid through the per-instance engine and checks both agree.
+- Positions still open when the data ends are marked to market at the last
+  price; that unrealized PnL is part of net PnL in both engines.
+- Reports PnL (gross, unrealized, funding, net, return on peak locked margin), trades,
+  stops and rejections, and the signal-to-fill latency and slippage cost.
+
+Run
+- python trading_bot_example/backtest.py                 # synthetic ticks
+- python trading_bot_example/backtest.py ticks.csv       # timestamp,symbol,price CSV (one symbol swept)
+"""
+
+import os
+import sys
+import math
+import time
+import random
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "instant_actions")))
+from conditional_orders import STOP_LOSS, trigger_price
+from margin_engine import MarginEngine
+from symbol_catalog import SymbolFormatter
+from market_data_feed import ReplaySource, random_walk_ticks
+from strategy_runner import OPEN, CLOSE, StrategyInstance, ThresholdStrategy
+
+STOP = "stop"
+SECONDS_PER_8H = 8 * 3600
+
+CONFIG = {
+    "LATENCY": 0.25,            # Seconds from signal to fill
+    "SLIPPAGE": "0.01",
+    "FUNDING_RATE_8H": "0.0001",
+    "PRICE_PRECISION": 2,
+    "QUANTITY_PRECISION": 3,
+    "LOCKED_PARAMS": {"leverage": "1", "cva": "2", "lf": "1", "partyAmm": "20", "partyBmm": "0"},
+}
+
+
+class SimulatedSolver:
+    """Fill, slippage, funding and margin model used in place of the solver."""
+
+    def __init__(
+        self,
+        latency: float = CONFIG["LATENCY"],
+        jitter: float = 0.0,
+        funding_rate_8h: str = CONFIG["FUNDING_RATE_8H"],
+        locked_params: Optional[Dict] = None,
+        price_precision: int = CONFIG["PRICE_PRECISION"],
+        quantity_precision: int = CONFIG["QUANTITY_PRECISION"],
+        seed: int = 1,
+    ):
+        """`jitter` is the sigma of a log-normal factor on `latency` (0 = fixed latency)."""
+        self.latency = latency
+        self.jitter = jitter
+        self.funding_per_s = Decimal(funding_rate_8h) / SECONDS_PER_8H
+        self.engine = MarginEngine(locked_params or CONFIG["LOCKED_PARAMS"])
+        self.fmt = SymbolFormatter(price_precision, quantity_precision)
+        self._rng = random.Random(seed)
+
+    def order_latency(self) -> float:
+        if not self.jitter:
+            return self.latency
+        return self.latency * math.exp(self._rng.gauss(0, self.jitter))
+
+    def limit_price(self, action: str, price: Decimal, position_type: int, slippage: Decimal) -> Decimal:
+        """The price the bot sends: opens accept worse by `slippage`, closes give up `slippage`."""
+        direction = 1 if (action == OPEN) == (position_type == 0) else -1
+        return Decimal(self.fmt.price(price * (1 + direction * slippage)))
+
+    def fills(self, action: str, price: Decimal, limit: Decimal, position_type: int) -> bool:
+        """Buys (long open, short close) fill at or below the limit, sells at or above it."""
+        buying = (action == OPEN) == (position_type == 0)
+        return price <= limit if buying else price >= limit
+
+    def locked_margin(self, price: Decimal, quantity: str, position_type: int) -> Decimal:
+        order = self.engine.instant_order(int(price * 10**18), quantity, position_type, slippage="0",
+                                          quantity_precision=self.fmt.quantity_precision)
+        return Decimal(order["cva"]) + Decimal(order["lf"]) + Decimal(order["partyAmm"])
+
+
+class _SimPosition:
+    """Simulator-side state of one instance: its pending order and open position."""
+
+    __slots__ = (
+        "instance", "stop_loss_pct", "action", "due", "limit", "signal_price", "signal_ts",
+        "open_price", "stop_price", "margin", "gross", "unrealized", "funding", "trades", "wins", "stops", "rejected",
+    )
+
+    def __init__(self, instance: StrategyInstance, stop_loss_pct: Optional[Decimal]):
+        self.instance = instance
+        self.stop_loss_pct = stop_loss_pct
+        self.action: Optional[str] = None
+        self.due = 0.0
+        self.limit = Decimal(0)
+        self.signal_price = Decimal(0)
+        self.signal_ts = 0.0
+        self.open_price = Decimal(0)
+        self.stop_price: Optional[Decimal] = None
+        self.margin = Decimal(0)
+        self.gross = Decimal(0)
+        self.unrealized = Decimal(0)
+        self.funding = Decimal(0)
+        self.trades = 0
+        self.wins = 0
+        self.stops = 0
+        self.rejected = 0
+
+
+class Backtest:
+    """Replays ticks through strategy instances, filling their orders with a `SimulatedSolver`."""
+
+    def __init__(self, solver: Optional[SimulatedSolver] = None, slippage: str = CONFIG["SLIPPAGE"]):
+        self.solver = solver or SimulatedSolver()
+        self.slippage = Decimal(slippage)
+        self.positions: List[_SimPosition] = []
+        self._by_symbol: Dict[str, List[_SimPosition]] = {}
+        self.latencies: List[float] = []
+        self.slippage_cost = Decimal(0)
+        self.stats = {"ticks": 0, "evaluations": 0, "signals": 0, "peak_margin": Decimal(0)}
+
+    def add_instance(self, account: str, symbol: str, symbol_id: int, strategy, quantity: str,
+                     position_type: int = 0, leverage: str = "1", stop_loss_pct: Optional[str] = None) -> StrategyInstance:
+        instance = StrategyInstance(account, symbol, symbol_id, strategy, quantity, position_type, leverage)
+        position = _SimPosition(instance, Decimal(stop_loss_pct) if stop_loss_pct is not None else None)
+        self._by_symbol.setdefault(instance.symbol, []).append(position)
+        self.positions.append(position)
+        return instance
+
+    def _signal(self, position: _SimPosition, action: str, price: Decimal, ts: float) -> None:
+        instance = position.instance
+        side = CLOSE if action == STOP else action
+        position.action = action
+        position.due = ts + self.solver.order_latency()
+        position.limit = self.solver.limit_price(side, price, instance.position_type, self.slippage)
+        position.signal_price = price
+        position.signal_ts = ts
+        instance.busy = True
+        self.stats["signals"] += 1
+
+    def _fill(self, position: _SimPosition, price: Decimal, ts: float, margin: List[Decimal]) -> None:
+        instance = position.instance
+        action, position.action = position.action, None
+        instance.busy = False
+        side = CLOSE if action == STOP else action
+        if not self.solver.fills(side, price, position.limit, instance.position_type):
+            position.rejected += 1
+            instance.errors += 1
+            return
+        quantity = Decimal(instance.quantity)
+        self.latencies.append(ts - position.signal_ts)
+        self.slippage_cost += abs(price - position.signal_price) * quantity
+        if side == OPEN:
+            instance.in_position, instance.quote_id = True, instance.opens
+            instance.opens += 1
+            position.open_price = price
+            if position.stop_loss_pct is not None:
+                stop = trigger_price(price, instance.position_type, STOP_LOSS, position.stop_loss_pct)
+                position.stop_price = Decimal(self.solver.fmt.price(stop))
+            position.margin = self.solver.locked_margin(price, instance.quantity, instance.position_type)
+            margin[0] += position.margin
+        else:
+            instance.in_position, instance.quote_id = False, None
+            instance.closes += 1
+            pnl = (price - position.open_price) * quantity
+            if instance.position_type == 1:
+                pnl = -pnl
+            position.gross += pnl
+            position.trades += 1
+            position.wins += pnl > 0
+            position.stops += action == STOP
+            position.stop_price = None
+            margin[0] -= position.margin
+
+    def run(self, ticks: Iterable[Tuple[float, str, str]]) -> Dict[str, Any]:
+        """Replay `(timestamp, symbol, price)` ticks in order; returns the report."""
+        funding_per_s = self.solver.funding_per_s
+        last_price: Dict[str, Decimal] = {}
+        last_ts: Dict[str, float] = {}
+        margin = [Decimal(0)]
+        peak_margin = Decimal(0)
+        first_ts = last = None
+        started = time.perf_counter()
+        for ts, symbol, raw in ticks:
+            self.stats["ticks"] += 1
+            if first_ts is None:
+                first_ts = ts
+            last = ts
+            positions = self._by_symbol.get(symbol)
+            if not positions:
+                continue
+            price = Decimal(raw)
+            previous = last_price.get(symbol)
+            if previous is not None:
+                elapsed = Decimal(ts - last_ts[symbol])
+                for position in positions:
+                    if position.instance.in_position:
+                        funding = previous * Decimal(position.instance.quantity) * funding_per_s * elapsed
+                        position.funding += funding if position.instance.position_type == 0 else -funding
+            last_price[symbol], last_ts[symbol] = price, ts
+
+            for position in positions:
+                if position.action is not None and position.due <= ts:
+                    self._fill(position, price, ts, margin)
+            if margin[0] > peak_margin:
+                peak_margin = margin[0]
+
+            if previous == price:
+                continue  # the feed only calls strategies on a price change
+            self.stats["evaluations"] += len(positions)
+            for position in positions:
+                instance = position.instance
+                if instance.busy:
+                    continue
+                stop = position.stop_price
+                if instance.in_position and stop is not None and (
+                        price <= stop if instance.position_type == 0 else price >= stop):
+                    self._signal(position, STOP, price, ts)
+                    continue
+                action = instance.strategy.decide(instance, price)
+                if action is not None:
+                    self._signal(position, action, price, ts)
+        # Positions still open at the end of data are marked to market at their symbol's last price
+        for symbol, positions in self._by_symbol.items():
+            for position in positions:
+                instance = position.instance
+                if instance.in_position and symbol in last_price:
+                    pnl = (last_price[symbol] - position.open_price) * Decimal(instance.quantity)
+                    position.unrealized = -pnl if instance.position_type == 1 else pnl
+        elapsed = time.perf_counter() - started
+        self.stats["peak_margin"] = peak_margin
+        return self.report(elapsed, (last - first_ts) if first_ts is not None else 0.0)
+
+    def report(self, elapsed: float, simulated_s: float) -> Dict[str, Any]:
+        gross = sum(p.gross for p in self.positions)
+        unrealized = sum(p.unrealized for p in self.positions)
+        funding = sum(p.funding for p in self.positions)
+        net = gross + unrealized - funding
+        latencies = sorted(self.latencies)
+        peak = self.stats["peak_margin"]
+        return {
+            "instances": len(self.positions),
+            "ticks": self.stats["ticks"],
+            "evaluations": self.stats["evaluations"],
+            "elapsed_s": elapsed,
+            "ticks_per_s": self.stats["ticks"] / elapsed if elapsed else 0.0,
+            "speedup": simulated_s / elapsed if elapsed else 0.0,
+            "trades": sum(p.trades for p in self.positions),
+            "wins": sum(p.wins for p in self.positions),
+            "stops": sum(p.stops for p in self.positions),
+            "rejected": sum(p.rejected for p in self.positions),
+            "open_positions": sum(p.instance.in_position for p in self.positions),
+            "gross_pnl": gross,
+            "unrealized_pnl": unrealized,
+            "funding": funding,
+            "net_pnl": net,
+            "peak_margin": peak,
+            "return_on_margin": net / peak if peak else Decimal(0),
+            "latency_p50_s": statistics.median(latencies) if latencies else 0.0,
+            "latency_p95_s": latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0,
+            "slippage_cost": self.slippage_cost,
+        }
+
+
+# --------------------------------------------------------------------
+# Vectorized parameter sweep
+# --------------------------------------------------------------------
+def _floor_price(values: np.ndarray, precision: int) -> np.ndarray:
+    """`SymbolFormatter.price` (ROUND_DOWN) on float64, nudged so exact decimals are not floored a step low."""
+    scale = 10.0 ** precision
+    return np.floor(values * scale + 1e-6) / scale
+
+
+def _sweep_kernel(args) -> Dict[str, np.ndarray]:
+    """One chunk of the grid: every tick updates all of the chunk's combinations at once."""
+    (timestamps, prices, entries, exits, stop_pcts, quantity, position_type,
+     latency, slippage, funding_per_s, precision) = args
+    n = len(entries)
+    long = position_type == 0
+    side = 1.0 if long else -1.0
+    in_pos = np.zeros(n, dtype=bool)
+    pending = np.zeros(n, dtype=np.int8)  # 0 none, 1 open, 2 close, 3 stop
+    due = np.zeros(n)
+    limit = np.zeros(n)
+    open_px = np.zeros(n)
+    stop_px = np.full(n, np.nan)
+    gross = np.zeros(n)
+    funding = np.zeros(n)
+    trades = np.zeros(n, dtype=np.int64)
+    stops = np.zeros(n, dtype=np.int64)
+    rejected = np.zeros(n, dtype=np.int64)
+    has_stop = ~np.isnan(stop_pcts)
+    stop_factor = np.where(has_stop, 1 - side * np.nan_to_num(stop_pcts), np.nan)
+    open_factor, close_factor = 1 + side * slippage, 1 - side * slippage
+
+    prev_price = prev_ts = None
+    for ts, price in zip(timestamps.tolist(), prices.tolist()):
+        if prev_price is not None:
+            funding[in_pos] += side * quantity * prev_price * funding_per_s * (ts - prev_ts)
+
+        due_now = (pending != 0) & (due <= ts)
+        if due_now.any():
+            opening = due_now & (pending == 1)
+            closing = due_now & (pending >= 2)
+            open_ok = opening & ((price <= limit) if long else (price >= limit))
+            close_ok = closing & ((price >= limit) if long else (price <= limit))
+            in_pos |= open_ok
+            open_px[open_ok] = price
+            stop_px[open_ok] = _floor_price(price * stop_factor[open_ok], precision)
+            gross[close_ok] += side * (price - open_px[close_ok]) * quantity
+            trades += close_ok
+            stops += close_ok & (pending == 3)
+            in_pos &= ~close_ok
+            stop_px[close_ok] = np.nan
+            rejected += (opening & ~open_ok) | (closing & ~close_ok)
+            pending[due_now] = 0
+
+        if price != prev_price:
+            idle = pending == 0
+            with np.errstate(invalid="ignore"):
+                stopped = idle & in_pos & ((price <= stop_px) if long else (price >= stop_px))
+            to_open = idle & ~in_pos & ((price <= entries) if long else (price >= entries))
+            to_close = idle & in_pos & ~stopped & ((price >= exits) if long else (price <= exits))
+            if to_open.any() or to_close.any() or stopped.any():
+                signalled = to_open | to_close | stopped
+                pending[to_open] = 1
+                pending[to_close] = 2
+                pending[stopped] = 3
+                due[signalled] = ts + latency
+                limit[to_open] = _floor_price(np.array([price * open_factor]), precision)[0]
+                limit[to_close | stopped] = _floor_price(np.array([price * close_factor]), precision)[0]
+        prev_price, prev_ts = price, ts
+    # Mark what is still open to market at the last price, so open losers cannot rank as flat
+    unrealized = np.zeros(n)
+    if prev_price is not None:
+        unrealized[in_pos] = side * (prev_price - open_px[in_pos]) * quantity
+    return {"gross": gross, "unrealized": unrealized, "funding": funding, "open": in_pos,
+            "trades": trades, "stops": stops, "rejected": rejected}
+
+
+def sweep(
+    timestamps: Sequence[float],
+    prices: Sequence[float],
+    entries: Sequence[float],
+    exits: Sequence[float],
+    stop_loss_pcts: Sequence[float],
+    quantity: float = 1.0,
+    position_type: int = 0,
+    latency: float = CONFIG["LATENCY"],
+    slippage: float = float(CONFIG["SLIPPAGE"]),
+    funding_rate_8h: float = float(CONFIG["FUNDING_RATE_8H"]),
+    precision: int = CONFIG["PRICE_PRECISION"],
+    workers: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """Every (entry, exit, stop) combination over one symbol's ticks; `nan` stop = no stop loss.
+
+    Returns flat arrays over the grid: the parameters, gross / unrealized / funding /
+    net PnL (positions still open are marked at the last price), whether a position
+    is still open, trades, stops and rejections.
+    """
+    grid = np.array(np.meshgrid(entries, exits, stop_loss_pcts, indexing="ij"), dtype=np.float64).reshape(3, -1)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    workers = workers or os.cpu_count() or 1
+    chunks = [idx for idx in np.array_split(np.arange(grid.shape[1]), workers) if len(idx)]
+    jobs = [
+        (timestamps, prices, grid[0, idx], grid[1, idx], grid[2, idx], quantity, position_type,
+         latency, slippage, funding_rate_8h / SECONDS_PER_8H, precision)
+        for idx in chunks
+    ]
+    if len(jobs) == 1:
+        parts = [_sweep_kernel(jobs[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+            parts = list(pool.map(_sweep_kernel, jobs))
+    out = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+    out.update(entry=grid[0], exit=grid[1], stop_loss_pct=grid[2], net=out["gross"] + out["unrealized"] - out["funding"])
+    return out
+
+
+def load_ticks(path: str) -> List[Tuple[float, str, str]]:
+    return list(ReplaySource.from_csv(path).ticks)
+
+
+def main():
+    ticks = load_ticks(sys.argv[1]) if len(sys.argv) > 1 else random_walk_ticks(["XRPUSDT"], 200_000)
+    symbol = ticks[0][1]
+    series = [(ts, price) for ts, sym, price in ticks if sym == symbol]
+    timestamps = [ts for ts, _ in series]
+    first = Decimal(series[0][1])
+    entries = [str((first * (1 - Decimal(k) / 2000)).quantize(Decimal("0.01"))) for k in range(1, 21)]
+    exits = [str((first * (1 + Decimal(k) / 2000)).quantize(Decimal("0.01"))) for k in range(0, 20)]
+    stop_loss_pcts = [None, "0.001", "0.0025", "0.005", "0.01"]
+    quantity = "10"
+    print(f"[BACKTEST] {symbol}: {len(series)} ticks over {timestamps[-1] - timestamps[0]:.0f}s, "
+          f"{len(entries) * len(exits) * len(stop_loss_pcts)} parameter combinations")
+
+    # 1. Per-instance replay through ThresholdStrategy, on a sample of the grid
+    rng = random.Random(3)
+    sample = [(rng.choice(entries), rng.choice(exits), rng.choice(stop_loss_pcts)) for _ in range(24)]
+    backtest = Backtest(SimulatedSolver())
+    for i, (entry, exit, stop) in enumerate(sample):
+        backtest.add_instance(f"0x{i:040x}", symbol, 340, ThresholdStrategy(entry, exit), quantity, stop_loss_pct=stop)
+    report = backtest.run(ticks)
+    print(f"[BACKTEST] Replay: {report['instances']} instances, {report['ticks']} ticks in {report['elapsed_s']:.2f}s "
+          f"({report['ticks_per_s']:,.0f} simulated ticks/s, {report['speedup']:,.0f}x real time)")
+    print(f"[BACKTEST]   {report['trades']} round trips ({report['wins']} winners, {report['stops']} stopped out, "
+          f"{report['rejected']} rejected by slippage)")
+    print(f"[BACKTEST]   PnL gross {report['gross_pnl']:.4f}, unrealized {report['unrealized_pnl']:.4f} "
+          f"({report['open_positions']} still open), funding {report['funding']:.6f}, net {report['net_pnl']:.4f}, "
+          f"peak locked margin {report['peak_margin']:.4f} ({report['return_on_margin']:.2%} on margin)")
+    print(f"[BACKTEST]   Signal to fill: p50 {report['latency_p50_s'] * 1000:.0f}ms, p95 {report['latency_p95_s'] * 1000:.0f}ms; "
+          f"slippage cost {report['slippage_cost']:.4f}")
+
+    # 2. The whole grid, vectorized and split across cores
+    start = time.perf_counter()
+    result = sweep(timestamps, [float(price) for _, price in series], [float(e) for e in entries],
+                   [float(x) for x in exits], [math.nan if s is None else float(s) for s in stop_loss_pcts],
+                   quantity=float(quantity))
+    elapsed = time.perf_counter() - start
+    combos = len(result["net"])
+    print(f"[BACKTEST] Sweep: {combos} combinations in {elapsed:.2f}s on {os.cpu_count()} core(s) "
+          f"({combos * len(series) / elapsed:,.0f} simulated ticks/s)")
+    best = int(np.argmax(result["net"]))
+    stop = result["stop_loss_pct"][best]
+    print(f"[BACKTEST]   Best: entry {result['entry'][best]:.2f}, exit {result['exit'][best]:.2f}, "
+          f"stop {'none' if math.isnan(stop) else f'{stop:.3f}'}: net {result['net'][best]:.4f} over "
+          f"{result['trades'][best]} trades{' (position still open)' if result['open'][best] else ''}")
+
+    # 3. The sweep must agree with the replay on the sampled combinations
+    index = {
+        (round(e, 8), round(x, 8), None if math.isnan(s) else round(s, 8)): i
+        for i, (e, x, s) in enumerate(zip(result["entry"], result["exit"], result["stop_loss_pct"]))
+    }
+    mismatches = 0
+    for (entry, exit, stop), position in zip(sample, backtest.positions):
+        i = index[(round(float(entry), 8), round(float(exit), 8), None if stop is None else round(float(stop), 8))]
+        same = (position.trades == result["trades"][i] and position.stops == result["stops"][i]
+                and position.rejected == result["rejected"][i]
+                and abs(float(position.gross + position.unrealized - position.funding) - result["net"][i]) < 1e-6)
+        mismatches += not same
+    print(f"[BACKTEST] Sweep vs replay on {len(sample)} sampled combinations: {mismatches} mismatches")
+
+
+if __name__ == "__main__":
+    main()
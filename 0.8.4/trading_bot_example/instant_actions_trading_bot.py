@@ -2,6 +2,11 @@
 
 What this script does
 - Logs in to a hedger/solver (SIWE) and then performs instant actions based on price checks.
+- Startup I/O (login, locked params, quote status, diamond contract) runs concurrently
+  (instant_actions/warmup.py), with a per-dependency readiness report.
+- Prices stream from Binance trades (market_data_feed.py); entry/exit checks run on every price change.
+- Position and pending-quote state is journaled (instant_actions/state_journal.py); a restart
+  replays it and reconciles only those quotes, so it neither enters twice nor forgets a position.
 
 Run
 - python trading_bot_example/instant_actions_trading_bot.py
@@ -15,18 +20,32 @@ Required .env
 
 Optional .env
 - CHAIN_ID (default: 42161)
+- NOTIFICATION_APP_NAME  # confirm quotes over the notification websocket; without it the status endpoint is polled
+- TRACE_ENABLED / TRACE_JSONL / TRACE_PROMETHEUS_PORT  # per-stage latency spans (instant_actions/tracing.py)
+- JOURNAL_DIR (default: ~/.symmio/journals)  # crash-safe bot state
+- RPC_URL  # check journaled positions on-chain (getQuote); without it the solver's status endpoint is used
 """
 
 import os
 import time
+import asyncio
 import requests
-import json
-from eth_account import Account
-from eth_account.messages import encode_defunct
 from dotenv import load_dotenv
-from datetime import datetime, timedelta, timezone
+from datetime import timedelta
 from decimal import Decimal
 import traceback
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "instant_actions")))
+from session_manager import SiweSessionManager
+from notification_hub import NotificationHub, QuoteFailed
+from locked_params_cache import LockedParamsCache
+from margin_engine import MarginEngine
+from market_data_feed import MarketDataFeed, BinanceTradeSource
+from tracing import TRACER, traced, configure as configure_tracing
+from state_journal import StateJournal, diamond_quote_status
+from warmup import Warmup, WarmupError, load_diamond
+from strategy_runner import OPEN, CLOSE, StrategyInstance, ThresholdStrategy
 
 # Configuration
 CONFIG = {
@@ -39,8 +58,8 @@ CONFIG = {
     "LEVERAGE": "1",        # Leverage value
     "MAX_FUNDING_RATE": "200",
     "DEADLINE_OFFSET": 3600,  # 1 hour
-    "POLL_INTERVAL": 5,       # Seconds between price checks
-    "STATUS_POLL_INTERVAL": 0.5  # Seconds between status checks
+    "CONFIRMATION_TIMEOUT": 60,  # Seconds to wait for a quote confirmation
+    "STATUS_POLL_INTERVAL": 0.5  # Seconds between status checks when there is no notification app name
 }
 
 # Load environment variables
@@ -52,122 +71,39 @@ ACTIVE_ACCOUNT = os.getenv("SUB_ACCOUNT_ADDRESS")
 HEDGER_URL = os.getenv("HEDGER_URL")
 CHAIN_ID = int(os.getenv("CHAIN_ID", 42161))
 MUON_BASE_URL = os.getenv("MUON_BASE_URL")
-DOMAIN = "localhost"
-ORIGIN = "http://localhost:3000"
-LOGIN_URI = f"{HEDGER_URL}/login"
 DIAMOND_ADDRESS = os.getenv("DIAMOND_ADDRESS")
 
 # URLs
-BINANCE_API_URL = "https://api.binance.com/api/v3/ticker/price"
-LOCKED_PARAMS_URL = f"{HEDGER_URL}/get_locked_params/XRPUSDT?leverage={CONFIG['LEVERAGE']}"
+LOCKED_PARAMS = LockedParamsCache(HEDGER_URL)
 MUON_URL = f"{MUON_BASE_URL}?app=symmio&method=uPnl_A_withSymbolPrice&params[partyA]={ACTIVE_ACCOUNT}&params[chainId]={CHAIN_ID}&params[symmio]={DIAMOND_ADDRESS}&params[symbolId]={CONFIG['SYMBOL_ID']}"
 STATUS_URL = f"{HEDGER_URL}/instant_open/{ACTIVE_ACCOUNT}"
+MUON_HTTP = requests.Session()  # kept warm from startup so price fetches skip the handshake
+NOTIFICATION_APP_NAME = os.getenv("NOTIFICATION_APP_NAME")
 
-# Initialize wallet
-wallet = Account.from_key(PRIVATE_KEY)
+# Crash-safe record of this bot's pending opens and positions
+JOURNAL = StateJournal(f"instant_actions_bot_{ACTIVE_ACCOUNT}")
 
-# Timestamp formats
-ISSUED_AT = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
-EXPIRATION_DATE = (datetime.now(timezone.utc) + timedelta(hours=2, minutes=30)).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+# Solver session: the access token is cached on disk and reused until shortly before expiry
+SESSION = SiweSessionManager(HEDGER_URL, PRIVATE_KEY, ACTIVE_ACCOUNT, CHAIN_ID, lifetime=timedelta(hours=2, minutes=30))
 
-def get_nonce(address: str) -> str:
-    """Fetch the nonce for the active account from the server."""
-    url = f"{HEDGER_URL}/nonce/{address}"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()["nonce"]
-
-def build_siwe_message(domain, address, statement, uri, version, chain_id, nonce, issued_at, expiration_time):
-    """Build a SIWE message string following the EIP-4361 format."""
-    return f"""{domain} wants you to sign in with your Ethereum account:
-{address}
-
-{statement}
-
-URI: {uri}
-Version: {version}
-Chain ID: {chain_id}
-Nonce: {nonce}
-Issued At: {issued_at}
-Expiration Time: {expiration_time}"""
 
+@traced("login")
 def login():
-    """Perform SIWE login and return the access token."""
+    """Return a valid access token, logging in via SIWE only when the cached one is missing or expiring."""
     try:
-        print(f"[LOGIN] Wallet Address: {wallet.address}")
-        print(f"[LOGIN] Active Account: {ACTIVE_ACCOUNT}")
-
-        # Fetch the nonce for the active account from the server
-        nonce = get_nonce(ACTIVE_ACCOUNT)
-        print(f"[LOGIN] Got nonce: {nonce}")
-
-        # Create the SIWE message manually
-        message_string = build_siwe_message(
-            domain=DOMAIN,
-            address=wallet.address,
-            statement=f"msg: {ACTIVE_ACCOUNT}",
-            uri=LOGIN_URI,
-            version="1",
-            chain_id=CHAIN_ID,
-            nonce=nonce,
-            issued_at=ISSUED_AT,
-            expiration_time=EXPIRATION_DATE
-        )
-
-        message = encode_defunct(text=message_string)
-        
-        signed_message = wallet.sign_message(message)
-        signature = "0x" + signed_message.signature.hex()
-
-        body = {
-            "account_address": ACTIVE_ACCOUNT,
-            "expiration_time": EXPIRATION_DATE,
-            "issued_at": ISSUED_AT,
-            "signature": signature,
-            "nonce": nonce
-        }
-
-        headers = {
-            "Content-Type": "application/json",
-            "Origin": ORIGIN,
-            "Referer": ORIGIN,
-        }
-
-        print("[LOGIN] Sending login request...")
-
-        response = requests.post(
-            LOGIN_URI,
-            json=body,
-            headers=headers
-        )
-        
-        response.raise_for_status()
-        token = response.json().get("access_token")
-        print(f"[LOGIN] Successfully obtained access token")
+        token = SESSION.get_token()
+        print(f"[LOGIN] Using access token for {ACTIVE_ACCOUNT}")
         return token
     except Exception as e:
         print(f"[ERROR] Login failed: {e}")
         traceback.print_exc()
         return None
 
-def get_binance_price(symbol):
-    """Get the current price of a symbol from Binance."""
-    try:
-        params = {"symbol": symbol}
-        response = requests.get(BINANCE_API_URL, params=params)
-        response.raise_for_status()
-        data = response.json()
-        price = Decimal(data["price"])
-        print(f"[PRICE] Current {symbol} price: {price}")
-        return price
-    except Exception as e:
-        print(f"[ERROR] Failed to get Binance price: {e}")
-        return None
-
+@traced("fetch_muon_price")
 def fetch_muon_price():
     """Fetch the current price from Muon oracle."""
     try:
-        response = requests.get(MUON_URL)
+        response = MUON_HTTP.get(MUON_URL, timeout=30)
         response.raise_for_status()
         data = response.json()
         fetched_price_wei = data["result"]["data"]["result"]["price"]
@@ -178,39 +114,30 @@ def fetch_muon_price():
         print(f"[ERROR] Failed to fetch Muon price: {e}")
         return None
 
+@traced("fetch_locked_params")
 def fetch_locked_params():
-    """Fetch locked parameters for the trade."""
+    """Locked parameters for the trade, from the cache (warmed at startup, refreshed in the background)."""
     try:
-        response = requests.get(LOCKED_PARAMS_URL)
-        response.raise_for_status()
-        data = response.json()
-        if data.get("message") == "Success":
-            return data
-        else:
-            raise ValueError("Failed to fetch locked parameters")
+        return LOCKED_PARAMS.get(CONFIG["SYMBOL"], CONFIG["LEVERAGE"])
     except Exception as e:
         print(f"[ERROR] Failed to fetch locked parameters: {e}")
         return None
 
-def calculate_normalized_locked_value(notional, locked_param, leverage, apply_leverage=True):
-    """Compute normalized locked value for a given parameter."""
-    notional = Decimal(str(notional))
-    locked_param = Decimal(str(locked_param))
-    leverage = Decimal(str(leverage))
-    
-    if apply_leverage:
-        return str(notional * locked_param / (Decimal('100') * leverage))
-    else:
-        return str(notional * locked_param / Decimal('100'))
+@traced("open_instant_trade")
+def open_instant_trade():
+    """Execute an instant open trade (SESSION sends the current access token and re-logs in once on a 401).
 
-def open_instant_trade(token):
-    """Execute an instant open trade using the access token. Returns temp_quote_id."""
+    Returns (temp_quote_id, rejected). `rejected` is True only when the open certainly created no
+    quote: it was never sent, or the solver answered 4xx. After a timeout, a dropped connection or a
+    5xx the outcome is unknown and both are falsy.
+    """
+    sent = False
     try:
         print("[TRADE] Starting instant open process...")
         
         fetched_price = fetch_muon_price()
         if not fetched_price:
-            return None
+            return None, True
         print(f"[TRADE] Fetched price: {fetched_price}")
         
         # Because in this example we are going LONG, we are increasing the price by 1% before we send the order
@@ -219,15 +146,12 @@ def open_instant_trade(token):
         
         locked_params = fetch_locked_params()
         if not locked_params:
-            return None
+            return None, True
         
         notional = adjusted_price * Decimal(CONFIG["QUANTITY"])
         print(f"[TRADE] Notional: {notional}")
         
-        leverage = Decimal(locked_params["leverage"])
-        normalized_cva = calculate_normalized_locked_value(notional, locked_params["cva"], leverage, True)
-        normalized_lf = calculate_normalized_locked_value(notional, locked_params["lf"], leverage, True)
-        normalized_party_amm = calculate_normalized_locked_value(notional, locked_params["partyAmm"], leverage, True)
+        locked = MarginEngine(locked_params).locked_values(notional)
         
         deadline = int(time.time()) + CONFIG["DEADLINE_OFFSET"]
         trade_params = {
@@ -236,9 +160,9 @@ def open_instant_trade(token):
             "orderType": 1,  # 1 for market order
             "price": str(adjusted_price),
             "quantity": CONFIG["QUANTITY"],
-            "cva": normalized_cva,
-            "lf": normalized_lf,
-            "partyAmm": normalized_party_amm,
+            "cva": locked["cva"],
+            "lf": locked["lf"],
+            "partyAmm": locked["partyAmm"],
             "partyBmm": '0',
             "maxFundingRate": CONFIG["MAX_FUNDING_RATE"],
             "deadline": deadline
@@ -246,15 +170,17 @@ def open_instant_trade(token):
         
         print(f"[TRADE] Trade Payload: {trade_params}")
         
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {token}"
-        }
+        headers = {"Content-Type": "application/json"}
         
-        response = requests.post(f"{HEDGER_URL}/instant_open", json=trade_params, headers=headers)
+        sent = True
+        response = SESSION.request("POST", f"{HEDGER_URL}/instant_open", json=trade_params, headers=headers)
         
         print(f"[TRADE] Response status: {response.status_code}")
         print(f"[TRADE] Response: {response.text}")
+        LOCKED_PARAMS.check_response(CONFIG["SYMBOL"], CONFIG["LEVERAGE"], response)
+        if 400 <= response.status_code < 500:
+            print(f"[ERROR] Instant open rejected ({response.status_code})")
+            return None, True
         
         response.raise_for_status()
         result = response.json()
@@ -262,92 +188,113 @@ def open_instant_trade(token):
         temp_quote_id = result.get("quote_id")
         if temp_quote_id:
             print(f"[TRADE] Received temporary quote ID: {temp_quote_id}")
-            return temp_quote_id
+            return temp_quote_id, False
         else:
             print("[ERROR] No temporary quote ID in response")
-            return None
+            return None, False
             
     except Exception as e:
         print(f"[ERROR] Failed to open instant trade: {e}")
         traceback.print_exc()
-        return None
+        return None, not sent
 
-def poll_quote_status(token, temp_quote_id):
-    """Poll for the status of a quote until it gets a permanent ID.""" #In order to track the status of the quote, we will poll the /instant_open/{address} endpoint
-    print(f"[STATUS] Starting to poll for quote status of temp ID: {temp_quote_id}")
-    
-    headers = {
-        "Authorization": f"Bearer {token}"
-    }
-    
-    max_attempts = 120  # 60 seconds (120 * 0.5s)
-    attempts = 0
-    
-    if isinstance(temp_quote_id, str) and temp_quote_id.startswith('-'):
-        try:
-            temp_quote_id = int(temp_quote_id)
-        except ValueError:
-            print(f"[STATUS] Warning: Could not convert temp_quote_id {temp_quote_id} to int")
-    
-    print(f"[STATUS] Looking for temp_quote_id: {temp_quote_id} (type: {type(temp_quote_id)})")
-    
-    while attempts < max_attempts:
-        try:
-            response = requests.get(STATUS_URL, headers=headers)
-            if response.status_code != 200:
-                print(f"[STATUS] Error: Response status {response.status_code}")
-                print(f"[STATUS] Response text: {response.text}")
-                attempts += 1
-                time.sleep(CONFIG["STATUS_POLL_INTERVAL"])
-                continue
-                
-            data = response.json()
-            print(f"[STATUS] Poll attempt {attempts+1}/{max_attempts}")
-            
-            if not data:
-                print("[STATUS] Empty response, waiting for next update...")
-                attempts += 1
-                time.sleep(CONFIG["STATUS_POLL_INTERVAL"])
-                continue
-                            
-            quotes = []
-            if isinstance(data, list):
-                quotes = data
-            elif isinstance(data, dict) and "quotes" in data:
-                quotes = data["quotes"]
-            
-            if not quotes:
-                print("[STATUS] No quotes found in response")
-                attempts += 1
-                time.sleep(CONFIG["STATUS_POLL_INTERVAL"])
-                continue
-                
-            print(f"[STATUS] Found {len(quotes)} quotes to check")
-            
-            # Look for any quote with a positive quote_id (confirmed)
-            for quote in quotes:
-                quote_id = quote.get("quote_id")
-            
-                if isinstance(quote_id, str) and quote_id.isdigit():
-                    quote_id = int(quote_id)
-                
-                if isinstance(quote_id, int) and quote_id > 0:
-                    print(f"[STATUS] ✓ CONFIRMED: Quote has permanent ID: {quote_id}")
-                    return quote_id
-            
-            attempts += 1
-            time.sleep(CONFIG["STATUS_POLL_INTERVAL"])
-            
-        except Exception as e:
-            print(f"[ERROR] Error polling quote status: {e}")
-            traceback.print_exc()
-            attempts += 1
-            time.sleep(CONFIG["STATUS_POLL_INTERVAL"])
-    
-    print("[STATUS] ⚠ Timed out waiting for permanent quote ID")
+def fetch_open_status():
+    """One GET of /instant_open/{address}: the account's quotes as the solver lists them."""
+    response = SESSION.request("GET", STATUS_URL)
+    response.raise_for_status()
+    data = response.json()
+    return data.get("quotes", []) if isinstance(data, dict) else (data or [])
+
+def confirmed_quote_ids(quotes):
+    """{temp_quote_id: quote_id} for every confirmed quote in a status listing."""
+    confirmed = {}
+    for quote in quotes:
+        temp_id, quote_id = quote.get("temp_quote_id"), quote.get("quote_id")
+        if temp_id is not None and quote_id is not None and int(quote_id) > 0:
+            confirmed[int(temp_id)] = int(quote_id)
+    return confirmed
+
+def fetch_confirmed_quote_ids():
+    """One GET of /instant_open/{address}: {temp_quote_id: quote_id} for every confirmed quote."""
+    return confirmed_quote_ids(fetch_open_status())
+
+def reconcile_journal(quotes, quote_status):
+    """Bring the journal up to date with one status listing; `quote_status` is getQuote, or None without RPC_URL."""
+    if quote_status is None:
+        # The listing's own quote status stands in for getQuote
+        listed = {int(q["quote_id"]): int(q["quote_status"]) for q in quotes
+                  if q.get("quote_id") is not None and q.get("quote_status") is not None}
+        quote_status = listed.get
+    return JOURNAL.reconcile(
+        confirmed_quote_ids(quotes),
+        quote_status=quote_status,
+        pending_ttl=CONFIG["DEADLINE_OFFSET"],
+        failed_temp_ids=[int(q["temp_quote_id"]) for q in quotes
+                         if q.get("temp_quote_id") is not None and q.get("action_status") == "failed"],
+        listed_temp_ids=[int(q["temp_quote_id"]) for q in quotes if q.get("temp_quote_id") is not None],
+    )
+
+def resync_quote_status(app_name, addresses, pending):
+    """Notification gap: re-check the status endpoint once for confirmations we may have missed."""
+    confirmed = fetch_confirmed_quote_ids()
+    for temp_id in pending:
+        if temp_id in confirmed:
+            HUB.resolve(app_name, temp_id, confirmed[temp_id])
+
+def chain_quote_status():
+    """getQuote status lookup for journal reconciliation, or None without RPC_URL."""
+    rpc_url = os.getenv("RPC_URL")
+    if not rpc_url:
+        return None
+    return diamond_quote_status(load_diamond(rpc_url, DIAMOND_ADDRESS, expected_chain_id=CHAIN_ID))
+
+# One websocket to the notification service for the whole bot
+HUB = NotificationHub(on_gap=resync_quote_status)
+
+def poll_status_endpoint(temp_quote_id):
+    """Poll /instant_open/{address} until the temp quote id has a permanent ID (no notification app name)."""
+    deadline = time.monotonic() + CONFIG["CONFIRMATION_TIMEOUT"]
+    while time.monotonic() < deadline:
+        quote_id = fetch_confirmed_quote_ids().get(temp_quote_id)
+        if quote_id:
+            return quote_id
+        time.sleep(CONFIG["STATUS_POLL_INTERVAL"])
     return None
 
-def close_instant_position(token, quote_id, current_price):
+@traced("confirmation_wait")
+def poll_quote_status(temp_quote_id):
+    """Wait for the quote's permanent ID via the notification hub, or the status endpoint without one.
+
+    Returns None when no confirmation arrived in time (the outcome is unknown); raises QuoteFailed
+    when the solver reports the quote failed.
+    """
+    temp_quote_id = int(temp_quote_id)
+    print(f"[STATUS] Waiting for confirmation of temp ID: {temp_quote_id}")
+    if not NOTIFICATION_APP_NAME:
+        quote_id = poll_status_endpoint(temp_quote_id)
+        if quote_id:
+            print(f"[STATUS] ✓ CONFIRMED via status endpoint: {quote_id}")
+        else:
+            print("[STATUS] ⚠ Timed out waiting for permanent quote ID")
+        return quote_id
+    try:
+        quote_id = HUB.wait_for_confirmation(NOTIFICATION_APP_NAME, temp_quote_id, timeout=CONFIG["CONFIRMATION_TIMEOUT"])
+        print(f"[STATUS] ✓ CONFIRMED: Quote has permanent ID: {quote_id}")
+        return quote_id
+    except QuoteFailed as e:
+        print(f"[STATUS] Quote failed: {e.data}")
+        raise
+    except TimeoutError:
+        # Last resort if the notification never arrived
+        quote_id = fetch_confirmed_quote_ids().get(temp_quote_id)
+        if quote_id:
+            print(f"[STATUS] ✓ CONFIRMED via status endpoint: {quote_id}")
+            return quote_id
+        print("[STATUS] ⚠ Timed out waiting for permanent quote ID")
+        return None
+
+@traced("close_instant_position")
+def close_instant_position(quote_id, current_price):
     """Close an open position."""
     try:
         print(f"[CLOSE] Preparing to close position with quote ID: {quote_id}")
@@ -366,13 +313,10 @@ def close_instant_position(token, quote_id, current_price):
             "close_price": close_price
         }
         
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {token}"
-        }
+        headers = {"Content-Type": "application/json"}
         
         print("[CLOSE] Sending instant close request...")
-        response = requests.post(f"{HEDGER_URL}/instant_close", json=payload, headers=headers)
+        response = SESSION.request("POST", f"{HEDGER_URL}/instant_close", json=payload, headers=headers)
         
         print(f"[CLOSE] Response status: {response.status_code}")
         print(f"[CLOSE] Response: {response.text}")
@@ -388,6 +332,7 @@ def close_instant_position(token, quote_id, current_price):
 
 def main():
     """Main trading bot logic."""
+    configure_tracing()
     try:
         print("=============================================")
         print("XRP Trading Bot Starting")
@@ -397,81 +342,159 @@ def main():
         print(f"Quantity: {CONFIG['QUANTITY']}")
         print("=============================================")
         
-        # Login and get access token
-        access_token = login()
-        if not access_token:
-            print("[ERROR] Failed to login. Exiting.")
+        # Independent startup I/O runs at once; the bot is ready after the slowest dependency, not their sum.
+        # The quote-status GET waits on the login lock, so it never triggers a second login.
+        try:
+            ready = (Warmup()
+                     .add("login", SESSION.get_token)
+                     .add("locked_params", LOCKED_PARAMS.warm, [(CONFIG["SYMBOL"], CONFIG["LEVERAGE"])])
+                     .add("open_status", fetch_open_status)
+                     .add("diamond", chain_quote_status)
+                     .preconnect(MUON_HTTP, MUON_BASE_URL)
+                     .run())
+        except WarmupError as e:
+            print(f"[ERROR] {e}. Exiting.")
             return
+        SESSION.start_background_refresh()
+        if NOTIFICATION_APP_NAME:
+            HUB.subscribe(NOTIFICATION_APP_NAME, ACTIVE_ACCOUNT)
+        else:
+            print(f"[STATUS] NOTIFICATION_APP_NAME not set; polling the status endpoint every {CONFIG['STATUS_POLL_INTERVAL']}s")
+        LOCKED_PARAMS.start_background_refresh()
         
-        # Entry price as Decimal for comparison
-        entry_price = Decimal(CONFIG["ENTRY_PRICE"])
-        exit_price = Decimal(CONFIG["EXIT_PRICE"])
+        # Restore the journaled state, then check only its quotes against the solver and chain
+        summary = reconcile_journal(ready["open_status"], ready["diamond"])
+        print(f"[JOURNAL] Replayed {JOURNAL.stats['replayed']} record(s) in {JOURNAL.stats['replay_ms']:.1f}ms, "
+              f"reconciled: {summary}")
+        open_quotes = [int(quote_id) for quote_id in JOURNAL.positions]
+        if open_quotes:
+            print(f"[JOURNAL] Resuming with open position(s): {open_quotes}")
         
-        # Trading state
-        in_position = False
-        confirmed_quote_id = None
-        temp_quote_id = None
+        # The entry/exit rule is strategy_runner's ThresholdStrategy, the same code backtest.py replays;
+        # the instance holds the position, "busy" is set while an open/close is in flight so ticks arriving meanwhile are skipped.
+        # "in_doubt" is the monotonic time of an open whose outcome is unknown; entries wait until it is resolved.
+        # A journaled pending open left over from before the restart is one: it is re-checked on the first entry signal.
+        position = StrategyInstance(ACTIVE_ACCOUNT, CONFIG["SYMBOL"], CONFIG["SYMBOL_ID"],
+                                    ThresholdStrategy(CONFIG["ENTRY_PRICE"], CONFIG["EXIT_PRICE"]),
+                                    CONFIG["QUANTITY"], CONFIG["POSITION_TYPE"], CONFIG["LEVERAGE"])
+        position.in_position = bool(open_quotes)
+        position.quote_id = open_quotes[0] if open_quotes else None
+        state = {"busy": False, "in_doubt": time.monotonic() - CONFIG["CONFIRMATION_TIMEOUT"] if JOURNAL.pending else None}
         
-        print("[BOT] Starting price monitoring loop...")
+        def resolve_in_doubt():
+            """Match opens with an unknown outcome against the solver and chain. Returns True if entering is safe."""
+            if time.monotonic() - state["in_doubt"] < CONFIG["CONFIRMATION_TIMEOUT"]:
+                return False
+            summary = reconcile_journal(fetch_open_status(), ready["diamond"])
+            print(f"[JOURNAL] Checked open(s) with unknown outcome: {summary}")
+            open_quotes = [int(quote_id) for quote_id in JOURNAL.positions]
+            if open_quotes:
+                state["in_doubt"] = None if not JOURNAL.pending else time.monotonic()
+                position.in_position = True
+                position.quote_id = open_quotes[0]
+                print(f"[BOT] The open went through: quote {open_quotes[0]}")
+                return False
+            if JOURNAL.pending:
+                # Still neither confirmed nor failed: check again after another confirmation window
+                state["in_doubt"] = time.monotonic()
+                print(f"[WARNING] {len(JOURNAL.pending)} open(s) still unresolved; entries stay paused")
+                return False
+            state["in_doubt"] = None
+            return True
         
-        # Main trading loop
-        while True:
-            try:
-                # Get current price from Binance
-                current_price = get_binance_price(CONFIG["SYMBOL"])
-                
-                if not current_price:
-                    print("[WARNING] Failed to get price, retrying...")
-                    time.sleep(CONFIG["POLL_INTERVAL"])
-                    continue
+        def try_enter(current_price):
+            if state["in_doubt"] is not None and not resolve_in_doubt():
+                return
+            print(f"[SIGNAL] Entry signal triggered at price {current_price}")
+            
+            # Spans of this trade share one trace id, later linked to its quote ids
+            with TRACER.trade():
+                intent = JOURNAL.intent({"symbol_id": CONFIG["SYMBOL_ID"], "quantity": CONFIG["QUANTITY"],
+                                "position_type": CONFIG["POSITION_TYPE"]})
+                temp_quote_id, rejected = open_instant_trade()
+            
+                if temp_quote_id:
+                    JOURNAL.sent(temp_quote_id, intent)
+                    print(f"[BOT] Trade executed with temporary quote ID: {temp_quote_id}")
+                    TRACER.link(temp_quote_id=temp_quote_id)
                 
-                # If not in a position and price is below entry price, enter position
-                if not in_position and current_price <= entry_price:
-                    print(f"[SIGNAL] Entry signal triggered at price {current_price}")
-                    
-                    # Execute the trade
-                    temp_quote_id = open_instant_trade(access_token)
-                    
-                    if temp_quote_id:
-                        print(f"[BOT] Trade executed with temporary quote ID: {temp_quote_id}")
-                        
-                        # Poll for the permanent quote ID
-                        confirmed_quote_id = poll_quote_status(access_token, temp_quote_id)
-                        
-                        if confirmed_quote_id:
-                            print(f"[BOT] Quote confirmed with ID: {confirmed_quote_id}")
-                            in_position = True
-                        else:
-                            print("[WARNING] Failed to get confirmed quote ID. Will retry on next cycle.")
-                    else:
-                        print("[ERROR] Failed to execute trade")
+                    # Poll for the permanent quote ID
+                    try:
+                        confirmed_quote_id = poll_quote_status(temp_quote_id)
+                    except QuoteFailed:
+                        JOURNAL.abandoned(temp_quote_id)
+                        TRACER.forget(temp_quote_id=temp_quote_id)
+                        return
                 
-                elif in_position and current_price >= exit_price:
-                    print(f"[SIGNAL] Exit signal triggered at price {current_price}")
-                    
-                    success = close_instant_position(access_token, confirmed_quote_id, current_price)
-                    
-                    if success:
-                        print("[BOT] Position closed successfully")
-                        in_position = False
-                        confirmed_quote_id = None
-                        temp_quote_id = None
-                        print("[BOT] Waiting for next entry opportunity...")
+                    if confirmed_quote_id:
+                        print(f"[BOT] Quote confirmed with ID: {confirmed_quote_id}")
+                        TRACER.link(quote_id=confirmed_quote_id)
+                        JOURNAL.confirmed(temp_quote_id, confirmed_quote_id, {"entry_price": str(current_price)})
+                        position.in_position = True
+                        position.quote_id = confirmed_quote_id
                     else:
-                        print("[ERROR] Failed to close position. Will retry.")
-                
-                time.sleep(CONFIG["POLL_INTERVAL"])
-                
+                        # It may still be confirmed: the journaled temp id is matched by reconcile() before entering again
+                        state["in_doubt"] = time.monotonic()
+                        print("[WARNING] Confirmation timed out; entries paused until the open is matched against the solver")
+                elif rejected:
+                    JOURNAL.abandoned(intent=intent)
+                    print("[ERROR] Failed to execute trade")
+                else:
+                    # The solver may have accepted it: keep the intent for reconcile() and don't enter again yet
+                    state["in_doubt"] = time.monotonic()
+                    print("[WARNING] Open outcome unknown; entries paused until it is matched against the solver")
+        
+        def try_exit(current_price):
+            print(f"[SIGNAL] Exit signal triggered at price {current_price}")
+            
+            # Resumes the trace of the open that created this position
+            with TRACER.trade(quote_id=position.quote_id):
+                success = close_instant_position(position.quote_id, current_price)
+            
+            if success:
+                JOURNAL.closed(position.quote_id)
+                TRACER.forget(quote_id=position.quote_id)
+                print("[BOT] Position closed successfully")
+                position.in_position = False
+                position.quote_id = None
+                print("[BOT] Waiting for next entry opportunity...")
+            else:
+                print("[ERROR] Failed to close position. Will retry.")
+        
+        async def on_price(symbol, current_price, timestamp):
+            if state["busy"]:
+                return
+            decision = position.strategy.decide(position, current_price)
+            if decision == OPEN:
+                action = try_enter
+            elif decision == CLOSE:
+                action = try_exit
+            else:
+                return
+            state["busy"] = True
+            try:
+                # Order placement is blocking HTTP; keep it off the event loop so ticks keep flowing
+                await asyncio.to_thread(action, current_price)
             except Exception as e:
-                print(f"[ERROR] Error in main trading loop: {e}")
+                print(f"[ERROR] Error handling {symbol} tick: {e}")
                 traceback.print_exc()
-                time.sleep(CONFIG["POLL_INTERVAL"])
+            finally:
+                state["busy"] = False
+        
+        feed = MarketDataFeed()
+        feed.add_source(BinanceTradeSource([CONFIG["SYMBOL"]]))
+        feed.subscribe(CONFIG["SYMBOL"], on_price)
+        
+        print("[BOT] Streaming prices, checking entry/exit on every tick...")
+        asyncio.run(feed.run())
         
     except KeyboardInterrupt:
         print("\n[BOT] Trading bot stopped by user")
     except Exception as e:
         print(f"[ERROR] Unhandled exception: {e}")
         traceback.print_exc()
+    finally:
+        JOURNAL.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -24,15 +24,19 @@ import json
 import os
 import time
 import traceback
-from datetime import datetime, timedelta, timezone
-from decimal import Decimal, ROUND_DOWN
+from datetime import timedelta
+from decimal import Decimal
 
 import requests
 from dotenv import load_dotenv
 from eth_account import Account
-from eth_account.messages import encode_defunct
 from web3 import Web3
 
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "instant_actions")))
+from session_manager import SiweSessionManager
+from symbol_catalog import SymbolCatalog
+
 
 def prompt_str(label: str, default: str | None = None) -> str:
 	if default is None:
@@ -70,95 +74,17 @@ def prompt_decimal(label: str, default: str | None = None, *, min_value: Decimal
 		return value
 
 
-def _iso_utc_ms(dt: datetime) -> str:
-	return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
-
-
-def build_siwe_message(
-	*,
-	domain: str,
-	address: str,
-	statement: str,
-	uri: str,
-	version: str,
-	chain_id: int,
-	nonce: str,
-	issued_at: str,
-	expiration_time: str,
-) -> str:
-	return f"""{domain} wants you to sign in with your Ethereum account:
-{address}
-
-{statement}
-
-URI: {uri}
-Version: {version}
-Chain ID: {chain_id}
-Nonce: {nonce}
-Issued At: {issued_at}
-Expiration Time: {expiration_time}"""
-
-
 def http_get_json(url: str, headers: dict | None = None, timeout: int = 30):
 	resp = requests.get(url, headers=headers, timeout=timeout)
 	resp.raise_for_status()
 	return resp.json()
 
 
-def get_nonce(perpshub_base_url: str, party_a: str) -> str:
-	url = f"{perpshub_base_url}nonce/{party_a}"
-	print(f"[NONCE] {url}")
-	data = http_get_json(url)
-	nonce = (data or {}).get("nonce")
-	if not nonce:
-		raise ValueError(f"No nonce in response: {data}")
-	return str(nonce)
-
-
-def login(*, perpshub_base_url: str, chain_id: int, active_account: str, wallet: Account) -> str:
-	login_uri = f"{perpshub_base_url}login"
-	issued_at = _iso_utc_ms(datetime.now(timezone.utc))
-	expiration_time = _iso_utc_ms(datetime.now(timezone.utc) + timedelta(hours=24))
-
-	nonce = get_nonce(perpshub_base_url, active_account)
-	msg = build_siwe_message(
-		domain="localhost",
-		address=wallet.address,
-		statement=f"msg: {active_account}",
-		uri=login_uri,
-		version="1",
-		chain_id=chain_id,
-		nonce=nonce,
-		issued_at=issued_at,
-		expiration_time=expiration_time,
-	)
-
-	message = encode_defunct(text=msg)
-	signed = wallet.sign_message(message)
-	signature = "0x" + signed.signature.hex()
-
-	body = {
-		"account_address": active_account,
-		"issued_at": issued_at,
-		"expiration_time": expiration_time,
-		"nonce": nonce,
-		"signature": signature,
-	}
-	headers = {
-		"Content-Type": "application/json",
-		"Origin": "http://localhost:3000",
-		"Referer": "http://localhost:3000",
-	}
-
-	print(f"[LOGIN] POST {login_uri}")
-	resp = requests.post(login_uri, json=body, headers=headers, timeout=30)
-	print(f"[LOGIN] Status={resp.status_code} Body={resp.text}")
-	resp.raise_for_status()
-
-	token = (resp.json() or {}).get("access_token")
-	if not token:
-		raise ValueError("No access_token in login response")
-	return token
+def login(*, perpshub_base_url: str, chain_id: int, active_account: str, wallet: Account) -> SiweSessionManager:
+	"""A logged-in session for `active_account`; the SIWE login only runs when the cached token is missing or expiring."""
+	session = SiweSessionManager(perpshub_base_url, wallet.key.hex(), active_account, chain_id, lifetime=timedelta(hours=24))
+	session.get_token()
+	return session
 
 
 def get_muon_url(*, muon_base_url: str, party_a: str, chain_id: int, symmio: str, symbol_id: int) -> str:
@@ -181,56 +107,10 @@ def fetch_muon_price(*, muon_base_url: str, party_a: str, chain_id: int, symmio:
 	return Decimal(price_wei) / Decimal("1e18")
 
 
-def fetch_symbol_info(perpshub_base_url: str, symbol_id: int) -> dict:
-	url = f"{perpshub_base_url}contract-symbols"
-	print(f"[SYMBOLS] {url}")
-	try:
-		payload = http_get_json(url)
-	except Exception as e:
-		print(f"[SYMBOLS] Warning: failed to fetch symbol info ({e}); using defaults")
-		return {"symbol_id": symbol_id, "price_precision": 6, "quantity_precision": 6}
-
-	symbols: list[dict] = []
-	if isinstance(payload, list):
-		symbols = [s for s in payload if isinstance(s, dict)]
-	elif isinstance(payload, dict):
-		candidate = None
-		for key in ("symbols", "data", "result", "items", "contract_symbols"):
-			val = payload.get(key)
-			if isinstance(val, list):
-				candidate = val
-				break
-		if isinstance(candidate, list):
-			symbols = [s for s in candidate if isinstance(s, dict)]
-		else:
-			values = list(payload.values())
-			if values and all(isinstance(v, dict) for v in values):
-				symbols = values
-
-	def _coerce_int(v):
-		try:
-			return int(v)
-		except Exception:
-			return None
-
-	for sym in symbols:
-		sym_id = _coerce_int(sym.get("symbol_id")) or _coerce_int(sym.get("symbolId")) or _coerce_int(sym.get("id"))
-		if sym_id == symbol_id:
-			return sym
-
-	print("[SYMBOLS] Warning: symbol not found; using defaults")
-	return {"symbol_id": symbol_id, "price_precision": 6, "quantity_precision": 6}
-
-
-def format_decimal(value: Decimal, precision: int) -> str:
-	quantizer = Decimal(10) ** -int(precision)
-	return str(value.quantize(quantizer, rounding=ROUND_DOWN))
-
-
 def instant_close(
 	*,
 	perpshub_base_url: str,
-	token: str,
+	session: SiweSessionManager,
 	quote_id: int,
 	quantity_to_close: str,
 	close_price: str,
@@ -241,13 +121,10 @@ def instant_close(
 		"quantity_to_close": str(quantity_to_close),
 		"close_price": str(close_price),
 	}
-	headers = {
-		"Content-Type": "application/json",
-		"Authorization": f"Bearer {token}",
-	}
+	headers = {"Content-Type": "application/json"}  # the session adds the token and re-logs in once on 401
 	print(f"[CLOSE] POST {url}")
 	print(f"[CLOSE] Payload: {json.dumps(payload, indent=2)}")
-	resp = requests.post(url, json=payload, headers=headers, timeout=30)
+	resp = session.request("POST", url, json=payload, headers=headers, timeout=30)
 	print(f"[CLOSE] Status={resp.status_code} Body={resp.text}")
 	resp.raise_for_status()
 	return resp.json() if resp.text else {}
@@ -335,12 +212,10 @@ def main() -> None:
 	)
 	print("=" * 60)
 
-	token = login(perpshub_base_url=perpshub_base_url, chain_id=chain_id, active_account=active_account, wallet=wallet)
+	session = login(perpshub_base_url=perpshub_base_url, chain_id=chain_id, active_account=active_account, wallet=wallet)
 	print("✅ Logged in")
 
-	symbol_info = fetch_symbol_info(perpshub_base_url, int(args.symbol_id))
-	price_precision = int(symbol_info.get("price_precision", 6))
-	quantity_precision = int(symbol_info.get("quantity_precision", 6))
+	fmt = SymbolCatalog(perpshub_base_url, default_precision=(6, 6)).formatter(int(args.symbol_id))
 
 	muon_price = fetch_muon_price(
 		muon_base_url=muon_base_url,
@@ -362,15 +237,15 @@ def main() -> None:
 		adjusted_price = muon_price * (Decimal("1") + slippage)
 		slippage_label = f"+{slippage}"
 
-	close_price = format_decimal(adjusted_price, price_precision)
-	quantity_to_close = format_decimal(Decimal(str(args.quantity)), quantity_precision)
+	close_price = fmt.price(adjusted_price)
+	quantity_to_close = fmt.quantity(Decimal(str(args.quantity)))
 
 	print(f"[PRICE] Muon: {muon_price} | Slippage: {slippage_label} | Close Price: {close_price}")
 	print(f"[QTY] Quantity to close formatted: {quantity_to_close}")
 
 	instant_close(
 		perpshub_base_url=perpshub_base_url,
-		token=token,
+		session=session,
 		quote_id=int(args.quote_id),
 		quantity_to_close=quantity_to_close,
 		close_price=close_price,
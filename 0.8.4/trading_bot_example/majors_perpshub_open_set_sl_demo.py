@@ -7,6 +7,9 @@ Required .env
 - PRIVATE_KEY
 - MAJORS_SUBACCOUNT (or SUB_ACCOUNT_ADDRESS)
 
+Optional .env (confirmations)
+- MAJORS_NOTIFICATION_APP_NAME  # confirm over the notification websocket; without it the status endpoint is polled
+
 Optional .env (endpoints)
 - PERPSHUB_BASE_URL
 - PERPSHUB_CHAIN_ID
@@ -17,7 +20,7 @@ Optional .env (trade params)
 - MAJORS_SYMBOL_NAME, MAJORS_SYMBOL_ID
 - MAJORS_POSITION_TYPE, MAJORS_QUANTITY, MAJORS_LEVERAGE
 - MAJORS_OPEN_SLIPPAGE, MAJORS_MAX_FUNDING_RATE
-- MAJORS_DEADLINE_OFFSET, MAJORS_STATUS_TIMEOUT_SECONDS, MAJORS_STATUS_POLL_INTERVAL
+- MAJORS_DEADLINE_OFFSET, MAJORS_STATUS_TIMEOUT_SECONDS
 - MAJORS_SL_PCT
 """
 
@@ -25,15 +28,22 @@ import os
 import time
 import json
 import traceback
-from datetime import datetime, timedelta, timezone
-from decimal import Decimal, ROUND_DOWN
+from datetime import timedelta
+from decimal import Decimal
 
 import requests
 from eth_account import Account
-from eth_account.messages import encode_defunct
 from dotenv import load_dotenv
 from web3 import Web3
 
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "instant_actions")))
+from session_manager import SiweSessionManager
+from notification_hub import NotificationHub, QuoteFailed
+from locked_params_cache import LockedParamsCache
+from margin_engine import MarginEngine
+from symbol_catalog import SymbolCatalog
+
 
 load_dotenv()
 
@@ -47,8 +57,9 @@ CONFIG = {
 	"QUANTITY": os.getenv("MAJORS_QUANTITY", "5.5"),
 	"MAX_FUNDING_RATE": os.getenv("MAJORS_MAX_FUNDING_RATE", "200"),
 	"DEADLINE_OFFSET": int(os.getenv("MAJORS_DEADLINE_OFFSET", "3600")),
-	"STATUS_POLL_INTERVAL": float(os.getenv("MAJORS_STATUS_POLL_INTERVAL", "0.5")),
+	"NOTIFICATION_APP_NAME": os.getenv("MAJORS_NOTIFICATION_APP_NAME"),
 	"STATUS_TIMEOUT_SECONDS": int(os.getenv("MAJORS_STATUS_TIMEOUT_SECONDS", "60")),
+	"STATUS_POLL_INTERVAL": 0.5,  # seconds, only without MAJORS_NOTIFICATION_APP_NAME
 	"SL_PCT": Decimal(os.getenv("MAJORS_SL_PCT", "0.20")),
 	"OPEN_SLIPPAGE": Decimal(os.getenv("MAJORS_OPEN_SLIPPAGE", "0.01")),  # 1%
 }
@@ -81,6 +92,13 @@ if not PERPSHUB_BASE_URL.endswith("/"):
 
 CHAIN_ID = int(os.getenv("PERPSHUB_CHAIN_ID", "8453"))
 
+# PerpsHub session: the access token is cached on disk and reused until shortly before expiry
+SESSION = SiweSessionManager(PERPSHUB_BASE_URL, PRIVATE_KEY, ACTIVE_ACCOUNT, CHAIN_ID, lifetime=timedelta(hours=24))
+LOCKED_PARAMS = LockedParamsCache(PERPSHUB_BASE_URL)
+
+# /contract-symbols is fetched once; unknown symbols fall back to 6/6 decimals
+SYMBOLS = SymbolCatalog(PERPSHUB_BASE_URL, default_precision=(6, 6))
+
 # Only needed if you want Muon-based price and the backend expects a price in instant_open.
 MUON_BASE_URL = os.getenv("MUON_BASE_URL", "https://muon-oracle1.rasa.capital/v1/")
 SYMMIO_DIAMOND_ADDRESS = os.getenv(
@@ -90,38 +108,6 @@ SYMMIO_DIAMOND_ADDRESS = os.getenv(
 SYMMIO_DIAMOND_ADDRESS = Web3.to_checksum_address(SYMMIO_DIAMOND_ADDRESS)
 
 
-DOMAIN = "localhost"
-ORIGIN = "http://localhost:3000"
-
-
-def _iso_utc_ms(dt: datetime) -> str:
-	return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
-
-
-def build_siwe_message(
-	domain: str,
-	address: str,
-	statement: str,
-	uri: str,
-	version: str,
-	chain_id: int,
-	nonce: str,
-	issued_at: str,
-	expiration_time: str,
-) -> str:
-	return f"""{domain} wants you to sign in with your Ethereum account:
-{address}
-
-{statement}
-
-URI: {uri}
-Version: {version}
-Chain ID: {chain_id}
-Nonce: {nonce}
-Issued At: {issued_at}
-Expiration Time: {expiration_time}"""
-
-
 def http_get_json(url: str, headers: dict | None = None, timeout: int = 30):
 	resp = requests.get(url, headers=headers, timeout=timeout)
 	resp.raise_for_status()
@@ -129,67 +115,15 @@ def http_get_json(url: str, headers: dict | None = None, timeout: int = 30):
 
 
 def http_post_json(url: str, body: dict, headers: dict | None = None, timeout: int = 30):
-	resp = requests.post(url, json=body, headers=headers, timeout=timeout)
+	"""Authenticated POST through SESSION (re-logs in once on 401)."""
+	resp = SESSION.request("POST", url, json=body, headers=headers or {}, timeout=timeout)
 	resp.raise_for_status()
 	return resp.json()
 
 
-def get_nonce(party_a: str) -> str:
-	url = f"{PERPSHUB_BASE_URL}nonce/{party_a}"
-	print(f"[NONCE] {url}")
-	data = http_get_json(url)
-	nonce = data.get("nonce")
-	if not nonce:
-		raise ValueError(f"No nonce in response: {data}")
-	return str(nonce)
-
-
 def login() -> str:
-	issued_at = _iso_utc_ms(datetime.now(timezone.utc))
-	expiration_time = _iso_utc_ms(datetime.now(timezone.utc) + timedelta(hours=24))
-
-	nonce = get_nonce(ACTIVE_ACCOUNT)
-	login_uri = f"{PERPSHUB_BASE_URL}login"
-
-	# This matches the style used by the solver login you already have.
-	message_string = build_siwe_message(
-		domain=DOMAIN,
-		address=wallet.address,
-		statement=f"msg: {ACTIVE_ACCOUNT}",
-		uri=login_uri,
-		version="1",
-		chain_id=CHAIN_ID,
-		nonce=nonce,
-		issued_at=issued_at,
-		expiration_time=expiration_time,
-	)
-
-	message = encode_defunct(text=message_string)
-	signed_message = wallet.sign_message(message)
-	signature = "0x" + signed_message.signature.hex()
-
-	body = {
-		"account_address": ACTIVE_ACCOUNT,
-		"issued_at": issued_at,
-		"expiration_time": expiration_time,
-		"nonce": nonce,
-		"signature": signature,
-	}
-	headers = {
-		"Content-Type": "application/json",
-		"Origin": ORIGIN,
-		"Referer": ORIGIN,
-	}
-
-	print(f"[LOGIN] POST {login_uri}")
-	resp = requests.post(login_uri, json=body, headers=headers, timeout=30)
-	print(f"[LOGIN] Status={resp.status_code} Body={resp.text}")
-	resp.raise_for_status()
-
-	token = (resp.json() or {}).get("access_token")
-	if not token:
-		raise ValueError("No access_token in login response")
-	return token
+	"""Return a cached access token, performing the SIWE login only when it is missing or expiring."""
+	return SESSION.get_token()
 
 
 def get_muon_url(party_a: str, chain_id: int, symmio: str, symbol_id: int) -> str:
@@ -212,87 +146,18 @@ def fetch_muon_price(symbol_id: int) -> Decimal:
 	return Decimal(price_wei) / Decimal("1e18")
 
 
-def fetch_symbol_info(symbol_id: int) -> dict:
-	url = f"{PERPSHUB_BASE_URL}contract-symbols"
-	print(f"[SYMBOLS] {url}")
-	try:
-		payload = http_get_json(url)
-	except Exception as e:
-		print(f"[SYMBOLS] Warning: failed to fetch symbol info ({e}); using defaults")
-		return {"symbol_id": symbol_id, "price_precision": 6, "quantity_precision": 6}
-
-	symbols: list[dict] = []
-	if isinstance(payload, list):
-		symbols = [s for s in payload if isinstance(s, dict)]
-	elif isinstance(payload, dict):
-		candidate = None
-		for key in ("symbols", "data", "result", "items", "contract_symbols"):
-			val = payload.get(key)
-			if isinstance(val, list):
-				candidate = val
-				break
-		if isinstance(candidate, list):
-			symbols = [s for s in candidate if isinstance(s, dict)]
-		else:
-			values = list(payload.values())
-			if values and all(isinstance(v, dict) for v in values):
-				symbols = values
-
-	def _coerce_int(val):
-		try:
-			return int(val)
-		except Exception:
-			return None
-
-	for sym in symbols:
-		sym_id = _coerce_int(sym.get("symbol_id")) or _coerce_int(sym.get("symbolId")) or _coerce_int(sym.get("id"))
-		if sym_id == symbol_id:
-			return sym
-
-	print("[SYMBOLS] Warning: symbol not found; using defaults")
-	return {"symbol_id": symbol_id, "price_precision": 6, "quantity_precision": 6}
-
-
-def format_decimal(value: Decimal, precision: int) -> str:
-	quantizer = Decimal(10) ** -int(precision)
-	return str(value.quantize(quantizer, rounding=ROUND_DOWN))
-
-
-
 def fetch_locked_params(symbol_name: str, leverage: str) -> dict:
-	url = f"{PERPSHUB_BASE_URL}get_locked_params/{symbol_name}?leverage={leverage}"
-	print(f"[PARAMS] {url}")
-	data = http_get_json(url)
-	if not isinstance(data, dict) or "cva" not in data:
-		raise ValueError(f"Unexpected locked params payload: {data}")
+	data = LOCKED_PARAMS.get(symbol_name, leverage)
+	print(f"[PARAMS] {symbol_name} x{leverage}: {data}")
 	return data
 
 
-def calculate_normalized_locked_value(
-	notional: Decimal,
-	locked_param: str,
-	leverage: Decimal,
-	apply_leverage: bool = True,
-) -> str:
-	locked = Decimal(str(locked_param))
-	if apply_leverage:
-		val = notional * locked / (Decimal("100") * leverage)
-	else:
-		val = notional * locked / Decimal("100")
-	s = "{:f}".format(val)
-	if "." in s:
-		s = s.rstrip("0").rstrip(".")
-	return s
-
-
-def instant_open(token: str) -> tuple[int, str, str]:
+def instant_open() -> tuple[int, str, str]:
 	symbol_id = int(CONFIG["SYMBOL_ID"])
 	symbol_name = str(CONFIG.get("SYMBOL_NAME") or "").strip()
 	if not symbol_name:
 		raise ValueError("Missing CONFIG['SYMBOL_NAME'] (e.g. XRPUSDT)")
-	symbol_info = fetch_symbol_info(symbol_id)
-	price_precision = int(symbol_info.get("price_precision", 6))
-	quantity_precision = int(symbol_info.get("quantity_precision", 6))
+	fmt = SYMBOLS.formatter(symbol_id)
 
 	muon_price = fetch_muon_price(symbol_id)
 
@@ -303,18 +168,15 @@ def instant_open(token: str) -> tuple[int, str, str]:
 	else:
 		requested_price = muon_price * (Decimal("1") - slippage)
 
-	requested_price_str = format_decimal(requested_price, price_precision)
+	requested_price_str = fmt.price(requested_price)
 	quantity = Decimal(str(CONFIG["QUANTITY"]))
-	quantity_str = format_decimal(quantity, quantity_precision)
+	quantity_str = fmt.quantity(quantity)
 
 	locked_params = fetch_locked_params(symbol_name, str(CONFIG["LEVERAGE"]))
-	leverage = Decimal(str(locked_params.get("leverage", CONFIG["LEVERAGE"])))
+	engine = MarginEngine(locked_params, leverage=locked_params.get("leverage", CONFIG["LEVERAGE"]), plain=True)
 
 	notional = Decimal(requested_price_str) * Decimal(quantity_str)
-	normalized_cva = calculate_normalized_locked_value(notional, locked_params["cva"], leverage, True)
-	normalized_lf = calculate_normalized_locked_value(notional, locked_params["lf"], leverage, True)
-	normalized_party_amm = calculate_normalized_locked_value(notional, locked_params["partyAmm"], leverage, True)
-	normalized_party_bmm = calculate_normalized_locked_value(notional, locked_params["partyBmm"], leverage, False)
+	locked = engine.locked_values(notional)
 
 	deadline = int(time.time()) + int(CONFIG["DEADLINE_OFFSET"])
 	payload = {
@@ -323,24 +185,23 @@ def instant_open(token: str) -> tuple[int, str, str]:
 		"orderType": int(CONFIG["ORDER_TYPE"]),
 		"price": requested_price_str,
 		"quantity": quantity_str,
-		"cva": normalized_cva,
-		"lf": normalized_lf,
-		"partyAmm": normalized_party_amm,
-		"partyBmm": normalized_party_bmm,
+		"cva": locked["cva"],
+		"lf": locked["lf"],
+		"partyAmm": locked["partyAmm"],
+		"partyBmm": locked["partyBmm"],
 		"maxFundingRate": str(CONFIG["MAX_FUNDING_RATE"]),
 		"deadline": deadline,
 	}
 
-	headers = {
-		"Content-Type": "application/json",
-		"Authorization": f"Bearer {token}",
-	}
+	# SESSION adds the current token and re-logs in once if the solver answers 401
+	headers = {"Content-Type": "application/json"}
 
 	url = f"{PERPSHUB_BASE_URL}instant_open"
 	print(f"[OPEN] POST {url}")
 	print(f"[OPEN] Payload: {json.dumps(payload, indent=2)}")
-	resp = requests.post(url, json=payload, headers=headers, timeout=30)
+	resp = SESSION.request("POST", url, json=payload, headers=headers, timeout=30)
 	print(f"[OPEN] Status={resp.status_code} Body={resp.text}")
+	LOCKED_PARAMS.check_response(symbol_name, str(CONFIG["LEVERAGE"]), resp)
 	resp.raise_for_status()
 	result = resp.json() or {}
 
@@ -350,75 +211,71 @@ def instant_open(token: str) -> tuple[int, str, str]:
 	return int(temp_quote_id), requested_price_str, quantity_str
 
 
-def poll_quote_status(token: str, temp_quote_id: int) -> int:
-	"""Poll PerpsHub until we can determine a permanent quote_id.
+def fetch_confirmed_quote_ids() -> dict:
+	"""One status check: {temp_quote_id: quote_id} for every confirmed quote.
 
 	PerpsHub status: GET {base}/instant_open/{ACTIVE_ACCOUNT}
 	"""
+	resp = SESSION.request("GET", f"{PERPSHUB_BASE_URL}instant_open/{ACTIVE_ACCOUNT}")
+	resp.raise_for_status()
+	data = resp.json()
+	quotes = data.get("quotes") if isinstance(data, dict) else data
 
-	headers = {"Authorization": f"Bearer {token}"}
-	timeout_s = int(CONFIG["STATUS_TIMEOUT_SECONDS"])
-	interval = float(CONFIG["STATUS_POLL_INTERVAL"])
-	end_time = time.time() + timeout_s
-
-	fallback_url = f"{PERPSHUB_BASE_URL}instant_open/{ACTIVE_ACCOUNT}"
-
-	print(f"[STATUS] Waiting for confirmation: temp_quote_id={temp_quote_id}")
-	attempt = 0
-	while time.time() < end_time:
-		attempt += 1
-		quotes = None
+	confirmed = {}
+	for q in quotes or []:
+		if not isinstance(q, dict):
+			continue
+		q_temp = q.get("temp_quote_id")
+		qid = q.get("quote_id")
 		try:
-			resp = requests.get(fallback_url, headers=headers, timeout=30)
-			if resp.status_code == 200:
-				data = resp.json()
-				if isinstance(data, dict) and "quotes" in data:
-					quotes = data.get("quotes")
-				elif isinstance(data, list):
-					quotes = data
-			else:
-				print(f"[STATUS] Attempt {attempt}: status={resp.status_code} body={resp.text}")
-		except Exception as e:
-			print(f"[STATUS] Attempt {attempt}: error polling ({e})")
-
-		if not quotes:
-			print(f"[STATUS] Attempt {attempt}: no quotes yet")
-			time.sleep(interval)
+			if q_temp is not None and qid is not None and int(qid) > 0:
+				confirmed[int(q_temp)] = int(qid)
+		except (TypeError, ValueError):
 			continue
+	return confirmed
+
+
+def resync_quote_status(app_name: str, addresses: set, pending: list) -> None:
+	"""Notification gap: re-check the status endpoint once for confirmations we may have missed."""
+	confirmed = fetch_confirmed_quote_ids()
+	for temp_id in pending:
+		if temp_id in confirmed:
+			HUB.resolve(app_name, temp_id, confirmed[temp_id])
+
+
+# One shared websocket to the notification service, subscribed in main()
+HUB = NotificationHub(on_gap=resync_quote_status)
 
-		# Try: first match by temp_quote_id (if present), else any positive quote_id.
-		for q in quotes:
-			if not isinstance(q, dict):
-				continue
-			q_temp = q.get("temp_quote_id")
-			qid = q.get("quote_id")
-
-			try:
-				if q_temp is not None and int(q_temp) == int(temp_quote_id):
-					if qid is not None and int(qid) > 0:
-						print(f"[STATUS] ✓ CONFIRMED (matched temp): quote_id={int(qid)}")
-						return int(qid)
-			except Exception:
-				pass
-
-		for q in quotes:
-			if not isinstance(q, dict):
-				continue
-			qid = q.get("quote_id")
-			try:
-				if qid is not None and int(qid) > 0:
-					print(f"[STATUS] ✓ CONFIRMED (any positive): quote_id={int(qid)}")
-					return int(qid)
-			except Exception:
-				continue
-
-		print(f"[STATUS] Attempt {attempt}: quotes present but not confirmed")
-		time.sleep(interval)
-
-	raise TimeoutError("Timed out waiting for a permanent quote_id")
-
-
-def set_stop_loss(token: str, quote_id: int, requested_price_str: str) -> None:
+
+def poll_quote_status(temp_quote_id: int) -> int:
+	"""Wait on the notification hub (or poll the status endpoint without an app name) for a permanent quote_id."""
+	temp_quote_id = int(temp_quote_id)
+	timeout_s = int(CONFIG["STATUS_TIMEOUT_SECONDS"])
+
+	print(f"[STATUS] Waiting for confirmation: temp_quote_id={temp_quote_id}")
+	if not CONFIG["NOTIFICATION_APP_NAME"]:
+		deadline = time.monotonic() + timeout_s
+		while time.monotonic() < deadline:
+			quote_id = fetch_confirmed_quote_ids().get(temp_quote_id)
+			if quote_id is not None:
+				print(f"[STATUS] ✓ CONFIRMED: quote_id={quote_id}")
+				return quote_id
+			time.sleep(CONFIG["STATUS_POLL_INTERVAL"])
+		raise TimeoutError("Timed out waiting for a permanent quote_id")
+	try:
+		quote_id = HUB.wait_for_confirmation(CONFIG["NOTIFICATION_APP_NAME"], temp_quote_id, timeout=timeout_s)
+	except QuoteFailed as e:
+		raise ValueError(f"Quote failed: {e.data}") from None
+	except TimeoutError:
+		# Last resort if the notification never arrived
+		quote_id = fetch_confirmed_quote_ids().get(temp_quote_id)
+		if quote_id is None:
+			raise TimeoutError("Timed out waiting for a permanent quote_id") from None
+	print(f"[STATUS] ✓ CONFIRMED: quote_id={quote_id}")
+	return quote_id
+
+
+def set_stop_loss(quote_id: int, requested_price_str: str) -> None:
 	"""Set stop loss using the PerpsHub stop-loss endpoint.
 
 	POST /stop_loss or /stop-loss
@@ -427,8 +284,7 @@ def set_stop_loss(token: str, quote_id: int, requested_price_str: str) -> None:
 	"""
 
 	symbol_id = int(CONFIG["SYMBOL_ID"])
-	symbol_info = fetch_symbol_info(symbol_id)
-	price_precision = int(symbol_info.get("price_precision", 6))
+	fmt = SYMBOLS.formatter(symbol_id)
 
 	current_price = fetch_muon_price(symbol_id)
 
@@ -437,7 +293,7 @@ def set_stop_loss(token: str, quote_id: int, requested_price_str: str) -> None:
 		sl_price = current_price * (Decimal("1") - sl_pct)
 	else:
 		sl_price = current_price * (Decimal("1") + sl_pct)
-	sl_price_str = format_decimal(sl_price, price_precision)
+	sl_price_str = fmt.price(sl_price)
 
 	body = {
 		"userAddress": wallet.address,
@@ -451,10 +307,7 @@ def set_stop_loss(token: str, quote_id: int, requested_price_str: str) -> None:
 		"timestamp": int(time.time() * 1000),
 	}
 
-	headers = {
-		"Content-Type": "application/json",
-		"Authorization": f"Bearer {token}",
-	}
+	headers = {"Content-Type": "application/json"}
 
 	url_dash = f"{PERPSHUB_BASE_URL}stop-loss"
 	url_underscore = f"{PERPSHUB_BASE_URL}stop_loss"
@@ -462,10 +315,10 @@ def set_stop_loss(token: str, quote_id: int, requested_price_str: str) -> None:
 	print(f"[SL] Setting SL @ {sl_price_str} (current={current_price})")
 	print(f"[SL] Payload: {json.dumps(body, indent=2)}")
 	print(f"[SL] POST {url_dash}")
-	resp = requests.post(url_dash, json=body, headers=headers, timeout=30)
+	resp = SESSION.request("POST", url_dash, json=body, headers=headers, timeout=30)
 	if resp.status_code == 404:
 		print(f"[SL] 404 on /stop-loss, trying /stop_loss")
-		resp = requests.post(url_underscore, json=body, headers=headers, timeout=30)
+		resp = SESSION.request("POST", url_underscore, json=body, headers=headers, timeout=30)
 
 	print(f"[SL] Status={resp.status_code} Body={resp.text}")
 	resp.raise_for_status()
@@ -483,16 +336,20 @@ def main():
 	print("=" * 60)
 
 	try:
-		token = login()
+		login()
+		if CONFIG["NOTIFICATION_APP_NAME"]:
+			HUB.subscribe(CONFIG["NOTIFICATION_APP_NAME"], ACTIVE_ACCOUNT)
+		else:
+			print(f"[STATUS] MAJORS_NOTIFICATION_APP_NAME not set; polling the status endpoint every {CONFIG['STATUS_POLL_INTERVAL']}s")
 		print("✅ Logged in")
 
-		temp_quote_id, requested_price_str, quantity_str = instant_open(token)
+		temp_quote_id, requested_price_str, quantity_str = instant_open()
 		print(f"✅ Open requested. temp_quote_id={temp_quote_id} price={requested_price_str} qty={quantity_str}")
 
-		quote_id = poll_quote_status(token, temp_quote_id)
+		quote_id = poll_quote_status(temp_quote_id)
 		print(f"✅ Confirmed. quote_id={quote_id}")
 
-		set_stop_loss(token, quote_id, requested_price_str)
+		set_stop_loss(quote_id, requested_price_str)
 		print("✅ Stop loss set")
 
 	except Exception as e:
@@ -0,0 +1,306 @@
+"""Streaming market-data feed for the trading bots.
+
+`instant_actions_trading_bot.py` used to poll the Binance REST ticker every 5s
+for one symbol, so signals arrived up to 5s late and each check cost a round
+trip. `MarketDataFeed` runs pluggable streaming sources on one asyncio loop and
+keeps, per symbol, the latest price plus a fixed-size NumPy ring buffer of
+recent ticks. Strategies subscribe to price-change callbacks, so entry/exit
+checks run on every tick instead of on a timer, for hundreds of symbols at once.
+
+Sources
+- BinanceTradeSource: Binance combined websocket streams (`<symbol>@trade` by
+  default), split over as many connections as needed, with reconnects.
+- ReplaySource: replays (timestamp, symbol, price) ticks from memory or a CSV
+  file, as fast as possible or at a chosen speed, for testing strategies
+  offline.
+
+Usage
+    feed = MarketDataFeed(capacity=2048)
+    feed.add_source(BinanceTradeSource(["XRPUSDT", "BTCUSDT"]))
+    feed.subscribe("XRPUSDT", on_price)          # on_price(symbol, price: Decimal, ts: float)
+    asyncio.run(feed.run())
+
+Run
+- python trading_bot_example/market_data_feed.py            # replay benchmark
+- python trading_bot_example/market_data_feed.py --live     # 10s of live Binance trades
+"""
+
+import sys
+import csv
+import json
+import time
+import random
+import asyncio
+import inspect
+from collections import defaultdict
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import websockets
+
+BINANCE_STREAM_URL = "wss://stream.binance.com:9443/stream"
+BINANCE_MAX_STREAMS_PER_CONNECTION = 1024
+
+PriceCallback = Callable[[str, Decimal, float], Any]
+
+
+class PriceRing:
+    """Fixed-size ring buffer of (timestamp, price) ticks backed by NumPy arrays."""
+
+    __slots__ = ("capacity", "timestamps", "prices", "_next", "_count")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.prices = np.zeros(capacity, dtype=np.float64)
+        self._next = 0
+        self._count = 0
+
+    def append(self, timestamp: float, price: float) -> None:
+        i = self._next
+        self.timestamps[i] = timestamp
+        self.prices[i] = price
+        self._next = (i + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def __len__(self) -> int:
+        return self._count
+
+    def last(self, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """The most recent `n` ticks (default: all held) in chronological order, as copies."""
+        n = self._count if n is None else min(n, self._count)
+        idx = (np.arange(self._next - n, self._next)) % self.capacity
+        return self.timestamps[idx], self.prices[idx]
+
+
+class MarketDataFeed:
+    """Latest price and tick history per symbol, with per-symbol price-change callbacks."""
+
+    def __init__(self, capacity: int = 1024, only_on_change: bool = True):
+        self.capacity = capacity
+        self.only_on_change = only_on_change
+        self.sources: List[Any] = []
+        self.rings: Dict[str, PriceRing] = {}
+        self.prices: Dict[str, Decimal] = {}
+        self.updated_at: Dict[str, float] = {}
+        self._callbacks: Dict[str, List[PriceCallback]] = defaultdict(list)
+        self._all_callbacks: List[PriceCallback] = []
+        self._tasks: Set[asyncio.Future] = set()  # coroutine callbacks in flight; the loop only keeps weak refs
+        self.stats = {"ticks": 0, "changes": 0, "callbacks": 0, "callback_errors": 0}
+
+    def add_source(self, source: Any) -> None:
+        self.sources.append(source)
+
+    def subscribe(self, symbol: str, callback: PriceCallback) -> None:
+        """Call `callback(symbol, price, timestamp)` on every price change of `symbol`.
+
+        Coroutine callbacks are scheduled as tasks; plain callbacks run inline and
+        must not block (hand blocking work to `asyncio.to_thread`).
+        """
+        self._callbacks[symbol.upper()].append(callback)
+
+    def subscribe_all(self, callback: PriceCallback) -> None:
+        self._all_callbacks.append(callback)
+
+    def latest(self, symbol: str) -> Optional[Decimal]:
+        return self.prices.get(symbol.upper())
+
+    def history(self, symbol: str, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(timestamps, prices) of the last `n` ticks for `symbol`."""
+        ring = self.rings.get(symbol.upper())
+        if ring is None:
+            return np.empty(0), np.empty(0)
+        return ring.last(n)
+
+    def on_tick(self, symbol: str, price: str, timestamp: float) -> None:
+        """Entry point for sources: record a tick and notify subscribers if the price moved."""
+        self.stats["ticks"] += 1
+        ring = self.rings.get(symbol)
+        if ring is None:
+            ring = self.rings[symbol] = PriceRing(self.capacity)
+        value = Decimal(price)
+        ring.append(timestamp, float(value))
+
+        previous = self.prices.get(symbol)
+        self.prices[symbol] = value
+        self.updated_at[symbol] = timestamp
+        if self.only_on_change and previous == value:
+            return
+        self.stats["changes"] += 1
+
+        for callback in self._callbacks.get(symbol, ()):
+            self._invoke(callback, symbol, value, timestamp)
+        for callback in self._all_callbacks:
+            self._invoke(callback, symbol, value, timestamp)
+
+    def _invoke(self, callback: PriceCallback, symbol: str, price: Decimal, timestamp: float) -> None:
+        self.stats["callbacks"] += 1
+        try:
+            result = callback(symbol, price, timestamp)
+            if inspect.isawaitable(result):
+                task = asyncio.ensure_future(result)
+                self._tasks.add(task)
+                task.add_done_callback(self._callback_done)
+        except Exception as e:
+            self.stats["callback_errors"] += 1
+            print(f"[FEED] Callback error for {symbol}: {e}")
+
+    def _callback_done(self, task: asyncio.Future) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["callback_errors"] += 1
+            print(f"[FEED] Callback error: {task.exception()}")
+
+    async def run(self) -> None:
+        """Run every source until they all finish (replays) or the task is cancelled (live)."""
+        await asyncio.gather(*(source.run(self) for source in self.sources))
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class BinanceTradeSource:
+    """Binance combined-stream trades for many symbols, spread over as few websockets as allowed."""
+
+    def __init__(
+        self,
+        symbols: Iterable[str],
+        stream: str = "trade",
+        url: str = BINANCE_STREAM_URL,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 30.0,
+    ):
+        self.symbols = [s.upper() for s in symbols]
+        self.stream = stream
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+    def _parse(self, message: Dict[str, Any]) -> Optional[Tuple[str, str, float]]:
+        data = message.get("data", message)
+        if "p" in data:  # trade / aggTrade
+            return data["s"], data["p"], data.get("T", data.get("E", 0)) / 1000.0
+        if "c" in data:  # miniTicker / ticker
+            return data["s"], data["c"], data.get("E", 0) / 1000.0
+        if "b" in data and "a" in data:  # bookTicker: mid price
+            mid = (Decimal(data["b"]) + Decimal(data["a"])) / 2
+            return data["s"], str(mid), time.time()
+        return None
+
+    async def _connection(self, feed: MarketDataFeed, symbols: Sequence[str]) -> None:
+        streams = "/".join(f"{s.lower()}@{self.stream}" for s in symbols)
+        url = f"{self.url}?streams={streams}"
+        delay = self.reconnect_delay
+        while True:
+            try:
+                async with websockets.connect(url, ping_interval=20, max_size=2**22) as ws:
+                    print(f"[FEED] Binance connected: {len(symbols)} symbol(s)")
+                    delay = self.reconnect_delay
+                    async for raw in ws:
+                        tick = self._parse(json.loads(raw))
+                        if tick is not None:
+                            feed.on_tick(*tick)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[FEED] Binance connection error: {e}; reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def run(self, feed: MarketDataFeed) -> None:
+        n = BINANCE_MAX_STREAMS_PER_CONNECTION
+        chunks = [self.symbols[i:i + n] for i in range(0, len(self.symbols), n)]
+        await asyncio.gather(*(self._connection(feed, chunk) for chunk in chunks))
+
+
+class ReplaySource:
+    """Replays recorded ticks; `speed=None` replays as fast as possible, 1.0 in real time."""
+
+    def __init__(self, ticks: Iterable[Tuple[float, str, str]], speed: Optional[float] = None, yield_every: int = 1000):
+        self.ticks = ticks
+        self.speed = speed
+        self.yield_every = yield_every
+
+    @classmethod
+    def from_csv(cls, path: str, **kwargs: Any) -> "ReplaySource":
+        """CSV with `timestamp,symbol,price` columns (header row required)."""
+        def rows():
+            with open(path, newline="") as f:
+                for row in csv.DictReader(f):
+                    yield float(row["timestamp"]), row["symbol"].upper(), row["price"]
+        return cls(rows(), **kwargs)
+
+    async def run(self, feed: MarketDataFeed) -> None:
+        first_ts = None
+        started = time.monotonic()
+        for i, (timestamp, symbol, price) in enumerate(self.ticks):
+            if self.speed:
+                if first_ts is None:
+                    first_ts = timestamp
+                wait = (timestamp - first_ts) / self.speed - (time.monotonic() - started)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            elif i % self.yield_every == 0:
+                await asyncio.sleep(0)  # let callback tasks run
+            feed.on_tick(symbol, str(price), timestamp)
+
+
+def random_walk_ticks(symbols: Sequence[str], n_ticks: int, seed: int = 7) -> List[Tuple[float, str, str]]:
+    """Synthetic interleaved ticks for `symbols`, for replays and benchmarks."""
+    rng = random.Random(seed)
+    prices = {s: Decimal(rng.randint(100, 100000)) / 100 for s in symbols}
+    ticks = []
+    t = time.time()
+    for i in range(n_ticks):
+        symbol = symbols[rng.randrange(len(symbols))]
+        step = Decimal(rng.choice((-2, -1, 0, 1, 2))) / 100
+        prices[symbol] = max(prices[symbol] + step, Decimal("0.01"))
+        ticks.append((t + i * 0.001, symbol, str(prices[symbol])))
+    return ticks
+
+
+def main():
+    if "--live" in sys.argv:
+        feed = MarketDataFeed()
+        feed.add_source(BinanceTradeSource(["XRPUSDT", "BTCUSDT", "ETHUSDT"]))
+        feed.subscribe_all(lambda s, p, t: print(f"[FEED] {s} {p}"))
+
+        async def live():
+            try:
+                await asyncio.wait_for(feed.run(), timeout=10)
+            except asyncio.TimeoutError:
+                pass
+
+        asyncio.run(live())
+        print(f"[FEED] stats={feed.stats}")
+        return
+
+    symbols = [f"SYM{i:03d}USDT" for i in range(300)]
+    ticks = random_walk_ticks(symbols, 300_000)
+    feed = MarketDataFeed(capacity=1024)
+    crossings = {"count": 0}
+
+    def make_strategy(level):
+        def on_price(symbol, price, ts):
+            if price <= level:
+                crossings["count"] += 1
+        return on_price
+
+    for symbol in symbols:
+        feed.subscribe(symbol, make_strategy(Decimal("100")))
+    feed.add_source(ReplaySource(ticks))
+
+    start = time.perf_counter()
+    asyncio.run(feed.run())
+    elapsed = time.perf_counter() - start
+    _, prices = feed.history(symbols[0], 100)
+    print(f"[FEED] Replayed {feed.stats['ticks']} ticks for {len(symbols)} symbols in {elapsed:.2f}s "
+          f"({feed.stats['ticks'] / elapsed:,.0f} ticks/s), {feed.stats['callbacks']} strategy callbacks")
+    print(f"[FEED] {symbols[0]}: last={feed.latest(symbols[0])} mean(100)={prices.mean():.4f} std(100)={prices.std():.4f}")
+    print(f"[FEED] For comparison, REST polling every 5s sees one price per symbol per 5s "
+          f"and costs {len(symbols)} requests per cycle")
+
+
+if __name__ == "__main__":
+    main()
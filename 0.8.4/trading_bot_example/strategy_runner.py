@@ -0,0 +1,391 @@
+"""Strategy Runner: many (account, symbol, strategy) instances on one event loop
+
+What this script does
+- Hosts any number of strategy instances, each trading one symbol from one sub-account,
+  on a single asyncio loop instead of one `instant_actions_trading_bot.py` process each.
+- Shares everything that does not need to be per instance:
+  - one market-data feed, with one subscription per symbol however many instances trade it
+  - one AsyncSolverClient: pooled HTTP, one SIWE session per sub-account, Muon price cache
+  - one locked-params cache and one notification hub for quote confirmations
+  - one order rate limit and in-flight cap for the whole book
+  - one adaptive per-endpoint rate scheduler: learns 429 limits, closes before opens, fair across sub-accounts
+- Keeps per-instance state in slotted objects, so thousands of instances stay cheap.
+- An open whose confirmation times out leaves its instance pending, not flat: it takes no new
+  entry until the status endpoint shows the quote confirmed or failed, or the order's deadline passes.
+
+Strategies file (STRATEGIES_FILE, JSON list)
+    [{"account": "0x...", "symbol": "XRPUSDT", "symbol_id": 340, "strategy": "threshold",
+      "entry": "3.05", "exit": "3.1", "quantity": "6", "position_type": 0, "leverage": "1"}]
+
+Run
+- python trading_bot_example/strategy_runner.py --benchmark   # instances per core at a given tick rate
+- python trading_bot_example/strategy_runner.py               # live, instances from STRATEGIES_FILE
+
+Required .env (live)
+- PRIVATE_KEY            # owner of every sub-account in the strategies file
+- HEDGER_URL
+- MUON_BASE_URL
+- DIAMOND_ADDRESS
+- STRATEGIES_FILE
+
+Optional .env
+- CHAIN_ID (default: 42161)
+- NOTIFICATION_APP_NAME  # confirm quotes over the notification websocket instead of polling
+- RATE_LIMITS / RATE_LIMIT_DEFAULT  # initial per-host request rates (instant_actions/rate_scheduler.py)
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import tracemalloc
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "instant_actions")))
+from async_client import AsyncSolverClient
+from rate_scheduler import RequestScheduler
+from notification_hub import NotificationHub, QuoteFailed
+from locked_params_cache import LockedParamsCache
+from market_data_feed import MarketDataFeed, BinanceTradeSource, ReplaySource, random_walk_ticks
+from tracing import configure as configure_tracing
+
+CONFIG = {
+    "ORDERS_PER_SECOND": 20,    # Order rate limit shared by every instance
+    "MAX_IN_FLIGHT": 64,        # Opens/closes awaiting the solver at once
+    "MUON_PRICE_TTL": 1.0,      # Seconds a Muon price is reused across instances
+    "SLIPPAGE": "0.01",
+    "PENDING_RECHECK_INTERVAL": 5.0,  # Seconds between status checks of an open with an unknown outcome
+    "PENDING_TIMEOUT": 3600,    # The open's deadline offset: after it the quote can no longer be opened
+}
+
+OPEN = "open"
+CLOSE = "close"
+
+
+class ThresholdStrategy:
+    """Go long/short when price crosses `entry`, close when it crosses `exit` (the legacy bot's rule)."""
+
+    __slots__ = ("entry", "exit")
+
+    def __init__(self, entry: str, exit: str):
+        self.entry = Decimal(entry)
+        self.exit = Decimal(exit)
+
+    def decide(self, instance: "StrategyInstance", price: Decimal) -> Optional[str]:
+        long = instance.position_type == 0
+        if not instance.in_position:
+            if (price <= self.entry) if long else (price >= self.entry):
+                return OPEN
+        elif (price >= self.exit) if long else (price <= self.exit):
+            return CLOSE
+        return None
+
+
+STRATEGIES = {"threshold": ThresholdStrategy}
+
+
+class StrategyInstance:
+    """Per-instance state. Everything shared lives on the runner."""
+
+    __slots__ = (
+        "account", "symbol", "symbol_id", "strategy", "quantity", "position_type", "leverage",
+        "in_position", "quote_id", "pending_temp_id", "busy", "opens", "closes", "errors",
+    )
+
+    def __init__(self, account: str, symbol: str, symbol_id: int, strategy, quantity: str,
+                 position_type: int = 0, leverage: str = "1"):
+        self.account = account
+        self.symbol = symbol.upper()
+        self.symbol_id = int(symbol_id)
+        self.strategy = strategy
+        self.quantity = quantity
+        self.position_type = int(position_type)
+        self.leverage = str(leverage)
+        self.in_position = False
+        self.quote_id: Optional[int] = None
+        self.pending_temp_id: Optional[int] = None  # open sent, outcome unknown: no new entry until it resolves
+        self.busy = False
+        self.opens = 0
+        self.closes = 0
+        self.errors = 0
+
+
+class TokenBucket:
+    """Async token bucket: at most `rate` acquisitions per second, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class StrategyRunner:
+    """Dispatches feed ticks to every instance on that symbol and executes their orders."""
+
+    def __init__(
+        self,
+        client: Optional[AsyncSolverClient],
+        feed: MarketDataFeed,
+        orders_per_second: float = CONFIG["ORDERS_PER_SECOND"],
+        max_in_flight: int = CONFIG["MAX_IN_FLIGHT"],
+        slippage: Decimal = Decimal(CONFIG["SLIPPAGE"]),
+        dry_run: bool = False,
+    ):
+        self.client = client
+        self.feed = feed
+        self.slippage = slippage
+        self.dry_run = dry_run
+        self.instances: List[StrategyInstance] = []
+        self._by_symbol: Dict[str, List[StrategyInstance]] = defaultdict(list)
+        self._limiter = TokenBucket(orders_per_second)
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._tasks = set()
+        self.stats = {"evaluations": 0, "signals": 0, "orders": 0, "errors": 0}
+
+    def add_instance(self, private_key: Optional[str], account: str, symbol: str, symbol_id: int, strategy,
+                     quantity: str, position_type: int = 0, leverage: str = "1") -> StrategyInstance:
+        instance = StrategyInstance(account, symbol, symbol_id, strategy, quantity, position_type, leverage)
+        if self.client is not None and private_key:
+            self.client.add_account(private_key, account)  # one session per sub-account, however many instances
+        if instance.symbol not in self._by_symbol:
+            self.feed.subscribe(instance.symbol, self._on_price)
+        self._by_symbol[instance.symbol].append(instance)
+        self.instances.append(instance)
+        return instance
+
+    def _on_price(self, symbol: str, price: Decimal, timestamp: float) -> None:
+        instances = self._by_symbol[symbol]
+        self.stats["evaluations"] += len(instances)
+        for instance in instances:
+            if instance.busy or instance.pending_temp_id is not None:
+                continue
+            action = instance.strategy.decide(instance, price)
+            if action is None:
+                continue
+            self.stats["signals"] += 1
+            instance.busy = True
+            self._spawn(self._execute(instance, action, price))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _opened(self, instance: StrategyInstance, quote_id: int) -> None:
+        instance.in_position, instance.quote_id, instance.pending_temp_id = True, quote_id, None
+        instance.opens += 1
+        print(f"[RUNNER] {instance.account[:10]} {instance.symbol} opened quote {quote_id}")
+
+    async def _confirmation(self, account: str, temp_quote_id: int) -> Optional[int]:
+        """The open's quote id, or None if it wasn't confirmed in time. Raises QuoteFailed."""
+        try:
+            if self.client.hub is not None:
+                return await self.client.hub.confirmation(self.client.notification_app_name, temp_quote_id)
+            return await self.client.poll_quote_status(account, temp_quote_id)
+        except TimeoutError:
+            return None
+
+    async def _resolve_pending(self, instance: StrategyInstance) -> None:
+        """Re-check an open with an unknown outcome until it is confirmed, failed, or past its deadline."""
+        temp_quote_id = instance.pending_temp_id
+        deadline = time.monotonic() + CONFIG["PENDING_TIMEOUT"]
+        while time.monotonic() < deadline:
+            await asyncio.sleep(CONFIG["PENDING_RECHECK_INTERVAL"])
+            try:
+                quotes = await self.client.get_open_status(instance.account)
+            except Exception as e:
+                print(f"[RUNNER] {instance.account[:10]} {instance.symbol} status check failed: {e}")
+                continue
+            for quote in quotes:
+                if quote.get("temp_quote_id") is None or int(quote["temp_quote_id"]) != temp_quote_id:
+                    continue
+                if quote.get("quote_id") is not None and int(quote["quote_id"]) > 0:
+                    self._opened(instance, int(quote["quote_id"]))
+                    return
+                if quote.get("action_status") == "failed":
+                    instance.pending_temp_id = None
+                    print(f"[RUNNER] {instance.account[:10]} {instance.symbol} temp ID {temp_quote_id} failed")
+                    return
+        instance.pending_temp_id = None
+        print(f"[RUNNER] {instance.account[:10]} {instance.symbol} temp ID {temp_quote_id} passed its deadline unconfirmed")
+
+    async def _execute(self, instance: StrategyInstance, action: str, price: Decimal) -> None:
+        try:
+            if self.dry_run:
+                if action == OPEN:
+                    instance.in_position, instance.quote_id = True, 0
+                    instance.opens += 1
+                else:
+                    instance.in_position, instance.quote_id = False, None
+                    instance.closes += 1
+                return
+            async with self._in_flight:
+                await self._limiter.acquire()
+                self.stats["orders"] += 1
+                if action == OPEN:
+                    print(f"[RUNNER] {instance.account[:10]} {instance.symbol} entry signal at {price}")
+                    result = await self.client.open_trade(
+                        instance.account,
+                        wait_confirmed=False,
+                        symbol_id=instance.symbol_id,
+                        symbol_name=instance.symbol,
+                        quantity=instance.quantity,
+                        position_type=instance.position_type,
+                        leverage=instance.leverage,
+                        slippage=self.slippage,
+                    )
+                    instance.pending_temp_id = temp_quote_id = int(result["temp_quote_id"])
+                    try:
+                        quote_id = await self._confirmation(instance.account, temp_quote_id)
+                    except QuoteFailed:
+                        instance.pending_temp_id = None
+                        raise
+                    if quote_id is None:
+                        print(f"[RUNNER] {instance.account[:10]} {instance.symbol} quote not confirmed in time "
+                              f"(temp ID {temp_quote_id}); no new entry until it resolves")
+                        self._spawn(self._resolve_pending(instance))
+                        return
+                    self._opened(instance, quote_id)
+                else:
+                    print(f"[RUNNER] {instance.account[:10]} {instance.symbol} exit signal at {price}")
+                    await self.client.close_trade(
+                        instance.account, instance.symbol_id, instance.quote_id, instance.quantity,
+                        position_type=instance.position_type, slippage=self.slippage,
+                    )
+                    instance.in_position, instance.quote_id = False, None
+                    instance.closes += 1
+                    print(f"[RUNNER] {instance.account[:10]} {instance.symbol} close requested")
+        except Exception as e:
+            instance.errors += 1
+            self.stats["errors"] += 1
+            print(f"[RUNNER] {instance.account[:10]} {instance.symbol} {action} failed: {e}")
+        finally:
+            instance.busy = False
+
+    async def run(self) -> None:
+        if self.client is not None and not self.dry_run:
+            await self.client.get_contract_symbols()
+        await self.feed.run()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def load_instances(path: str) -> List[Dict]:
+    with open(path) as f:
+        return json.load(f)
+
+
+async def run_live() -> None:
+    load_dotenv()
+    hedger_url = os.getenv("HEDGER_URL")
+    private_key = os.getenv("PRIVATE_KEY")
+    app_name = os.getenv("NOTIFICATION_APP_NAME")
+    specs = load_instances(os.getenv("STRATEGIES_FILE"))
+
+    locked_params = LockedParamsCache(hedger_url)
+    locked_params.warm({(spec["symbol"], str(spec.get("leverage", "1"))) for spec in specs})
+    locked_params.start_background_refresh()
+
+    feed = MarketDataFeed()
+    feed.add_source(BinanceTradeSource(sorted({spec["symbol"] for spec in specs})))
+    async with AsyncSolverClient(
+        hedger_url,
+        int(os.getenv("CHAIN_ID", 42161)),
+        os.getenv("MUON_BASE_URL"),
+        os.getenv("DIAMOND_ADDRESS"),
+        hub=NotificationHub() if app_name else None,
+        notification_app_name=app_name,
+        locked_params=locked_params,
+        muon_ttl=CONFIG["MUON_PRICE_TTL"],
+        scheduler=RequestScheduler.from_env(),
+    ) as client:
+        runner = StrategyRunner(client, feed)
+        for spec in specs:
+            strategy = STRATEGIES[spec.get("strategy", "threshold")](spec["entry"], spec["exit"])
+            runner.add_instance(
+                private_key, spec["account"], spec["symbol"], spec["symbol_id"], strategy, spec["quantity"],
+                spec.get("position_type", 0), spec.get("leverage", "1"),
+            )
+        print(f"[RUNNER] {len(runner.instances)} instance(s), {len(runner._by_symbol)} symbol(s), "
+              f"{len(client.accounts)} sub-account(s)")
+        await runner.run()
+
+
+def benchmark(instances: int = 20_000, symbols: int = 300, ticks: int = 200_000) -> Dict[str, float]:
+    """Strategy evaluations per second on one core, with order execution stubbed out."""
+    names = [f"SYM{i:03d}USDT" for i in range(symbols)]
+    tick_data = random_walk_ticks(names, ticks)
+    first_price = {}
+    for _, symbol, price in tick_data:
+        first_price.setdefault(symbol, Decimal(price))
+
+    feed = MarketDataFeed(capacity=256)
+
+    async def run():
+        runner = StrategyRunner(None, feed, dry_run=True)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(instances):
+            symbol = names[i % symbols]
+            # Bands around the start price so some instances trade and most just evaluate
+            band = Decimal(1 + i % 50) / 1000
+            strategy = ThresholdStrategy(str(first_price[symbol] * (1 - band)), str(first_price[symbol]))
+            runner.add_instance(None, f"0x{i:040x}", symbol, i % symbols, strategy, "1")
+        per_instance = (tracemalloc.get_traced_memory()[0] - before) / instances
+        tracemalloc.stop()
+
+        feed.add_source(ReplaySource(tick_data))
+        start = time.perf_counter()
+        await runner.run()
+        return runner, per_instance, time.perf_counter() - start
+
+    runner, per_instance, elapsed = asyncio.run(run())
+    evals_per_s = runner.stats["evaluations"] / elapsed
+    result = {
+        "instances": instances,
+        "symbols": symbols,
+        "ticks": feed.stats["ticks"],
+        "elapsed_s": elapsed,
+        "evaluations_per_s": evals_per_s,
+        "bytes_per_instance": per_instance,
+        "signals": runner.stats["signals"],
+    }
+    print(f"[RUNNER] {instances} instances on {symbols} symbols, {feed.stats['ticks']} ticks in {elapsed:.2f}s")
+    print(f"[RUNNER] {evals_per_s:,.0f} strategy evaluations/s, {runner.stats['signals']} signals, "
+          f"~{per_instance:.0f} bytes per instance")
+    for rate in (1, 10, 100):
+        print(f"[RUNNER] At {rate} price change(s)/s per symbol one core drives ~{evals_per_s / rate:,.0f} instances")
+    return result
+
+
+def main():
+    if "--benchmark" in sys.argv:
+        benchmark()
+        return
+    configure_tracing()
+    try:
+        asyncio.run(run_live())
+    except KeyboardInterrupt:
+        print("\n[RUNNER] Stopped by user")
+
+
+if __name__ == "__main__":
+    main()
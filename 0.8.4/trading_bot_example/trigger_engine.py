@@ -0,0 +1,527 @@
+"""Trigger Engine: client-side stop / take-profit / trailing / limit conditions
+
+What this script does
+- Keeps thousands of price conditions per symbol locally instead of hand-coding
+  `current_price <= entry_price` for one symbol (instant_actions_trading_bot.py)
+  or handing every stop to the remote conditional-orders service.
+- Indexes each symbol's conditions in two heaps keyed by trigger price:
+  - "below" conditions (long stop, short take-profit, buy limit) in a max-heap
+  - "above" conditions (long take-profit, short stop, sell limit) in a min-heap
+  so a tick only looks at the top of each heap and pops the k crossed triggers
+  in O(k log n); untouched conditions cost nothing.
+- Trailing stops are grouped by the extreme price they trail from, each group a
+  heap keyed by trail distance. The groups are heaped by peak and by activation
+  level, so a new high (low, for shorts) merges only the groups it passes and a
+  tick only checks the group closest to firing: O(k log n) here too.
+- Cancelled conditions (e.g. one-cancels-other siblings) are deleted lazily and
+  counted; a book is compacted once they outnumber the live ones.
+- When a trigger fires, its siblings on the same quote are cancelled
+  (one-cancels-other) and the dispatcher closes the position: `instant_close`
+  through the async solver client, or an on-chain `requestToClosePosition`.
+- Subscribes to the streaming feed (market_data_feed.py), so checks run on every tick.
+
+Usage
+    engine = TriggerEngine(InstantCloseDispatcher(client))
+    engine.add_stop("XRPUSDT", quote_id=101, position_type=0, level="2.9", account=..., symbol_id=340, quantity="6")
+    engine.add_take_profit("XRPUSDT", quote_id=101, position_type=0, level="3.3", account=..., symbol_id=340, quantity="6")
+    engine.add_trailing("XRPUSDT", quote_id=102, position_type=1, trail="0.02", reference="3.05", ...)
+    engine.attach(feed)
+    ...
+    await engine.drain()                        # closes still in flight at shutdown
+
+Run
+- python trading_bot_example/trigger_engine.py     # throughput with 20k conditions, vs a linear scan
+"""
+
+import os
+import sys
+import time
+import heapq
+import random
+import asyncio
+import inspect
+import itertools
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Set, Union
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "instant_actions")))
+from market_data_feed import MarketDataFeed, ReplaySource, random_walk_ticks
+
+Number = Union[str, int, float, Decimal]
+
+STOP = "stop"
+TAKE_PROFIT = "take_profit"
+LIMIT = "limit"
+TRAILING = "trailing"
+BELOW = "below"
+ABOVE = "above"
+COMPACT_MIN = 1024  # cancelled entries a book holds before compaction is considered
+
+
+class Trigger:
+    """One condition on one symbol; `level` is the current trigger price."""
+
+    __slots__ = (
+        "id", "symbol", "kind", "when", "level", "trail", "quote_id", "position_type",
+        "account", "symbol_id", "quantity", "active", "fired_at",
+    )
+
+    def __init__(self, id, symbol, kind, when, level, trail, quote_id, position_type, account, symbol_id, quantity):
+        self.id = id
+        self.symbol = symbol
+        self.kind = kind
+        self.when = when
+        self.level = level
+        self.trail = trail
+        self.quote_id = quote_id
+        self.position_type = position_type
+        self.account = account
+        self.symbol_id = symbol_id
+        self.quantity = quantity
+        self.active = True
+        self.fired_at: Optional[float] = None
+
+    def __repr__(self) -> str:
+        return f"Trigger({self.kind} {self.symbol} quote={self.quote_id} {self.when} {self.level})"
+
+
+class _TrailGroup:
+    __slots__ = ("peak", "heap", "stamp", "alive")
+
+    def __init__(self, peak: float):
+        self.peak = peak
+        self.heap: List[tuple] = []  # (trail, seq, trigger)
+        self.stamp = -1
+        self.alive = True
+
+
+class _TrailingBook:
+    """Trailing stops of one direction on one symbol.
+
+    Both directions trail below a running peak of x = price (longs) or -price
+    (shorts), and fire once x <= peak * factor, factor = 1 - trail (long) or
+    1 + trail (short). Stops with the same peak share a group, a heap by trail.
+    Groups sit in two heaps: by peak, so a new extreme pops and merges exactly
+    the groups it passes, and by activation level (peak * factor of the
+    group's tightest trail), so a tick only looks at the group closest to
+    firing. A quiet tick is O(1); each fired stop or merged group costs O(log n).
+    """
+
+    __slots__ = ("long", "groups", "by_peak", "by_activation", "dead", "_stamps")
+
+    def __init__(self, long: bool):
+        self.long = long
+        self.groups: Dict[float, _TrailGroup] = {}  # peak -> live group
+        self.by_peak: List[tuple] = []             # (peak, stamp, group)
+        self.by_activation: List[tuple] = []       # (-activation, stamp, group); stale once the group is re-armed
+        self.dead = 0                              # cancelled stops still in a group's heap
+        self._stamps = itertools.count()
+
+    def _factor(self, trail: float) -> float:
+        return 1 - trail if self.long else 1 + trail
+
+    def _arm(self, group: _TrailGroup) -> None:
+        group.stamp = next(self._stamps)
+        heapq.heappush(self.by_activation, (-(group.peak * self._factor(group.heap[0][0])), group.stamp, group))
+
+    def _new_group(self, peak: float) -> _TrailGroup:
+        group = self.groups[peak] = _TrailGroup(peak)
+        heapq.heappush(self.by_peak, (peak, next(self._stamps), group))
+        return group
+
+    def add(self, trigger: Trigger, reference: float, seq: int) -> None:
+        peak = reference if self.long else -reference
+        group = self.groups.get(peak) or self._new_group(peak)
+        tightest = group.heap[0][0] if group.heap else None
+        heapq.heappush(group.heap, (trigger.trail, seq, trigger))
+        if tightest is None or trigger.trail < tightest:
+            self._arm(group)
+
+    def crossed(self, price: float) -> List[Trigger]:
+        x = price if self.long else -price
+        by_peak = self.by_peak
+        if by_peak and by_peak[0][0] <= x:
+            # A new extreme lifts every group it passes onto one peak; the smaller heaps go into the largest
+            merged = []
+            while by_peak and by_peak[0][0] <= x:
+                group = heapq.heappop(by_peak)[2]
+                if group.alive:
+                    del self.groups[group.peak]
+                    merged.append(group)
+            if merged:
+                base = max(merged, key=lambda g: len(g.heap))
+                for group in merged:
+                    if group is not base:
+                        group.alive = False
+                        for entry in group.heap:
+                            heapq.heappush(base.heap, entry)
+                base.peak = x
+                self.groups[x] = base
+                heapq.heappush(by_peak, (x, next(self._stamps), base))
+                self._arm(base)
+
+        fired = []
+        by_activation = self.by_activation
+        while by_activation and -by_activation[0][0] >= x:
+            _, stamp, group = heapq.heappop(by_activation)
+            if not group.alive or stamp != group.stamp:
+                continue
+            heap = group.heap
+            while heap and (not heap[0][2].active or x <= group.peak * self._factor(heap[0][0])):
+                trail, _, trigger = heapq.heappop(heap)
+                if trigger.active:
+                    level = group.peak * self._factor(trail)
+                    trigger.level = level if self.long else -level
+                    fired.append(trigger)
+                else:
+                    self.dead -= 1
+            if heap:
+                self._arm(group)
+            else:
+                group.alive = False
+                del self.groups[group.peak]
+        return fired
+
+    def compact(self) -> None:
+        """Drop cancelled stops and rebuild both group heaps."""
+        groups = list(self.groups.values())
+        self.groups, self.by_peak, self.by_activation = {}, [], []
+        for group in groups:
+            group.heap = [entry for entry in group.heap if entry[2].active]
+            if not group.heap:
+                group.alive = False
+                continue
+            heapq.heapify(group.heap)
+            self.groups[group.peak] = group
+            self.by_peak.append((group.peak, next(self._stamps), group))
+            self._arm(group)
+        heapq.heapify(self.by_peak)
+        self.dead = 0
+
+
+class _SymbolBook:
+    __slots__ = ("below", "above", "trailing_long", "trailing_short", "live", "dead")
+
+    def __init__(self):
+        self.below: List[tuple] = []   # (-level, seq, trigger)
+        self.above: List[tuple] = []   # (level, seq, trigger)
+        self.trailing_long = _TrailingBook(True)
+        self.trailing_short = _TrailingBook(False)
+        self.live = 0                  # active triggers of every kind
+        self.dead = 0                  # cancelled triggers still in `below` / `above`
+
+    def compact(self) -> None:
+        self.below = [entry for entry in self.below if entry[2].active]
+        self.above = [entry for entry in self.above if entry[2].active]
+        heapq.heapify(self.below)
+        heapq.heapify(self.above)
+        self.dead = 0
+
+
+class TriggerEngine:
+    """Per-symbol trigger heaps; `on_price` pops crossed triggers and hands them to `dispatch`."""
+
+    def __init__(self, dispatch: Optional[Callable[[Trigger, Decimal, float], Any]] = None, one_cancels_other: bool = True):
+        self.dispatch = dispatch
+        self.one_cancels_other = one_cancels_other
+        self.books: Dict[str, _SymbolBook] = {}
+        self.by_quote: Dict[Any, List[Trigger]] = {}  # live triggers with a quote_id
+        self._ids = itertools.count(1)
+        self._tasks: Set[asyncio.Future] = set()  # async dispatches in flight; the loop only keeps weak refs
+        self.stats = {"ticks": 0, "fired": 0, "cancelled": 0, "dispatch_errors": 0}
+
+    # ----------------------------------------------------------------
+    # Adding and cancelling
+    # ----------------------------------------------------------------
+    def _book(self, symbol: str) -> _SymbolBook:
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = _SymbolBook()
+        return book
+
+    def add(
+        self,
+        symbol: str,
+        level: Number,
+        when: str,
+        kind: str = LIMIT,
+        quote_id: Any = None,
+        position_type: int = 0,
+        account: Optional[str] = None,
+        symbol_id: Optional[int] = None,
+        quantity: Optional[str] = None,
+    ) -> Trigger:
+        """Fire once the price is at or `below` / `above` `level`."""
+        if when not in (BELOW, ABOVE):
+            raise ValueError("when must be 'below' or 'above'")
+        symbol = symbol.upper()
+        trigger = Trigger(next(self._ids), symbol, kind, when, float(level), None, quote_id,
+                          position_type, account, symbol_id, quantity)
+        book = self._book(symbol)
+        if when == BELOW:
+            heapq.heappush(book.below, (-trigger.level, trigger.id, trigger))
+        else:
+            heapq.heappush(book.above, (trigger.level, trigger.id, trigger))
+        self._index(book, trigger)
+        return trigger
+
+    def add_stop(self, symbol: str, quote_id: Any, position_type: int, level: Number, **kwargs) -> Trigger:
+        """A long stops out when price falls to `level`; a short when it rises to it."""
+        when = BELOW if position_type == 0 else ABOVE
+        return self.add(symbol, level, when, STOP, quote_id, position_type, **kwargs)
+
+    def add_take_profit(self, symbol: str, quote_id: Any, position_type: int, level: Number, **kwargs) -> Trigger:
+        when = ABOVE if position_type == 0 else BELOW
+        return self.add(symbol, level, when, TAKE_PROFIT, quote_id, position_type, **kwargs)
+
+    def add_trailing(
+        self, symbol: str, quote_id: Any, position_type: int, trail: Number, reference: Number, **kwargs,
+    ) -> Trigger:
+        """Stop `trail` (a fraction, 0.02 = 2%) behind the best price since `reference` (usually the fill)."""
+        symbol = symbol.upper()
+        trail, reference = float(trail), float(reference)
+        long = position_type == 0
+        trigger = Trigger(next(self._ids), symbol, TRAILING, BELOW if long else ABOVE,
+                          reference * (1 - trail) if long else reference * (1 + trail), trail, quote_id,
+                          position_type, kwargs.get("account"), kwargs.get("symbol_id"), kwargs.get("quantity"))
+        book = self._book(symbol)
+        (book.trailing_long if long else book.trailing_short).add(trigger, reference, trigger.id)
+        self._index(book, trigger)
+        return trigger
+
+    def _index(self, book: _SymbolBook, trigger: Trigger) -> None:
+        book.live += 1
+        if trigger.quote_id is not None:
+            self.by_quote.setdefault(trigger.quote_id, []).append(trigger)
+
+    def _retire(self, trigger: Trigger) -> None:
+        """`trigger` leaves the live set (fired or cancelled)."""
+        trigger.active = False
+        self.books[trigger.symbol].live -= 1
+        siblings = self.by_quote.get(trigger.quote_id) if trigger.quote_id is not None else None
+        if siblings is not None:
+            siblings.remove(trigger)
+            if not siblings:
+                del self.by_quote[trigger.quote_id]
+
+    def cancel(self, trigger: Trigger) -> None:
+        """Lazy removal: the heap entry is dropped when it reaches the top, or by compaction."""
+        if not trigger.active:
+            return
+        self._retire(trigger)
+        self.stats["cancelled"] += 1
+        book = self.books[trigger.symbol]
+        if trigger.kind == TRAILING:
+            store = book.trailing_long if trigger.position_type == 0 else book.trailing_short
+        else:
+            store = book
+        store.dead += 1
+        if store.dead > COMPACT_MIN and store.dead > book.live:
+            store.compact()
+
+    def cancel_quote(self, quote_id: Any) -> None:
+        for trigger in self.by_quote.pop(quote_id, ()):
+            self.cancel(trigger)
+
+    def __len__(self) -> int:
+        """Live (not fired, not cancelled) triggers."""
+        return sum(book.live for book in self.books.values())
+
+    # ----------------------------------------------------------------
+    # Ticks
+    # ----------------------------------------------------------------
+    def crossed(self, symbol: str, price: float) -> List[Trigger]:
+        """Pop every trigger `price` crosses, without dispatching."""
+        book = self.books.get(symbol)
+        if book is None:
+            return []
+        fired = []
+        below, above = book.below, book.above
+        while below and -below[0][0] >= price:
+            trigger = heapq.heappop(below)[2]
+            if trigger.active:
+                fired.append(trigger)
+            else:
+                book.dead -= 1
+        while above and above[0][0] <= price:
+            trigger = heapq.heappop(above)[2]
+            if trigger.active:
+                fired.append(trigger)
+            else:
+                book.dead -= 1
+        if book.trailing_long.groups:
+            fired.extend(book.trailing_long.crossed(price))
+        if book.trailing_short.groups:
+            fired.extend(book.trailing_short.crossed(price))
+        for trigger in fired:
+            self._retire(trigger)
+        return fired
+
+    def on_price(self, symbol: str, price: Decimal, timestamp: float) -> List[Trigger]:
+        """Feed callback: fire and dispatch every crossed trigger."""
+        self.stats["ticks"] += 1
+        fired = self.crossed(symbol, float(price))
+        closed = set()
+        for trigger in fired:
+            if self.one_cancels_other and trigger.quote_id is not None:
+                if trigger.quote_id in closed:
+                    continue  # a sibling already fired on this tick
+                closed.add(trigger.quote_id)
+                self.cancel_quote(trigger.quote_id)
+            trigger.fired_at = timestamp
+            self.stats["fired"] += 1
+            if self.dispatch is None:
+                continue
+            try:
+                result = self.dispatch(trigger, price, timestamp)
+                if inspect.isawaitable(result):
+                    task = asyncio.ensure_future(result)
+                    self._tasks.add(task)
+                    task.add_done_callback(self._dispatch_done)
+            except Exception as e:
+                self.stats["dispatch_errors"] += 1
+                print(f"[TRIGGER] Dispatch failed for {trigger}: {e}")
+        return fired
+
+    def _dispatch_done(self, task: asyncio.Future) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["dispatch_errors"] += 1
+            print(f"[TRIGGER] Dispatch failed: {task.exception()}")
+
+    async def drain(self) -> None:
+        """Wait for every async dispatch still in flight (e.g. closes sent on the last ticks before shutdown)."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def attach(self, feed: MarketDataFeed) -> None:
+        """Run on every price change of every symbol the feed carries."""
+        feed.subscribe_all(self.on_price)
+
+
+# --------------------------------------------------------------------
+# Dispatchers
+# --------------------------------------------------------------------
+class InstantCloseDispatcher:
+    """Closes a triggered quote with `/instant_close` through an AsyncSolverClient."""
+
+    def __init__(self, client, slippage: Number = "0.01", max_in_flight: int = 64):
+        self.client = client
+        self.slippage = Decimal(str(slippage))
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def __call__(self, trigger: Trigger, price: Decimal, timestamp: float) -> None:
+        async with self.semaphore:
+            try:
+                await self.client.close_trade(
+                    trigger.account, trigger.symbol_id, trigger.quote_id, trigger.quantity,
+                    trigger.position_type, self.slippage,
+                )
+                print(f"[TRIGGER] {trigger.kind} at {price}: instant close sent for quote {trigger.quote_id}")
+            except Exception as e:
+                print(f"[TRIGGER] Instant close failed for quote {trigger.quote_id}: {e}")
+
+
+class RequestToCloseDispatcher:
+    """Sends an on-chain `requestToClosePosition` (party_a/request_to_close_position.py) in a worker thread."""
+
+    def __init__(self, close_client, slippage: Number = "0.01", order_type: int = 1, deadline_offset: int = 3600):
+        self.close_client = close_client
+        self.slippage = Decimal(str(slippage))
+        self.order_type = order_type
+        self.deadline_offset = deadline_offset
+
+    async def __call__(self, trigger: Trigger, price: Decimal, timestamp: float) -> None:
+        # Closing a long sells below the price, closing a short buys above it
+        factor = 1 - self.slippage if trigger.position_type == 0 else 1 + self.slippage
+        close_price = int(price * factor * 10**18)
+        quantity = int(Decimal(str(trigger.quantity)) * 10**18)
+        deadline = int(time.time()) + self.deadline_offset
+        try:
+            await asyncio.to_thread(
+                self.close_client.request_to_close_position,
+                trigger.quote_id, close_price, quantity, self.order_type, deadline,
+            )
+        except Exception as e:
+            print(f"[TRIGGER] requestToClosePosition failed for quote {trigger.quote_id}: {e}")
+
+
+# --------------------------------------------------------------------
+# Benchmark
+# --------------------------------------------------------------------
+def benchmark(conditions: int = 20_000, symbols: int = 100, ticks: int = 200_000, seed: int = 5) -> Dict[str, float]:
+    rng = random.Random(seed)
+    names = [f"SYM{i:03d}USDT" for i in range(symbols)]
+    tape = random_walk_ticks(names, ticks, seed=seed)
+    first = {}
+    for _, symbol, price in tape:
+        first.setdefault(symbol, float(price))
+    last = dict(first)
+
+    def populate(engine: "TriggerEngine", quote_ids):
+        for quote_id in quote_ids:
+            symbol = names[quote_id % symbols]
+            ref = last[symbol]
+            kind = rng.random()
+            position_type = rng.randint(0, 1)
+            if kind < 0.4:
+                engine.add_stop(symbol, quote_id, position_type, ref * (1 - rng.uniform(0, 0.05) * (1 if position_type == 0 else -1)))
+            elif kind < 0.8:
+                engine.add_take_profit(symbol, quote_id, position_type, ref * (1 + rng.uniform(0, 0.05) * (1 if position_type == 0 else -1)))
+            else:
+                engine.add_trailing(symbol, quote_id, position_type, rng.uniform(0.005, 0.05), ref)
+
+    # Keep the book at `conditions` by re-arming a fresh condition around the current price for every fire
+    next_quote = itertools.count(conditions)
+
+    def rearm(trigger, price, ts):
+        quote_id = next(next_quote)
+        last[names[quote_id % symbols]] = float(feed.latest(names[quote_id % symbols]) or price)
+        populate(engine, [quote_id])
+
+    engine = TriggerEngine(rearm)
+    populate(engine, range(conditions))
+    feed = MarketDataFeed(capacity=64)
+    engine.attach(feed)
+    feed.add_source(ReplaySource(tape, yield_every=10_000))
+    start = time.perf_counter()
+    asyncio.run(feed.run())
+    elapsed = time.perf_counter() - start
+    engine_fired = engine.stats["fired"]
+
+    # Matching alone, without the feed: heaps vs checking every condition of the symbol on every tick
+    sample = [(symbol, float(price)) for _, symbol, price in tape[:20_000]]
+    last.update(first)
+    engine = TriggerEngine()
+    populate(engine, range(conditions))
+    start = time.perf_counter()
+    for symbol, price in sample:
+        engine.crossed(symbol, price)
+    heap_tps = len(sample) / (time.perf_counter() - start)
+
+    levels: Dict[str, List[tuple]] = {s: [] for s in names}
+    for i in range(conditions):
+        symbol = names[i % symbols]
+        levels[symbol].append((first[symbol] * (1 - rng.uniform(-0.05, 0.05)), rng.random() < 0.5))
+    start = time.perf_counter()
+    for symbol, price in sample:
+        for level, below in levels[symbol]:
+            if (price <= level) if below else (price >= level):
+                pass
+    scan_tps = len(sample) / (time.perf_counter() - start)
+
+    tps = ticks / elapsed
+    print(f"[TRIGGER] {conditions} conditions over {symbols} symbols (40% stop, 40% take-profit, 20% trailing)")
+    print(f"[TRIGGER] {ticks} ticks through the feed in {elapsed:.2f}s: {tps:,.0f} ticks/s, "
+          f"{engine_fired} fired and re-armed")
+    print(f"[TRIGGER] Matching only: heaps {heap_tps:,.0f} ticks/s, linear scan {scan_tps:,.0f} ticks/s "
+          f"({heap_tps / scan_tps:.0f}x)")
+    return {"ticks_per_s": tps, "heap_ticks_per_s": heap_tps, "scan_ticks_per_s": scan_tps}
+
+
+def main():
+    benchmark()
+
+
+if __name__ == "__main__":
+    main()
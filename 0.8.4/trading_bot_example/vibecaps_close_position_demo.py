@@ -26,15 +26,19 @@ import json
 import os
 import time
 import traceback
-from datetime import datetime, timedelta, timezone
-from decimal import Decimal, ROUND_DOWN
+from datetime import timedelta
+from decimal import Decimal
 
 import requests
 from dotenv import load_dotenv
 from eth_account import Account
-from eth_account.messages import encode_defunct
 from web3 import Web3
 
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "instant_actions")))
+from session_manager import SiweSessionManager
+from symbol_catalog import SymbolCatalog
+
 
 def prompt_str(label: str, default: str | None = None) -> str:
 	if default is None:
@@ -72,89 +76,11 @@ def prompt_decimal(label: str, default: str | None = None, *, min_value: Decimal
 		return value
 
 
-def utc_iso_ms_z(dt: datetime) -> str:
-	return dt.isoformat(timespec="milliseconds").replace("+00:00", "Z")
-
-
-def build_siwe_message(
-	*,
-	domain: str,
-	address: str,
-	statement: str,
-	uri: str,
-	version: str,
-	chain_id: int,
-	nonce: str,
-	issued_at: str,
-	expiration_time: str,
-) -> str:
-	return f"""{domain} wants you to sign in with your Ethereum account:
-{address}
-
-{statement}
-
-URI: {uri}
-Version: {version}
-Chain ID: {chain_id}
-Nonce: {nonce}
-Issued At: {issued_at}
-Expiration Time: {expiration_time}"""
-
-
-def get_nonce(solver_base_url: str, account_address: str) -> str:
-	url = f"{solver_base_url}/nonce/{account_address}"
-	print(f"[NONCE] {url}")
-	resp = requests.get(url, timeout=30)
-	resp.raise_for_status()
-	return resp.json()["nonce"]
-
-
-def login(*, solver_base_url: str, chain_id: int, active_account: str, wallet: Account) -> str:
-	login_uri = f"{solver_base_url}/login"
-
-	issued_at = utc_iso_ms_z(datetime.now(timezone.utc))
-	expiration_time = utc_iso_ms_z(datetime.now(timezone.utc) + timedelta(hours=24))
-
-	nonce = get_nonce(solver_base_url, active_account)
-	msg = build_siwe_message(
-		domain="localhost",
-		address=wallet.address,
-		statement=f"msg: {active_account}",
-		uri=login_uri,
-		version="1",
-		chain_id=chain_id,
-		nonce=nonce,
-		issued_at=issued_at,
-		expiration_time=expiration_time,
-	)
-	print(f"[LOGIN] SIWE Message:\n{msg}\n")
-
-	message = encode_defunct(text=msg)
-	signed = wallet.sign_message(message)
-	signature = "0x" + signed.signature.hex()
-
-	body = {
-		"account_address": active_account,
-		"expiration_time": expiration_time,
-		"issued_at": issued_at,
-		"signature": signature,
-		"nonce": nonce,
-	}
-	headers = {
-		"Content-Type": "application/json",
-		"Origin": "http://localhost:3000",
-		"Referer": "http://localhost:3000",
-	}
-
-	print(f"[LOGIN] POST {login_uri}")
-	resp = requests.post(login_uri, json=body, headers=headers, timeout=30)
-	print(f"[LOGIN] Response: {resp.text}")
-	resp.raise_for_status()
-
-	token = resp.json().get("access_token")
-	if not token:
-		raise ValueError("No access_token in login response")
-	return token
+def login(*, solver_base_url: str, chain_id: int, active_account: str, wallet: Account) -> SiweSessionManager:
+	"""A logged-in session for `active_account`; the SIWE login only runs when the cached token is missing or expiring."""
+	session = SiweSessionManager(solver_base_url, wallet.key.hex(), active_account, chain_id, lifetime=timedelta(hours=24))
+	session.get_token()
+	return session
 
 
 def get_muon_url(muon_base_url: str, *, party_a: str, chain_id: int, symmio: str, symbol_id: int) -> str:
@@ -179,58 +105,10 @@ def fetch_muon_price(*, muon_base_url: str, party_a: str, chain_id: int, symmio:
 	return Decimal(price_wei) / Decimal("1e18")
 
 
-def fetch_symbol_info(solver_base_url: str, symbol_id: int) -> dict:
-	url = f"{solver_base_url}/contract-symbols"
-	print(f"[SYMBOLS] {url}")
-	resp = requests.get(url, timeout=30)
-	resp.raise_for_status()
-	payload = resp.json()
-
-	symbols: list[dict] = []
-	if isinstance(payload, list):
-		symbols = [s for s in payload if isinstance(s, dict)]
-	elif isinstance(payload, dict):
-		candidate = None
-		for key in ("symbols", "data", "result", "items", "contract_symbols"):
-			val = payload.get(key)
-			if isinstance(val, list):
-				candidate = val
-				break
-			if isinstance(val, dict):
-				nested = val.get("symbols") or val.get("data") or val.get("result")
-				if isinstance(nested, list):
-					candidate = nested
-					break
-		if isinstance(candidate, list):
-			symbols = [s for s in candidate if isinstance(s, dict)]
-		else:
-			values = list(payload.values())
-			if values and all(isinstance(v, dict) for v in values):
-				symbols = values
-
-	def _coerce_int(v):
-		try:
-			return int(v)
-		except (TypeError, ValueError):
-			return None
-
-	for sym in symbols:
-		sym_id = _coerce_int(sym.get("symbol_id")) or _coerce_int(sym.get("symbolId")) or _coerce_int(sym.get("id"))
-		if sym_id == symbol_id:
-			return sym
-
-	raise ValueError(f"Symbol ID {symbol_id} not found in contract-symbols")
-
-
-def format_decimal(value: Decimal, precision: int) -> str:
-	quantizer = Decimal(10) ** -precision
-	return str(value.quantize(quantizer, rounding=ROUND_DOWN))
-
-
 def instant_close(
 	*,
 	solver_base_url: str,
-	token: str,
+	session: SiweSessionManager,
 	quote_id: int,
 	quantity_to_close: str,
 	close_price: str,
@@ -245,13 +123,10 @@ def instant_close(
 		"deadline": int(deadline),
 		"order_type": int(order_type),
 	}
-	headers = {
-		"Content-Type": "application/json",
-		"Authorization": f"Bearer {token}",
-	}
+	headers = {"Content-Type": "application/json"}  # the session adds the token and re-logs in once on 401
 	print(f"[CLOSE] POST {url}")
 	print(f"[CLOSE] Payload: {json.dumps(payload, indent=2)}")
-	resp = requests.post(url, json=payload, headers=headers, timeout=30)
+	resp = session.request("POST", url, json=payload, headers=headers, timeout=30)
 	print(f"[CLOSE] Status: {resp.status_code}")
 	print(f"[CLOSE] Response: {resp.text}")
 	resp.raise_for_status()
@@ -363,12 +238,10 @@ def main() -> None:
 	)
 	print("=" * 60)
 
-	token = login(solver_base_url=solver_base_url, chain_id=chain_id, active_account=active_account, wallet=wallet)
+	session = login(solver_base_url=solver_base_url, chain_id=chain_id, active_account=active_account, wallet=wallet)
 	print("✅ Logged in")
 
-	symbol_info = fetch_symbol_info(solver_base_url, args.symbol_id)
-	price_precision = int(symbol_info.get("price_precision", 6))
-	quantity_precision = int(symbol_info.get("quantity_precision", 6))
+	fmt = SymbolCatalog(solver_base_url).formatter(args.symbol_id)
 
 	muon_price = fetch_muon_price(
 		muon_base_url=muon_base_url,
@@ -390,15 +263,15 @@ def main() -> None:
 		adjusted_price = muon_price * (Decimal("1") + slippage)
 		slippage_label = f"+{slippage}"
 
-	close_price = format_decimal(adjusted_price, price_precision)
-	quantity_to_close = format_decimal(Decimal(str(args.quantity)), quantity_precision)
+	close_price = fmt.price(adjusted_price)
+	quantity_to_close = fmt.quantity(Decimal(str(args.quantity)))
 
 	print(f"[PRICE] Muon: {muon_price} | Slippage: {slippage_label} | Close Price: {close_price}")
 	print(f"[QTY] Quantity to close formatted: {quantity_to_close}")
 
 	instant_close(
 		solver_base_url=solver_base_url,
-		token=token,
+		session=session,
 		quote_id=args.quote_id,
 		quantity_to_close=quantity_to_close,
 		close_price=close_price,
@@ -0,0 +1,363 @@
+"""Latency-weighted RPC endpoint pool with failover.
+
+Every script binds to a single `RPC_URL`, so one slow or rate-limited node
+stalls every bot on that chain. `RpcEndpointPool` is a drop-in Web3 provider
+that takes several RPC URLs for the same chain and:
+
+- routes reads to the healthy endpoint with the lowest EWMA latency
+  (weighted by its EWMA error rate), failing over on transport errors,
+- broadcasts `eth_sendRawTransaction` to several endpoints at once and returns
+  the first accepted hash,
+- tracks block height per endpoint and ejects nodes that lag behind the best
+  one, or that keep failing, for a cool-down period.
+
+Usage
+    w3 = Web3(RpcEndpointPool(os.getenv("RPC_URLS").split(",")))
+
+Run
+- python tx_pipeline/rpc_pool.py
+
+The demo starts local stub JSON-RPC nodes with injected latency, 429s, block
+lag and an outage, and compares read latency through the pool with single
+endpoints. No .env is needed.
+
+Optional .env
+- RPC_URLS  # comma-separated RPC URLs of one chain (falls back to RPC_URL)
+"""
+
+import os
+import json
+import time
+import random
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence
+
+from dotenv import load_dotenv
+from web3 import HTTPProvider, Web3
+from web3.providers.base import JSONBaseProvider
+
+BROADCAST_METHODS = {"eth_sendRawTransaction"}
+
+
+class _Endpoint:
+    """Health statistics for one RPC URL."""
+
+    __slots__ = (
+        "url", "provider", "latency_ewma", "error_ewma", "block_number",
+        "consecutive_errors", "ejected_until", "requests", "errors",
+    )
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url
+        self.provider = HTTPProvider(
+            url,
+            request_kwargs={"timeout": timeout},
+            exception_retry_configuration=None,
+        )
+        self.latency_ewma = 0.0
+        self.error_ewma = 0.0
+        self.block_number = 0
+        self.consecutive_errors = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def score(self) -> float:
+        return self.latency_ewma * (1.0 + 10.0 * self.error_ewma)
+
+
+class RpcEndpointPool(JSONBaseProvider):
+    """Web3 provider routing requests over several RPC endpoints of one chain."""
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        timeout: float = 10.0,
+        alpha: float = 0.2,
+        broadcast_fanout: int = 3,
+        max_block_lag: int = 3,
+        max_consecutive_errors: int = 3,
+        eject_seconds: float = 30.0,
+        health_interval: Optional[float] = 2.0,
+    ):
+        super().__init__()
+        urls = [u.strip() for u in urls if u and u.strip()]
+        if not urls:
+            raise ValueError("RpcEndpointPool needs at least one RPC URL")
+
+        self.endpoints = [_Endpoint(url, timeout) for url in urls]
+        self.alpha = alpha
+        self.broadcast_fanout = broadcast_fanout
+        self.max_block_lag = max_block_lag
+        self.max_consecutive_errors = max_consecutive_errors
+        self.eject_seconds = eject_seconds
+
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(4, len(self.endpoints)))
+        self._stop = threading.Event()
+
+        if health_interval:
+            self.check_health()
+            self._health_thread = threading.Thread(
+                target=self._health_loop, args=(health_interval,), daemon=True
+            )
+            self._health_thread.start()
+
+    # ----------------------------------------------------------------
+    # Bookkeeping
+    # ----------------------------------------------------------------
+    def _record(self, endpoint: _Endpoint, elapsed: float, failed: bool) -> None:
+        with self._lock:
+            a = self.alpha
+            endpoint.requests += 1
+            if endpoint.latency_ewma == 0.0:
+                endpoint.latency_ewma = elapsed
+            else:
+                endpoint.latency_ewma = (1 - a) * endpoint.latency_ewma + a * elapsed
+            endpoint.error_ewma = (1 - a) * endpoint.error_ewma + a * (1.0 if failed else 0.0)
+            if failed:
+                endpoint.errors += 1
+                endpoint.consecutive_errors += 1
+                now = time.monotonic()
+                if endpoint.consecutive_errors >= self.max_consecutive_errors and endpoint.ejected_until <= now:
+                    endpoint.ejected_until = now + self.eject_seconds
+                    print(f"[RPC POOL] Ejected {endpoint.url} after {endpoint.consecutive_errors} errors")
+            else:
+                endpoint.consecutive_errors = 0
+
+    def ranked(self) -> List[_Endpoint]:
+        """Healthy endpoints ordered by score; all endpoints if none is healthy."""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [e for e in self.endpoints if e.ejected_until <= now]
+            return sorted(healthy or self.endpoints, key=_Endpoint.score)
+
+    def _call(self, endpoint: _Endpoint, method: str, params: Any) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            response = endpoint.provider.make_request(method, params)
+        except Exception:
+            self._record(endpoint, time.perf_counter() - start, failed=True)
+            raise
+        self._record(endpoint, time.perf_counter() - start, failed=False)
+        return response
+
+    # ----------------------------------------------------------------
+    # Health checks
+    # ----------------------------------------------------------------
+    def check_health(self) -> None:
+        """Refresh block heights of every endpoint and eject the ones lagging behind."""
+        futures = {
+            self._executor.submit(self._call, e, "eth_blockNumber", []): e for e in self.endpoints
+        }
+        for future in as_completed(futures):
+            endpoint = futures[future]
+            try:
+                result = future.result().get("result")
+                if result is not None:
+                    endpoint.block_number = int(result, 16)
+            except Exception:
+                pass
+
+        best = max(e.block_number for e in self.endpoints)
+        now = time.monotonic()
+        with self._lock:
+            for endpoint in self.endpoints:
+                lag = best - endpoint.block_number
+                if lag > self.max_block_lag and endpoint.ejected_until <= now:
+                    endpoint.ejected_until = now + self.eject_seconds
+                    print(f"[RPC POOL] Ejected {endpoint.url}: {lag} blocks behind")
+
+    def _health_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.check_health()
+
+    def close(self) -> None:
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+
+    # ----------------------------------------------------------------
+    # Provider interface
+    # ----------------------------------------------------------------
+    def make_request(self, method, params):
+        if method in BROADCAST_METHODS:
+            return self._broadcast(method, params)
+
+        last_error: Optional[Exception] = None
+        for endpoint in self.ranked():
+            try:
+                return self._call(endpoint, method, params)
+            except Exception as e:
+                last_error = e
+                print(f"[RPC POOL] {method} failed on {endpoint.url}: {e}")
+        raise last_error
+
+    def _broadcast(self, method, params):
+        targets = self.ranked()[: self.broadcast_fanout]
+        futures = [self._executor.submit(self._call, e, method, params) for e in targets]
+
+        first_error_response = None
+        last_error: Optional[Exception] = None
+        for future in as_completed(futures):
+            try:
+                response = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            if "result" in response:
+                return response
+            first_error_response = first_error_response or response
+        if first_error_response is not None:
+            return first_error_response
+        raise last_error
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return any(e.provider.is_connected(show_traceback) for e in self.ranked())
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "url": e.url,
+                "latency_ms": round(e.latency_ewma * 1000, 2),
+                "error_rate": round(e.error_ewma, 3),
+                "block_number": e.block_number,
+                "requests": e.requests,
+                "errors": e.errors,
+                "ejected": e.ejected_until > now,
+            }
+            for e in self.endpoints
+        ]
+
+
+# --------------------------------------------------------------------
+# Fault-injection benchmark with local stub nodes
+# --------------------------------------------------------------------
+class _StubNodeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    wbufsize = 65536
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        node = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        request = json.loads(body)
+        time.sleep(node.latency * (0.5 + node.rng.random()))
+
+        if node.down:
+            payload = b'{"error": "service unavailable"}'
+            self.send_response(503)
+        elif node.rng.random() < node.error_rate:
+            payload = b'{"error": "rate limited"}'
+            self.send_response(429)
+        else:
+            method = request["method"]
+            if method == "eth_blockNumber":
+                result = hex(node.block_number())
+            elif method == "eth_chainId":
+                result = hex(42161)
+            elif method == "eth_sendRawTransaction":
+                result = Web3.to_hex(Web3.keccak(hexstr=request["params"][0]))
+            else:
+                result = hex(10**18)
+            payload = json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": result}).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_stub_node(latency: float, error_rate: float = 0.0, block_lag: int = 0, seed: int = 0) -> ThreadingHTTPServer:
+    """Start a local JSON-RPC stub on a free port. Blocks advance every 250 ms."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubNodeHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.down = False
+    server.rng = random.Random(seed)
+    started = time.monotonic()
+    server.block_number = lambda: 1000 + int((time.monotonic() - started) / 0.25) - block_lag
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _stub_url(server: ThreadingHTTPServer) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _measure(w3: Web3, reads: int, address: str) -> Dict[str, float]:
+    latencies = []
+    errors = 0
+    for _ in range(reads):
+        start = time.perf_counter()
+        try:
+            w3.eth.get_balance(address)
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+def benchmark(reads: int = 200) -> None:
+    address = "0x5044238ea045585C704dC2C6387D66d29eD56648"
+    nodes = {
+        "fast": start_stub_node(latency=0.005, seed=1),
+        "slow": start_stub_node(latency=0.060, seed=2),
+        "flaky": start_stub_node(latency=0.008, error_rate=0.3, seed=3),
+        "lagging": start_stub_node(latency=0.002, block_lag=50, seed=4),
+    }
+    urls = {name: _stub_url(server) for name, server in nodes.items()}
+
+    for name in ("slow", "flaky"):
+        w3 = Web3(HTTPProvider(urls[name], exception_retry_configuration=None))
+        result = _measure(w3, reads, address)
+        print(f"[BENCH] single {name:<8} p50={result['p50_ms']:6.1f}ms p99={result['p99_ms']:6.1f}ms errors={result['errors']}")
+
+    pool = RpcEndpointPool(list(urls.values()), eject_seconds=5.0, health_interval=0.5)
+    w3 = Web3(pool)
+    result = _measure(w3, reads, address)
+    print(f"[BENCH] pool            p50={result['p50_ms']:6.1f}ms p99={result['p99_ms']:6.1f}ms errors={result['errors']}")
+
+    # Outage: take the fastest node down and keep reading
+    nodes["fast"].down = True
+    result = _measure(w3, reads, address)
+    print(f"[BENCH] pool (fast down) p50={result['p50_ms']:6.1f}ms p99={result['p99_ms']:6.1f}ms errors={result['errors']}")
+
+    tx_hash = w3.eth.send_raw_transaction("0x" + "ab" * 100)
+    print(f"[BENCH] broadcast accepted: {tx_hash.hex()}")
+
+    for row in pool.stats():
+        name = next(n for n, u in urls.items() if u == row["url"])
+        print(f"[BENCH] {name:<8} {row}")
+    pool.close()
+    for server in nodes.values():
+        server.shutdown()
+
+
+def main():
+    load_dotenv()
+    urls = os.getenv("RPC_URLS") or os.getenv("RPC_URL")
+    if urls and len(urls.split(",")) > 1:
+        pool = RpcEndpointPool(urls.split(","))
+        w3 = Web3(pool)
+        print(f"[RPC POOL] Block number: {w3.eth.block_number}")
+        for row in pool.stats():
+            print(f"[RPC POOL] {row}")
+        pool.close()
+    benchmark()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Pre-flight eth_call simulation with cached revert diagnosis.
+
+Scripts such as options-0.2.1/account/deallocate.py hardcode `gas` to avoid
+estimateGas masking the real revert reason, so a doomed transaction is only
+discovered after it has been mined and paid for. `TxSimulator` runs every built
+transaction through `eth_call` against the pending block while the transaction
+is being signed, decodes the revert (custom errors from the diamond ABI,
+`Error(string)` and `Panic(uint256)`) and aborts the send if it would revert.
+
+Simulation results are cached by (sender, target, calldata, value, block), so
+retrying the same transaction within a block costs no extra RPC call.
+
+Run
+- python tx_pipeline/simulate.py
+
+Required .env (only for the live pre-flight at the end of the demo)
+- RPC_URL
+- PRIVATE_KEY
+- DIAMOND_ADDRESS
+
+Optional .env
+- ABI_DIR  # directory of ABI json files to load error definitions from (default: ../abi)
+"""
+
+import os
+import json
+import glob
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from eth_abi import decode as abi_decode, encode as abi_encode
+from eth_utils import function_abi_to_4byte_selector
+from eth_utils.abi import collapse_if_tuple
+from web3 import Web3
+from web3.exceptions import ContractLogicError
+
+ERROR_STRING_SELECTOR = bytes.fromhex("08c379a0")  # Error(string)
+PANIC_SELECTOR = bytes.fromhex("4e487b71")  # Panic(uint256)
+
+PANIC_CODES = {
+    0x00: "generic compiler panic",
+    0x01: "assertion failed",
+    0x11: "arithmetic overflow or underflow",
+    0x12: "division or modulo by zero",
+    0x21: "invalid enum value",
+    0x22: "invalid storage byte array encoding",
+    0x31: "pop on empty array",
+    0x32: "array index out of bounds",
+    0x41: "out of memory",
+    0x51: "call to zero-initialized function",
+}
+
+
+class SimulationRevert(Exception):
+    """Raised when a transaction is aborted because its simulation reverted."""
+
+    def __init__(self, reason: str, data: Optional[str] = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.data = data
+
+
+def load_abis(abi_dir: str) -> List[Dict]:
+    """Concatenate every ABI json file in `abi_dir`."""
+    entries: List[Dict] = []
+    for path in sorted(glob.glob(os.path.join(abi_dir, "*.json"))):
+        with open(path, "r") as abi_file:
+            entries.extend(json.load(abi_file))
+    return entries
+
+
+class RevertDecoder:
+    """Decode revert data into a readable reason using the error definitions of an ABI."""
+
+    def __init__(self, abi: List[Dict]):
+        self.errors: Dict[bytes, Tuple[str, List[str], List[str]]] = {}
+        for entry in abi:
+            if entry.get("type") != "error":
+                continue
+            selector = function_abi_to_4byte_selector(entry)
+            types = [collapse_if_tuple(arg) for arg in entry.get("inputs", [])]
+            names = [arg.get("name", "") for arg in entry.get("inputs", [])]
+            self.errors[selector] = (entry["name"], types, names)
+
+    def decode(self, data: Optional[str]) -> str:
+        if not data or data == "0x":
+            return "execution reverted (no reason)"
+        raw = Web3.to_bytes(hexstr=data)
+        selector, payload = raw[:4], raw[4:]
+
+        try:
+            if selector == ERROR_STRING_SELECTOR:
+                (reason,) = abi_decode(["string"], payload)
+                return f"execution reverted: {reason}"
+            if selector == PANIC_SELECTOR:
+                (code,) = abi_decode(["uint256"], payload)
+                return f"panic 0x{code:02x}: {PANIC_CODES.get(code, 'unknown panic code')}"
+            if selector in self.errors:
+                name, types, names = self.errors[selector]
+                values = abi_decode(types, payload)
+                args = ", ".join(f"{n}={v}" if n else str(v) for n, v in zip(names, values))
+                return f"{name}({args})"
+        except Exception as e:
+            return f"undecodable revert 0x{selector.hex()} ({e})"
+        return f"unknown custom error 0x{selector.hex()}"
+
+
+def _revert_data(exc: Exception) -> Optional[str]:
+    data = getattr(exc, "data", None)
+    if isinstance(data, dict):
+        data = data.get("data")
+    if isinstance(data, str) and data.startswith("0x"):
+        return data
+    return None
+
+
+class TxSimulator:
+    """Runs transactions through eth_call before broadcast and keeps revert statistics."""
+
+    def __init__(
+        self,
+        w3: Web3,
+        abi: List[Dict],
+        cache_size: int = 4096,
+        block_refresh_interval: float = 1.0,
+        max_workers: int = 4,
+    ):
+        self.w3 = w3
+        self.decoder = RevertDecoder(abi)
+        self.cache_size = cache_size
+        self.block_refresh_interval = block_refresh_interval
+
+        self._cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._block_number = 0
+        self._block_checked_at = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        self.stats = {
+            "simulations": 0,
+            "cache_hits": 0,
+            "reverts_prevented": 0,
+            "gas_saved": 0,
+        }
+
+    def current_block(self) -> int:
+        """Latest block number, refreshed at most every `block_refresh_interval` seconds."""
+        now = time.monotonic()
+        if now - self._block_checked_at >= self.block_refresh_interval:
+            self._block_number = self.w3.eth.block_number
+            self._block_checked_at = now
+        return self._block_number
+
+    def simulate(self, tx: Dict[str, Any]) -> Dict[str, Any]:
+        """eth_call `tx` at the pending block. Returns {"success", "reason", "data", "block", "cached"}."""
+        block = self.current_block()
+        data = tx.get("data", "0x")
+        if isinstance(data, (bytes, bytearray)):
+            data = "0x" + bytes(data).hex()
+        key = (tx.get("from"), tx.get("to"), data, tx.get("value", 0), block)
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return {**cached, "cached": True}
+
+        call_tx = {k: tx[k] for k in ("from", "to", "value", "gas") if k in tx}
+        call_tx["data"] = data
+        try:
+            output = self.w3.eth.call(call_tx, "pending")
+            result = {"success": True, "reason": None, "data": "0x" + bytes(output).hex(), "block": block}
+        except ContractLogicError as e:
+            revert_data = _revert_data(e)
+            reason = self.decoder.decode(revert_data) if revert_data else str(e.message or e)
+            result = {"success": False, "reason": reason, "data": revert_data, "block": block}
+
+        with self._lock:
+            self.stats["simulations"] += 1
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return {**result, "cached": False}
+
+    def preflight_and_send(self, tx: Dict[str, Any], private_key: str):
+        """Sign `tx` while it is simulated; broadcast only if the simulation succeeds."""
+        future = self._executor.submit(self.simulate, tx)
+        signed_txn = self.w3.eth.account.sign_transaction(tx, private_key=private_key)
+        result = future.result()
+
+        if not result["success"]:
+            with self._lock:
+                self.stats["reverts_prevented"] += 1
+                self.stats["gas_saved"] += int(tx.get("gas", 0))
+            print(f"[SIMULATE] Aborted doomed transaction: {result['reason']}")
+            raise SimulationRevert(result["reason"], result["data"])
+
+        return self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+
+    def report(self) -> Dict[str, int]:
+        print(
+            f"[SIMULATE] simulations={self.stats['simulations']} "
+            f"cache_hits={self.stats['cache_hits']} "
+            f"reverts_prevented={self.stats['reverts_prevented']} "
+            f"gas_saved={self.stats['gas_saved']}"
+        )
+        return dict(self.stats)
+
+
+def main():
+    load_dotenv()
+    abi_dir = os.getenv("ABI_DIR") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "abi"))
+    options_abi_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "options-0.2.1", "abi"))
+    abi = load_abis(abi_dir) + load_abis(options_abi_dir)
+    decoder = RevertDecoder(abi)
+    print(f"[SIMULATE] Loaded {len(decoder.errors)} custom errors")
+
+    # 1. Offline decoding examples
+    samples = [
+        "0x" + (ERROR_STRING_SELECTOR + abi_encode(["string"], ["LibMuon: TSS not verified"])).hex(),
+        "0x" + (PANIC_SELECTOR + (0x11).to_bytes(32, "big")).hex(),
+    ]
+    if decoder.errors:
+        selector, (name, types, _) = next(iter(decoder.errors.items()))
+        if not types:
+            samples.append("0x" + selector.hex())
+    for sample in samples:
+        print(f"[SIMULATE] {sample[:18]}... -> {decoder.decode(sample)}")
+
+    # 2. Live pre-flight of a depositAndAllocate(0) against the pending block
+    rpc_url = os.getenv("RPC_URL")
+    private_key = os.getenv("PRIVATE_KEY")
+    diamond_address = os.getenv("DIAMOND_ADDRESS")
+    if not (rpc_url and private_key and diamond_address):
+        print("[SIMULATE] RPC_URL / PRIVATE_KEY / DIAMOND_ADDRESS not set, skipping live pre-flight")
+        return
+
+    w3 = Web3(Web3.HTTPProvider(rpc_url))
+    account = w3.eth.account.from_key(private_key)
+    diamond = w3.eth.contract(address=Web3.to_checksum_address(diamond_address), abi=load_abis(abi_dir))
+    simulator = TxSimulator(w3, abi)
+
+    txn = diamond.functions.depositAndAllocate(0).build_transaction({
+        "from": account.address,
+        "nonce": w3.eth.get_transaction_count(account.address, "pending"),
+        "gas": 200000,
+        "gasPrice": w3.eth.gas_price,
+    })
+    for attempt in range(3):
+        result = simulator.simulate(txn)
+        print(f"[SIMULATE] attempt {attempt + 1}: success={result['success']} "
+              f"cached={result['cached']} reason={result['reason']}")
+    simulator.report()
+
+
+if __name__ == "__main__":
+    main()
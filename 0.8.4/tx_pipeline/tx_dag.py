@@ -0,0 +1,495 @@
+"""Dependency-aware transaction DAG executor.
+
+Flows such as approve -> depositAndAllocate (account/deposit_and_allocate.py),
+approve -> depositForAccount -> allocate
+(multiaccount/deposit_and_allocate_for_account.py) or settle -> force close
+(force_actions/settle_and_force_close_position.py) are written as strictly
+sequential send-and-wait steps: each transaction waits for the previous
+receipt before it is even built.
+
+Here a workflow is declared as a DAG of transaction and fetch (oracle / API)
+nodes:
+
+- fetch nodes run concurrently in a thread pool as soon as their inputs exist,
+- a transaction depending only on earlier transactions is submitted right
+  after them with the next pre-assigned nonce, without waiting for receipts
+  (nonce order already guarantees on-chain order),
+- anything that needs a transaction's *effect* (a fetch after a tx, or a
+  `needs_receipt` edge) waits for its receipt.
+
+On failure the executor repairs and rolls back: a nonce whose broadcast failed
+is filled with a zero-value self-transfer so later nonces are not stuck,
+already-broadcast dependents of a failed transaction are replaced by no-ops
+(their receipt wait ends as soon as either the original or the no-op is
+mined), and nodes that completed and declare a `rollback` get it sent in
+reverse order; a rollback that fails is reported in the outcome, not raised.
+
+Run
+- python tx_pipeline/tx_dag.py
+
+The demo runs approve -> depositForAccount -> allocate plus a Muon fetch
+against a simulated chain (1 s blocks) and compares end-to-end latency with
+the sequential send-and-wait pattern of the current scripts.
+"""
+
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import rlp
+from eth_account import Account
+from web3 import Web3
+from web3.exceptions import TimeExhausted
+
+Results = Dict[str, Any]
+FEE_FIELDS = ("gasPrice", "maxFeePerGas", "maxPriorityFeePerGas")
+
+
+class TxReplaced(Exception):
+    """The node's nonce was taken by the no-op that replaced it."""
+
+
+class Node:
+    """Base DAG node. `deps` are node names this node needs before it can start."""
+
+    kind = "node"
+
+    def __init__(self, name: str, deps: Sequence[str] = ()):
+        self.name = name
+        self.deps = list(deps)
+
+
+class FetchNode(Node):
+    """Off-chain work (Muon signature, solver API, eth_call). `fetch(results)` returns any value."""
+
+    kind = "fetch"
+
+    def __init__(self, name: str, fetch: Callable[[Results], Any], deps: Sequence[str] = ()):
+        super().__init__(name, deps)
+        self.fetch = fetch
+
+
+class TxNode(Node):
+    """A transaction. `build(results)` returns a tx dict without nonce.
+
+    `needs_receipt` lists transaction deps whose receipt (not only their
+    submission) must exist before this node is built. `rollback(results)` may
+    return a compensating tx dict to send if the workflow fails afterwards.
+    """
+
+    kind = "tx"
+
+    def __init__(
+        self,
+        name: str,
+        build: Callable[[Results], Dict[str, Any]],
+        deps: Sequence[str] = (),
+        needs_receipt: Sequence[str] = (),
+        rollback: Optional[Callable[[Results], Optional[Dict[str, Any]]]] = None,
+    ):
+        super().__init__(name, list(deps) + [d for d in needs_receipt if d not in deps])
+        self.build = build
+        self.needs_receipt = set(needs_receipt)
+        self.rollback = rollback
+
+
+class Workflow:
+    def __init__(self, nodes: Sequence[Node] = ()):
+        self.nodes: Dict[str, Node] = {}
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: Node) -> Node:
+        if node.name in self.nodes:
+            raise ValueError(f"Duplicate node {node.name}")
+        self.nodes[node.name] = node
+        return node
+
+    def validate(self) -> List[str]:
+        """Return a topological order, raising on unknown deps or cycles."""
+        order: List[str] = []
+        state: Dict[str, int] = {}
+
+        def visit(name: str, path: List[str]):
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"Cycle in workflow: {' -> '.join(path + [name])}")
+            if name not in self.nodes:
+                raise ValueError(f"Unknown dependency {name}")
+            state[name] = 1
+            for dep in self.nodes[name].deps:
+                visit(dep, path + [name])
+            state[name] = 2
+            order.append(name)
+
+        for name in self.nodes:
+            visit(name, [])
+        return order
+
+    def dependents(self, name: str) -> List[str]:
+        """All nodes that depend on `name`, transitively."""
+        found: List[str] = []
+        frontier = [name]
+        while frontier:
+            current = frontier.pop()
+            for node in self.nodes.values():
+                if current in node.deps and node.name not in found:
+                    found.append(node.name)
+                    frontier.append(node.name)
+        return found
+
+
+class TxDagExecutor:
+    """Runs a Workflow from one account with pre-assigned sequential nonces."""
+
+    def __init__(self, w3, private_key: str, max_workers: int = 8, broadcast_retries: int = 2, receipt_timeout: float = 180,
+                 receipt_poll: float = 2.0):
+        self.w3 = w3
+        self.private_key = private_key
+        self.account = Account.from_key(private_key)
+        self.max_workers = max_workers
+        self.broadcast_retries = broadcast_retries
+        self.receipt_timeout = receipt_timeout
+        self.receipt_poll = receipt_poll
+        self._replacements: Dict[int, bytes] = {}  # nonce -> no-op hash sent over a doomed tx
+
+    # ----------------------------------------------------------------
+    # Transaction helpers
+    # ----------------------------------------------------------------
+    def _prepare(self, tx: Dict[str, Any], nonce: int, defaults: Dict[str, Any]) -> Dict[str, Any]:
+        tx = {**defaults, **tx}
+        tx["from"] = self.account.address
+        tx["nonce"] = nonce
+        return tx
+
+    def _broadcast(self, tx: Dict[str, Any]) -> bytes:
+        signed_txn = self.w3.eth.account.sign_transaction(tx, private_key=self.private_key)
+        return self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+
+    def _noop(self, nonce: int, defaults: Dict[str, Any], bump: bool = False) -> bytes:
+        """Zero-value self-transfer used to fill a nonce gap or replace a doomed tx."""
+        tx = {"to": self.account.address, "value": 0, "gas": 21000, "nonce": nonce, "from": self.account.address}
+        for key in FEE_FIELDS + ("chainId",):
+            if key in defaults:
+                tx[key] = defaults[key]
+        if bump:
+            # Replacement rules want every fee field at least 10% higher
+            for key in FEE_FIELDS:
+                if key in tx:
+                    tx[key] = tx[key] * 13 // 10 + 1
+        return self._broadcast(tx)
+
+    def _wait_receipt(self, tx_hash: bytes, nonce: Optional[int] = None):
+        """Receipt of `tx_hash`; raises `TxReplaced` once the no-op sent over its nonce is mined instead."""
+        deadline = time.monotonic() + self.receipt_timeout
+        while True:
+            candidates = [tx_hash]
+            replacement = self._replacements.get(nonce) if nonce is not None else None
+            if replacement is not None:
+                candidates.append(replacement)
+            for candidate in candidates:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeExhausted(f"No receipt for {tx_hash.hex()} after {self.receipt_timeout}s")
+                try:
+                    receipt = self.w3.eth.wait_for_transaction_receipt(candidate, timeout=min(self.receipt_poll, remaining))
+                except TimeExhausted:
+                    continue
+                if candidate != tx_hash:
+                    raise TxReplaced(f"nonce {nonce} was taken by the no-op {candidate.hex()}")
+                return receipt
+
+    # ----------------------------------------------------------------
+    # Execution
+    # ----------------------------------------------------------------
+    def run(self, workflow: Workflow, defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+        """Execute `workflow`. Returns per-node {"status", "result", "nonce", "tx_hash", "receipt"}.
+
+        `defaults` are merged into every built tx (gas, gasPrice, chainId).
+        """
+        order = workflow.validate()
+        defaults = dict(defaults or {})
+        if "gasPrice" not in defaults and "maxFeePerGas" not in defaults:
+            defaults["gasPrice"] = self.w3.eth.gas_price
+
+        next_nonce = self.w3.eth.get_transaction_count(self.account.address, "pending")
+        self._replacements = {}
+        results: Results = {}
+        outcome: Dict[str, Dict[str, Any]] = {
+            name: {"status": "waiting", "result": None, "nonce": None, "tx_hash": None, "receipt": None}
+            for name in order
+        }
+        futures: Dict[Future, tuple] = {}
+        failed = False
+        start = time.perf_counter()
+
+        def satisfied(node: Node) -> bool:
+            for dep in node.deps:
+                dep_node = workflow.nodes[dep]
+                status = outcome[dep]["status"]
+                if dep_node.kind == "fetch" or node.kind == "fetch":
+                    if status != "done":
+                        return False
+                elif isinstance(node, TxNode) and dep in node.needs_receipt:
+                    if status != "done":
+                        return False
+                elif status not in ("submitted", "done"):
+                    return False
+            return True
+
+        def skip_dependents(name: str, reason: str) -> None:
+            for dep_name in workflow.dependents(name):
+                entry = outcome[dep_name]
+                if entry["status"] == "waiting":
+                    entry["status"] = "skipped"
+                    entry["result"] = reason
+                elif entry["status"] == "submitted":
+                    # Already broadcast on top of a failed predecessor: replace it with a no-op
+                    try:
+                        self._replacements[entry["nonce"]] = self._noop(entry["nonce"], defaults, bump=True)
+                        entry["status"] = "cancelling"
+                        print(f"[DAG] Replacing {dep_name} (nonce {entry['nonce']}) with a no-op")
+                    except Exception as e:
+                        print(f"[DAG] Could not replace {dep_name}: {e}")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while True:
+                # Launch everything that became ready, in topological order
+                for name in order:
+                    node = workflow.nodes[name]
+                    entry = outcome[name]
+                    if entry["status"] != "waiting" or not satisfied(node):
+                        continue
+
+                    if node.kind == "fetch":
+                        entry["status"] = "running"
+                        futures[pool.submit(node.fetch, results)] = ("fetch", name)
+                        continue
+
+                    try:
+                        built = node.build(results)
+                    except Exception as e:
+                        failed = True
+                        entry["status"] = "failed"
+                        entry["result"] = str(e)
+                        print(f"[DAG] {name} could not be built: {e}")
+                        skip_dependents(name, f"dependency {name} failed")
+                        continue
+
+                    nonce = next_nonce
+                    next_nonce += 1
+                    entry["nonce"] = nonce
+                    tx = self._prepare(built, nonce, defaults)
+                    try:
+                        tx_hash = None
+                        for attempt in range(self.broadcast_retries + 1):
+                            try:
+                                tx_hash = self._broadcast(tx)
+                                break
+                            except Exception as e:
+                                if attempt == self.broadcast_retries:
+                                    raise
+                                print(f"[DAG] Broadcast of {name} failed ({e}), retrying")
+                    except Exception as e:
+                        failed = True
+                        entry["status"] = "failed"
+                        entry["result"] = str(e)
+                        print(f"[DAG] {name} could not be sent: {e}; filling nonce {nonce}")
+                        try:
+                            self._noop(nonce, defaults)
+                        except Exception as fill_error:
+                            print(f"[DAG] Failed to fill nonce {nonce}: {fill_error}")
+                        skip_dependents(name, f"dependency {name} failed")
+                        continue
+
+                    entry["status"] = "submitted"
+                    entry["tx_hash"] = tx_hash
+                    print(f"[DAG] {name} submitted with nonce {nonce}: {tx_hash.hex()}")
+                    futures[pool.submit(self._wait_receipt, tx_hash, nonce)] = ("tx", name)
+
+                if not futures:
+                    break
+
+                done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, name = futures.pop(future)
+                    entry = outcome[name]
+                    try:
+                        value = future.result()
+                    except Exception as e:
+                        failed = True
+                        entry["status"] = "cancelled" if entry["status"] == "cancelling" else "failed"
+                        entry["result"] = str(e)
+                        print(f"[DAG] {name} {entry['status']}: {e}")
+                        skip_dependents(name, f"dependency {name} failed")
+                        continue
+
+                    if kind == "fetch":
+                        results[name] = value
+                        entry["status"] = "done"
+                        entry["result"] = value
+                        continue
+
+                    entry["receipt"] = value
+                    if value["status"] == 1:
+                        results[name] = value
+                        entry["status"] = "done"
+                        print(f"[DAG] {name} confirmed in block {value['blockNumber']}")
+                    else:
+                        failed = True
+                        entry["status"] = "failed"
+                        print(f"[DAG] {name} reverted in block {value['blockNumber']}")
+                        skip_dependents(name, f"dependency {name} reverted")
+
+        if failed:
+            self._rollback(workflow, order, outcome, results, defaults)
+
+        elapsed = time.perf_counter() - start
+        print(f"[DAG] Workflow finished in {elapsed:.2f}s: "
+              f"{ {name: entry['status'] for name, entry in outcome.items()} }")
+        return outcome
+
+    def _rollback(self, workflow: Workflow, order: List[str], outcome, results: Results, defaults) -> None:
+        for name in reversed(order):
+            node = workflow.nodes[name]
+            if not isinstance(node, TxNode) or node.rollback is None or outcome[name]["status"] != "done":
+                continue
+            try:
+                tx = node.rollback(results)
+                if not tx:
+                    continue
+                nonce = self.w3.eth.get_transaction_count(self.account.address, "pending")
+                tx_hash = self._broadcast(self._prepare(tx, nonce, defaults))
+                receipt = self._wait_receipt(tx_hash)
+                if receipt["status"] != 1:
+                    raise RuntimeError(f"rollback {tx_hash.hex()} reverted")
+            except Exception as e:
+                outcome[name]["status"] = "rollback_failed"
+                outcome[name]["result"] = str(e)
+                print(f"[DAG] Rollback of {name} failed: {e}")
+                continue
+            outcome[name]["status"] = "rolled_back"
+            print(f"[DAG] Rolled back {name}: {tx_hash.hex()}")
+
+    def run_sequential(self, workflow: Workflow, defaults: Optional[Dict[str, Any]] = None) -> float:
+        """The current scripts' pattern: build, send, wait for receipt, one node at a time."""
+        order = workflow.validate()
+        defaults = dict(defaults or {})
+        if "gasPrice" not in defaults and "maxFeePerGas" not in defaults:
+            defaults["gasPrice"] = self.w3.eth.gas_price
+        results: Results = {}
+        start = time.perf_counter()
+        for name in order:
+            node = workflow.nodes[name]
+            if node.kind == "fetch":
+                results[name] = node.fetch(results)
+                continue
+            nonce = self.w3.eth.get_transaction_count(self.account.address)
+            tx_hash = self._broadcast(self._prepare(node.build(results), nonce, defaults))
+            results[name] = self._wait_receipt(tx_hash)
+        return time.perf_counter() - start
+
+
+# --------------------------------------------------------------------
+# Simulated chain for the latency comparison
+# --------------------------------------------------------------------
+class _SimulatedEth:
+    """Just enough of `w3.eth` to mine signed txs in nonce order at a fixed block time."""
+
+    account = Account
+
+    def __init__(self, block_time: float, rpc_latency: float):
+        self.block_time = block_time
+        self.rpc_latency = rpc_latency
+        self.genesis = time.monotonic()
+        self.gas_price = 10**9
+        self.chain_id = 42161
+        self._lock = threading.Lock()
+        self._txs: Dict[bytes, Dict[str, Any]] = {}
+        self._by_nonce: Dict[str, Dict[int, bytes]] = {}
+
+    def _block_at(self, t: float) -> int:
+        return int((t - self.genesis) / self.block_time) + 1
+
+    def get_transaction_count(self, address: str, block_identifier: str = "latest") -> int:
+        time.sleep(self.rpc_latency)
+        with self._lock:
+            nonces = self._by_nonce.get(address, {})
+            if block_identifier == "pending":
+                return max(nonces, default=-1) + 1
+            now_block = self._block_at(time.monotonic())
+            mined = [n for n, h in nonces.items() if self._txs[h]["block"] <= now_block]
+            return max(mined, default=-1) + 1
+
+    def send_raw_transaction(self, raw: bytes) -> bytes:
+        time.sleep(self.rpc_latency)
+        sender = Account.recover_transaction(raw)
+        nonce = int.from_bytes(rlp.decode(bytes(raw))[0], "big")  # legacy txs only
+        tx_hash = bytes(Web3.keccak(raw))
+        with self._lock:
+            nonces = self._by_nonce.setdefault(sender, {})
+            previous = nonces.get(nonce - 1)
+            earliest = self._block_at(time.monotonic()) + 1
+            if previous is not None:
+                earliest = max(earliest, self._txs[previous]["block"])
+            replaced = nonces.get(nonce)
+            if replaced is not None and self._txs[replaced]["block"] <= self._block_at(time.monotonic()):
+                raise ValueError("nonce too low")
+            nonces[nonce] = tx_hash
+            self._txs[tx_hash] = {"block": earliest, "nonce": nonce}
+        return tx_hash
+
+    def wait_for_transaction_receipt(self, tx_hash: bytes, timeout: float = 120):
+        with self._lock:
+            block = self._txs[tx_hash]["block"]
+        mined_at = self.genesis + block * self.block_time
+        time.sleep(max(0.0, mined_at - time.monotonic()) + self.rpc_latency)
+        return {"transactionHash": tx_hash, "blockNumber": block, "status": 1}
+
+
+class _SimulatedWeb3:
+    def __init__(self, block_time: float = 1.0, rpc_latency: float = 0.05):
+        self.eth = _SimulatedEth(block_time, rpc_latency)
+
+
+def _deposit_and_allocate_workflow(muon_latency: float) -> Workflow:
+    """approve -> depositForAccount -> allocate, with the allocate leg needing a Muon signature."""
+    multiaccount = "0xffE2C25404525D2D4351D75177B92F18D9DaF4Af"
+    collateral = "0x50E88C692B137B8a51b6017026Ef414651e0d5ba"
+
+    def fetch_upnl_sig(results):
+        time.sleep(muon_latency)
+        return {"upnl": 0, "timestamp": int(time.time())}
+
+    return Workflow([
+        FetchNode("muon_upnl_sig", fetch_upnl_sig),
+        TxNode("approve", lambda r: {"to": collateral, "data": "0x095ea7b3", "gas": 60000, "value": 0},
+               rollback=lambda r: {"to": collateral, "data": "0x095ea7b3", "gas": 60000, "value": 0}),
+        TxNode("deposit_for_account", lambda r: {"to": multiaccount, "data": "0x01", "gas": 300000, "value": 0},
+               deps=["approve"]),
+        TxNode("allocate", lambda r: {"to": multiaccount, "data": "0x02", "gas": 300000, "value": 0},
+               deps=["deposit_for_account", "muon_upnl_sig"]),
+    ])
+
+
+def main():
+    private_key = Account.create().key.hex()
+    block_time, muon_latency = 1.0, 0.4
+    defaults = {"chainId": 42161}
+
+    w3 = _SimulatedWeb3(block_time=block_time)
+    sequential = TxDagExecutor(w3, private_key).run_sequential(_deposit_and_allocate_workflow(muon_latency), defaults)
+    print(f"[BENCH] sequential send-and-wait: {sequential:.2f}s")
+
+    w3 = _SimulatedWeb3(block_time=block_time)
+    start = time.perf_counter()
+    outcome = TxDagExecutor(w3, private_key).run(_deposit_and_allocate_workflow(muon_latency), defaults)
+    dag = time.perf_counter() - start
+    print(f"[BENCH] DAG with pre-assigned nonces: {dag:.2f}s ({sequential / dag:.1f}x faster)")
+    assert all(entry["status"] == "done" for entry in outcome.values())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""Transaction replacement and stuck-tx acceleration engine.
+
+`settle_upnl.py`, `force_close_position.py` and friends send with a one-shot
+`gasPrice` and then block in `wait_for_transaction_receipt`. When gas spikes
+the transaction can sit in the mempool until the Muon signature it carries is
+no longer valid, at which point it can only revert.
+
+`TxReplacementEngine` keeps track of our pending transactions and, on a
+configurable schedule, re-broadcasts them with the same nonce and bumped fees
+(EIP-1559 replacement rules: both `maxFeePerGas` and `maxPriorityFeePerGas`
+must grow by at least 10%; legacy transactions bump `gasPrice`). A transaction
+whose embedded signature has expired is cancelled with a zero-value
+self-transfer on the same nonce instead of being accelerated; a cancel that
+gets stuck is bumped on the same schedule. A replacement that `max_fee_cap`
+would price below the 10% minimum is never broadcast (nodes reject it as
+underpriced). Time to inclusion is recorded per function in histograms.
+
+Signature expiry for a Muon-signed call is the signature timestamp plus the
+validity window from `getMuonConfig()` (see view/state/muon/get_muon_config.py):
+    expires_at = upnl_sig_timestamp + upnl_valid_time
+
+Run
+- python tx_pipeline/tx_replacement.py
+
+Required .env
+- RPC_URL
+- PRIVATE_KEY
+
+Optional .env
+- CHAIN_ID
+"""
+
+import os
+import time
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+from dotenv import load_dotenv
+from web3 import Web3
+
+# Minimum bump accepted by geth / erigon / most providers is 10%.
+MIN_BUMP_PERCENT = 10
+DEFAULT_SCHEDULE = (6, 12, 24, 36, 60)  # seconds since last broadcast before each bump
+HISTOGRAM_BUCKETS = (1, 2, 5, 10, 20, 30, 60, 120, 300)  # seconds, plus +Inf
+FEE_FIELDS = ("gasPrice", "maxFeePerGas", "maxPriorityFeePerGas")
+
+
+class ReplacementUnderpriced(RuntimeError):
+    """The fee cap leaves no room for a replacement the network would accept."""
+
+
+class PendingTx:
+    """A nonce we have broadcast and are waiting to see included."""
+
+    __slots__ = (
+        "tx", "function_name", "signature_expires_at", "first_sent_at",
+        "last_sent_at", "bumps", "hashes", "cancel_tx", "cancel_hashes", "status",
+    )
+
+    def __init__(self, tx: Dict[str, Any], function_name: str, signature_expires_at: Optional[float]):
+        self.tx = tx
+        self.function_name = function_name
+        self.signature_expires_at = signature_expires_at
+        self.first_sent_at = time.monotonic()
+        self.last_sent_at = self.first_sent_at
+        self.bumps = 0
+        self.hashes: List[bytes] = []
+        self.cancel_tx: Optional[Dict[str, Any]] = None
+        self.cancel_hashes: List[bytes] = []
+        self.status = "pending"
+
+
+class TxReplacementEngine:
+    """Watches our pending transactions, bumps stuck ones and cancels expired ones."""
+
+    def __init__(
+        self,
+        w3: Web3,
+        private_key: str,
+        schedule: Sequence[float] = DEFAULT_SCHEDULE,
+        bump_percent: float = 12.5,
+        max_fee_cap: Optional[int] = None,
+        expiry_margin: float = 5.0,
+    ):
+        if bump_percent < MIN_BUMP_PERCENT:
+            raise ValueError(f"bump_percent must be at least {MIN_BUMP_PERCENT}% to replace a pending transaction")
+        self.w3 = w3
+        self.private_key = private_key
+        self.account = w3.eth.account.from_key(private_key)
+        self.schedule = tuple(schedule)
+        self.bump_percent = bump_percent
+        self.max_fee_cap = max_fee_cap
+        self.expiry_margin = expiry_margin
+
+        self.pending: Dict[int, PendingTx] = {}
+        self.histograms: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    # ----------------------------------------------------------------
+    # Sending
+    # ----------------------------------------------------------------
+    def _broadcast(self, tx: Dict[str, Any]) -> bytes:
+        signed_txn = self.w3.eth.account.sign_transaction(tx, private_key=self.private_key)
+        return self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+
+    def send(self, tx: Dict[str, Any], function_name: str, signature_expires_at: Optional[float] = None) -> bytes:
+        """Broadcast `tx` (with nonce and fees set) and start watching it.
+
+        `signature_expires_at` is a unix timestamp after which the transaction
+        can no longer succeed; it is cancelled shortly before that instead of
+        being bumped again.
+        """
+        tx = dict(tx)
+        if "nonce" not in tx:
+            tx["nonce"] = self.w3.eth.get_transaction_count(self.account.address, "pending")
+        tx_hash = self._broadcast(tx)
+
+        entry = PendingTx(tx, function_name, signature_expires_at)
+        entry.hashes.append(tx_hash)
+        with self._lock:
+            self.pending[tx["nonce"]] = entry
+        print(f"[REPLACE] Sent {function_name} nonce={tx['nonce']}: {tx_hash.hex()}")
+        return tx_hash
+
+    def _bump(self, fees: Dict[str, Any]) -> Dict[str, int]:
+        """Return `fees` bumped by `bump_percent`, never below the current network suggestion."""
+        factor_num, factor_den = int(1000 + self.bump_percent * 10), 1000
+        bumped: Dict[str, int] = {}
+        if "maxFeePerGas" in fees:
+            base_fee = self.w3.eth.get_block("pending").get("baseFeePerGas", 0)
+            priority = max(
+                fees["maxPriorityFeePerGas"] * factor_num // factor_den + 1,
+                self.w3.eth.max_priority_fee,
+            )
+            max_fee = max(fees["maxFeePerGas"] * factor_num // factor_den + 1, 2 * base_fee + priority)
+            if self.max_fee_cap is not None:
+                max_fee = min(max_fee, self.max_fee_cap)
+                priority = min(priority, max_fee)
+            bumped["maxFeePerGas"] = max_fee
+            bumped["maxPriorityFeePerGas"] = priority
+        else:
+            gas_price = max(fees["gasPrice"] * factor_num // factor_den + 1, self.w3.eth.gas_price)
+            if self.max_fee_cap is not None:
+                gas_price = min(gas_price, self.max_fee_cap)
+            bumped["gasPrice"] = gas_price
+        return bumped
+
+    @staticmethod
+    def _underpriced(new_fees: Dict[str, int], old_fees: Dict[str, int]) -> bool:
+        """True if any fee grew by less than the MIN_BUMP_PERCENT a replacement needs."""
+        return any(new_fees[k] * 100 < old_fees[k] * (100 + MIN_BUMP_PERCENT) for k in new_fees)
+
+    def _replace(self, entry: PendingTx) -> None:
+        old_fees = {k: entry.tx[k] for k in FEE_FIELDS if k in entry.tx}
+        new_fees = self._bump(old_fees)
+        if self._underpriced(new_fees, old_fees):
+            print(f"[REPLACE] nonce={entry.tx['nonce']} too close to max_fee_cap for a replacement, not bumping")
+            entry.last_sent_at = time.monotonic()
+            return
+        entry.tx.update(new_fees)
+        tx_hash = self._broadcast(entry.tx)
+        entry.hashes.append(tx_hash)
+        entry.bumps += 1
+        entry.last_sent_at = time.monotonic()
+        print(f"[REPLACE] Bumped {entry.function_name} nonce={entry.tx['nonce']} "
+              f"(bump {entry.bumps}, {new_fees}): {tx_hash.hex()}")
+
+    def _cancel(self, entry: PendingTx) -> None:
+        """Replace the nonce with a self-transfer, or bump the self-transfer already sent."""
+        previous = entry.cancel_tx or entry.tx
+        old_fees = {k: previous[k] for k in FEE_FIELDS if k in previous}
+        new_fees = self._bump(old_fees)
+        if self._underpriced(new_fees, old_fees):
+            raise ReplacementUnderpriced(
+                f"Cannot cancel nonce={entry.tx['nonce']}: max_fee_cap {self.max_fee_cap} leaves {new_fees}, "
+                f"replacing {old_fees} needs {MIN_BUMP_PERCENT}% more")
+        cancel_tx = {
+            "from": self.account.address,
+            "to": self.account.address,
+            "value": 0,
+            "gas": 21000,
+            "nonce": entry.tx["nonce"],
+            **new_fees,
+        }
+        if "chainId" in entry.tx:
+            cancel_tx["chainId"] = entry.tx["chainId"]
+        cancel_hash = self._broadcast(cancel_tx)
+        resent = entry.cancel_tx is not None
+        entry.cancel_tx = cancel_tx
+        entry.cancel_hashes.append(cancel_hash)
+        if resent:
+            entry.bumps += 1
+        entry.status = "cancelling"
+        entry.last_sent_at = time.monotonic()
+        if resent:
+            print(f"[REPLACE] Bumped cancel of {entry.function_name} nonce={entry.tx['nonce']} ({new_fees}): "
+                  f"{cancel_hash.hex()}")
+        else:
+            print(f"[REPLACE] Signature expired for {entry.function_name} nonce={entry.tx['nonce']}, "
+                  f"cancel sent: {cancel_hash.hex()}")
+
+    # ----------------------------------------------------------------
+    # Watching
+    # ----------------------------------------------------------------
+    def _record_inclusion(self, entry: PendingTx, elapsed: float) -> None:
+        counts = self.histograms.setdefault(entry.function_name, [0] * (len(HISTOGRAM_BUCKETS) + 1))
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if elapsed <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+
+    def _settle(self, entry: PendingTx) -> None:
+        """The nonce was consumed: find out which of our broadcasts made it."""
+        elapsed = time.monotonic() - entry.first_sent_at
+        if any(self._mined(tx_hash) for tx_hash in reversed(entry.hashes)):
+            entry.status = "included"
+            self._record_inclusion(entry, elapsed)
+        elif any(self._mined(tx_hash) for tx_hash in reversed(entry.cancel_hashes)):
+            entry.status = "cancelled"
+        else:
+            entry.status = "replaced"  # the nonce went to a transaction sent outside this engine
+        print(f"[REPLACE] {entry.function_name} nonce={entry.tx['nonce']} {entry.status} "
+              f"after {elapsed:.1f}s and {entry.bumps} bump(s)")
+
+    def _mined(self, tx_hash: bytes) -> bool:
+        try:
+            return self.w3.eth.get_transaction_receipt(tx_hash) is not None
+        except Exception:
+            return False
+
+    def poll(self) -> None:
+        """One pass over the pending set: settle mined nonces, cancel expired ones, bump stuck ones."""
+        with self._lock:
+            if not self.pending:
+                return
+            entries = sorted(self.pending.items())
+
+        confirmed_nonce = self.w3.eth.get_transaction_count(self.account.address, "latest")
+        now = time.monotonic()
+        wall_now = time.time()
+
+        for nonce, entry in entries:
+            try:
+                if nonce < confirmed_nonce:
+                    self._settle(entry)
+                    with self._lock:
+                        self.pending.pop(nonce, None)
+                    continue
+                wait = self.schedule[min(entry.bumps, len(self.schedule) - 1)]
+                if entry.status == "cancelling":
+                    if now - entry.last_sent_at >= wait:
+                        self._cancel(entry)
+                    continue
+
+                expires_at = entry.signature_expires_at
+                if expires_at is not None and wall_now >= expires_at - self.expiry_margin:
+                    self._cancel(entry)
+                    continue
+
+                if now - entry.last_sent_at >= wait:
+                    self._replace(entry)
+            except Exception as e:
+                print(f"[REPLACE] Error handling nonce={nonce}: {e}")
+
+    def run(self, poll_interval: float = 2.0) -> threading.Thread:
+        """Poll in a background thread until `stop()` is called."""
+        def loop():
+            while not self._stop.wait(poll_interval):
+                self.poll()
+
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+    def wait_all(self, poll_interval: float = 2.0, timeout: Optional[float] = None) -> None:
+        """Block until every tracked nonce has been included or cancelled."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending:
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"{len(self.pending)} transaction(s) still pending")
+            self.poll()
+            time.sleep(poll_interval)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def report(self) -> Dict[str, Dict[str, int]]:
+        """Time-to-inclusion histograms per function, as {function: {"<=Ns": count, ...}}."""
+        labels = [f"<={b}s" for b in HISTOGRAM_BUCKETS] + ["+Inf"]
+        result = {}
+        for function_name, counts in self.histograms.items():
+            result[function_name] = dict(zip(labels, counts))
+            print(f"[REPLACE] {function_name}: {result[function_name]}")
+        return result
+
+
+def main():
+    """Send a zero-value self-transfer at a deliberately low tip and let the engine accelerate it."""
+    load_dotenv()
+    w3 = Web3(Web3.HTTPProvider(os.getenv("RPC_URL")))
+    private_key = os.getenv("PRIVATE_KEY")
+    engine = TxReplacementEngine(w3, private_key, schedule=(5, 10, 20))
+    account = engine.account
+
+    base_fee = w3.eth.get_block("pending").get("baseFeePerGas", 0)
+    tx = {
+        "from": account.address,
+        "to": account.address,
+        "value": 0,
+        "gas": 21000,
+        "nonce": w3.eth.get_transaction_count(account.address, "pending"),
+        "maxPriorityFeePerGas": 1,
+        "maxFeePerGas": base_fee + 1,
+        "chainId": int(os.getenv("CHAIN_ID", w3.eth.chain_id)),
+    }
+    engine.send(tx, "selfTransfer", signature_expires_at=time.time() + 120)
+    engine.wait_all(poll_interval=2.0, timeout=300)
+    engine.report()
+
+
+if __name__ == "__main__":
+    main()